@@ -282,9 +282,20 @@ if 'generated_script' not in st.session_state:
     st.session_state.generated_script = None
 if 'html_content' not in st.session_state:
     st.session_state.html_content = None
+if 'project_id' not in st.session_state:
+    st.session_state.project_id = "default"
+if 'loaded_project' not in st.session_state:
+    st.session_state.loaded_project = None
+if 'script_case_id' not in st.session_state:
+    st.session_state.script_case_id = None
 
 
 # Helper functions
+def project_params(**params):
+    """Query parameters selecting the current project's knowledge base"""
+    return {"project_id": st.session_state.project_id or "default", **params}
+
+
 def check_backend_health():
     """Check if backend is running"""
     try:
@@ -304,7 +315,8 @@ def upload_documents(files):
     
     response = requests.post(
         f"{API_BASE_URL}/upload",
-        files=files_data
+        files=files_data,
+        params=project_params()
     )
     return response.json()
 
@@ -313,38 +325,114 @@ def build_knowledge_base(reset=False):
     """Build knowledge base"""
     response = requests.post(
         f"{API_BASE_URL}/build-knowledge-base",
-        params={"reset": reset}
+        params=project_params(reset=reset)
     )
     return response.json()
 
 
-def generate_test_cases(query, top_k=5):
-    """Generate test cases"""
+def delete_document(filename):
+    """Delete one uploaded document and its chunks"""
+    response = requests.delete(
+        f"{API_BASE_URL}/documents/{filename}",
+        params=project_params()
+    )
+    return response.json()
+
+
+def generate_test_cases(query, top_k=5, regenerate=False):
+    """Generate test cases (stored results are reused unless regenerate is set)"""
     response = requests.post(
         f"{API_BASE_URL}/generate-test-cases",
-        json={"query": query, "top_k": top_k}
+        json={"query": query, "top_k": top_k, "regenerate": regenerate},
+        params=project_params()
+    )
+    return response.json()
+
+
+def generate_test_plan(max_features=None, regenerate=False):
+    """Generate a test plan covering every discovered feature"""
+    response = requests.post(
+        f"{API_BASE_URL}/generate-test-plan",
+        json={"max_features": max_features, "regenerate": regenerate},
+        params=project_params()
+    )
+    return response.json()
+
+
+def list_stored_test_cases(limit=200, **filters):
+    """Stored test cases of the current project, newest first"""
+    response = requests.get(
+        f"{API_BASE_URL}/test-cases",
+        params=project_params(limit=limit, **{k: v for k, v in filters.items() if v is not None})
+    )
+    return response.json()
+
+
+def get_test_case_facets():
+    """Filter values of the current project's stored test cases"""
+    response = requests.get(f"{API_BASE_URL}/test-cases/facets", params=project_params())
+    return response.json().get("facets", {})
+
+
+def load_latest_test_cases():
+    """Test cases of the project's latest test-case or test-plan generation"""
+    latest = []
+    for kind in ("test_cases", "test_plan"):
+        response = requests.get(f"{API_BASE_URL}/generations", params=project_params(kind=kind, limit=1))
+        latest.extend(response.json().get("items", []))
+    if not latest:
+        return []
+    
+    generation_id = max(generation["id"] for generation in latest)
+    page = list_stored_test_cases(limit=500, generation_id=generation_id)
+    return list(reversed(page.get("items", [])))
+
+
+def get_stored_script(test_case_id):
+    """Latest stored script of a stored test case, if any"""
+    response = requests.get(
+        f"{API_BASE_URL}/scripts",
+        params=project_params(test_case_id=test_case_id, limit=1)
+    )
+    items = response.json().get("items", [])
+    return items[0] if items else None
+
+
+def deduplicate_test_cases(test_cases):
+    """Merge semantically duplicate test cases"""
+    response = requests.post(
+        f"{API_BASE_URL}/deduplicate-test-cases",
+        json={"test_cases": test_cases},
+        params=project_params()
     )
     return response.json()
 
 
-def generate_selenium_script(test_case, html_content=None):
+def generate_selenium_script(test_case, html_content=None, regenerate=False, repair_selectors=False):
     """Generate Selenium script"""
     response = requests.post(
         f"{API_BASE_URL}/generate-selenium-script",
-        json={"test_case": test_case, "html_content": html_content}
+        json={
+            "test_case": test_case,
+            "html_content": html_content,
+            "test_case_id": test_case.get("case_id"),
+            "regenerate": regenerate,
+            "repair_selectors": repair_selectors
+        },
+        params=project_params()
     )
     return response.json()
 
 
 def get_kb_stats():
     """Get knowledge base statistics"""
-    response = requests.get(f"{API_BASE_URL}/knowledge-base/stats")
+    response = requests.get(f"{API_BASE_URL}/knowledge-base/stats", params=project_params())
     return response.json()
 
 
 def get_test_suggestions():
     """Get test scenario suggestions"""
-    response = requests.get(f"{API_BASE_URL}/test-suggestions")
+    response = requests.get(f"{API_BASE_URL}/test-suggestions", params=project_params())
     return response.json()
 
 
@@ -379,6 +467,25 @@ def main():
             label_visibility="collapsed"
         )
         
+        # Project (each project has its own knowledge base)
+        st.markdown("<div style='color: #999; font-size: 0.75rem; font-weight: 600; letter-spacing: 1px; margin: 2rem 0 1rem 0; text-transform: uppercase;'>Project</div>", unsafe_allow_html=True)
+        st.text_input(
+            "Project",
+            key="project_id",
+            help="Letters, digits, '-' and '_'. Documents and test generation are scoped to this project.",
+            label_visibility="collapsed"
+        )
+        
+        # Restore the project's last generated test cases (e.g. after a browser refresh)
+        if st.session_state.loaded_project != st.session_state.project_id:
+            try:
+                st.session_state.test_cases = load_latest_test_cases()
+                st.session_state.generated_script = None
+                st.session_state.script_case_id = None
+                st.session_state.loaded_project = st.session_state.project_id
+            except Exception:
+                pass
+        
         # Knowledge Base Status
         st.markdown("<div style='color: #999; font-size: 0.75rem; font-weight: 600; letter-spacing: 1px; margin: 2rem 0 1rem 0; text-transform: uppercase;'>Knowledge Base</div>", unsafe_allow_html=True)
         try:
@@ -574,7 +681,12 @@ def show_document_upload_page():
             if stats.get("uploaded_files"):
                 with st.expander("View uploaded files"):
                     for file in stats["uploaded_files"]:
-                        st.write(f"- {file}")
+                        file_col, delete_col = st.columns([4, 1])
+                        file_col.write(f"- {file}")
+                        if delete_col.button("🗑️", key=f"delete_{file}", help=f"Delete {file} and its chunks"):
+                            result = delete_document(file)
+                            st.success(f"✅ {result.get('message', 'Deleted')}")
+                            st.rerun()
         
         with col2:
             kb_info = stats.get("vector_db", {})
@@ -634,6 +746,10 @@ def show_test_case_generation_page():
         )
     
     top_k = st.slider("Number of context chunks to retrieve", 3, 10, 5)
+    regenerate = st.checkbox(
+        "Regenerate",
+        help="Call the LLM even if these test cases were already generated from the current documents"
+    )
     
     if st.button("🚀 Generate Test Cases", type="primary"):
         if not query:
@@ -641,17 +757,68 @@ def show_test_case_generation_page():
         else:
             with st.spinner("Generating test cases... This may take 30-60 seconds."):
                 try:
-                    result = generate_test_cases(query, top_k)
+                    result = generate_test_cases(query, top_k, regenerate)
                     st.session_state.test_cases = result.get("test_cases", [])
                     
-                    if st.session_state.test_cases:
+                    if st.session_state.test_cases and result.get("reused"):
+                        st.success(f"✅ Loaded {len(st.session_state.test_cases)} stored test case(s) for this query")
+                    elif st.session_state.test_cases:
                         st.success(f"✅ Generated {len(st.session_state.test_cases)} test case(s)")
                     else:
                         st.warning("No test cases were generated. Try modifying your query.")
+                    
+                    dropped = result.get("parse_report", {}).get("dropped", [])
+                    if dropped:
+                        st.warning(
+                            f"⚠️ {len(dropped)} incomplete or invalid test case(s) were dropped: "
+                            + "; ".join(f"{d.get('test_id') or '#' + str(d['index'] + 1)} ({d['reason']})" for d in dropped)
+                        )
                 
                 except Exception as e:
                     st.error(f"❌ Error generating test cases: {str(e)}")
     
+    if st.button("📑 Generate Full Test Plan", help="Discover features and generate test cases for each in parallel"):
+        with st.spinner("Generating a test plan for every feature..."):
+            try:
+                result = generate_test_plan(regenerate=regenerate)
+                if result.get("status") != "success":
+                    st.error(f"❌ Error generating test plan: {result.get('detail', result)}")
+                else:
+                    plan = result["test_plan"]
+                    st.session_state.test_cases = plan["test_cases"]
+                    st.success(
+                        f"✅ {'Loaded stored' if result.get('reused') else 'Generated'} {plan['total_test_cases']} test case(s) across "
+                        f"{len(plan['features'])} feature(s) in {plan['generation']['wall_seconds']:.1f}s"
+                    )
+                    failed = [f["name"] for f in plan["features"] if f.get("error")]
+                    if failed:
+                        st.warning(f"⚠️ Generation failed for: {', '.join(failed)}")
+            
+            except Exception as e:
+                st.error(f"❌ Error generating test plan: {str(e)}")
+    
+    # Browse stored test cases
+    with st.expander("🗄️ Stored Test Cases"):
+        try:
+            facets = get_test_case_facets()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                feature = st.selectbox("Feature", [None] + facets.get("feature", []), format_func=lambda x: x or "All")
+            with col2:
+                priority = st.selectbox("Priority", [None] + facets.get("priority", []), format_func=lambda x: x or "All")
+            with col3:
+                test_type = st.selectbox("Type", [None] + facets.get("test_type", []), format_func=lambda x: x or "All")
+            with col4:
+                source = st.selectbox("Source", [None] + facets.get("source", []), format_func=lambda x: x or "All")
+            
+            if st.button("📂 Load Stored Test Cases"):
+                page = list_stored_test_cases(feature=feature, priority=priority, test_type=test_type, source=source)
+                st.session_state.test_cases = page.get("items", [])
+                st.success(f"✅ Loaded {len(st.session_state.test_cases)} of {page.get('total', 0)} matching test case(s)")
+        
+        except Exception as e:
+            st.error(f"❌ Error loading stored test cases: {str(e)}")
+    
     # Display test cases
     if st.session_state.test_cases:
         st.markdown("---")
@@ -686,10 +853,32 @@ def show_test_case_generation_page():
                 **Grounded In:** {tc.get('grounded_in', 'N/A')}
                 """)
                 
+                merged_from = tc.get('merged_from', [])
+                if merged_from:
+                    st.caption(
+                        "Also covers: "
+                        + "; ".join(f"{m.get('feature', 'N/A')} / {m.get('test_id', 'N/A')} ({m['similarity']:.2f})" for m in merged_from)
+                    )
+                
                 if st.button(f"🤖 Generate Selenium Script", key=f"gen_script_{i}"):
                     st.session_state.selected_test_case = tc
                     st.info("Go to **Script Generation** page to generate the Selenium script")
         
+        if st.button("🧹 Remove Duplicates", help="Merge test cases that describe the same scenario"):
+            with st.spinner("Comparing test cases..."):
+                try:
+                    result = deduplicate_test_cases(st.session_state.test_cases)
+                    if result.get("status") != "success":
+                        st.error(f"❌ Error removing duplicates: {result.get('detail', result)}")
+                    else:
+                        st.session_state.test_cases = result["test_cases"]
+                        st.success(f"✅ Merged {result['dedup']['duplicates_removed']} duplicate test case(s)")
+                        time.sleep(1)
+                        st.rerun()
+                
+                except Exception as e:
+                    st.error(f"❌ Error removing duplicates: {str(e)}")
+        
         # Export options
         st.markdown("---")
         st.subheader("📥 Export Test Cases")
@@ -768,6 +957,19 @@ def show_script_generation_page():
     
     selected_tc = st.session_state.test_cases[selected_index]
     
+    # Show the stored script of a stored test case instead of regenerating it
+    case_id = selected_tc.get("case_id")
+    if case_id != st.session_state.script_case_id:
+        st.session_state.script_case_id = case_id
+        st.session_state.generated_script = None
+        if case_id is not None:
+            try:
+                stored_script = get_stored_script(case_id)
+                if stored_script:
+                    st.session_state.generated_script = stored_script["script"]
+            except Exception:
+                pass
+    
     # Display selected test case
     with st.expander("📋 View Selected Test Case Details", expanded=True):
         st.json(selected_tc)
@@ -777,21 +979,53 @@ def show_script_generation_page():
     # Generate script
     st.subheader("3. Generate Selenium Script")
     
+    regenerate_script = st.checkbox(
+        "Regenerate",
+        key="regenerate_script",
+        help="Call the LLM even if a script was already generated for this test case and HTML"
+    )
+    repair_selectors = st.checkbox(
+        "Repair locators",
+        key="repair_selectors",
+        help="Ask the LLM to fix locators that match no element on the page"
+    )
+    
     if st.button("🚀 Generate Selenium Script", type="primary"):
         with st.spinner("Generating Selenium script... This may take 30-60 seconds."):
             try:
                 result = generate_selenium_script(
                     test_case=selected_tc,
-                    html_content=st.session_state.html_content
+                    html_content=st.session_state.html_content,
+                    regenerate=regenerate_script,
+                    repair_selectors=repair_selectors
                 )
                 
                 st.session_state.generated_script = result.get("script", "")
                 validation = result.get("validation", {})
                 
+                if result.get("reused"):
+                    st.info("Loaded the stored script for this test case")
                 if validation.get("valid"):
                     st.success("✅ Script generated successfully and syntax is valid!")
                 else:
                     st.warning(f"⚠️ Script generated but has syntax issues: {validation.get('error')}")
+                
+                selectors = validation.get("selectors") or {}
+                if selectors.get("repaired"):
+                    st.info(f"🔧 Repaired {len(selectors['repaired'])} locator(s) that matched nothing on the page")
+                for entry in selectors.get("unresolved", []):
+                    hint = ", ".join(f"`{s['value']}`" for s in entry.get("suggestions", []))
+                    st.warning(
+                        f"🎯 Line {entry['lines'][0]}: By.{entry['by']} `{entry['value']}` matches nothing on the page"
+                        + (f" (did you mean {hint}?)" if hint else "")
+                    )
+                
+                rewrite = result.get("rewrite") or {}
+                if rewrite.get("sleeps_replaced") or rewrite.get("sleeps_removed"):
+                    st.caption(
+                        f"⏱️ Replaced {rewrite['sleeps_replaced']} and removed {rewrite['sleeps_removed']} fixed sleep(s) "
+                        f"({rewrite['sleep_seconds_removed']:g}s) with explicit waits"
+                    )
             
             except Exception as e:
                 st.error(f"❌ Error generating script: {str(e)}")
@@ -0,0 +1,633 @@
+"""
+Persistent store for generated artifacts.
+
+Test cases, Selenium scripts and the generations that produced them (request,
+prompt, retrieved context, provider and knowledge-base version) are kept in a
+SQLite database in WAL mode, so API workers can write while others read and
+results survive restarts and browser refreshes. The same database holds the
+content-addressed Selenium script cache.
+
+A generation is reused instead of regenerated when the same request was made
+against the same knowledge-base version and revision. The version is the
+collection a request read from (it changes on rebuilds); the revision counts
+in-place changes (documents added, replaced or deleted).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+from backend.config import Config
+from backend import metrics
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    request_key TEXT NOT NULL,
+    request TEXT NOT NULL,
+    prompt TEXT,
+    context TEXT,
+    result TEXT,
+    kb_version TEXT,
+    kb_revision INTEGER NOT NULL DEFAULT 0,
+    provider TEXT,
+    model TEXT,
+    seconds REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_generations_lookup
+    ON generations (project_id, kind, request_key, kb_version, kb_revision);
+CREATE INDEX IF NOT EXISTS idx_generations_project ON generations (project_id, id);
+
+CREATE TABLE IF NOT EXISTS test_cases (
+    id INTEGER PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    generation_id INTEGER NOT NULL REFERENCES generations (id) ON DELETE CASCADE,
+    test_id TEXT,
+    feature TEXT,
+    test_scenario TEXT,
+    test_type TEXT,
+    priority TEXT,
+    source TEXT,
+    kb_version TEXT,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_test_cases_project ON test_cases (project_id, id);
+CREATE INDEX IF NOT EXISTS idx_test_cases_generation ON test_cases (generation_id, id);
+CREATE INDEX IF NOT EXISTS idx_test_cases_feature ON test_cases (project_id, feature, id);
+CREATE INDEX IF NOT EXISTS idx_test_cases_priority ON test_cases (project_id, priority, id);
+CREATE INDEX IF NOT EXISTS idx_test_cases_type ON test_cases (project_id, test_type, id);
+CREATE INDEX IF NOT EXISTS idx_test_cases_source ON test_cases (project_id, source, id);
+CREATE INDEX IF NOT EXISTS idx_test_cases_kb_version ON test_cases (project_id, kb_version, id);
+
+CREATE TABLE IF NOT EXISTS scripts (
+    id INTEGER PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    generation_id INTEGER NOT NULL REFERENCES generations (id) ON DELETE CASCADE,
+    test_case_id INTEGER REFERENCES test_cases (id) ON DELETE SET NULL,
+    test_id TEXT,
+    script TEXT NOT NULL,
+    validation TEXT,
+    kb_version TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scripts_project ON scripts (project_id, id);
+CREATE INDEX IF NOT EXISTS idx_scripts_test_case ON scripts (test_case_id, id);
+CREATE INDEX IF NOT EXISTS idx_scripts_test_id ON scripts (project_id, test_id, id);
+
+CREATE TABLE IF NOT EXISTS script_cache (
+    project_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    test_case_sha256 TEXT NOT NULL,
+    page_sha256 TEXT NOT NULL,
+    script TEXT NOT NULL,
+    provider TEXT,
+    model TEXT,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_hit_at REAL,
+    PRIMARY KEY (project_id, key)
+);
+CREATE INDEX IF NOT EXISTS idx_script_cache_test_case ON script_cache (project_id, test_case_sha256);
+
+CREATE TABLE IF NOT EXISTS kb_revisions (
+    project_id TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL,
+    changed_at REAL NOT NULL
+);
+"""
+
+# Columns added after the first release: (table, column, definition)
+ADDED_COLUMNS = [
+    ("script_cache", "provider", "TEXT"),
+]
+
+# Filters accepted by list_test_cases(), by column
+TEST_CASE_FILTERS = ("feature", "priority", "test_type", "source", "kb_version", "generation_id")
+
+MAX_PAGE_SIZE = 500
+
+
+def request_key(kind: str, **request: Any) -> str:
+    """Stable hash of a generation request (kind and parameters)"""
+    payload = json.dumps({"kind": kind, **request}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """SQLite store of generations, test cases and scripts"""
+
+    def __init__(self, path: str = None):
+        """
+        Initialize artifact store.
+
+        Args:
+            path: Database file (defaults to ARTIFACT_DB_PATH)
+        """
+        self.path = path or Config.ARTIFACT_DB_PATH
+        self._local = threading.local()
+        # The schema is created on first use, so constructing the store (at
+        # import time in the API) opens no connection a fork could inherit
+        self._schema_pid: Optional[int] = None
+        self._schema_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Per-thread connection (sqlite3 connections are not shared across threads).
+
+        A connection is also never used across fork(): a preloaded app's
+        workers inherit the master's thread-local, so a connection opened by
+        another process is dropped (not closed, which would touch the
+        parent's locks) and replaced.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._ensure_schema(connection)
+        return connection
+
+    def _ensure_schema(self, connection: sqlite3.Connection) -> None:
+        with self._schema_lock:
+            if self._schema_pid != os.getpid():
+                connection.executescript(SCHEMA)
+                for table, column, definition in ADDED_COLUMNS:
+                    columns = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+                    if column not in columns:
+                        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                self._schema_pid = os.getpid()
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    # Knowledge-base revisions
+
+    def kb_revision(self, project_id: str) -> int:
+        """Number of in-place knowledge-base changes recorded for a project"""
+        row = self._connection().execute(
+            "SELECT revision FROM kb_revisions WHERE project_id = ?", (project_id,)
+        ).fetchone()
+        return row["revision"] if row else 0
+
+    def bump_kb_revision(self, project_id: str) -> int:
+        """Record a knowledge-base change; stored generations stop being reused"""
+        with self._transaction() as connection:
+            connection.execute(
+                """
+                INSERT INTO kb_revisions (project_id, revision, changed_at) VALUES (?, 1, ?)
+                ON CONFLICT (project_id) DO UPDATE SET revision = revision + 1, changed_at = excluded.changed_at
+                """,
+                (project_id, time.time())
+            )
+        return self.kb_revision(project_id)
+
+    # Generations
+
+    def find_generation(
+        self,
+        project_id: str,
+        kind: str,
+        key: str,
+        kb_version: Optional[str],
+        kb_revision: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Latest generation of the same request against the same knowledge base.
+
+        Returns:
+            Generation record, or None if the request has to be generated
+        """
+        row = self._connection().execute(
+            """
+            SELECT * FROM generations
+            WHERE project_id = ? AND kind = ? AND request_key = ? AND kb_version IS ? AND kb_revision = ?
+            ORDER BY id DESC LIMIT 1
+            """,
+            (project_id, kind, key, kb_version, kb_revision)
+        ).fetchone()
+        metrics.CACHE_LOOKUPS_TOTAL.labels(f"stored_{kind}", "hit" if row else "miss").inc()
+        return self._generation(row) if row else None
+
+    def get_generation(self, generation_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT * FROM generations WHERE id = ?", (generation_id,)
+        ).fetchone()
+        return self._generation(row) if row else None
+
+    def list_generations(
+        self,
+        project_id: str,
+        kind: str = None,
+        limit: int = 50,
+        cursor: int = None
+    ) -> Dict[str, Any]:
+        """Generations of a project, newest first (without prompts)"""
+        where, params = ["project_id = ?"], [project_id]
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        page = self._page(
+            "SELECT id, project_id, kind, request, kb_version, kb_revision, provider, model, seconds, created_at "
+            "FROM generations",
+            where, params, limit, cursor
+        )
+        page["items"] = [self._generation(row) for row in page["items"]]
+        return page
+
+    def _insert_generation(
+        self,
+        connection: sqlite3.Connection,
+        project_id: str,
+        kind: str,
+        request: Dict[str, Any],
+        provenance: Dict[str, Any]
+    ) -> int:
+        cursor = connection.execute(
+            """
+            INSERT INTO generations (
+                project_id, kind, request_key, request, prompt, context, result,
+                kb_version, kb_revision, provider, model, seconds, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                project_id,
+                kind,
+                request_key(kind, **request),
+                json.dumps(request, default=str),
+                provenance.get("prompt"),
+                json.dumps(provenance.get("context") or []),
+                json.dumps(provenance.get("result") or {}, default=str),
+                provenance.get("kb_version"),
+                provenance.get("kb_revision", 0),
+                provenance.get("provider"),
+                provenance.get("model"),
+                provenance.get("seconds"),
+                time.time()
+            )
+        )
+        return cursor.lastrowid
+
+    def _generation(self, row: sqlite3.Row) -> Dict[str, Any]:
+        generation = dict(row)
+        generation["request"] = json.loads(generation["request"])
+        for column, empty in (("context", "[]"), ("result", "{}")):
+            if column in generation:
+                generation[column] = json.loads(generation[column] or empty)
+        generation.pop("request_key", None)
+        return generation
+
+    # Test cases
+
+    def save_test_cases(
+        self,
+        project_id: str,
+        kind: str,
+        request: Dict[str, Any],
+        test_cases: List[Dict[str, Any]],
+        provenance: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Store a test-case generation.
+
+        Args:
+            project_id: Project identifier
+            kind: "test_cases" or "test_plan"
+            request: Request parameters (the reuse key is derived from them)
+            test_cases: Generated test cases; each gets its stored `case_id`
+            provenance: prompt, context, result (metadata returned with the
+                test cases), kb_version, kb_revision, provider, model and
+                seconds of the generation
+
+        Returns:
+            The generation record
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            generation_id = self._insert_generation(connection, project_id, kind, request, provenance)
+            for test_case in test_cases:
+                test_case.pop("case_id", None)
+                cursor = connection.execute(
+                    """
+                    INSERT INTO test_cases (
+                        project_id, generation_id, test_id, feature, test_scenario, test_type,
+                        priority, source, kb_version, data, created_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        project_id,
+                        generation_id,
+                        test_case.get("test_id"),
+                        test_case.get("feature"),
+                        test_case.get("test_scenario"),
+                        test_case.get("test_type"),
+                        test_case.get("priority"),
+                        test_case.get("grounded_in"),
+                        provenance.get("kb_version"),
+                        json.dumps(test_case),
+                        now
+                    )
+                )
+                test_case["case_id"] = cursor.lastrowid
+        return self.get_generation(generation_id)
+
+    def generation_test_cases(self, generation_id: int) -> List[Dict[str, Any]]:
+        """Test cases of a generation in their original order"""
+        rows = self._connection().execute(
+            "SELECT id, data FROM test_cases WHERE generation_id = ? ORDER BY id", (generation_id,)
+        ).fetchall()
+        return [self._test_case(row) for row in rows]
+
+    def list_test_cases(
+        self,
+        project_id: str,
+        limit: int = 50,
+        cursor: int = None,
+        **filters: Any
+    ) -> Dict[str, Any]:
+        """
+        Stored test cases of a project, newest first.
+
+        Args:
+            project_id: Project identifier
+            limit: Page size (at most MAX_PAGE_SIZE)
+            cursor: `next_cursor` of the previous page
+            **filters: Exact matches on TEST_CASE_FILTERS columns (None is ignored)
+
+        Returns:
+            Dictionary with items, total (matching rows) and next_cursor
+        """
+        where, params = ["project_id = ?"], [project_id]
+        for column, value in filters.items():
+            if column not in TEST_CASE_FILTERS:
+                raise ValueError(f"Unknown test case filter: {column}")
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        page = self._page("SELECT id, data FROM test_cases", where, params, limit, cursor, count=True)
+        page["items"] = [self._test_case(row) for row in page["items"]]
+        return page
+
+    def test_case_facets(self, project_id: str) -> Dict[str, List[Any]]:
+        """Distinct filter values of a project's test cases"""
+        connection = self._connection()
+        return {
+            column: [
+                row[0] for row in connection.execute(
+                    f"SELECT DISTINCT {column} FROM test_cases WHERE project_id = ? AND {column} IS NOT NULL ORDER BY 1",
+                    (project_id,)
+                )
+            ]
+            for column in ("feature", "priority", "test_type", "source", "kb_version")
+        }
+
+    def _test_case(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {**json.loads(row["data"]), "case_id": row["id"]}
+
+    # Scripts
+
+    def find_script(self, generation_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT * FROM scripts WHERE generation_id = ? ORDER BY id DESC LIMIT 1", (generation_id,)
+        ).fetchone()
+        return self._script(row) if row else None
+
+    def save_script(
+        self,
+        project_id: str,
+        request: Dict[str, Any],
+        script: str,
+        validation: Dict[str, Any],
+        provenance: Dict[str, Any],
+        test_case_id: int = None
+    ) -> Dict[str, Any]:
+        """
+        Store a script generation.
+
+        Args:
+            project_id: Project identifier
+            request: Request parameters (test case and HTML)
+            script: Generated script
+            validation: Syntax validation result
+            provenance: As for save_test_cases()
+            test_case_id: Stored test case the script implements, if known
+
+        Returns:
+            The stored script record
+        """
+        with self._transaction() as connection:
+            generation_id = self._insert_generation(connection, project_id, "script", request, provenance)
+            if test_case_id is not None and connection.execute(
+                "SELECT 1 FROM test_cases WHERE id = ? AND project_id = ?", (test_case_id, project_id)
+            ).fetchone() is None:
+                test_case_id = None
+            cursor = connection.execute(
+                """
+                INSERT INTO scripts (
+                    project_id, generation_id, test_case_id, test_id, script, validation, kb_version, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    project_id,
+                    generation_id,
+                    test_case_id,
+                    (request.get("test_case") or {}).get("test_id"),
+                    script,
+                    json.dumps(validation),
+                    provenance.get("kb_version"),
+                    time.time()
+                )
+            )
+            script_id = cursor.lastrowid
+        return self.get_script(script_id)
+
+    def get_script(self, script_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT * FROM scripts WHERE id = ?", (script_id,)).fetchone()
+        return self._script(row) if row else None
+
+    def list_scripts(
+        self,
+        project_id: str,
+        test_case_id: int = None,
+        test_id: str = None,
+        limit: int = 50,
+        cursor: int = None
+    ) -> Dict[str, Any]:
+        """Stored scripts of a project, newest first"""
+        where, params = ["project_id = ?"], [project_id]
+        if test_case_id is not None:
+            where.append("test_case_id = ?")
+            params.append(test_case_id)
+        if test_id is not None:
+            where.append("test_id = ?")
+            params.append(test_id)
+        page = self._page("SELECT * FROM scripts", where, params, limit, cursor, count=True)
+        page["items"] = [self._script(row) for row in page["items"]]
+        return page
+
+    def latest_scripts(self, project_id: str) -> List[Dict[str, Any]]:
+        """Newest stored script of each test case (by case_id, else test_id), newest first"""
+        seen = set()
+        scripts = []
+        cursor = None
+        while True:
+            page = self.list_scripts(project_id, limit=MAX_PAGE_SIZE, cursor=cursor)
+            for script in page["items"]:
+                key = script["test_case_id"] or script["test_id"] or f"script-{script['id']}"
+                if key not in seen:
+                    seen.add(key)
+                    scripts.append(script)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return scripts
+
+    def script_cache(self, project_id: str) -> "ScriptCache":
+        """Content-addressed script cache of a project"""
+        return ScriptCache(self, project_id)
+
+    def _script(self, row: sqlite3.Row) -> Dict[str, Any]:
+        script = dict(row)
+        script["validation"] = json.loads(script["validation"] or "{}")
+        return script
+
+    def _page(
+        self,
+        select: str,
+        where: List[str],
+        params: List[Any],
+        limit: int,
+        cursor: Optional[int],
+        count: bool = False
+    ) -> Dict[str, Any]:
+        """
+        One page of a query, newest first.
+
+        Pages are keyed on the row ID (WHERE id < cursor) rather than OFFSET,
+        so deep pages cost the same as the first one.
+        """
+        limit = max(1, min(limit or 50, MAX_PAGE_SIZE))
+        connection = self._connection()
+
+        total = None
+        if count:
+            total = connection.execute(
+                f"SELECT COUNT(*) FROM ({select} WHERE {' AND '.join(where)})", params
+            ).fetchone()[0]
+
+        if cursor is not None:
+            where = where + ["id < ?"]
+            params = params + [cursor]
+        rows = connection.execute(
+            f"{select} WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?", params + [limit + 1]
+        ).fetchall()
+
+        page = {
+            "items": rows[:limit],
+            "next_cursor": rows[limit - 1]["id"] if len(rows) > limit else None
+        }
+        if count:
+            page["total"] = total
+        return page
+
+
+class ScriptCache:
+    """
+    Selenium scripts of one project keyed by a hash of everything that shapes
+    them (see SeleniumScriptAgent.script_cache_key).
+
+    Caching a script for a test case drops the project's entries for the same
+    test case on other page versions, so a changed page invalidates them.
+    """
+
+    def __init__(self, store: ArtifactStore, project_id: str):
+        self.store = store
+        self.project_id = project_id
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached script, or None on a miss"""
+        with self.store._transaction() as connection:
+            row = connection.execute(
+                "SELECT script FROM script_cache WHERE project_id = ? AND key = ?", (self.project_id, key)
+            ).fetchone()
+            if row:
+                connection.execute(
+                    "UPDATE script_cache SET hits = hits + 1, last_hit_at = ? WHERE project_id = ? AND key = ?",
+                    (time.time(), self.project_id, key)
+                )
+        metrics.CACHE_LOOKUPS_TOTAL.labels("selenium_script", "hit" if row else "miss").inc()
+        return row["script"] if row else None
+
+    def put(
+        self,
+        key: str,
+        test_case_sha256: str,
+        page_sha256: str,
+        script: str,
+        model: str = None,
+        provider: str = None
+    ) -> int:
+        """
+        Cache a script.
+
+        Args:
+            key: Cache key
+            test_case_sha256: Hash of the test case fields in the prompt
+            page_sha256: Hash of the page
+            script: Generated script
+            model: Model that wrote the script
+            provider: Provider that served it
+
+        Returns:
+            Number of entries invalidated because the page changed
+        """
+        with self.store._transaction() as connection:
+            invalidated = connection.execute(
+                "DELETE FROM script_cache WHERE project_id = ? AND test_case_sha256 = ? AND page_sha256 != ?",
+                (self.project_id, test_case_sha256, page_sha256)
+            ).rowcount
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO script_cache (
+                    key, project_id, test_case_sha256, page_sha256, script, provider, model, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, self.project_id, test_case_sha256, page_sha256, script, provider, model, time.time())
+            )
+        return invalidated
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of entries, pages and hits"""
+        row = self.store._connection().execute(
+            """
+            SELECT COUNT(*) AS entries, COUNT(DISTINCT page_sha256) AS pages, COALESCE(SUM(hits), 0) AS hits
+            FROM script_cache WHERE project_id = ?
+            """,
+            (self.project_id,)
+        ).fetchone()
+        return dict(row)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -15,24 +15,115 @@ class Config:
     """Application configuration"""
     
     # LLM Configuration
-    LLM_PROVIDER: Literal["openai", "groq", "ollama"] = os.getenv("LLM_PROVIDER", "groq")
+    LLM_PROVIDER: Literal["openai", "groq", "ollama", "mock"] = os.getenv("LLM_PROVIDER", "groq")
+    
+    # Ordered failover pool, e.g. "groq,openai,ollama" (defaults to LLM_PROVIDER alone)
+    LLM_PROVIDERS: str = os.getenv("LLM_PROVIDERS", "")
+    LLM_REQUEST_TIMEOUT_S: float = float(os.getenv("LLM_REQUEST_TIMEOUT_S", "60"))
+    
+    # Hedging: when the primary is slower than its LLM_HEDGE_PERCENTILE latency,
+    # a backup request goes to the next provider and the loser is cancelled.
+    # At most LLM_HEDGE_BUDGET (fraction of requests) are hedged.
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_HEDGE_DEFAULT_DELAY_MS: float = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "10000"))
+    LLM_HEDGE_BUDGET: float = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+    
+    # Circuit breaker: a provider is skipped for LLM_BREAKER_COOLDOWN_S after
+    # LLM_BREAKER_FAILURES consecutive failures, then probed with one request
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_COOLDOWN_S: float = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+    
+    # Rate limiting: requests are queued so each provider runs at
+    # LLM_RATE_TARGET_UTILIZATION of its requests/tokens-per-minute limits
+    # (the *_RPM / *_TPM settings, else learned from response headers and 429s)
+    LLM_RATE_TARGET_UTILIZATION: float = float(os.getenv("LLM_RATE_TARGET_UTILIZATION", "0.9"))
+    LLM_RATE_BURST_S: float = float(os.getenv("LLM_RATE_BURST_S", "10"))
+    
+    # Retries: 429s, 5xx and dropped connections are retried with jittered
+    # exponential backoff. LLM_DEADLINE_S bounds one generation including
+    # queueing and retries (0 disables it)
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_RETRY_BASE_DELAY_MS: float = float(os.getenv("LLM_RETRY_BASE_DELAY_MS", "500"))
+    LLM_RETRY_MAX_DELAY_MS: float = float(os.getenv("LLM_RETRY_MAX_DELAY_MS", "20000"))
+    LLM_DEADLINE_S: float = float(os.getenv("LLM_DEADLINE_S", "300"))
     
     # API Keys
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     
+    # Known account rate limits (0 = learn them from response headers)
+    OPENAI_RPM: float = float(os.getenv("OPENAI_RPM", "0"))
+    OPENAI_TPM: float = float(os.getenv("OPENAI_TPM", "0"))
+    GROQ_RPM: float = float(os.getenv("GROQ_RPM", "0"))
+    GROQ_TPM: float = float(os.getenv("GROQ_TPM", "0"))
+    
     # Model Names
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
     GROQ_MODEL: str = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
     OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "llama2")
     
+    # Ollama: "native" uses /api/chat and keeps the model loaded with a fixed
+    # context size; "openai" goes through the /v1 compatibility shim
+    OLLAMA_API: Literal["native", "openai"] = os.getenv("OLLAMA_API", "native")
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    OLLAMA_NUM_CTX: int = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+    OLLAMA_NUM_PREDICT: int = int(os.getenv("OLLAMA_NUM_PREDICT", "0"))
+    OLLAMA_PRELOAD: bool = os.getenv("OLLAMA_PRELOAD", "true").lower() == "true"
+    OLLAMA_PRELOAD_TIMEOUT_S: float = float(os.getenv("OLLAMA_PRELOAD_TIMEOUT_S", "300"))
+    
+    # Mock LLM server (python -m backend.mock_llm) for load and latency testing
+    MOCK_LLM_BASE_URL: str = os.getenv("MOCK_LLM_BASE_URL", "http://localhost:8001")
+    MOCK_LLM_MODEL: str = os.getenv("MOCK_LLM_MODEL", "mock-qa")
+    MOCK_LLM_LATENCY_DISTRIBUTION: Literal["fixed", "uniform", "normal", "lognormal"] = os.getenv(
+        "MOCK_LLM_LATENCY_DISTRIBUTION", "fixed"
+    )
+    MOCK_LLM_LATENCY_MS: float = float(os.getenv("MOCK_LLM_LATENCY_MS", "200"))
+    MOCK_LLM_LATENCY_SPREAD_MS: float = float(os.getenv("MOCK_LLM_LATENCY_SPREAD_MS", "50"))
+    MOCK_LLM_LATENCY_SIGMA: float = float(os.getenv("MOCK_LLM_LATENCY_SIGMA", "0.5"))
+    MOCK_LLM_TOKENS_PER_SEC: float = float(os.getenv("MOCK_LLM_TOKENS_PER_SEC", "0"))
+    MOCK_LLM_ERROR_RATE: float = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+    MOCK_LLM_ERROR_CODES: str = os.getenv("MOCK_LLM_ERROR_CODES", "429,500,503")
+    MOCK_LLM_SEED: str = os.getenv("MOCK_LLM_SEED", "")
+    MOCK_LLM_RATE_LIMIT_RPM: int = int(os.getenv("MOCK_LLM_RATE_LIMIT_RPM", "0"))
+    
     # Embedding Model
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
     
     # Vector Database
     CHROMA_DB_PATH: str = os.getenv("CHROMA_DB_PATH", "./chroma_db")
     
+    # Generated test cases, scripts and their provenance (SQLite)
+    ARTIFACT_DB_PATH: str = os.getenv("ARTIFACT_DB_PATH", "./qa_artifacts.db")
+    
+    # Previous knowledge-base versions kept after a rebuild is swapped in,
+    # so requests that started on them can finish
+    KB_RETAINED_VERSIONS: int = int(os.getenv("KB_RETAINED_VERSIONS", "1"))
+    
+    # Pins only cover requests of the process that holds them: any version is
+    # also kept this long after the commit that replaced it, for requests of
+    # other workers; a rebuild shadow older than KB_STALE_SHADOW_S that was
+    # never committed belongs to a crashed build and is deleted
+    KB_VERSION_GRACE_S: float = float(os.getenv("KB_VERSION_GRACE_S", "600"))
+    KB_STALE_SHADOW_S: float = float(os.getenv("KB_STALE_SHADOW_S", "21600"))
+    
+    # Knowledge-base handles (one per project) kept open at once
+    KB_MAX_OPEN: int = int(os.getenv("KB_MAX_OPEN", "16"))
+    
+    # Embedding service: "local" loads the model in every process, "remote"
+    # sends encode/search calls to `python -m backend.embedding_service`
+    EMBEDDING_SERVICE_MODE: Literal["local", "remote"] = os.getenv("EMBEDDING_SERVICE_MODE", "local")
+    # Socket and key default to a private per-user runtime directory; without
+    # EMBEDDING_SERVICE_AUTHKEY the service writes a random key file (0600)
+    # that workers of the same user read
+    EMBEDDING_SERVICE_SOCKET: str = os.getenv("EMBEDDING_SERVICE_SOCKET", "")
+    EMBEDDING_SERVICE_AUTHKEY: str = os.getenv("EMBEDDING_SERVICE_AUTHKEY", "")
+    EMBEDDING_SERVICE_AUTHKEY_FILE: str = os.getenv("EMBEDDING_SERVICE_AUTHKEY_FILE", "")
+    EMBEDDING_SERVICE_MAX_BATCH: int = int(os.getenv("EMBEDDING_SERVICE_MAX_BATCH", "64"))
+    EMBEDDING_SERVICE_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_SERVICE_BATCH_WAIT_MS", "5"))
+    
     # Server Configuration
     BACKEND_HOST: str = os.getenv("BACKEND_HOST", "0.0.0.0")
     BACKEND_PORT: int = int(os.getenv("BACKEND_PORT", "8000"))
@@ -46,42 +137,131 @@ class Config:
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     TOP_K_RESULTS: int = 5
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+    
+    # Near-duplicate chunks at ingest: "skip" drops them, "merge" also records
+    # the sources sharing a kept chunk in its metadata
+    CHUNK_DEDUP_MODE: Literal["off", "skip", "merge"] = os.getenv("CHUNK_DEDUP_MODE", "merge")
+    CHUNK_DEDUP_THRESHOLD: float = float(os.getenv("CHUNK_DEDUP_THRESHOLD", "0.95"))
+    
+    # JSON ingestion mode: "structured" streams one chunk per logical unit,
+    # "text" pretty-prints the whole document and uses the character chunker
+    JSON_INGEST_MODE: Literal["structured", "text"] = os.getenv("JSON_INGEST_MODE", "structured")
     
     # Generation Settings
     MAX_TOKENS: int = 2000
     TEMPERATURE: float = 0.7
     
+    # Requests are always streamed internally (so a hedged loser can be
+    # cancelled); with LLM_STREAM, generate() hedges on time-to-first-token
+    # instead of total latency
+    LLM_STREAM: bool = os.getenv("LLM_STREAM", "false").lower() == "true"
+    
+    # Structured output for JSON responses: "auto" picks per provider (JSON
+    # schema for Ollama and recent OpenAI models, JSON mode otherwise)
+    LLM_STRUCTURED_OUTPUT: Literal["auto", "json_schema", "json_object", "off"] = os.getenv(
+        "LLM_STRUCTURED_OUTPUT", "auto"
+    )
+    
+    # Test plans: features discovered per plan, generated concurrently with
+    # TEST_PLAN_TOP_K context chunks each
+    TEST_PLAN_MAX_FEATURES: int = int(os.getenv("TEST_PLAN_MAX_FEATURES", "8"))
+    TEST_PLAN_CONCURRENCY: int = int(os.getenv("TEST_PLAN_CONCURRENCY", "4"))
+    TEST_PLAN_TOP_K: int = int(os.getenv("TEST_PLAN_TOP_K", "5"))
+    
+    # Semantic dedup of generated test cases: cases of the same type whose
+    # embeddings reach this cosine similarity are merged
+    TEST_CASE_DEDUP_ENABLED: bool = os.getenv("TEST_CASE_DEDUP_ENABLED", "true").lower() == "true"
+    TEST_CASE_DEDUP_THRESHOLD: float = float(os.getenv("TEST_CASE_DEDUP_THRESHOLD", "0.9"))
+    
+    # Reuse Selenium scripts generated for the same test case, page,
+    # documentation context and model settings (stored in ARTIFACT_DB_PATH)
+    SELENIUM_SCRIPT_CACHE: bool = os.getenv("SELENIUM_SCRIPT_CACHE", "true").lower() == "true"
+    
+    # Test cases of one page generated together in a single LLM call (one test
+    # method each) by batch script generation; 1 generates each case on its own
+    SELENIUM_BATCH_SIZE: int = max(1, int(os.getenv("SELENIUM_BATCH_SIZE", "4")))
+    
+    # Replace fixed time.sleep() calls in generated scripts with explicit waits;
+    # scripts meant for headless runs also lose maximize_window()
+    SELENIUM_REWRITE_WAITS: bool = os.getenv("SELENIUM_REWRITE_WAITS", "true").lower() == "true"
+    SELENIUM_HEADLESS: bool = os.getenv("SELENIUM_HEADLESS", "true").lower() == "true"
+    
+    # Resolve generated scripts' locators against the page HTML sent with the
+    # request; unresolved ones can be repaired with one small LLM call
+    SELENIUM_CHECK_SELECTORS: bool = os.getenv("SELENIUM_CHECK_SELECTORS", "true").lower() == "true"
+    SELENIUM_REPAIR_SELECTORS: bool = os.getenv("SELENIUM_REPAIR_SELECTORS", "false").lower() == "true"
+    
+    # When a test-case response is cut off, ask for just the missing remainder
+    # (one extra request) instead of returning only the salvaged test cases
+    TEST_CASE_CONTINUATION: bool = os.getenv("TEST_CASE_CONTINUATION", "false").lower() == "true"
+    
+    # Scripts generated at once by the pipelined test suite endpoint, each
+    # started as soon as its test case has been streamed
+    PIPELINE_SCRIPT_CONCURRENCY: int = max(1, int(os.getenv("PIPELINE_SCRIPT_CONCURRENCY", "4")))
+    
+    # Script runner (python -m backend.script_runner): worker processes, each
+    # with one warm headless Chrome; the driver must be installed locally
+    # (RUNNER_CHROMEDRIVER, else chromedriver on PATH) as nothing is downloaded
+    RUNNER_WORKERS: int = int(os.getenv("RUNNER_WORKERS", "0")) or (os.cpu_count() or 1)
+    RUNNER_CHROMEDRIVER: str = os.getenv("RUNNER_CHROMEDRIVER", "")
+    RUNNER_CHROME_BINARY: str = os.getenv("RUNNER_CHROME_BINARY", "")
+    RUNNER_WINDOW_SIZE: str = os.getenv("RUNNER_WINDOW_SIZE", "1920,1080")
+    RUNNER_PAGE_LOAD_TIMEOUT_S: float = float(os.getenv("RUNNER_PAGE_LOAD_TIMEOUT_S", "30"))
+    RUNNER_DRIVER_MAX_USES: int = int(os.getenv("RUNNER_DRIVER_MAX_USES", "100"))
+    
+    # Number of recent request profiles kept for Chrome trace export
+    PROFILE_HISTORY: int = int(os.getenv("PROFILE_HISTORY", "50"))
+    
     @classmethod
-    def get_llm_config(cls) -> dict:
+    def get_llm_providers(cls) -> list:
+        """Ordered provider pool"""
+        providers = [p.strip() for p in cls.LLM_PROVIDERS.split(",") if p.strip()]
+        return providers or [cls.LLM_PROVIDER]
+    
+    @classmethod
+    def get_llm_config(cls, provider: str = None) -> dict:
         """Get LLM configuration based on provider"""
-        if cls.LLM_PROVIDER == "openai":
+        provider = provider or cls.LLM_PROVIDER
+        if provider == "openai":
             return {
                 "provider": "openai",
                 "api_key": cls.OPENAI_API_KEY,
-                "model": cls.OPENAI_MODEL
+                "model": cls.OPENAI_MODEL,
+                "rpm": cls.OPENAI_RPM,
+                "tpm": cls.OPENAI_TPM
             }
-        elif cls.LLM_PROVIDER == "groq":
+        elif provider == "groq":
             return {
                 "provider": "groq",
                 "api_key": cls.GROQ_API_KEY,
-                "model": cls.GROQ_MODEL
+                "model": cls.GROQ_MODEL,
+                "rpm": cls.GROQ_RPM,
+                "tpm": cls.GROQ_TPM
             }
-        elif cls.LLM_PROVIDER == "ollama":
+        elif provider == "ollama":
             return {
                 "provider": "ollama",
                 "base_url": cls.OLLAMA_BASE_URL,
                 "model": cls.OLLAMA_MODEL
             }
+        elif provider == "mock":
+            return {
+                "provider": "mock",
+                "base_url": cls.MOCK_LLM_BASE_URL,
+                "model": cls.MOCK_LLM_MODEL
+            }
         else:
-            raise ValueError(f"Unsupported LLM provider: {cls.LLM_PROVIDER}")
+            raise ValueError(f"Unsupported LLM provider: {provider}")
     
     @classmethod
     def validate_config(cls) -> bool:
-        """Validate configuration based on selected provider"""
-        if cls.LLM_PROVIDER == "openai" and not cls.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY is required when using OpenAI provider")
-        elif cls.LLM_PROVIDER == "groq" and not cls.GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY is required when using Groq provider")
+        """Validate configuration based on selected providers"""
+        for provider in cls.get_llm_providers():
+            if provider == "openai" and not cls.OPENAI_API_KEY:
+                raise ValueError("OPENAI_API_KEY is required when using OpenAI provider")
+            elif provider == "groq" and not cls.GROQ_API_KEY:
+                raise ValueError("GROQ_API_KEY is required when using Groq provider")
         return True
 
 
@@ -0,0 +1,388 @@
+"""
+Near-duplicate detection for ingested chunks and generated test cases.
+
+Chunks are fingerprinted with a 64-bit SimHash over word shingles. Similarity
+is 1 - hamming_distance / 64; candidates are found with a banded index (split
+the fingerprint into max_distance + 1 bands, so any fingerprint within
+max_distance bits shares at least one band exactly).
+
+Test cases are reworded rather than copied, so they are compared by meaning:
+embedded in one batch with the knowledge base's embedding model and clustered
+on cosine similarity, computed block-wise as matrix products.
+"""
+
+import re
+import time
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.config import Config
+from backend import metrics
+from backend.profiling import span
+
+
+FINGERPRINT_BITS = 64
+SHINGLE_WORDS = 3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of a text's lowercase word shingles"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) > SHINGLE_WORDS:
+        shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    else:
+        shingles = [" ".join(words)]
+
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        h = _hash64(shingle)
+        for bit in range(FINGERPRINT_BITS):
+            if h >> bit & 1:
+                weights[bit] += 1
+            else:
+                weights[bit] -= 1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class SimHashIndex:
+    """Find stored fingerprints within a Hamming distance"""
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        self._band_width = FINGERPRINT_BITS // bands
+        self._bands = bands
+        self._buckets: List[Dict[int, List[tuple]]] = [defaultdict(list) for _ in range(bands)]
+
+    def _band_keys(self, fingerprint: int):
+        mask = (1 << self._band_width) - 1
+        for band in range(self._bands):
+            yield band, fingerprint >> (band * self._band_width) & mask
+
+    def find(self, fingerprint: int) -> Optional[Any]:
+        """Key of the first stored fingerprint within max_distance, if any"""
+        for band, key in self._band_keys(fingerprint):
+            for stored, value in self._buckets[band].get(key, ()):
+                if bin(stored ^ fingerprint).count("1") <= self.max_distance:
+                    return value
+        return None
+
+    def add(self, fingerprint: int, value: Any) -> None:
+        for band, key in self._band_keys(fingerprint):
+            self._buckets[band][key].append((fingerprint, value))
+
+
+class ChunkDeduplicator:
+    """
+    Drop near-duplicate chunks during one add_documents call.
+
+    In "merge" mode the kept chunk also records which other sources contained
+    a copy (`duplicate_sources`, comma-separated, and their number in
+    `duplicate_count`), so provenance survives the removal.
+    """
+
+    def __init__(self, mode: str = None, threshold: float = None):
+        """
+        Initialize deduplicator.
+
+        Args:
+            mode: "off", "skip" or "merge" (defaults to CHUNK_DEDUP_MODE)
+            threshold: Minimum SimHash similarity (0-1) to treat chunks as duplicates
+        """
+        self.mode = mode or Config.CHUNK_DEDUP_MODE
+        self.threshold = Config.CHUNK_DEDUP_THRESHOLD if threshold is None else threshold
+        self.index = SimHashIndex(int((1 - self.threshold) * FINGERPRINT_BITS))
+
+        self.chunks_seen = 0
+        self.chars_seen = 0
+        self.chars_removed = 0
+        self._metadatas: Dict[str, Dict[str, Any]] = {}
+        self._shared: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._removed_by_source: Dict[str, int] = defaultdict(int)
+        self._seen_by_source: Dict[str, int] = defaultdict(int)
+        self._chars_removed_by_source: Dict[str, int] = defaultdict(int)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def seed(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        exclude_source: str = None
+    ) -> None:
+        """Index chunks already stored in the target collection, except those of `exclude_source`"""
+        for chunk_id, text, metadata in zip(ids, documents, metadatas):
+            if exclude_source and (metadata or {}).get("source") == exclude_source:
+                continue
+            self.index.add(simhash(text), chunk_id)
+            self._metadatas[chunk_id] = dict(metadata or {})
+
+    def check(self, chunk_id: str, text: str, metadata: Dict[str, Any]) -> Optional[str]:
+        """
+        Register a chunk.
+
+        Returns:
+            ID of the kept chunk it duplicates, or None if the chunk is new
+        """
+        source = metadata.get("source", "unknown")
+        self.chunks_seen += 1
+        self.chars_seen += len(text)
+        self._seen_by_source[source] += 1
+
+        fingerprint = simhash(text)
+        kept_id = self.index.find(fingerprint)
+
+        if kept_id is None:
+            self.index.add(fingerprint, chunk_id)
+            self._metadatas[chunk_id] = metadata
+            return None
+
+        self.chars_removed += len(text)
+        self._removed_by_source[source] += 1
+        self._chars_removed_by_source[source] += len(text)
+        if source != self._metadatas[kept_id].get("source"):
+            self._shared[kept_id][source] = self._shared[kept_id].get(source, 0) + 1
+        return kept_id
+
+    def merged_metadatas(self) -> Dict[str, Dict[str, Any]]:
+        """Updated metadata of kept chunks that other sources duplicated"""
+        if self.mode != "merge":
+            return {}
+
+        merged = {}
+        for kept_id, sources in self._shared.items():
+            metadata = self._metadatas[kept_id]
+            previous = [s for s in (metadata.get("duplicate_sources") or "").split(",") if s]
+            duplicate_sources = sorted(set(previous) | set(sources))
+            merged[kept_id] = {
+                **metadata,
+                "duplicate_sources": ",".join(duplicate_sources),
+                "duplicate_count": len(duplicate_sources)
+            }
+        return merged
+
+    def report(self) -> Dict[str, Any]:
+        """Summary of what was removed"""
+        removed = sum(self._removed_by_source.values())
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "chunks_seen": self.chunks_seen,
+            "chunks_kept": self.chunks_seen - removed,
+            "duplicates_removed": removed,
+            "chars_removed": self.chars_removed,
+            "removed_ratio": round(removed / self.chunks_seen, 4) if self.chunks_seen else 0.0,
+            "removed_by_source": dict(self._removed_by_source),
+            "seen_by_source": dict(self._seen_by_source),
+            "chars_removed_by_source": dict(self._chars_removed_by_source),
+            "shared_chunks": [
+                {
+                    "chunk_id": kept_id,
+                    "source": self._metadatas[kept_id].get("source", "unknown"),
+                    "duplicate_sources": sorted(sources)
+                }
+                for kept_id, sources in sorted(
+                    self._shared.items(), key=lambda item: -sum(item[1].values())
+                )[:20]
+            ]
+        }
+
+
+class TestCaseDeduplicator:
+    """
+    Merge semantically duplicate test cases.
+
+    Each case is embedded from its scenario and steps. Clustering is greedy in
+    input order: the first case of a cluster is kept and absorbs every later
+    case of the same test_type whose cosine similarity to it reaches the
+    threshold. Kept cases list what they absorbed in `merged_from`, so the
+    provenance (test ID, feature, source) of removed cases survives.
+    """
+
+    # Rows of the similarity matrix computed per matrix product
+    BLOCK_SIZE = 1024
+
+    def __init__(self, embedding_model: Any, threshold: float = None):
+        """
+        Initialize deduplicator.
+
+        Args:
+            embedding_model: Model with the SentenceTransformer.encode contract
+            threshold: Minimum cosine similarity (0-1) to treat cases as duplicates
+        """
+        self.embedding_model = embedding_model
+        self.threshold = Config.TEST_CASE_DEDUP_THRESHOLD if threshold is None else threshold
+
+    def case_text(self, test_case: Dict[str, Any]) -> str:
+        """Text embedded for a test case"""
+        steps = test_case.get("test_steps") or []
+        if isinstance(steps, list):
+            steps = " ".join(str(step) for step in steps)
+        return f"{test_case.get('test_scenario', '')}. {steps}".strip()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized embeddings, one row per text"""
+        with metrics.EMBEDDING_BATCH_SECONDS.labels("test_case_dedup").time():
+            vectors = self.embedding_model.encode(
+                texts,
+                batch_size=Config.EMBEDDING_BATCH_SIZE,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def cluster(self, vectors: np.ndarray, groups: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Assign every case to the kept case of its cluster.
+
+        Args:
+            vectors: L2-normalized embeddings
+            groups: Cases are only merged within the same group (test_type)
+
+        Returns:
+            Index of the kept case for each case (itself if kept) and the
+            similarity to it (1.0 for kept cases)
+        """
+        n = len(vectors)
+        keeper = np.arange(n)
+        similarity = np.ones(n, dtype=np.float32)
+        absorbed = np.zeros(n, dtype=bool)
+
+        group_indexes = defaultdict(list)
+        for i, group in enumerate(groups):
+            group_indexes[str(group)].append(i)
+
+        for indexes in group_indexes.values():
+            indexes = np.asarray(indexes)
+            group_vectors = vectors[indexes]
+            size = len(indexes)
+
+            for start in range(0, size, self.BLOCK_SIZE):
+                stop = min(start + self.BLOCK_SIZE, size)
+                # Only later cases can be absorbed, so compare the block with
+                # itself and everything after it
+                sims = group_vectors[start:stop] @ group_vectors[start:].T
+                matches = sims >= self.threshold
+                matches[:, :stop - start] &= np.triu(np.ones((stop - start, stop - start), dtype=bool), 1)
+
+                for row in np.flatnonzero(matches.any(axis=1)):
+                    i = indexes[start + row]
+                    if absorbed[i]:
+                        continue
+                    columns = np.flatnonzero(matches[row])
+                    targets = indexes[columns + start]
+                    fresh = ~absorbed[targets]
+                    keeper[targets[fresh]] = i
+                    similarity[targets[fresh]] = sims[row, columns[fresh]]
+                    absorbed[targets[fresh]] = True
+
+        return keeper, similarity
+
+    def deduplicate(self, test_cases: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Remove semantic duplicates.
+
+        Args:
+            test_cases: Test cases in priority order (earlier cases are kept)
+
+        Returns:
+            Kept test cases (copies, in input order) and a report of what was merged
+        """
+        if not test_cases:
+            return [], self._report(0, 0, [], 0.0, 0.0)
+
+        # Identical cases are collapsed first; only distinct texts are
+        # embedded and clustered
+        groups = [str(tc.get("test_type", "")) for tc in test_cases]
+        texts = [self.case_text(tc) for tc in test_cases]
+        distinct: Dict[Tuple[str, str], int] = {}
+        first = []
+        position = np.empty(len(test_cases), dtype=int)
+        for i, key in enumerate(zip(groups, texts)):
+            if key not in distinct:
+                distinct[key] = len(first)
+                first.append(i)
+            position[i] = distinct[key]
+        first = np.asarray(first)
+
+        start_time = time.perf_counter()
+        with span("test_case_dedup.embed", texts=len(distinct)):
+            vectors = self.embed([texts[i] for i in first])
+        embed_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        with span("test_case_dedup.cluster", texts=len(distinct)):
+            distinct_keeper, distinct_similarity = self.cluster(vectors, [groups[i] for i in first])
+        cluster_seconds = time.perf_counter() - start_time
+
+        keeper = first[distinct_keeper[position]]
+        similarity = distinct_similarity[position]
+
+        kept = {}
+        for i, test_case in enumerate(test_cases):
+            if keeper[i] == i:
+                kept[i] = {**test_case, "merged_from": list(test_case.get("merged_from") or [])}
+        for i, test_case in enumerate(test_cases):
+            if keeper[i] != i:
+                kept[int(keeper[i])]["merged_from"].append({
+                    "test_id": test_case.get("test_id"),
+                    "feature": test_case.get("feature"),
+                    "test_scenario": test_case.get("test_scenario"),
+                    "grounded_in": test_case.get("grounded_in"),
+                    "similarity": round(float(similarity[i]), 4)
+                })
+
+        deduplicated = []
+        for test_case in kept.values():
+            if not test_case["merged_from"]:
+                del test_case["merged_from"]
+            deduplicated.append(test_case)
+
+        removed = len(test_cases) - len(deduplicated)
+        metrics.DUPLICATE_TEST_CASES_TOTAL.inc(removed)
+        return deduplicated, self._report(len(test_cases), removed, deduplicated, embed_seconds, cluster_seconds)
+
+    def _report(
+        self,
+        seen: int,
+        removed: int,
+        kept: List[Dict[str, Any]],
+        embed_seconds: float,
+        cluster_seconds: float
+    ) -> Dict[str, Any]:
+        merged = [tc for tc in kept if tc.get("merged_from")]
+        return {
+            "threshold": self.threshold,
+            "test_cases_seen": seen,
+            "test_cases_kept": seen - removed,
+            "duplicates_removed": removed,
+            "embed_seconds": round(embed_seconds, 4),
+            "cluster_seconds": round(cluster_seconds, 4),
+            "clusters": [
+                {
+                    "test_id": tc.get("test_id"),
+                    "test_scenario": tc.get("test_scenario"),
+                    "duplicates": [m["test_id"] for m in tc["merged_from"]]
+                }
+                for tc in sorted(merged, key=lambda tc: -len(tc["merged_from"]))[:20]
+            ]
+        }
@@ -3,10 +3,14 @@ Document processing utilities for extracting text from various file formats.
 """
 
 import os
+import re
 import json
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 import PyPDF2
+from backend.config import Config
+from backend import metrics
 
 
 class DocumentProcessor:
@@ -27,8 +31,22 @@ class DocumentProcessor:
         file_name = Path(file_path).name
         
         try:
+            chunks = None
+            start_time = time.perf_counter()
+            
             if file_extension in ['.txt', '.md']:
                 content = DocumentProcessor._process_text_file(file_path)
+            elif file_extension == '.json' and Config.JSON_INGEST_MODE == "structured":
+                # Chunks are produced lazily while the file is walked
+                content = ""
+                chunks = _observe_parse_time(
+                    DocumentProcessor.chunk_json_units(
+                        DocumentProcessor.iter_json_units(file_path),
+                        chunk_size=Config.CHUNK_SIZE,
+                        chunk_overlap=Config.CHUNK_OVERLAP
+                    ),
+                    file_extension
+                )
             elif file_extension == '.json':
                 content = DocumentProcessor._process_json_file(file_path)
             elif file_extension == '.pdf':
@@ -38,7 +56,12 @@ class DocumentProcessor:
             else:
                 raise ValueError(f"Unsupported file format: {file_extension}")
             
-            return {
+            if chunks is None:
+                metrics.DOCUMENT_PARSE_SECONDS.labels(file_extension).observe(
+                    time.perf_counter() - start_time
+                )
+            
+            document = {
                 "content": content,
                 "metadata": {
                     "source": file_name,
@@ -47,6 +70,11 @@ class DocumentProcessor:
                 },
                 "source": file_name
             }
+            
+            if chunks is not None:
+                document["chunks"] = chunks
+            
+            return document
         except Exception as e:
             raise Exception(f"Error processing file {file_name}: {str(e)}")
     
@@ -65,6 +93,85 @@ class DocumentProcessor:
         # Convert JSON to formatted string
         return json.dumps(data, indent=2)
     
+    @staticmethod
+    def iter_json_units(file_path: str) -> Iterator[Tuple[str, str]]:
+        """
+        Walk a JSON file incrementally and yield its logical units.
+        
+        The root container and its child containers are expanded, so
+        `endpoints[3]`, `data_models.Product` or `error_codes.404` each become
+        one unit. Children of OpenAPI `paths` and `components` are expanded one
+        level further. Only the unit being decoded is held in memory.
+        
+        Args:
+            file_path: Path to the JSON file
+            
+        Returns:
+            Iterator of (json_path, compact_json) tuples
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                reader = _JsonStreamReader(f)
+                yield from reader.walk()
+        except ValueError as e:
+            raise Exception(f"Error processing file {Path(file_path).name}: {str(e)}")
+    
+    @staticmethod
+    def chunk_json_units(
+        units: Iterator[Tuple[str, str]],
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Pack JSON units into chunks.
+        
+        Consecutive small units sharing a parent are packed into one chunk;
+        a unit larger than chunk_size is split with chunk_text.
+        
+        Args:
+            units: Iterator of (json_path, compact_json) tuples
+            chunk_size: Maximum size of each chunk
+            chunk_overlap: Overlap used when splitting oversized units
+            
+        Returns:
+            Iterator of dictionaries with 'content' and 'json_path' keys
+        """
+        pending_lines: List[str] = []
+        pending_paths: List[str] = []
+        pending_parent = None
+        pending_size = 0
+        
+        def flush():
+            if len(pending_paths) == 1:
+                json_path = pending_paths[0]
+            else:
+                json_path = pending_parent
+            return {"content": "\n".join(pending_lines), "json_path": json_path}
+        
+        for json_path, value in units:
+            line = f"{json_path}: {value}"
+            parent = _json_parent_path(json_path)
+            
+            if pending_lines and (
+                parent != pending_parent
+                or pending_size + len(line) + 1 > chunk_size
+            ):
+                yield flush()
+                pending_lines, pending_paths, pending_size = [], [], 0
+            
+            if len(line) > chunk_size:
+                for piece in DocumentProcessor.chunk_text(line, chunk_size, chunk_overlap):
+                    yield {"content": piece, "json_path": json_path}
+                continue
+            
+            pending_lines.append(line)
+            pending_paths.append(json_path)
+            pending_parent = parent
+            pending_size += len(line) + 1
+        
+        if pending_lines:
+            yield flush()
+    
     @staticmethod
     def _process_pdf_file(file_path: str) -> str:
         """Process PDF files and extract text"""
@@ -148,3 +255,160 @@ class DocumentProcessor:
             "created_time": file_stats.st_ctime,
             "modified_time": file_stats.st_mtime
         }
+
+
+def _observe_parse_time(chunks: Iterator[Dict[str, Any]], file_type: str) -> Iterator[Dict[str, Any]]:
+    """Record the time spent producing lazily parsed chunks once they are exhausted"""
+    elapsed = 0.0
+    iterator = iter(chunks)
+    
+    while True:
+        start_time = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - start_time
+        yield chunk
+    
+    metrics.DOCUMENT_PARSE_SECONDS.labels(file_type).observe(elapsed)
+
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _json_child_path(parent: str, key: Any) -> str:
+    """Build a JSONPath expression for a child key or index"""
+    if isinstance(key, int):
+        return f"{parent}[{key}]"
+    if _IDENTIFIER_RE.match(key) or key.isdigit():
+        return f"{parent}.{key}"
+    return f"{parent}[{json.dumps(key, ensure_ascii=False)}]"
+
+
+def _json_parent_path(path: str) -> str:
+    """Return the parent of a path built by _json_child_path (the root is its own parent)"""
+    if path == "$":
+        return path
+    if path.endswith("]"):
+        return path[:path.rindex("[")]
+    return path[:path.rindex(".")]
+
+
+class _JsonStreamReader:
+    """Incremental reader that decodes one JSON unit at a time"""
+    
+    BLOCK_SIZE = 64 * 1024
+    
+    # Containers whose children are expanded as well (OpenAPI layout)
+    NESTED_COLLECTIONS = {"$.paths", "$.components", "$.definitions"}
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+    
+    def walk(self) -> Iterator[Tuple[str, str]]:
+        """Yield (json_path, compact_json) for every logical unit"""
+        if self._peek() is None:
+            return
+        yield from self._walk_value("$", expand=True, expand_children=True)
+        if self._peek() is not None:
+            raise ValueError(f"Extra data after JSON document at offset {self.pos}")
+    
+    def _walk_value(self, path: str, expand: bool, expand_children: bool):
+        char = self._peek()
+        
+        if not expand or char not in ("{", "["):
+            value = self._decode_value()
+            yield path, json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+            return
+        
+        self.pos += 1
+        closing = "}" if char == "{" else "]"
+        index = 0
+        
+        if self._peek() == closing:
+            # Keep empty containers so their keys are still indexed
+            self.pos += 1
+            yield path, char + closing
+            return
+        
+        while True:
+            if char == "{":
+                key = self._decode_value()
+                if not isinstance(key, str):
+                    raise ValueError(f"Expected object key at offset {self.pos}")
+                self._expect(":")
+                child_path = _json_child_path(path, key)
+            else:
+                child_path = _json_child_path(path, index)
+            
+            # Expand object members of the root, and members of known collections
+            child_expand = (
+                (expand_children and char == "{")
+                or path in self.NESTED_COLLECTIONS
+            )
+            yield from self._walk_value(child_path, expand=child_expand, expand_children=False)
+            index += 1
+            
+            separator = self._peek()
+            if separator == ",":
+                self.pos += 1
+            elif separator == closing:
+                self.pos += 1
+                return
+            else:
+                raise ValueError(f"Expected ',' or '{closing}' at offset {self.pos}")
+    
+    def _fill(self, min_size: int = 0) -> bool:
+        """Read more data into the buffer; return False at end of file"""
+        if self.eof:
+            return False
+        
+        # Drop consumed text so memory stays bounded by the current unit
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        
+        block = self.stream.read(max(self.BLOCK_SIZE, min_size))
+        if not block:
+            self.eof = True
+            return False
+        
+        self.buffer += block
+        return True
+    
+    def _peek(self):
+        """Skip whitespace and return the next character (None at end of file)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+    
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}")
+        self.pos += 1
+    
+    def _decode_value(self) -> Any:
+        """Decode the value at the current position, reading more data as needed"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number or literal may continue in the next block
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow geometrically so large units are not re-parsed too often
+            self._fill(min_size=len(self.buffer) - self.pos)
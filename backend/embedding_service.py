@@ -0,0 +1,375 @@
+"""
+Shared embedding and retrieval service.
+
+One process loads the embedding model and owns the ChromaDB client; uvicorn
+workers talk to it over a local Unix socket through RemoteVectorDatabase.
+Concurrent encode requests (including the query embeddings of concurrent
+searches) are micro-batched into a single model call.
+
+Run the service, then start the API with EMBEDDING_SERVICE_MODE=remote:
+
+    python -m backend.embedding_service
+    EMBEDDING_SERVICE_MODE=remote uvicorn backend.main:app --workers 8
+
+Messages are pickled, so only processes that know the authkey may connect:
+the socket and a random key file live in a directory only this user can
+read (see runtime_dir()), unless EMBEDDING_SERVICE_AUTHKEY is set.
+"""
+
+import os
+import stat
+import time
+import queue
+import secrets
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from multiprocessing.connection import Client, Listener
+from typing import List, Dict, Any, Optional
+
+from backend.config import Config
+from backend.knowledge_bases import DEFAULT_PROJECT, KnowledgeBaseManager
+
+
+# VectorDatabase methods that only read; everything else is serialized
+READ_METHODS = {
+    "search", "get_all_documents", "get_collection_stats", "get_dedup_report",
+    "list_documents", "active_collection_name"
+}
+
+# Collection versions pinned by the current request on the worker side, keyed by project
+_pinned_collections: ContextVar[Dict[str, str]] = ContextVar("remote_pinned_collections", default={})
+
+
+def runtime_dir() -> str:
+    """
+    Private directory for the socket and key file: $XDG_RUNTIME_DIR/qa-agent,
+    else qa-agent-<uid> in the temp directory, created with mode 0700.
+
+    Raises:
+        PermissionError: If the directory exists but belongs to another user
+            or is readable by others
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    path = os.path.join(base, "qa-agent") if base else os.path.join(tempfile.gettempdir(), f"qa-agent-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by this user with mode 0700")
+    return path
+
+
+def default_socket_path() -> str:
+    """EMBEDDING_SERVICE_SOCKET, else embeddings.sock in runtime_dir()"""
+    return Config.EMBEDDING_SERVICE_SOCKET or os.path.join(runtime_dir(), "embeddings.sock")
+
+
+def load_authkey(create: bool = False) -> bytes:
+    """
+    Shared secret of the service and its workers.
+
+    EMBEDDING_SERVICE_AUTHKEY if set, else the key file
+    (EMBEDDING_SERVICE_AUTHKEY_FILE, default embeddings.key in runtime_dir()).
+
+    Args:
+        create: Write a random key file if there is none (the service does)
+
+    Raises:
+        Exception: If there is no key file yet
+        PermissionError: If the key file is not private to this user
+    """
+    if Config.EMBEDDING_SERVICE_AUTHKEY:
+        return Config.EMBEDDING_SERVICE_AUTHKEY.encode("utf-8")
+
+    path = Config.EMBEDDING_SERVICE_AUTHKEY_FILE or os.path.join(runtime_dir(), "embeddings.key")
+    if create:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as key_file:
+                key_file.write(secrets.token_hex(32))
+
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        raise Exception(
+            f"No embedding service key at {path}: start the service first or set EMBEDDING_SERVICE_AUTHKEY"
+        )
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} must be owned by this user with mode 0600")
+    with open(path) as key_file:
+        return key_file.read().strip().encode("utf-8")
+
+
+class _PendingEncode:
+    """An encode request waiting for its batch to run"""
+
+    __slots__ = ("texts", "result", "error", "done")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchingEncoder:
+    """
+    Wrap an embedding model so concurrent encode() calls share model calls.
+
+    A request waits at most `max_wait_ms` for others to join its batch; a batch
+    is cut once it holds `max_batch` texts.
+    """
+
+    def __init__(self, model: Any, max_batch: int = None, max_wait_ms: float = None):
+        self.model = model
+        self.max_batch = max_batch or Config.EMBEDDING_SERVICE_MAX_BATCH
+        self.max_wait_s = (max_wait_ms if max_wait_ms is not None else Config.EMBEDDING_SERVICE_BATCH_WAIT_MS) / 1000.0
+        self._queue: "queue.Queue[_PendingEncode]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, sentences, convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs):
+        """Same contract as SentenceTransformer.encode for str or list input"""
+        single = isinstance(sentences, str)
+        pending = _PendingEncode([sentences] if single else list(sentences))
+
+        if not pending.texts:
+            return self.model.encode([], convert_to_numpy=True)
+
+        self._queue.put(pending)
+        pending.done.wait()
+
+        if pending.error:
+            raise pending.error
+        return pending.result[0] if single else pending.result
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait_s
+
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                size += len(pending.texts)
+
+            try:
+                vectors = self.model.encode(
+                    [text for pending in batch for text in pending.texts],
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                )
+                offset = 0
+                for pending in batch:
+                    pending.result = vectors[offset:offset + len(pending.texts)]
+                    offset += len(pending.texts)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+
+class EmbeddingServer:
+    """Serve encode and per-project VectorDatabase calls to API workers"""
+
+    def __init__(self, socket_path: str = None, authkey: str = None):
+        from backend.vector_db import load_embedding_model
+
+        self.socket_path = socket_path or default_socket_path()
+        self.authkey = authkey.encode("utf-8") if authkey else load_authkey(create=True)
+        self.encoder = BatchingEncoder(load_embedding_model())
+        self.knowledge_bases = KnowledgeBaseManager(embedding_model=self.encoder)
+        self._write_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        # Create the socket owner-only from the start instead of chmod-ing it after bind
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        print(f"Embedding service listening on {self.socket_path}")
+
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    print(f"Rejected embedding service connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def _handle(self, connection) -> None:
+        with connection:
+            while True:
+                try:
+                    operation, project_id, name, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    connection.send(("ok", self._dispatch(operation, project_id, name, args, kwargs)))
+                except Exception as e:
+                    connection.send(("error", str(e)))
+
+    def _dispatch(
+        self,
+        operation: str,
+        project_id: str,
+        name: Optional[str],
+        args: tuple,
+        kwargs: dict
+    ) -> Any:
+        if operation == "encode":
+            return self.encoder.encode(*args, **kwargs)
+
+        knowledge_base = self.knowledge_bases.get(project_id)
+        if operation != "call" or name.startswith("_") or not callable(getattr(knowledge_base, name, None)):
+            raise ValueError(f"Unsupported embedding service operation: {operation} {name}")
+
+        method = getattr(knowledge_base, name)
+        if name in READ_METHODS:
+            return method(*args, **kwargs)
+        # Writes are serialized per project; projects build independently
+        with self._write_locks[project_id]:
+            return method(*args, **kwargs)
+
+
+class RemoteEmbeddingModel:
+    """Embedding model proxy with the SentenceTransformer.encode contract"""
+
+    def __init__(self, remote: "RemoteVectorDatabase"):
+        self._remote = remote
+
+    def encode(self, sentences, convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs):
+        return self._remote._request("encode", None, (sentences,), {})
+
+
+class EmbeddingServiceTransport:
+    """Per-thread connections to the embedding service, shared by all projects"""
+
+    def __init__(self, socket_path: str = None, authkey: str = None):
+        self.socket_path = socket_path or default_socket_path()
+        # Read on first connect, as the service may create the key file after the API starts
+        self.authkey = authkey.encode("utf-8") if authkey else None
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = Client(self.socket_path, family="AF_UNIX", authkey=self.authkey or load_authkey())
+            self._local.connection = connection
+        return connection
+
+    def request(self, operation: str, project_id: str, name: Optional[str], args: tuple, kwargs: dict) -> Any:
+        try:
+            connection = self._connection()
+            connection.send((operation, project_id, name, args, kwargs))
+            status, payload = connection.recv()
+        except (EOFError, OSError) as e:
+            # Drop the broken connection; the next call reconnects
+            self._local.connection = None
+            raise Exception(f"Embedding service unavailable at {self.socket_path}: {str(e)}")
+
+        if status == "error":
+            raise Exception(payload)
+        return payload
+
+
+def _materialize_chunks(document: Dict[str, Any]) -> Dict[str, Any]:
+    if document.get("chunks") is None:
+        return document
+    return {**document, "chunks": list(document["chunks"])}
+
+
+class RemoteVectorDatabase:
+    """
+    VectorDatabase proxy that forwards calls to the embedding service.
+
+    Public VectorDatabase methods are forwarded by name, so the proxy follows
+    the VectorDatabase API without restating it.
+    """
+
+    def __init__(
+        self,
+        project_id: str = DEFAULT_PROJECT,
+        socket_path: str = None,
+        authkey: str = None,
+        transport: EmbeddingServiceTransport = None
+    ):
+        self.project_id = project_id
+        self.transport = transport or EmbeddingServiceTransport(socket_path, authkey)
+        self.embedding_model = RemoteEmbeddingModel(self)
+
+    def _request(self, operation: str, name: Optional[str], args: tuple, kwargs: dict) -> Any:
+        return self.transport.request(operation, self.project_id, name, args, kwargs)
+
+    def add_documents(self, documents: List[Dict[str, Any]], *args, **kwargs) -> int:
+        # Lazily streamed chunks cannot cross the process boundary
+        documents = [_materialize_chunks(doc) for doc in documents]
+        return self._request("call", "add_documents", (documents,) + args, kwargs)
+
+    def replace_document(self, document: Dict[str, Any], *args, **kwargs) -> Dict[str, Any]:
+        return self._request("call", "replace_document", (_materialize_chunks(document),) + args, kwargs)
+
+    @contextmanager
+    def pin(self):
+        """
+        Pin the active collection version for reads in the enclosed block.
+
+        The service keeps KB_RETAINED_VERSIONS previous versions, and any
+        version for KB_VERSION_GRACE_S after it was replaced, which covers
+        requests that are still reading when a rebuild is committed.
+        """
+        pinned = _pinned_collections.get()
+        if self.project_id in pinned:
+            yield pinned[self.project_id]
+            return
+
+        name = self.active_collection_name()
+        token = _pinned_collections.set({**pinned, self.project_id: name})
+        try:
+            yield name
+        finally:
+            _pinned_collections.reset(token)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def remote_method(*args, **kwargs):
+            pinned = _pinned_collections.get().get(self.project_id)
+            if pinned and name in READ_METHODS and name != "active_collection_name":
+                kwargs.setdefault("collection_name", pinned)
+            return self._request("call", name, args, kwargs)
+
+        remote_method.__name__ = name
+        return remote_method
+
+
+# Run the embedding service
+if __name__ == "__main__":
+    EmbeddingServer().serve_forever()
@@ -0,0 +1,39 @@
+"""
+Gunicorn configuration for preload-then-fork deployments.
+
+The app (and with it the embedding model) is imported once in the master and
+workers are forked from it, so model weights are shared copy-on-write:
+
+    gunicorn -c backend/gunicorn_conf.py backend.main:app
+
+Each worker still opens its own ChromaDB client after fork. When workers
+also write to the knowledge base, prefer the shared embedding service
+(EMBEDDING_SERVICE_MODE=remote), which has a single writer.
+"""
+
+import gc
+import os
+
+from backend.config import Config
+
+
+bind = f"{Config.BACKEND_HOST}:{os.getenv('PORT', Config.BACKEND_PORT)}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 300
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's generations; otherwise
+    # a worker's first GC pass writes to every object header and un-shares the pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Keep per-worker torch thread pools small; N workers already use N cores
+    try:
+        import torch
+        torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS", "1")))
+    except ImportError:
+        pass
@@ -0,0 +1,366 @@
+"""
+Tolerant JSON parsing for LLM output.
+
+Models wrap JSON in prose or code fences, leave trailing commas, forget the
+comma between two objects, write Python literals, or stop mid-array when
+they hit max_tokens. parse_json() fixes the common syntax errors; when the
+document is still broken, salvage_array() decodes an array element by
+element so every complete item is kept and the rest is reported.
+ArrayStream does the same for a streamed response, handing back each
+element as soon as it is complete.
+"""
+
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_EXCERPT_CHARS = 200
+
+
+class SalvageResult:
+    """Items recovered from a damaged JSON array and what was lost"""
+
+    def __init__(self):
+        self.items: List[Any] = []  # decoded elements, at array positions `indexes`
+        self.indexes: List[int] = []
+        self.dropped: List[Dict[str, Any]] = []
+        self.repairs: List[str] = []
+        self.truncated = False
+        self.found = False
+
+    def drop(self, index: int, reason: str, fragment: str) -> None:
+        self.dropped.append({
+            "index": index,
+            "reason": reason,
+            "excerpt": fragment[:_EXCERPT_CHARS]
+        })
+
+
+def strip_fences(text: str) -> str:
+    """Contents of the first Markdown code fence, or the text itself"""
+    match = _FENCE_RE.search(text)
+    return match.group(1) if match else text
+
+
+def fix_syntax(text: str) -> Tuple[str, List[str]]:
+    """
+    Fix common JSON syntax errors outside string literals.
+
+    Removes trailing commas, inserts missing commas between values on
+    separate lines and replaces Python literals (True/False/None).
+
+    Returns:
+        Fixed text and the list of repairs made
+    """
+    out = []
+    repairs = []
+    in_string = False
+    escaped = False
+    i = 0
+    n = len(text)
+
+    while i < n:
+        char = text[i]
+
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                i = _after_value(text, i + 1, out, repairs)
+                continue
+            i += 1
+            continue
+
+        if char == '"':
+            in_string = True
+            out.append(char)
+            i += 1
+            continue
+
+        if char == ",":
+            j = _skip_whitespace(text, i + 1)
+            if j < n and text[j] in "]}":
+                repairs.append("removed trailing comma")
+                i += 1
+                continue
+
+        if char in "]}":
+            out.append(char)
+            i = _after_value(text, i + 1, out, repairs)
+            continue
+
+        if char.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            if word in _LITERALS:
+                out.append(_LITERALS[word])
+                repairs.append(f"replaced {word}")
+            else:
+                out.append(word)
+            i = j
+            continue
+
+        out.append(char)
+        i += 1
+
+    return "".join(out), repairs
+
+
+def _skip_whitespace(text: str, i: int) -> int:
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return i
+
+
+def _after_value(text: str, i: int, out: List[str], repairs: List[str]) -> int:
+    """Insert a comma if another value starts on a later line without one"""
+    j = _skip_whitespace(text, i)
+    if j < len(text) and text[j] in '"{[' and "\n" in text[i:j]:
+        out.append(",")
+        repairs.append("inserted missing comma")
+    return i
+
+
+def loads(text: str) -> Any:
+    """json.loads that accepts raw control characters (e.g. newlines) in strings"""
+    return json.loads(text, strict=False)
+
+
+def parse_json(text: str) -> Tuple[Any, List[str]]:
+    """
+    Decode the JSON document in an LLM response.
+
+    Tolerates prose or code fences around the document and the syntax
+    errors fix_syntax() handles.
+
+    Returns:
+        Decoded value and the repairs that were needed
+
+    Raises:
+        ValueError: If no complete JSON document can be decoded
+    """
+    candidates = [text.strip(), strip_fences(text).strip()]
+    for open_char, close_char in (("{", "}"), ("[", "]")):
+        start = text.find(open_char)
+        end = text.rfind(close_char) + 1
+        if start != -1 and end > start:
+            candidates.append(text[start:end])
+
+    for candidate in candidates:
+        try:
+            return loads(candidate), []
+        except json.JSONDecodeError:
+            continue
+
+    for candidate in candidates:
+        fixed, repairs = fix_syntax(candidate)
+        try:
+            return loads(fixed), repairs
+        except json.JSONDecodeError:
+            continue
+
+    raise ValueError("No JSON document found in response")
+
+
+def _array_start(text: str, key: Optional[str]) -> Optional[int]:
+    """Index of the '[' opening the item array"""
+    if key:
+        match = re.search(r'"%s"\s*:\s*\[' % re.escape(key), text)
+        if match:
+            return match.end() - 1
+    start = text.find("[")
+    return start if start != -1 else None
+
+
+def _value_end(text: str, start: int) -> Optional[int]:
+    """Index just past the value starting at `start`, or None if it is cut off"""
+    first = text[start]
+    if first in "{[":
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        return None
+
+    if first == '"':
+        escaped = False
+        for i in range(start + 1, len(text)):
+            if escaped:
+                escaped = False
+            elif text[i] == "\\":
+                escaped = True
+            elif text[i] == '"':
+                return i + 1
+        return None
+
+    match = re.compile(r"[,\]\n]").search(text, start)
+    return match.start() if match else None
+
+
+def salvage_array(text: str, key: str = None) -> SalvageResult:
+    """
+    Decode an array element by element.
+
+    Complete elements are kept (after fix_syntax() if needed); elements that
+    still do not decode are dropped, and an element cut off at the end of the
+    text marks the result as truncated.
+
+    Args:
+        text: LLM response containing the array
+        key: Object key holding the array (e.g. "test_cases"); the first
+            array in the text is used if the key is not found
+
+    Returns:
+        SalvageResult (found is False if there is no array at all)
+    """
+    result = SalvageResult()
+    text = strip_fences(text) if "```" in text else text
+    start = _array_start(text, key)
+    if start is None:
+        return result
+    result.found = True
+
+    i = start + 1
+    index = 0
+    while True:
+        while i < len(text) and (text[i].isspace() or text[i] == ","):
+            i += 1
+        if i >= len(text):
+            result.truncated = True
+            break
+        if text[i] == "]":
+            break
+
+        end = _value_end(text, i)
+        if end is None:
+            result.truncated = True
+            result.drop(index, "truncated", text[i:])
+            break
+
+        _decode_item(text[i:end], index, result)
+        i = end
+        index += 1
+
+    return result
+
+
+def _decode_item(fragment: str, index: int, result: SalvageResult) -> None:
+    """Add one array element to `result`, repaired if needed, or record it as dropped"""
+    try:
+        result.items.append(loads(fragment))
+        result.indexes.append(index)
+    except json.JSONDecodeError:
+        fixed, repairs = fix_syntax(fragment)
+        try:
+            result.items.append(loads(fixed))
+            result.indexes.append(index)
+            result.repairs.extend(repairs)
+        except json.JSONDecodeError as e:
+            result.drop(index, f"invalid JSON: {e.msg}", fragment)
+
+
+class ArrayStream:
+    """
+    salvage_array() for a response that is still arriving.
+
+    feed() each delta as it comes in and act on the elements it returns while
+    the model is still writing the rest; close() once the response has ended
+    to find out whether the array was cut off.
+    """
+
+    def __init__(self, key: str = None):
+        """
+        Args:
+            key: Object key holding the array; unlike salvage_array() there is
+                no fallback to the first array, because a nested list such as
+                test_steps would otherwise be taken for it before the key arrives
+        """
+        self.result = SalvageResult()
+        self._key = key
+        self._text = ""
+        self._i: Optional[int] = None  # next unread position inside the array
+        self._index = 0
+        self._ended = False
+
+    def feed(self, delta: str) -> List[Tuple[int, Any]]:
+        """
+        Add a response delta.
+
+        Returns:
+            (array position, element) of each element this delta completed
+        """
+        self._text += delta
+        if self._ended:
+            return []
+
+        if self._i is None:
+            if self._key:
+                match = re.search(r'"%s"\s*:\s*\[' % re.escape(self._key), self._text)
+                start = match.end() - 1 if match else -1
+            else:
+                start = self._text.find("[")
+            if start == -1:
+                return []
+            self.result.found = True
+            self._i = start + 1
+
+        completed = len(self.result.items)
+        text = self._text
+        i = self._i
+        while True:
+            while i < len(text) and (text[i].isspace() or text[i] == ","):
+                i += 1
+            if i >= len(text):
+                break
+            if text[i] == "]":
+                self._ended = True
+                break
+
+            end = _value_end(text, i)
+            if end is None:
+                break
+            _decode_item(text[i:end], self._index, self.result)
+            i = end
+            self._index += 1
+
+        self._i = i
+        return list(zip(self.result.indexes[completed:], self.result.items[completed:]))
+
+    def close(self) -> SalvageResult:
+        """
+        Mark the response as complete.
+
+        Returns:
+            The SalvageResult of the whole array, truncated if it never closed
+        """
+        if self.result.found and not self._ended:
+            self.result.truncated = True
+            rest = self._text[self._i:]
+            if rest:
+                self.result.drop(self._index, "truncated", rest)
+        return self.result
@@ -0,0 +1,170 @@
+"""
+Named knowledge bases.
+
+Each project has its own collection and upload directory. Open knowledge-base
+handles are kept in a bounded LRU and share one embedding model and one
+ChromaDB client.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
+
+from backend.config import Config
+from backend import metrics
+
+
+DEFAULT_PROJECT = "default"
+
+# Collection names must be 3-63 characters, so project IDs are capped at 48
+PROJECT_ID_RE = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,46}[A-Za-z0-9])?$")
+
+
+class KnowledgeBaseManager:
+    """Open and track per-project knowledge bases"""
+
+    def __init__(
+        self,
+        max_open: int = None,
+        factory: Callable[[str], Any] = None,
+        embedding_model: Any = None
+    ):
+        """
+        Initialize knowledge base manager.
+
+        Args:
+            max_open: Maximum number of knowledge-base handles kept open
+            factory: Callable creating a knowledge base for a project ID
+                (defaults to a local VectorDatabase)
+            embedding_model: Embedding model shared by local knowledge bases
+                (loaded from config on first use if omitted)
+        """
+        self.max_open = max_open or Config.KB_MAX_OPEN
+        self._factory = factory or self._open_local
+        self._open: "OrderedDict[str, Any]" = OrderedDict()
+        self._usage: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._embedding_model = embedding_model
+        self._client = None
+
+    @staticmethod
+    def validate_project_id(project_id: str) -> str:
+        """Return the project ID or raise ValueError if it is not usable"""
+        if not PROJECT_ID_RE.match(project_id or ""):
+            raise ValueError(
+                f"Invalid project ID '{project_id}'. Use 1-48 letters, digits, '-' or '_', "
+                "starting and ending with a letter or digit."
+            )
+        return project_id
+
+    @staticmethod
+    def collection_name(project_id: str) -> str:
+        """Base collection name of a project"""
+        if project_id == DEFAULT_PROJECT:
+            return "qa_documents"
+        return f"kb_{project_id}"
+
+    @staticmethod
+    def upload_dir(project_id: str) -> str:
+        """Upload directory of a project (created if missing)"""
+        if project_id == DEFAULT_PROJECT:
+            path = Config.UPLOAD_DIR
+        else:
+            path = os.path.join(Config.UPLOAD_DIR, "projects", project_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def list_uploaded_files(project_id: str) -> List[str]:
+        """Supported documents in a project's upload directory"""
+        upload_dir = KnowledgeBaseManager.upload_dir(project_id)
+        return sorted(
+            f for f in os.listdir(upload_dir)
+            if os.path.isfile(os.path.join(upload_dir, f))
+            and os.path.splitext(f)[1].lower() in Config.ALLOWED_EXTENSIONS
+        )
+
+    def get(self, project_id: str = DEFAULT_PROJECT) -> Any:
+        """
+        Get the knowledge base of a project, opening it if needed.
+
+        Args:
+            project_id: Project identifier
+
+        Returns:
+            VectorDatabase (or compatible proxy) for the project
+        """
+        self.validate_project_id(project_id)
+
+        with self._lock:
+            knowledge_base = self._open.get(project_id)
+            if knowledge_base is not None:
+                self._open.move_to_end(project_id)
+                metrics.CACHE_LOOKUPS_TOTAL.labels("knowledge_base", "hit").inc()
+            else:
+                metrics.CACHE_LOOKUPS_TOTAL.labels("knowledge_base", "miss").inc()
+                knowledge_base = self._factory(project_id)
+                self._open[project_id] = knowledge_base
+                self._usage_for(project_id)["opened"] += 1
+
+                # Evict least recently used handles; their data stays on disk
+                while len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+
+            self._usage_for(project_id)["last_used_at"] = time.time()
+
+        return knowledge_base
+
+    def close(self, project_id: str) -> None:
+        """Drop an open handle (e.g. after the knowledge base was reset)"""
+        with self._lock:
+            self._open.pop(project_id, None)
+
+    def record_usage(self, project_id: str, event: str, count: int = 1) -> None:
+        """Increment a usage counter of a project"""
+        with self._lock:
+            usage = self._usage_for(project_id)
+            usage[event] = usage.get(event, 0) + count
+            usage["last_used_at"] = time.time()
+
+    def usage(self, project_id: str) -> Dict[str, Any]:
+        """Usage statistics of a project since this process started"""
+        with self._lock:
+            return {
+                **self._usage_for(project_id),
+                "open": project_id in self._open
+            }
+
+    def list_projects(self) -> List[str]:
+        """Projects that have an upload directory or were used in this process"""
+        projects = {DEFAULT_PROJECT} | set(self._usage)
+        projects_root = os.path.join(Config.UPLOAD_DIR, "projects")
+        if os.path.isdir(projects_root):
+            projects.update(
+                name for name in os.listdir(projects_root)
+                if PROJECT_ID_RE.match(name) and os.path.isdir(os.path.join(projects_root, name))
+            )
+        return sorted(projects)
+
+    def _usage_for(self, project_id: str) -> Dict[str, Any]:
+        if project_id not in self._usage:
+            self._usage[project_id] = {"opened": 0, "last_used_at": None}
+        return self._usage[project_id]
+
+    def _open_local(self, project_id: str) -> Any:
+        from backend.vector_db import VectorDatabase, load_embedding_model
+
+        if self._embedding_model is None:
+            self._embedding_model = load_embedding_model()
+
+        knowledge_base = VectorDatabase(
+            collection_name=self.collection_name(project_id),
+            embedding_model=self._embedding_model,
+            client=self._client
+        )
+        # Later knowledge bases reuse the first one's ChromaDB client
+        self._client = self._client or knowledge_base.client
+        return knowledge_base
@@ -1,43 +1,292 @@
 """
-LLM handler for interacting with different LLM providers (OpenAI, Groq, Ollama).
+LLM handler for interacting with different LLM providers (OpenAI, Groq, Ollama, Mock).
+
+Requests go to an ordered provider pool (LLM_PROVIDERS). A provider that
+fails is skipped in favor of the next one, and a request that runs past the
+primary's p95 latency is hedged on the next provider; whichever attempt
+loses is cancelled. Each attempt waits for its provider's rate limiter and
+retries transient errors with backoff, within the request's deadline.
 """
 
-from typing import List, Dict, Any, Optional
-import openai
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Optional, Iterator
 from backend.config import Config
+from backend import metrics
+from backend.llm_providers import (
+    DeadlineExceeded,
+    HedgeBudget,
+    LLMProvider,
+    backoff_delay,
+    build_provider_pool,
+    error_headers,
+    error_status,
+    is_format_error,
+    is_retryable,
+    retry_after
+)
+from backend.profiling import span
 
 
-class LLMHandler:
-    """Handle LLM interactions for test case and script generation"""
+_DONE = object()
+
+# Absolute time.monotonic() deadline of the current request, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+# (provider, model) that answered the last LLM call made in this context
+_served_by: ContextVar[Optional[tuple]] = ContextVar("llm_served_by", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    """
+    Bound every LLM call made in this block to finish within `seconds`.
     
-    def __init__(self):
-        """Initialize LLM handler based on configuration"""
-        self.config = Config.get_llm_config()
-        self.provider = self.config["provider"]
-        
-        if self.provider == "openai":
-            openai.api_key = self.config["api_key"]
-            self.model = self.config["model"]
-            self.client = openai.OpenAI(api_key=self.config["api_key"])
-        elif self.provider == "groq":
-            self.model = self.config["model"]
-            self.client = openai.OpenAI(
-                api_key=self.config["api_key"],
-                base_url="https://api.groq.com/openai/v1"
+    Nested scopes can only tighten the deadline. Time spent queued behind the
+    rate limiter and waiting between retries counts against it.
+    """
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def served_by() -> Optional[tuple]:
+    """(provider, model) that answered the last LLM call in this context, if any"""
+    return _served_by.get()
+
+
+def _current_deadline() -> Optional[float]:
+    deadline = _deadline.get()
+    if Config.LLM_DEADLINE_S > 0:
+        own = time.monotonic() + Config.LLM_DEADLINE_S
+        deadline = own if deadline is None else min(deadline, own)
+    return deadline
+
+
+def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a request can use, as providers count them against the limit"""
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+
+class _Attempt:
+    """One streamed request to one provider, cancellable between chunks"""
+    
+    def __init__(
+        self,
+        provider: LLMProvider,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        events: "queue.Queue",
+        is_hedge: bool,
+        deadline: Optional[float] = None,
+        json_schema: Dict[str, Any] = None
+    ):
+        self.provider = provider
+        self.messages = messages
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.events = events
+        self.is_hedge = is_hedge
+        self.deadline = deadline
+        self.json_schema = json_schema
+        # Weakened for this attempt alone when the API rejects the format
+        self.structured_output = provider.structured_output
+        
+        self.parts: List[str] = []
+        self.chunks: "queue.Queue" = queue.Queue()
+        self.error: Optional[Exception] = None
+        self.ttft: Optional[float] = None
+        self.usage = (None, None)
+        self.retries = 0
+        self.timings: Optional[Dict[str, Any]] = None
+        self._cancelled = threading.Event()
+    
+    def start(self) -> "_Attempt":
+        threading.Thread(target=self._run, name=f"llm-{self.provider.name}", daemon=True).start()
+        return self
+    
+    def cancel(self) -> None:
+        """
+        Stop the attempt.
+        
+        The connection is closed at the next streamed chunk, which stops
+        generation (and billing) on the provider side. An attempt waiting for
+        the rate limiter or a retry gives up at once; one still waiting for
+        response headers is abandoned at its request timeout.
+        """
+        self._cancelled.set()
+    
+    def _remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+    
+    def _run(self) -> None:
+        provider = self.provider
+        reserved_tokens = _estimate_tokens(self.messages, self.max_tokens)
+        
+        while True:
+            self.error = None
+            hint = None
+            try:
+                self._request(reserved_tokens)
+            except Exception as e:
+                self.error = e
+                headers = error_headers(e)
+                hint = retry_after(headers)
+                provider.rate_limiter.observe_headers(headers)
+                if error_status(e) == 429:
+                    provider.rate_limiter.record_rate_limited(hint)
+                elif (
+                    error_status(e) == 400 and self.json_schema is not None
+                    and self.structured_output != "off" and is_format_error(e)
+                ):
+                    # The model rejected the response format: retry one step weaker
+                    print(f"{provider.name} rejected {self.structured_output} output: {str(e)}")
+                    self.structured_output = provider.structured_output_rejected(self.structured_output)
+                    continue
+            
+            if self.error is None or self._cancelled.is_set() or not self._should_retry():
+                break
+            
+            delay = backoff_delay(self.retries, hint)
+            remaining = self._remaining()
+            if remaining is not None and delay > remaining:
+                break
+            
+            self.retries += 1
+            status = error_status(self.error)
+            reason = "rate_limited" if status == 429 else "server_error" if status else "connection"
+            metrics.LLM_RETRIES_TOTAL.labels(provider.name, reason).inc()
+            if self._cancelled.wait(delay):
+                break
+        
+        if self._cancelled.is_set():
+            provider.breaker.release_probe()
+        elif self.error is not None:
+            metrics.LLM_ERRORS_TOTAL.labels(provider.name, provider.model).inc()
+            # Rate limiting and deadlines say nothing about the provider's health
+            provider.record_failure(
+                trip_breaker=error_status(self.error) != 429 and not isinstance(self.error, DeadlineExceeded)
             )
-        elif self.provider == "ollama":
-            self.model = self.config["model"]
-            self.client = openai.OpenAI(
-                api_key="ollama",  # Ollama doesn't require API key
-                base_url=f"{self.config['base_url']}/v1"
+        else:
+            provider.rate_limiter.record_success()
+            if self.json_schema is not None and self.structured_output != "off":
+                provider.structured_output_accepted(self.structured_output)
+            if self.usage[1] is not None:
+                provider.rate_limiter.settle(reserved_tokens, self.usage[0] + self.usage[1])
+        
+        self.chunks.put(_DONE)
+        self.events.put(("done", self))
+    
+    def _should_retry(self) -> bool:
+        # Nothing can be retried once content has reached the caller
+        return (
+            not self.parts
+            and self.retries < Config.LLM_MAX_RETRIES
+            and is_retryable(self.error)
+        )
+    
+    def _request(self, reserved_tokens: int) -> None:
+        """Send one request once the rate limiter allows it and stream the response"""
+        provider = self.provider
+        if not provider.rate_limiter.acquire(reserved_tokens, self.deadline, self._cancelled):
+            return
+        
+        timeout = None
+        remaining = self._remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise DeadlineExceeded(f"deadline passed before the request to {provider.name} was sent")
+            timeout = min(remaining, Config.LLM_REQUEST_TIMEOUT_S)
+        
+        start_time = time.perf_counter()
+        stream = None
+        
+        try:
+            stream = provider.stream_chat(
+                self.messages, self.temperature, self.max_tokens, timeout, self.json_schema,
+                self.structured_output
             )
+            provider.rate_limiter.observe_headers(stream.headers)
+            
+            for content, usage in stream:
+                if self._cancelled.is_set():
+                    return
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    raise DeadlineExceeded(f"deadline passed while streaming from {provider.name}")
+                
+                usage = _record_usage(provider, usage)
+                if usage[1]:
+                    self.usage = usage
+                
+                if content:
+                    if self.ttft is None:
+                        self.ttft = time.perf_counter() - start_time
+                        metrics.LLM_TIME_TO_FIRST_TOKEN_SECONDS.labels(provider.name, provider.model).observe(self.ttft)
+                        self.events.put(("first_token", self))
+                    self.parts.append(content)
+                    self.chunks.put(content)
+        finally:
+            if stream is not None:
+                stream.close()
+        
+        self.timings = stream.timings
+        
+        # Latency of the successful request alone, so queueing and retries do
+        # not skew the hedge percentiles
+        latency = time.perf_counter() - start_time
+        metrics.LLM_REQUEST_SECONDS.labels(provider.name, provider.model).observe(latency)
+        provider.record_success(latency, self.ttft)
+
+
+def _record_usage(provider: LLMProvider, usage: Any) -> tuple:
+    """Record token usage reported by the provider and return (prompt, completion) tokens"""
+    if not usage:
+        return None, None
+    
+    prompt_tokens = usage.prompt_tokens or 0
+    completion_tokens = usage.completion_tokens or 0
+    
+    metrics.LLM_TOKENS_TOTAL.labels(provider.name, provider.model, "prompt").inc(prompt_tokens)
+    metrics.LLM_TOKENS_TOTAL.labels(provider.name, provider.model, "completion").inc(completion_tokens)
+    
+    return prompt_tokens, completion_tokens
+
+
+class LLMHandler:
+    """Handle LLM interactions for test case and script generation"""
+    
+    def __init__(self, providers: List[LLMProvider] = None):
+        """
+        Initialize LLM handler based on configuration.
+        
+        Args:
+            providers: Provider pool in failover order (built from LLM_PROVIDERS if omitted)
+        """
+        self.providers = providers or build_provider_pool()
+        self.hedge_budget = HedgeBudget()
+        
+        # Primary provider
+        self.provider = self.providers[0].name
+        self.model = self.providers[0].model
+        self.client = self.providers[0].client
     
     def generate(
         self,
         prompt: str,
         system_prompt: str = None,
         temperature: float = None,
-        max_tokens: int = None
+        max_tokens: int = None,
+        json_schema: Dict[str, Any] = None
     ) -> str:
         """
         Generate text using LLM.
@@ -47,13 +296,220 @@ class LLMHandler:
             system_prompt: System prompt for context
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            json_schema: JSON schema the response must follow; providers that
+                support structured output are constrained to it (the prompt
+                should still describe the format for those that do not)
             
         Returns:
             Generated text
         """
+        if Config.LLM_STREAM:
+            return "".join(self.generate_stream(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                json_schema=json_schema
+            ))
+        
+        temperature = temperature or Config.TEMPERATURE
+        max_tokens = max_tokens or Config.MAX_TOKENS
+        
+        messages = self._build_messages(prompt, system_prompt)
+        
+        with span(
+            "llm.generate",
+            provider=self.provider,
+            model=self.model,
+            prompt_chars=sum(len(m["content"]) for m in messages)
+        ) as llm_span:
+            winner = self._race(
+                messages, temperature, max_tokens, until_first_token=False, llm_span=llm_span,
+                json_schema=json_schema
+            )
+            content = "".join(winner.parts)
+            llm_span.set(
+                completion_chars=len(content),
+                prompt_tokens=winner.usage[0],
+                completion_tokens=winner.usage[1],
+                **(winner.timings or {})
+            )
+        
+        return content
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = None,
+        temperature: float = None,
+        max_tokens: int = None,
+        json_schema: Dict[str, Any] = None
+    ) -> Iterator[str]:
+        """
+        Generate text using LLM, yielding content deltas as they arrive.
+        
+        Hedging applies to the first token: once a provider starts streaming,
+        the response is committed to it.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System prompt for context
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            json_schema: JSON schema the response must follow (see generate)
+            
+        Returns:
+            Iterator of generated text fragments
+        """
         temperature = temperature or Config.TEMPERATURE
         max_tokens = max_tokens or Config.MAX_TOKENS
         
+        messages = self._build_messages(prompt, system_prompt)
+        
+        with span(
+            "llm.generate_stream",
+            provider=self.provider,
+            model=self.model,
+            prompt_chars=sum(len(m["content"]) for m in messages)
+        ) as llm_span:
+            winner = self._race(
+                messages, temperature, max_tokens, until_first_token=True, llm_span=llm_span,
+                json_schema=json_schema
+            )
+            if winner.ttft is not None:
+                llm_span.set(ttft_ms=round(winner.ttft * 1000, 3))
+            
+            completion_chars = 0
+            try:
+                while True:
+                    content = winner.chunks.get()
+                    if content is _DONE:
+                        break
+                    completion_chars += len(content)
+                    yield content
+            finally:
+                # Stop generating if the consumer goes away early
+                winner.cancel()
+            
+            if winner.error is not None:
+                raise Exception(f"Error generating text with {winner.provider.name}: {str(winner.error)}")
+            
+            llm_span.set(
+                completion_chars=completion_chars,
+                prompt_tokens=winner.usage[0],
+                completion_tokens=winner.usage[1],
+                **(winner.timings or {})
+            )
+    
+    def _race(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        until_first_token: bool,
+        llm_span: Any,
+        json_schema: Dict[str, Any] = None
+    ) -> _Attempt:
+        """
+        Run a request across the provider pool.
+        
+        The first available provider is tried. If it fails, the next one is;
+        if it is slower than its p95 latency (time to first token when
+        streaming), a hedge is sent to the next provider. The first attempt to
+        finish (or to stream its first token) wins and the others are cancelled.
+        No new attempt starts after the request's deadline.
+        
+        Returns:
+            The winning attempt
+        """
+        deadline = _current_deadline()
+        events: "queue.Queue" = queue.Queue()
+        candidates = iter(self.providers)
+        active: List[_Attempt] = []
+        failed: List[_Attempt] = []
+        hedged = not Config.LLM_HEDGE_ENABLED or len(self.providers) < 2
+        self.hedge_budget.record_request()
+        
+        def launch(is_hedge: bool) -> Optional[_Attempt]:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            for provider in candidates:
+                if provider.breaker.allow_request():
+                    attempt = _Attempt(
+                        provider, messages, temperature, max_tokens, events, is_hedge, deadline, json_schema
+                    ).start()
+                    active.append(attempt)
+                    return attempt
+            return None
+        
+        primary = launch(is_hedge=False)
+        if primary is None:
+            raise Exception(
+                f"Error generating text with {self.provider}: all providers are unavailable (circuit open)"
+            )
+        hedge_at = time.monotonic() + primary.provider.hedge_delay(until_first_token)
+        
+        while True:
+            try:
+                timeout = None if hedged else max(hedge_at - time.monotonic(), 0)
+                kind, attempt = events.get(timeout=timeout)
+            except queue.Empty:
+                # The primary is slower than usual: hedge on the next provider
+                hedged = True
+                if self.hedge_budget.try_acquire():
+                    launch(is_hedge=True)
+                continue
+            
+            if kind == "done" and attempt.error is not None:
+                active.remove(attempt)
+                failed.append(attempt)
+                if attempt.is_hedge:
+                    metrics.LLM_HEDGED_REQUESTS_TOTAL.labels(attempt.provider.name, "failed").inc()
+                if active:
+                    continue
+                
+                # Fail over to the next provider
+                replacement = launch(is_hedge=False)
+                if replacement is None:
+                    errors = "; ".join(f"{a.provider.name}: {str(a.error)}" for a in failed)
+                    raise Exception(f"Error generating text with {self.provider}: {errors}")
+                hedge_at = time.monotonic() + replacement.provider.hedge_delay(until_first_token)
+                continue
+            
+            if kind == "done" or until_first_token:
+                winner = attempt
+                for other in active:
+                    if other is not winner:
+                        other.cancel()
+                    if other.is_hedge:
+                        metrics.LLM_HEDGED_REQUESTS_TOTAL.labels(
+                            other.provider.name, "won" if other is winner else "lost"
+                        ).inc()
+                
+                llm_span.set(
+                    provider=winner.provider.name,
+                    model=winner.provider.model,
+                    attempts=len(active) + len(failed),
+                    retries=sum(a.retries for a in active + failed),
+                    hedged=any(a.is_hedge for a in active + failed)
+                )
+                _served_by.set((winner.provider.name, winner.provider.model))
+                return winner
+    
+    def preload(self) -> None:
+        """Warm up every provider in the pool (loads local models such as Ollama's)"""
+        for provider in self.providers:
+            try:
+                provider.preload()
+            except Exception as e:
+                print(f"Could not preload {provider.name}: {str(e)}")
+    
+    def provider_health(self) -> List[Dict[str, Any]]:
+        """Health and latency of each provider in failover order"""
+        return [provider.health() for provider in self.providers]
+    
+    def _build_messages(self, prompt: str, system_prompt: str = None) -> List[Dict[str, str]]:
+        """Build the chat messages list"""
         messages = []
         
         if system_prompt:
@@ -67,17 +523,7 @@ class LLMHandler:
             "content": prompt
         })
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            
-            return response.choices[0].message.content
-        except Exception as e:
-            raise Exception(f"Error generating text with {self.provider}: {str(e)}")
+        return messages
     
     def generate_with_context(
         self,
@@ -85,7 +531,8 @@ class LLMHandler:
         context_chunks: List[Dict[str, Any]],
         system_prompt: str,
         temperature: float = None,
-        max_tokens: int = None
+        max_tokens: int = None,
+        json_schema: Dict[str, Any] = None
     ) -> str:
         """
         Generate text with RAG context.
@@ -96,15 +543,50 @@ class LLMHandler:
             system_prompt: System prompt
             temperature: Sampling temperature
             max_tokens: Maximum tokens
+            json_schema: JSON schema the response must follow (see generate)
             
         Returns:
             Generated text
         """
-        # Format context
-        context_text = self._format_context(context_chunks)
+        return self.generate(
+            prompt=self._context_prompt(query, context_chunks),
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            json_schema=json_schema
+        )
+    
+    def generate_with_context_stream(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        system_prompt: str,
+        temperature: float = None,
+        max_tokens: int = None,
+        json_schema: Dict[str, Any] = None
+    ) -> Iterator[str]:
+        """
+        Stream text with RAG context (see generate_with_context and generate_stream).
         
-        # Create prompt with context
-        full_prompt = f"""Context from documentation:
+        Returns:
+            Iterator of generated text fragments
+        """
+        return self.generate_stream(
+            prompt=self._context_prompt(query, context_chunks),
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            json_schema=json_schema
+        )
+    
+    def _context_prompt(self, query: str, context_chunks: List[Dict[str, Any]]) -> str:
+        """Build the user prompt that grounds a query in the retrieved chunks"""
+        with span("llm.build_prompt", chunks=len(context_chunks)) as prompt_span:
+            # Format context
+            context_text = self._format_context(context_chunks)
+            
+            # Create prompt with context
+            full_prompt = f"""Context from documentation:
 
 {context_text}
 
@@ -113,13 +595,10 @@ class LLMHandler:
 User Query: {query}
 
 Based STRICTLY on the provided context above, generate your response. Do not include any information that is not explicitly mentioned in the context."""
+            
+            prompt_span.set(chars=len(full_prompt))
         
-        return self.generate(
-            prompt=full_prompt,
-            system_prompt=system_prompt,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+        return full_prompt
     
     def _format_context(self, context_chunks: List[Dict[str, Any]]) -> str:
         """Format context chunks into a readable string"""
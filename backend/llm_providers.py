@@ -0,0 +1,797 @@
+"""
+LLM provider pool with latency tracking, circuit breakers and rate limiting.
+
+Each provider streams chat completions, through an OpenAI-compatible client
+or, for Ollama, its native API. LLMHandler walks the pool in
+order, skipping providers whose breaker is open, and uses the latency
+percentiles to decide when to hedge a slow request. Requests to a provider are
+paced by its AdaptiveRateLimiter and transient errors are retried with
+jittered exponential backoff.
+"""
+
+import re
+import json
+import time
+import random
+import threading
+from collections import deque, namedtuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import openai
+
+from backend.config import Config
+from backend import metrics
+
+
+class LatencyTracker:
+    """Rolling window of request latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """Latency at quantile q (0-1), or None with fewer than min_samples samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """
+    Skip a provider after consecutive failures.
+
+    closed: requests flow. open: requests are refused until the cooldown
+    expires. half_open: one probe request is let through; its outcome closes
+    or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = None, cooldown_s: float = None):
+        self.failure_threshold = failure_threshold or Config.LLM_BREAKER_FAILURES
+        self.cooldown_s = Config.LLM_BREAKER_COOLDOWN_S if cooldown_s is None else cooldown_s
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_s:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe whose request was cancelled"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+# Token counts of one response (same fields as the OpenAI usage object)
+Usage = namedtuple("Usage", ["prompt_tokens", "completion_tokens"])
+
+
+class DeadlineExceeded(Exception):
+    """A request's deadline passed before it could complete"""
+
+
+# Providers whose x-ratelimit-*-requests headers count requests per day
+# (token headers are always per minute). Those are not paced, only paused
+# when the day's quota runs out.
+DAILY_REQUEST_LIMITS = {"groq"}
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """Seconds from a rate-limit header value ("2", "1.5s", "6m0s", "20ms")"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def retry_after(headers: Any) -> Optional[float]:
+    """Seconds the provider asked us to wait, from Retry-After style headers"""
+    if not headers:
+        return None
+    if headers.get("retry-after-ms") is not None:
+        delay = parse_duration(headers.get("retry-after-ms"))
+        return delay / 1000.0 if delay is not None else None
+    delay = parse_duration(headers.get("retry-after"))
+    if delay is not None:
+        return delay
+    resets = [
+        parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+        for kind in ("requests", "tokens")
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0"
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status of a provider error, if it has one"""
+    return getattr(error, "status_code", None)
+
+
+def error_headers(error: Exception) -> Any:
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying"""
+    status = error_status(error)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return isinstance(error, (openai.APIConnectionError, httpx.TransportError))
+
+
+def backoff_delay(retry: int, hint: Optional[float] = None) -> float:
+    """
+    Seconds to wait before retry number `retry` (0-based).
+
+    Full jitter: a uniform draw up to the exponential cap, so clients that
+    failed together do not retry together. A Retry-After hint is a floor.
+    """
+    cap = min(Config.LLM_RETRY_MAX_DELAY_MS, Config.LLM_RETRY_BASE_DELAY_MS * 2 ** retry) / 1000.0
+    delay = random.uniform(0, cap)
+    return max(delay, hint) if hint is not None else delay
+
+
+class AdaptiveRateLimiter:
+    """
+    Pace requests and tokens per minute for one provider.
+
+    Limits start from config (0 = unknown) and are learned from the
+    x-ratelimit-* response headers, or from the request rate that drew a 429
+    when the provider sends none. Capacity refills continuously at
+    LLM_RATE_TARGET_UTILIZATION of the limit with at most LLM_RATE_BURST_S
+    worth banked, so batches run just under the quota instead of bursting
+    into it. A 429 pauses the provider until its Retry-After and halves the
+    pace; each success restores a step of it.
+    """
+
+    KINDS = ("requests", "tokens")
+
+    # Requests in the last minute needed before a 429 is read as a rate limit
+    # (fewer means the quota is shared or exhausted; Retry-After covers that)
+    MIN_INFERENCE_REQUESTS = 10
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0):
+        self.name = name
+        self.limits = {"requests": float(rpm or 0), "tokens": float(tpm or 0)}
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.rate_limited = 0
+        self._levels: Dict[str, Optional[float]] = {"requests": None, "tokens": None}
+        self._updated = time.monotonic()
+        self._recent: deque = deque()
+        self._cond = threading.Condition()
+
+    def _rate(self, kind: str) -> float:
+        """Refill rate in units per second (0 = unlimited)"""
+        return self.limits[kind] * Config.LLM_RATE_TARGET_UTILIZATION * self.scale / 60.0
+
+    def _capacity(self, kind: str) -> float:
+        return max(self._rate(kind) * Config.LLM_RATE_BURST_S, 1.0)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        for kind in self.KINDS:
+            if not self.limits[kind]:
+                self._levels[kind] = None
+            elif self._levels[kind] is None:
+                self._levels[kind] = self._capacity(kind)
+            else:
+                self._levels[kind] = min(self._levels[kind] + elapsed * self._rate(kind), self._capacity(kind))
+
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+
+    def _wait_time(self, costs: Dict[str, float], now: float) -> float:
+        wait = self.paused_until - now
+        for kind, cost in costs.items():
+            level = self._levels[kind]
+            if level is None:
+                continue
+            # A request larger than the bucket goes through once the bucket is full
+            needed = min(cost, self._capacity(kind))
+            if level < needed:
+                wait = max(wait, (needed - level) / self._rate(kind))
+        return wait
+
+    def acquire(
+        self,
+        tokens: int,
+        deadline: Optional[float] = None,
+        cancelled: threading.Event = None
+    ) -> bool:
+        """
+        Wait until one request of about `tokens` tokens fits the limits.
+
+        Args:
+            tokens: Estimated prompt plus completion tokens
+            deadline: time.monotonic() by which the request must have started
+            cancelled: Event that abandons the wait when set
+
+        Returns:
+            True once capacity is reserved, False if cancelled while waiting
+
+        Raises:
+            DeadlineExceeded: If capacity would not free up before the deadline
+        """
+        costs = {"requests": 1.0, "tokens": float(tokens)}
+        start = time.monotonic()
+
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        return False
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(costs, now)
+                    if wait <= 0:
+                        for kind, cost in costs.items():
+                            if self._levels[kind] is not None:
+                                self._levels[kind] -= cost
+                        self._recent.append(now)
+                        if now > start:
+                            metrics.LLM_RATE_LIMIT_WAIT_SECONDS.labels(self.name).observe(now - start)
+                        return True
+                    if deadline is not None and now + wait > deadline:
+                        raise DeadlineExceeded(
+                            f"{self.name} rate limit would delay the request past its deadline "
+                            f"(needs {wait:.1f}s, {max(deadline - now, 0):.1f}s left)"
+                        )
+                    # Wake up periodically to notice cancellation
+                    self._cond.wait(min(wait, 0.5) if cancelled is not None else wait)
+            finally:
+                self.waiting -= 1
+
+    def settle(self, reserved_tokens: int, used_tokens: Optional[int]) -> None:
+        """Give back the unused part of a token reservation"""
+        if used_tokens is None:
+            return
+        with self._cond:
+            if self._levels["tokens"] is not None:
+                self._levels["tokens"] = min(
+                    self._levels["tokens"] + reserved_tokens - used_tokens, self._capacity("tokens")
+                )
+                self._cond.notify_all()
+
+    def observe_headers(self, headers: Any) -> None:
+        """Learn limits and remaining capacity from x-ratelimit-* response headers"""
+        if not headers:
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            for kind in self.KINDS:
+                limit = parse_duration(headers.get(f"x-ratelimit-limit-{kind}"))
+                remaining = parse_duration(headers.get(f"x-ratelimit-remaining-{kind}"))
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+
+                if kind == "requests" and self.name in DAILY_REQUEST_LIMITS:
+                    limit = None
+                elif limit:
+                    self.limits[kind] = limit
+                    self._refill(now)
+
+                if remaining is None:
+                    continue
+                if remaining <= 0 and reset:
+                    self.paused_until = max(self.paused_until, now + reset)
+                elif self._levels[kind] is not None and limit:
+                    # Other clients share the quota: never bank more than the
+                    # provider says is left, minus the headroom we keep
+                    headroom = limit * (1 - Config.LLM_RATE_TARGET_UTILIZATION)
+                    self._levels[kind] = min(self._levels[kind], max(remaining - headroom, 0.0))
+
+    def record_rate_limited(self, delay: Optional[float]) -> None:
+        """React to a 429: pause, learn a limit if none is known, and slow down"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, now + (delay or Config.LLM_RETRY_BASE_DELAY_MS / 1000.0))
+            if not self.limits["requests"] and len(self._recent) >= self.MIN_INFERENCE_REQUESTS:
+                self.limits["requests"] = float(len(self._recent))
+            self.scale = max(self.scale * 0.5, 0.05)
+            for kind in self.KINDS:
+                if self._levels[kind] is not None:
+                    self._levels[kind] = min(self._levels[kind], 0.0)
+
+    def record_success(self) -> None:
+        with self._cond:
+            if self.scale < 1.0:
+                self._refill(time.monotonic())
+                self.scale = min(self.scale + 0.05, 1.0)
+                self._cond.notify_all()
+
+    def state(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "rpm_limit": self.limits["requests"] or None,
+                "tpm_limit": self.limits["tokens"] or None,
+                "pace": round(self.scale, 3),
+                "paused_for_s": round(max(self.paused_until - time.monotonic(), 0.0), 3),
+                "waiting": self.waiting,
+                "rate_limited": self.rate_limited
+            }
+
+
+# OpenAI models that accept response_format={"type": "json_schema"}
+_JSON_SCHEMA_MODELS = re.compile(r"^(gpt-4o|gpt-4\.1|gpt-5|o\d)")
+
+
+# Next weaker structured output mode, used when the API rejects one
+WEAKER_STRUCTURED_OUTPUT = {"json_schema": "json_object", "json_object": "off"}
+
+# Rejections of a mode in a row before a provider stops using it for every request
+STRUCTURED_OUTPUT_MAX_REJECTIONS = 3
+
+_FORMAT_ERROR_RE = re.compile(r"response_format|json_schema|json_object|\bformat\b|structured output", re.IGNORECASE)
+
+
+def is_format_error(error: Exception) -> bool:
+    """Whether a 400 is about the requested response format rather than the prompt or parameters"""
+    if getattr(error, "param", None) in ("response_format", "format"):
+        return True
+    return _FORMAT_ERROR_RE.search(str(error)) is not None
+
+
+def structured_output_mode(name: str, model: str) -> str:
+    """
+    How a provider can constrain output to a JSON schema.
+
+    "json_schema" enforces the schema itself, "json_object" (JSON mode) only
+    guarantees valid JSON, "off" relies on the prompt alone.
+    """
+    mode = Config.LLM_STRUCTURED_OUTPUT
+    if mode != "auto":
+        return mode
+    if name == "ollama" or (name == "openai" and _JSON_SCHEMA_MODELS.match(model)):
+        return "json_schema"
+    return "json_object"
+
+
+class _OpenAIChatStream:
+    """Chat completion stream from an OpenAI-compatible API"""
+
+    timings = None
+
+    def __init__(self, response: Any):
+        self.headers = response.headers
+        self._stream = response.parse()
+
+    def __iter__(self) -> Iterator[Tuple[Optional[str], Any]]:
+        for chunk in self._stream:
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            yield content, getattr(chunk, "usage", None)
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class LLMProvider:
+    """
+    One OpenAI-compatible provider with its health state.
+
+    The client's own retries are disabled: retries go through the rate
+    limiter so 429s are seen and paced rather than retried blindly.
+    """
+
+    def __init__(self, name: str):
+        config = Config.get_llm_config(name)
+        self.name = config["provider"]
+        self.model = config["model"]
+
+        if self.name == "openai":
+            self.client = openai.OpenAI(
+                api_key=config["api_key"],
+                timeout=Config.LLM_REQUEST_TIMEOUT_S,
+                max_retries=0
+            )
+        elif self.name == "groq":
+            self.client = openai.OpenAI(
+                api_key=config["api_key"],
+                base_url="https://api.groq.com/openai/v1",
+                timeout=Config.LLM_REQUEST_TIMEOUT_S,
+                max_retries=0
+            )
+        elif self.name == "ollama":
+            self.client = openai.OpenAI(
+                api_key="ollama",  # Ollama doesn't require API key
+                base_url=f"{config['base_url']}/v1",
+                timeout=Config.LLM_REQUEST_TIMEOUT_S,
+                max_retries=0
+            )
+        elif self.name == "mock":
+            self.client = openai.OpenAI(
+                api_key="mock",  # Local mock server (backend/mock_llm.py)
+                base_url=f"{config['base_url']}/v1",
+                timeout=Config.LLM_REQUEST_TIMEOUT_S,
+                max_retries=0
+            )
+
+        self.structured_output = structured_output_mode(self.name, self.model)
+        self.breaker = CircuitBreaker()
+        self.rate_limiter = AdaptiveRateLimiter(self.name, config.get("rpm", 0), config.get("tpm", 0))
+        self.latency = LatencyTracker()
+        self.ttft = LatencyTracker()
+        self.requests = 0
+        self.failures = 0
+        self._format_rejections: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def response_format(
+        self,
+        json_schema: Optional[Dict[str, Any]],
+        structured_output: str = None
+    ) -> Optional[Dict[str, Any]]:
+        """OpenAI response_format constraining output to `json_schema`, if supported"""
+        mode = structured_output or self.structured_output
+        if json_schema is None or mode == "off":
+            return None
+        if mode == "json_schema":
+            return {
+                "type": "json_schema",
+                "json_schema": {"name": json_schema.get("title", "response"), "schema": json_schema}
+            }
+        return {"type": "json_object"}
+
+    def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        timeout: float = None,
+        json_schema: Dict[str, Any] = None,
+        structured_output: str = None
+    ) -> Any:
+        """
+        Start a streamed chat completion.
+
+        Args:
+            json_schema: Constrain the response to this schema where the
+                provider supports it (see structured_output_mode)
+            structured_output: Mode for this request instead of the provider's
+
+        Returns:
+            Stream with `headers` and `timings`, iterating (content, usage)
+            pairs; close() stops generation
+        """
+        client = self.client if timeout is None else self.client.with_options(timeout=timeout)
+        options = {}
+        response_format = self.response_format(json_schema, structured_output)
+        if response_format:
+            options["response_format"] = response_format
+        response = client.chat.completions.with_raw_response.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            extra_body={"stream_options": {"include_usage": True}},
+            **options
+        )
+        return _OpenAIChatStream(response)
+
+    def preload(self) -> None:
+        """Warm the provider up before the first request (nothing to do for hosted APIs)"""
+
+    def record_success(self, latency_s: float, ttft_s: Optional[float]) -> None:
+        with self._lock:
+            self.requests += 1
+        self.latency.observe(latency_s)
+        if ttft_s is not None:
+            self.ttft.observe(ttft_s)
+        self.breaker.record_success()
+        metrics.LLM_CIRCUIT_OPEN.labels(self.name).set(0)
+
+    def structured_output_rejected(self, mode: str) -> str:
+        """
+        Record that the API rejected response format `mode` for a request.
+
+        Only STRUCTURED_OUTPUT_MAX_REJECTIONS rejections in a row downgrade
+        the provider itself, so one odd request does not turn structured
+        output off for every later one.
+
+        Returns:
+            The next weaker mode, for retrying the rejected request
+        """
+        weaker = WEAKER_STRUCTURED_OUTPUT[mode]
+        metrics.LLM_STRUCTURED_OUTPUT_FALLBACKS_TOTAL.labels(self.name, mode).inc()
+        with self._lock:
+            self._format_rejections[mode] = self._format_rejections.get(mode, 0) + 1
+            if self._format_rejections[mode] >= STRUCTURED_OUTPUT_MAX_REJECTIONS and self.structured_output == mode:
+                print(f"{self.name} keeps rejecting {mode} output, using {weaker} from now on")
+                self.structured_output = weaker
+        return weaker
+
+    def structured_output_accepted(self, mode: str) -> None:
+        with self._lock:
+            self._format_rejections.pop(mode, None)
+
+    def record_failure(self, trip_breaker: bool = True) -> None:
+        """
+        Record a failed request.
+
+        Args:
+            trip_breaker: False for rate limiting, which the limiter handles;
+                the provider itself is healthy
+        """
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+        if not trip_breaker:
+            self.breaker.release_probe()
+            return
+        self.breaker.record_failure()
+        metrics.LLM_CIRCUIT_OPEN.labels(self.name).set(1 if self.breaker.state == "open" else 0)
+
+    def hedge_delay(self, first_token: bool = False) -> float:
+        """Seconds to wait before hedging a request to this provider"""
+        tracker = self.ttft if first_token else self.latency
+        delay = tracker.percentile(Config.LLM_HEDGE_PERCENTILE, Config.LLM_HEDGE_MIN_SAMPLES)
+        return delay if delay is not None else Config.LLM_HEDGE_DEFAULT_DELAY_MS / 1000.0
+
+    def health(self) -> Dict[str, Any]:
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            "provider": self.name,
+            "model": self.model,
+            "state": self.breaker.state,
+            "structured_output": self.structured_output,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_p50_ms": ms(self.latency.percentile(0.5)),
+            "latency_p95_ms": ms(self.latency.percentile(0.95)),
+            "ttft_p95_ms": ms(self.ttft.percentile(0.95)),
+            "samples": len(self.latency),
+            "rate_limit": self.rate_limiter.state()
+        }
+
+
+class OllamaError(Exception):
+    """Error response from the Ollama API"""
+
+    def __init__(self, message: str, status_code: int = None, response: Any = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+class _OllamaChatStream:
+    """Newline-delimited JSON stream from Ollama's /api/chat"""
+
+    def __init__(self, provider: "OllamaProvider", response: httpx.Response):
+        self.provider = provider
+        self.headers = response.headers
+        self.timings: Optional[Dict[str, Any]] = None
+        self._response = response
+
+    def __iter__(self) -> Iterator[Tuple[Optional[str], Any]]:
+        for line in self._response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise OllamaError(f"Ollama error: {chunk['error']}")
+
+            if not chunk.get("done"):
+                yield (chunk.get("message") or {}).get("content"), None
+                continue
+
+            self.timings = self.provider.record_timings(chunk)
+            yield None, Usage(chunk.get("prompt_eval_count") or 0, chunk.get("eval_count") or 0)
+
+    def close(self) -> None:
+        # Closing the connection stops generation on the server
+        self._response.close()
+
+
+class OllamaProvider(LLMProvider):
+    """
+    Ollama through its native API instead of the /v1 shim.
+
+    Every request carries the same keep_alive and num_ctx, so the model stays
+    resident between requests and is never reloaded for a different context
+    size. preload() loads it with those settings before the first request.
+    """
+
+    def __init__(self, name: str = "ollama"):
+        super().__init__(name)
+        self.base_url = Config.OLLAMA_BASE_URL.rstrip("/")
+        self.http = httpx.Client(base_url=self.base_url, timeout=Config.LLM_REQUEST_TIMEOUT_S)
+        self.preloaded = False
+        self.last_timings: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def keep_alive() -> Any:
+        """OLLAMA_KEEP_ALIVE as Ollama expects it: a duration string or seconds (-1 = forever)"""
+        value = Config.OLLAMA_KEEP_ALIVE.strip()
+        return int(value) if value.lstrip("-").isdigit() else value
+
+    def options(self, temperature: float = None, max_tokens: int = None) -> Dict[str, Any]:
+        options = {}
+        if Config.OLLAMA_NUM_CTX:
+            options["num_ctx"] = Config.OLLAMA_NUM_CTX
+        num_predict = Config.OLLAMA_NUM_PREDICT or max_tokens
+        if num_predict:
+            options["num_predict"] = num_predict
+        if temperature is not None:
+            options["temperature"] = temperature
+        return options
+
+    def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        timeout: float = None,
+        json_schema: Dict[str, Any] = None,
+        structured_output: str = None
+    ) -> _OllamaChatStream:
+        body = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": self.keep_alive(),
+            "options": self.options(temperature, max_tokens)
+        }
+        mode = structured_output or self.structured_output
+        if json_schema is not None and mode != "off":
+            body["format"] = json_schema if mode == "json_schema" else "json"
+
+        request = self.http.build_request(
+            "POST",
+            "/api/chat",
+            json=body,
+            timeout=timeout or Config.LLM_REQUEST_TIMEOUT_S
+        )
+        response = self.http.send(request, stream=True)
+        if response.status_code >= 400:
+            response.read()
+            response.close()
+            raise OllamaError(
+                f"Ollama error ({response.status_code}): {response.text}",
+                status_code=response.status_code,
+                response=response
+            )
+        return _OllamaChatStream(self, response)
+
+    def preload(self) -> None:
+        """Load the model with the request-time context size and keep it resident"""
+        response = self.http.post(
+            "/api/generate",
+            json={
+                "model": self.model,
+                "stream": False,
+                "keep_alive": self.keep_alive(),
+                "options": self.options()
+            },
+            timeout=Config.OLLAMA_PRELOAD_TIMEOUT_S
+        )
+        if response.status_code >= 400:
+            raise OllamaError(
+                f"Ollama error ({response.status_code}): {response.text}",
+                status_code=response.status_code,
+                response=response
+            )
+        self.record_timings(response.json())
+        self.preloaded = True
+
+    def record_timings(self, final_chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the load / prompt-eval / eval split Ollama reports in nanoseconds"""
+        phases = {
+            "load": final_chunk.get("load_duration") or 0,
+            "prompt_eval": final_chunk.get("prompt_eval_duration") or 0,
+            "eval": final_chunk.get("eval_duration") or 0
+        }
+        for phase, nanoseconds in phases.items():
+            metrics.LLM_PHASE_SECONDS.labels(self.name, phase).observe(nanoseconds / 1e9)
+
+        eval_count = final_chunk.get("eval_count") or 0
+        timings = {
+            "load_ms": round(phases["load"] / 1e6, 1),
+            "prompt_eval_ms": round(phases["prompt_eval"] / 1e6, 1),
+            "eval_ms": round(phases["eval"] / 1e6, 1),
+            "total_ms": round((final_chunk.get("total_duration") or 0) / 1e6, 1),
+            "prompt_eval_tokens": final_chunk.get("prompt_eval_count") or 0,
+            "eval_tokens": eval_count,
+            "eval_tokens_per_s": round(eval_count / (phases["eval"] / 1e9), 1) if phases["eval"] else None
+        }
+        self.last_timings = timings
+        return timings
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            **super().health(),
+            "api": "native",
+            "keep_alive": self.keep_alive(),
+            "num_ctx": Config.OLLAMA_NUM_CTX or None,
+            "preloaded": self.preloaded,
+            "last_timings": self.last_timings
+        }
+
+
+class HedgeBudget:
+    """Allow hedges for at most a fraction of requests"""
+
+    def __init__(self, fraction: float = None):
+        self.fraction = Config.LLM_HEDGE_BUDGET if fraction is None else fraction
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.fraction * self.requests + 1:
+                return False
+            self.hedges += 1
+            return True
+
+
+def build_provider(name: str) -> LLMProvider:
+    if name == "ollama" and Config.OLLAMA_API == "native":
+        return OllamaProvider(name)
+    return LLMProvider(name)
+
+
+def build_provider_pool(names: List[str] = None) -> List[LLMProvider]:
+    """Create providers in failover order"""
+    return [build_provider(name) for name in (names or Config.get_llm_providers())]
@@ -4,21 +4,38 @@ Provides endpoints for document ingestion, test case generation, and script gene
 """
 
 import os
+import json
+import time
+import queue
 import shutil
-from typing import List, Optional
+import hashlib
+import tempfile
+import threading
+import contextvars
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
 from pathlib import Path
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 from backend.config import Config
 from backend.document_processor import DocumentProcessor
-from backend.vector_db import VectorDatabase
-from backend.llm_handler import LLMHandler
+from backend.vector_db import load_embedding_model
+from backend.dedup import TestCaseDeduplicator
+from backend.knowledge_bases import DEFAULT_PROJECT, KnowledgeBaseManager
+from backend.llm_handler import LLMHandler, served_by
+from backend.artifact_store import ArtifactStore, request_key
 from backend.test_case_agent import TestCaseAgent
 from backend.selenium_agent import SeleniumScriptAgent
+from backend.suite_bundler import bundle_scripts
+from backend import metrics
+from backend.profiling import ProfileStore, profile_request, span
 
 
 # Initialize FastAPI app
@@ -37,21 +54,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def track_in_flight_requests(request: Request, call_next):
+    """Track the number of requests currently being served"""
+    with metrics.HTTP_REQUESTS_IN_FLIGHT.track_inprogress():
+        return await call_next(request)
+
 # Initialize components
-vector_db = VectorDatabase()
+if Config.EMBEDDING_SERVICE_MODE == "remote":
+    from backend.embedding_service import EmbeddingServiceTransport, RemoteVectorDatabase
+    embedding_transport = EmbeddingServiceTransport()
+    knowledge_bases = KnowledgeBaseManager(
+        factory=lambda project_id: RemoteVectorDatabase(project_id, transport=embedding_transport)
+    )
+else:
+    # Load the model at import so preloaded workers share it
+    knowledge_bases = KnowledgeBaseManager(embedding_model=load_embedding_model())
 llm_handler = LLMHandler()
-test_case_agent = TestCaseAgent(vector_db, llm_handler)
-selenium_agent = SeleniumScriptAgent(vector_db, llm_handler)
+profile_store = ProfileStore(Config.PROFILE_HISTORY)
+artifact_store = ArtifactStore()
+rebuild_locks = defaultdict(threading.Lock)
+
+
+@app.on_event("startup")
+async def preload_llm():
+    """Load local models in the background so the first request is not a cold start"""
+    if Config.OLLAMA_PRELOAD:
+        threading.Thread(target=llm_handler.preload, name="llm-preload", daemon=True).start()
+
 
 # Pydantic models
 class TestCaseRequest(BaseModel):
     query: str
     top_k: Optional[int] = 5
+    regenerate: bool = False
+
+
+class TestPlanRequest(BaseModel):
+    features: Optional[List[str]] = None
+    max_features: Optional[int] = None
+    regenerate: bool = False
+
+
+class DedupRequest(BaseModel):
+    test_cases: List[dict]
+    threshold: Optional[float] = None
 
 
 class ScriptGenerationRequest(BaseModel):
     test_case: dict
     html_content: Optional[str] = None
+    test_case_id: Optional[int] = None
+    regenerate: bool = False
+    repair_selectors: Optional[bool] = None
+
+
+class ScriptBatchRequest(BaseModel):
+    test_cases: List[dict]
+    html_content: Optional[str] = None
+    regenerate: bool = False
+    repair_selectors: Optional[bool] = None
+    batch_size: Optional[int] = None
+
+
+class TestSuitePipelineRequest(BaseModel):
+    query: str
+    top_k: Optional[int] = 5
+    html_content: Optional[str] = None
+    regenerate: bool = False
+    repair_selectors: Optional[bool] = None
+    concurrency: Optional[int] = None
+
+
+class SelectorCheckRequest(BaseModel):
+    scripts: List[str]
+    html_content: str
+    repair: bool = False
+
+
+class SuiteBundleRequest(BaseModel):
+    scripts: Optional[Dict[str, str]] = None
+    shards: int = 1
 
 
 class StatusResponse(BaseModel):
@@ -60,6 +144,85 @@ class StatusResponse(BaseModel):
     details: Optional[dict] = None
 
 
+def _profiling_requested(profile: bool, x_profile: Optional[str]) -> bool:
+    """Profiling is enabled by ?profile=1 or an X-Profile: 1 header"""
+    return profile or (x_profile or "").lower() in ("1", "true", "yes")
+
+
+def _validate_project_id(project_id: str) -> str:
+    """Reject invalid project IDs with a 400"""
+    try:
+        return KnowledgeBaseManager.validate_project_id(project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _knowledge_base(project_id: str):
+    """Open a project's knowledge base"""
+    return knowledge_bases.get(_validate_project_id(project_id))
+
+
+def _require_documents(knowledge_base) -> None:
+    """Reject generation requests against an empty knowledge base"""
+    stats = knowledge_base.get_collection_stats()
+    if not stats.get("exists") or stats.get("count", 0) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Knowledge base is empty. Please build the knowledge base first."
+        )
+
+
+def _find_generation(project_id: str, kind: str, stored_request: dict, kb_version: str, regenerate: bool) -> tuple:
+    """
+    Look up a stored generation of the same request against the same knowledge base.
+    
+    Returns:
+        Tuple of (knowledge-base revision, generation or None)
+    """
+    kb_revision = artifact_store.kb_revision(project_id)
+    if regenerate:
+        return kb_revision, None
+    with span("artifact_store.lookup", kind=kind):
+        generation = artifact_store.find_generation(
+            project_id, kind, request_key(kind, **stored_request), kb_version, kb_revision
+        )
+    return kb_revision, generation
+
+
+def _provenance(provenance: dict, kb_version: str, kb_revision: int, start_time: float, result: dict = None) -> dict:
+    """Provenance of a generation (an agent's prompts and context), as stored with its artifacts"""
+    provider, model = served_by() or (llm_handler.provider, llm_handler.model)
+    return {
+        **provenance,
+        "result": result,
+        "kb_version": kb_version,
+        "kb_revision": kb_revision,
+        "provider": provider,
+        "model": model,
+        "seconds": round(time.perf_counter() - start_time, 3)
+    }
+
+
+def _validate_script(selenium_agent, script: str, html_content: Optional[str], repair: Optional[bool]) -> tuple:
+    """
+    Check a generated script's syntax and, given the page, its locators.
+    
+    Returns:
+        Tuple of (script, with unresolved locators repaired if asked, validation)
+    """
+    with span("selenium.validate_syntax"):
+        validation = selenium_agent.validate_script_syntax(script)
+    
+    # Resolve locators against the page (repairing unresolved ones if asked)
+    if Config.SELENIUM_CHECK_SELECTORS and html_content and validation["valid"]:
+        if repair is None:
+            repair = Config.SELENIUM_REPAIR_SELECTORS
+        with span("selenium.check_selectors"):
+            script, validation["selectors"] = selenium_agent.check_selectors(script, html_content, repair=repair)
+    
+    return script, validation
+
+
 # API Endpoints
 
 @app.get("/")
@@ -74,8 +237,15 @@ async def root():
             "build_kb": "/build-knowledge-base",
             "generate_tests": "/generate-test-cases",
             "generate_script": "/generate-selenium-script",
+            "generate_scripts": "/generate-selenium-scripts",
+            "generate_suite_stream": "/generate-test-suite/stream",
+            "check_selectors": "/check-selectors",
+            "bundle_suite": "/bundle-test-suite",
             "suggestions": "/test-suggestions",
-            "stats": "/knowledge-base/stats"
+            "stats": "/knowledge-base/stats",
+            "knowledge_bases": "/knowledge-bases",
+            "llm_providers": "/llm/providers",
+            "metrics": "/metrics"
         }
     }
 
@@ -88,11 +258,12 @@ async def health_check():
         Config.validate_config()
         
         # Check vector DB
-        stats = vector_db.get_collection_stats()
+        stats = knowledge_bases.get(DEFAULT_PROJECT).get_collection_stats()
         
         return {
             "status": "healthy",
-            "llm_provider": Config.LLM_PROVIDER,
+            "llm_provider": llm_handler.provider,
+            "llm_providers": [p["provider"] for p in llm_handler.provider_health() if p["state"] != "open"],
             "vector_db": {
                 "connected": True,
                 "documents": stats.get("count", 0)
@@ -108,13 +279,33 @@ async def health_check():
         )
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics endpoint"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/llm/providers")
+async def llm_providers():
+    """
+    Health of the LLM provider pool in failover order: circuit breaker state,
+    failure counts and latency percentiles used for hedging.
+    """
+    return {
+        "status": "success",
+        "hedging": Config.LLM_HEDGE_ENABLED and len(llm_handler.providers) > 1,
+        "providers": llm_handler.provider_health()
+    }
+
+
 @app.post("/upload")
-async def upload_documents(files: List[UploadFile] = File(...)):
+async def upload_documents(files: List[UploadFile] = File(...), project_id: str = DEFAULT_PROJECT):
     """
-    Upload support documents.
+    Upload support documents to a project.
     Accepts: .txt, .md, .json, .pdf, .html files
     """
     try:
+        upload_dir = knowledge_bases.upload_dir(_validate_project_id(project_id))
         uploaded_files = []
         
         for file in files:
@@ -127,7 +318,7 @@ async def upload_documents(files: List[UploadFile] = File(...)):
                 )
             
             # Save file
-            file_path = os.path.join(Config.UPLOAD_DIR, file.filename)
+            file_path = os.path.join(upload_dir, os.path.basename(file.filename))
             with open(file_path, "wb") as f:
                 content = await file.read()
                 if len(content) > Config.MAX_FILE_SIZE:
@@ -143,6 +334,8 @@ async def upload_documents(files: List[UploadFile] = File(...)):
                 "size": len(content)
             })
         
+        knowledge_bases.record_usage(project_id, "uploads", len(uploaded_files))
+        
         return StatusResponse(
             status="success",
             message=f"Successfully uploaded {len(uploaded_files)} file(s)",
@@ -155,24 +348,60 @@ async def upload_documents(files: List[UploadFile] = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _build_knowledge_base(knowledge_base, upload_dir: str, uploaded_files: List[str], reset: bool) -> tuple:
+    """
+    Process uploaded files and index them.
+    
+    With reset, documents are written to a shadow collection that is swapped
+    in atomically once complete; queries keep reading the previous version.
+    
+    Returns:
+        Tuple of (processed documents, number of chunks)
+    """
+    # Process documents
+    documents = []
+    for filename in uploaded_files:
+        file_path = os.path.join(upload_dir, filename)
+        try:
+            doc = DocumentProcessor.process_file(file_path)
+            documents.append(doc)
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+    
+    if not documents:
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to process any documents"
+        )
+    
+    if not reset:
+        # Add to the active collection
+        knowledge_base.create_collection()
+        return documents, knowledge_base.add_documents(documents)
+    
+    shadow_name = knowledge_base.begin_rebuild()
+    try:
+        num_chunks = knowledge_base.add_documents(documents, collection_name=shadow_name)
+    except Exception:
+        knowledge_base.abort_rebuild(shadow_name)
+        raise
+    
+    knowledge_base.commit_rebuild(shadow_name)
+    return documents, num_chunks
+
+
 @app.post("/build-knowledge-base")
-async def build_knowledge_base(reset: bool = False):
+async def build_knowledge_base(reset: bool = False, project_id: str = DEFAULT_PROJECT):
     """
-    Build knowledge base from uploaded documents.
-    Processes all files in the upload directory and creates vector embeddings.
+    Build a project's knowledge base from its uploaded documents.
+    Processes all files in the project's upload directory and creates vector embeddings.
+    With reset=true the rebuild is written to a shadow collection and swapped
+    in atomically, so queries are served from the previous version meanwhile.
     """
     try:
-        # Check if documents exist
-        if not os.path.exists(Config.UPLOAD_DIR):
-            raise HTTPException(
-                status_code=400,
-                detail="No documents uploaded. Please upload documents first."
-            )
-        
-        uploaded_files = [
-            f for f in os.listdir(Config.UPLOAD_DIR)
-            if Path(f).suffix.lower() in Config.ALLOWED_EXTENSIONS
-        ]
+        knowledge_base = _knowledge_base(project_id)
+        upload_dir = knowledge_bases.upload_dir(project_id)
+        uploaded_files = knowledge_bases.list_uploaded_files(project_id)
         
         if not uploaded_files:
             raise HTTPException(
@@ -180,35 +409,34 @@ async def build_knowledge_base(reset: bool = False):
                 detail="No valid documents found in upload directory."
             )
         
-        # Create or reset collection
-        vector_db.create_collection(reset=reset)
-        
-        # Process and add documents
-        documents = []
-        for filename in uploaded_files:
-            file_path = os.path.join(Config.UPLOAD_DIR, filename)
-            try:
-                doc = DocumentProcessor.process_file(file_path)
-                documents.append(doc)
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
-        
-        if not documents:
+        rebuild_lock = rebuild_locks[project_id]
+        if not rebuild_lock.acquire(blocking=False):
             raise HTTPException(
-                status_code=500,
-                detail="Failed to process any documents"
+                status_code=409,
+                detail=f"A knowledge base build is already running for project '{project_id}'."
             )
         
-        # Add to vector database
-        num_chunks = vector_db.add_documents(documents)
+        try:
+            # Run off the event loop so queries keep being served during the build
+            documents, num_chunks = await run_in_threadpool(
+                _build_knowledge_base, knowledge_base, upload_dir, uploaded_files, reset
+            )
+        finally:
+            rebuild_lock.release()
+        
+        artifact_store.bump_kb_revision(project_id)
+        knowledge_bases.record_usage(project_id, "builds")
+        knowledge_bases.record_usage(project_id, "chunks_indexed", num_chunks)
         
         return StatusResponse(
             status="success",
             message="Knowledge base built successfully",
             details={
+                "project_id": project_id,
                 "files_processed": len(documents),
                 "chunks_created": num_chunks,
-                "files": [doc["source"] for doc in documents]
+                "files": [doc["source"] for doc in documents],
+                "deduplication": knowledge_base.get_dedup_report()
             }
         )
     
@@ -218,32 +446,351 @@ async def build_knowledge_base(reset: bool = False):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/generate-test-cases")
-async def generate_test_cases(request: TestCaseRequest):
+def _validate_document_name(filename: str) -> str:
+    """Reject document names that are paths or have an unsupported extension"""
+    if not filename or filename != os.path.basename(filename) or filename.startswith("."):
+        raise HTTPException(status_code=400, detail=f"Invalid document name: {filename}")
+    
+    file_ext = Path(filename).suffix.lower()
+    if file_ext not in Config.ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {file_ext}. Allowed: {Config.ALLOWED_EXTENSIONS}"
+        )
+    return filename
+
+
+def _replace_document(knowledge_base, upload_dir: str, filename: str, content: bytes) -> dict:
     """
-    Generate test cases based on user query.
-    Uses RAG to retrieve relevant documentation and LLM to generate structured test cases.
+    Index a new version of one document, then move it into the upload directory.
+    
+    The file is processed from a staging directory, so the previous version
+    (file and chunks) stays in place if processing or embedding fails.
     """
+    staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=upload_dir)
     try:
-        # Check if knowledge base exists
-        stats = vector_db.get_collection_stats()
-        if not stats.get("exists") or stats.get("count", 0) == 0:
+        staged_path = os.path.join(staging_dir, filename)
+        with open(staged_path, "wb") as f:
+            f.write(content)
+        
+        file_path = os.path.join(upload_dir, filename)
+        document = DocumentProcessor.process_file(staged_path)
+        document["metadata"]["file_path"] = file_path
+        
+        result = knowledge_base.replace_document(document)
+        os.replace(staged_path, file_path)
+        return result
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+@app.get("/documents")
+async def list_documents(project_id: str = DEFAULT_PROJECT):
+    """
+    List a project's uploaded documents with their indexed chunk counts.
+    """
+    try:
+        chunk_counts = _knowledge_base(project_id).list_documents()
+        uploaded_files = knowledge_bases.list_uploaded_files(project_id)
+        
+        return {
+            "status": "success",
+            "project_id": project_id,
+            "documents": [
+                {
+                    "filename": filename,
+                    "uploaded": filename in uploaded_files,
+                    "chunks": chunk_counts.get(filename, 0)
+                }
+                for filename in sorted(set(uploaded_files) | set(chunk_counts))
+            ]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.put("/documents/{filename}")
+async def update_document(filename: str, file: UploadFile = File(...), project_id: str = DEFAULT_PROJECT):
+    """
+    Upload a new version of one document and re-index only its chunks.
+    Unchanged chunks keep their embeddings; if indexing fails the previous
+    version of the document stays in place.
+    """
+    try:
+        _validate_document_name(filename)
+        knowledge_base = _knowledge_base(project_id)
+        upload_dir = knowledge_bases.upload_dir(project_id)
+        
+        content = await file.read()
+        if len(content) > Config.MAX_FILE_SIZE:
             raise HTTPException(
                 status_code=400,
-                detail="Knowledge base is empty. Please build the knowledge base first."
+                detail=f"File {filename} exceeds maximum size of {Config.MAX_FILE_SIZE} bytes"
             )
         
-        # Generate test cases
+        # A running build would overwrite the change, so refuse rather than wait
+        rebuild_lock = rebuild_locks[project_id]
+        if not rebuild_lock.acquire(blocking=False):
+            raise HTTPException(
+                status_code=409,
+                detail=f"A knowledge base build is already running for project '{project_id}'."
+            )
+        
+        try:
+            result = await run_in_threadpool(_replace_document, knowledge_base, upload_dir, filename, content)
+        finally:
+            rebuild_lock.release()
+        
+        artifact_store.bump_kb_revision(project_id)
+        knowledge_bases.record_usage(project_id, "documents_updated")
+        knowledge_bases.record_usage(project_id, "chunks_indexed", result["chunks_embedded"])
+        
+        return StatusResponse(
+            status="success",
+            message=f"Document {filename} updated",
+            details={"project_id": project_id, **result}
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/documents/{filename}")
+async def delete_document(filename: str, project_id: str = DEFAULT_PROJECT):
+    """
+    Delete one document and its chunks from a project's knowledge base.
+    """
+    try:
+        _validate_document_name(filename)
+        knowledge_base = _knowledge_base(project_id)
+        file_path = os.path.join(knowledge_bases.upload_dir(project_id), filename)
+        
+        rebuild_lock = rebuild_locks[project_id]
+        if not rebuild_lock.acquire(blocking=False):
+            raise HTTPException(
+                status_code=409,
+                detail=f"A knowledge base build is already running for project '{project_id}'."
+            )
+        
+        try:
+            chunks_removed = await run_in_threadpool(knowledge_base.delete_document, filename)
+            file_existed = os.path.isfile(file_path)
+            if file_existed:
+                os.remove(file_path)
+        finally:
+            rebuild_lock.release()
+        
+        if not chunks_removed and not file_existed:
+            raise HTTPException(status_code=404, detail=f"Document {filename} not found")
+        
+        artifact_store.bump_kb_revision(project_id)
+        knowledge_bases.record_usage(project_id, "documents_deleted")
+        
+        return StatusResponse(
+            status="success",
+            message=f"Document {filename} deleted",
+            details={"project_id": project_id, "source": filename, "chunks_removed": chunks_removed}
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _generate_test_cases(knowledge_base, project_id: str, request: TestCaseRequest) -> tuple:
+    """
+    Reuse or generate and store the test cases of a query.
+    
+    Returns:
+        Tuple of (test cases, generation record, whether it was reused)
+    """
+    test_case_agent = TestCaseAgent(knowledge_base, llm_handler)
+    stored_request = {"query": request.query, "top_k": request.top_k}
+    
+    with knowledge_base.pin() as kb_version:
+        kb_revision, generation = _find_generation(
+            project_id, "test_cases", stored_request, kb_version, request.regenerate
+        )
+        if generation:
+            return artifact_store.generation_test_cases(generation["id"]), generation, True
+        
+        start_time = time.perf_counter()
         test_cases = test_case_agent.generate_test_cases(
             query=request.query,
             top_k=request.top_k
         )
+        generation = artifact_store.save_test_cases(
+            project_id, "test_cases", stored_request, test_cases,
+            _provenance(
+                test_case_agent.provenance, kb_version, kb_revision, start_time,
+                {"parse_report": test_case_agent.parse_report}
+            )
+        )
+        return test_cases, generation, False
+
+
+@app.post("/generate-test-cases")
+async def generate_test_cases(
+    request: TestCaseRequest,
+    project_id: str = DEFAULT_PROJECT,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None)
+):
+    """
+    Generate test cases based on user query.
+    Uses RAG to retrieve relevant documentation from the project's knowledge base
+    and LLM to generate structured test cases.
+    The test cases are stored; the same query against an unchanged knowledge
+    base returns them without calling the LLM unless regenerate is set.
+    Pass ?profile=1 (or X-Profile: 1) to include timed spans in the response.
+    """
+    try:
+        # Check if knowledge base exists
+        knowledge_base = _knowledge_base(project_id)
+        _require_documents(knowledge_base)
+        
+        # Generate test cases
+        with profile_request("generate_test_cases", _profiling_requested(profile, x_profile)) as profiler:
+            with span("generate_test_cases", top_k=request.top_k):
+                # Run in a worker thread with this request's context (profiling);
+                # rate limiting and retries block while waiting
+                context = contextvars.copy_context()
+                test_cases, generation, reused = await run_in_threadpool(
+                    context.run, _generate_test_cases, knowledge_base, project_id, request
+                )
+        
+        knowledge_bases.record_usage(project_id, "test_cases_reused" if reused else "test_case_generations")
+        
+        response = {
+            "status": "success",
+            "project_id": project_id,
+            "query": request.query,
+            "test_cases": test_cases,
+            "count": len(test_cases),
+            "parse_report": generation["result"].get("parse_report", {}),
+            "generation_id": generation["id"],
+            "reused": reused
+        }
+        
+        if profiler:
+            profile_store.add(profiler)
+            response["profile"] = profiler.to_dict()
+        
+        return response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _generate_test_plan(knowledge_base, project_id: str, request: TestPlanRequest) -> tuple:
+    """
+    Generate and store a test plan, or load the stored one.
+    
+    Returns:
+        Tuple of (test plan, generation record, whether it was reused)
+    """
+    test_case_agent = TestCaseAgent(knowledge_base, llm_handler)
+    stored_request = {"features": request.features, "max_features": request.max_features}
+    
+    with knowledge_base.pin() as kb_version:
+        kb_revision, generation = _find_generation(
+            project_id, "test_plan", stored_request, kb_version, request.regenerate
+        )
+        if generation:
+            test_cases = artifact_store.generation_test_cases(generation["id"])
+            return {**generation["result"], "test_cases": test_cases}, generation, True
+        
+        start_time = time.perf_counter()
+        test_plan = test_case_agent.generate_test_plan(
+            features=request.features,
+            max_features=request.max_features
+        )
+        summary = {key: value for key, value in test_plan.items() if key != "test_cases"}
+        generation = artifact_store.save_test_cases(
+            project_id, "test_plan", stored_request, test_plan["test_cases"],
+            _provenance(test_case_agent.provenance, kb_version, kb_revision, start_time, summary)
+        )
+        return test_plan, generation, False
+
+
+@app.post("/generate-test-plan")
+async def generate_test_plan(
+    request: TestPlanRequest,
+    project_id: str = DEFAULT_PROJECT,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None)
+):
+    """
+    Generate a test plan for a project.
+    Features are discovered from the knowledge base (or taken from the request)
+    and generated concurrently, one bounded-context generation per feature,
+    then merged, deduplicated and renumbered.
+    The plan is stored and reused like /generate-test-cases results.
+    Pass ?profile=1 (or X-Profile: 1) to include timed spans in the response.
+    """
+    try:
+        knowledge_base = _knowledge_base(project_id)
+        _require_documents(knowledge_base)
+        
+        with profile_request("generate_test_plan", _profiling_requested(profile, x_profile)) as profiler:
+            with span("generate_test_plan", features=len(request.features or [])):
+                # Run in a worker thread with this request's context (profiling)
+                context = contextvars.copy_context()
+                test_plan, generation, reused = await run_in_threadpool(
+                    context.run, _generate_test_plan, knowledge_base, project_id, request
+                )
+        
+        knowledge_bases.record_usage(project_id, "test_plans_reused" if reused else "test_plan_generations")
+        
+        response = {
+            "status": "success",
+            "project_id": project_id,
+            "test_plan": test_plan,
+            "generation_id": generation["id"],
+            "reused": reused
+        }
+        
+        if profiler:
+            profile_store.add(profiler)
+            response["profile"] = profiler.to_dict()
+        
+        return response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/deduplicate-test-cases")
+async def deduplicate_test_cases(request: DedupRequest, project_id: str = DEFAULT_PROJECT):
+    """
+    Merge semantically duplicate test cases.
+    Cases are embedded with the project's embedding model and clustered by
+    cosine similarity; kept cases list the cases they absorbed in merged_from.
+    """
+    try:
+        if request.threshold is not None and not 0 < request.threshold <= 1:
+            raise HTTPException(status_code=400, detail="threshold must be in (0, 1]")
+        
+        knowledge_base = _knowledge_base(project_id)
+        deduplicator = TestCaseDeduplicator(knowledge_base.embedding_model, request.threshold)
+        test_cases, report = await run_in_threadpool(deduplicator.deduplicate, request.test_cases)
         
         return {
             "status": "success",
-            "query": request.query,
+            "project_id": project_id,
             "test_cases": test_cases,
-            "count": len(test_cases)
+            "count": len(test_cases),
+            "dedup": report
         }
     
     except HTTPException:
@@ -252,35 +799,590 @@ async def generate_test_cases(request: TestCaseRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _generate_selenium_script(knowledge_base, project_id: str, request: ScriptGenerationRequest) -> tuple:
+    """
+    Reuse or generate, validate and store the script of one test case.
+    
+    Returns:
+        Tuple of (stored script record, whether it was reused, the agent)
+    """
+    selenium_agent = SeleniumScriptAgent(knowledge_base, llm_handler, artifact_store.script_cache(project_id))
+    
+    test_case = {key: value for key, value in request.test_case.items() if key not in ("case_id", "merged_from")}
+    test_case_id = request.test_case_id or request.test_case.get("case_id")
+    stored_request = {
+        "test_case": test_case,
+        "html_sha256": hashlib.sha256(request.html_content.encode("utf-8")).hexdigest() if request.html_content else None
+    }
+    
+    with knowledge_base.pin() as kb_version:
+        kb_revision, generation = _find_generation(
+            project_id, "script", stored_request, kb_version, request.regenerate
+        )
+        stored = artifact_store.find_script(generation["id"]) if generation else None
+        if stored is not None:
+            return stored, True, selenium_agent
+        
+        start_time = time.perf_counter()
+        
+        # Generate script
+        script = selenium_agent.generate_selenium_script(
+            test_case=test_case,
+            html_content=request.html_content,
+            use_cache=not request.regenerate
+        )
+        
+        # Validate syntax and locators
+        script, validation = _validate_script(
+            selenium_agent, script, request.html_content, request.repair_selectors
+        )
+        
+        stored = artifact_store.save_script(
+            project_id, stored_request, script, validation,
+            _provenance(
+                selenium_agent.provenance, kb_version, kb_revision, start_time,
+                {"script_cache": selenium_agent.cache_report, "rewrite": selenium_agent.rewrite_report}
+            ),
+            test_case_id=test_case_id
+        )
+        return stored, False, selenium_agent
+
+
 @app.post("/generate-selenium-script")
-async def generate_selenium_script(request: ScriptGenerationRequest):
+async def generate_selenium_script(
+    request: ScriptGenerationRequest,
+    project_id: str = DEFAULT_PROJECT,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None)
+):
     """
     Generate Selenium Python script from test case.
     Uses test case details and HTML structure to create executable script.
+    Scripts are stored (linked to the stored test case if test_case_id is
+    given) and reused for the same test case and HTML unless regenerate is set.
+    Across knowledge-base versions, the content-addressed script cache still
+    skips the LLM while the test case, page and documentation are unchanged.
+    Pass ?profile=1 (or X-Profile: 1) to include timed spans in the response.
     """
     try:
         # Check if knowledge base exists
-        stats = vector_db.get_collection_stats()
-        if not stats.get("exists") or stats.get("count", 0) == 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Knowledge base is empty. Please build the knowledge base first."
+        knowledge_base = _knowledge_base(project_id)
+        _require_documents(knowledge_base)
+        
+        with profile_request("generate_selenium_script", _profiling_requested(profile, x_profile)) as profiler:
+            with span("generate_selenium_script"):
+                # Run in a worker thread with this request's context (profiling)
+                context = contextvars.copy_context()
+                stored, reused, selenium_agent = await run_in_threadpool(
+                    context.run, _generate_selenium_script, knowledge_base, project_id, request
+                )
+        
+        knowledge_bases.record_usage(project_id, "scripts_reused" if reused else "script_generations")
+        
+        response = {
+            "status": "success",
+            "project_id": project_id,
+            "test_id": request.test_case.get("test_id", "unknown"),
+            "script": stored["script"],
+            "validation": stored["validation"],
+            "script_id": stored["id"],
+            "generation_id": stored["generation_id"],
+            "reused": reused,
+            "script_cache": selenium_agent.cache_report,
+            "rewrite": selenium_agent.rewrite_report
+        }
+        
+        if profiler:
+            profile_store.add(profiler)
+            response["profile"] = profiler.to_dict()
+        
+        return response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _generate_scripts(knowledge_base, project_id: str, request: ScriptBatchRequest) -> tuple:
+    """
+    Generate and store the scripts of several test cases, reusing stored ones.
+    
+    Returns:
+        Tuple of (one result per test case, the agent's batch report)
+    """
+    selenium_agent = SeleniumScriptAgent(knowledge_base, llm_handler, artifact_store.script_cache(project_id))
+    html_sha256 = hashlib.sha256(request.html_content.encode("utf-8")).hexdigest() if request.html_content else None
+    
+    with knowledge_base.pin() as kb_version:
+        entries = []
+        for raw_test_case in request.test_cases:
+            test_case = {key: value for key, value in raw_test_case.items() if key not in ("case_id", "merged_from")}
+            stored_request = {"test_case": test_case, "html_sha256": html_sha256}
+            kb_revision, generation = _find_generation(
+                project_id, "script", stored_request, kb_version, request.regenerate
             )
+            entries.append({
+                "test_case": test_case,
+                "test_case_id": raw_test_case.get("case_id"),
+                "stored_request": stored_request,
+                "kb_revision": kb_revision,
+                "stored": artifact_store.find_script(generation["id"]) if generation else None,
+                "result": None
+            })
         
-        # Generate script
-        script = selenium_agent.generate_selenium_script(
-            test_case=request.test_case,
-            html_content=request.html_content
+        pending = [entry for entry in entries if entry["stored"] is None]
+        start_time = time.perf_counter()
+        results = selenium_agent.generate_scripts(
+            [entry["test_case"] for entry in pending],
+            request.html_content,
+            use_cache=not request.regenerate,
+            batch_size=request.batch_size
         )
         
-        # Validate syntax
-        validation = selenium_agent.validate_script_syntax(script)
+        for entry, result in zip(pending, results):
+            entry["result"] = result
+            if result["error"]:
+                continue
+            script, validation = _validate_script(
+                selenium_agent, result["script"], request.html_content, request.repair_selectors
+            )
+            entry["stored"] = artifact_store.save_script(
+                project_id, entry["stored_request"], script, validation,
+                _provenance(
+                    result["provenance"], kb_version, entry["kb_revision"], start_time,
+                    {"script_cache": result["script_cache"], "rewrite": result["rewrite"], "batch": result["batch"]}
+                ),
+                test_case_id=entry["test_case_id"]
+            )
+    
+    scripts = []
+    for entry in entries:
+        result = entry["result"]
+        item = {"test_id": entry["test_case"].get("test_id", "unknown"), "reused": result is None}
+        if entry["stored"] is not None:
+            item.update({
+                "script": entry["stored"]["script"],
+                "validation": entry["stored"]["validation"],
+                "script_id": entry["stored"]["id"],
+                "generation_id": entry["stored"]["generation_id"]
+            })
+        if result is not None:
+            item.update({
+                "error": result["error"],
+                "script_cache": result["script_cache"],
+                "rewrite": result["rewrite"],
+                "batch": result["batch"]
+            })
+        scripts.append(item)
+    return scripts, selenium_agent.batch_report
+
+
+@app.post("/generate-selenium-scripts")
+async def generate_selenium_scripts(
+    request: ScriptBatchRequest,
+    project_id: str = DEFAULT_PROJECT,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None)
+):
+    """
+    Generate Selenium scripts for several test cases of one page.
+    Stored scripts are reused as by /generate-selenium-script. The rest are
+    generated batch_size (SELENIUM_BATCH_SIZE) test cases per LLM call, with
+    the page and documentation context sent once per call; a case the batch
+    does not produce is generated on its own.
+    Pass ?profile=1 (or X-Profile: 1) to include timed spans in the response.
+    """
+    try:
+        if not request.test_cases:
+            raise HTTPException(status_code=400, detail="No test cases given")
+        if request.batch_size is not None and request.batch_size < 1:
+            raise HTTPException(status_code=400, detail="batch_size must be at least 1")
+        
+        knowledge_base = _knowledge_base(project_id)
+        _require_documents(knowledge_base)
+        
+        with profile_request("generate_selenium_scripts", _profiling_requested(profile, x_profile)) as profiler:
+            with span("generate_selenium_scripts", test_cases=len(request.test_cases)):
+                # Run in a worker thread with this request's context (profiling)
+                context = contextvars.copy_context()
+                scripts, batch_report = await run_in_threadpool(
+                    context.run, _generate_scripts, knowledge_base, project_id, request
+                )
+        
+        reused = sum(1 for item in scripts if item["reused"])
+        knowledge_bases.record_usage(project_id, "scripts_reused", reused)
+        knowledge_bases.record_usage(project_id, "script_generations", len(scripts) - reused)
+        
+        response = {
+            "status": "success",
+            "project_id": project_id,
+            "scripts": scripts,
+            "count": len(scripts),
+            "failed": sum(1 for item in scripts if item.get("error")),
+            "batch": batch_report
+        }
+        
+        if profiler:
+            profile_store.add(profiler)
+            response["profile"] = profiler.to_dict()
+        
+        return response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _pipeline_script(
+    knowledge_base,
+    project_id: str,
+    request: TestSuitePipelineRequest,
+    kb_version: str,
+    index: int,
+    raw_test_case: dict,
+    emit
+) -> dict:
+    """
+    Reuse or generate and validate the script of one streamed test case, then emit it.
+    
+    Returns:
+        The result, with what save_script() needs if the script is new
+    """
+    test_case = {key: value for key, value in raw_test_case.items() if key not in ("case_id", "merged_from")}
+    stored_request = {
+        "test_case": test_case,
+        "html_sha256": hashlib.sha256(request.html_content.encode("utf-8")).hexdigest() if request.html_content else None
+    }
+    result = {"index": index, "test_id": test_case.get("test_id", "unknown"), "reused": False, "stored": None}
+    
+    try:
+        kb_revision, generation = _find_generation(
+            project_id, "script", stored_request, kb_version, request.regenerate
+        )
+        result["stored"] = artifact_store.find_script(generation["id"]) if generation else None
+        if result["stored"] is not None:
+            result.update(
+                reused=True,
+                script=result["stored"]["script"],
+                validation=result["stored"]["validation"]
+            )
+        else:
+            start_time = time.perf_counter()
+            selenium_agent = SeleniumScriptAgent(knowledge_base, llm_handler, artifact_store.script_cache(project_id))
+            script = selenium_agent.generate_selenium_script(
+                test_case=test_case,
+                html_content=request.html_content,
+                use_cache=not request.regenerate
+            )
+            script, validation = _validate_script(
+                selenium_agent, script, request.html_content, request.repair_selectors
+            )
+            result.update(
+                script=script,
+                validation=validation,
+                script_cache=selenium_agent.cache_report,
+                rewrite=selenium_agent.rewrite_report,
+                stored_request=stored_request,
+                provenance=_provenance(
+                    selenium_agent.provenance, kb_version, kb_revision, start_time,
+                    {"script_cache": selenium_agent.cache_report, "rewrite": selenium_agent.rewrite_report}
+                )
+            )
+    except Exception as e:
+        result["error"] = str(e)
+    
+    event = {"event": "script", "index": index, "test_id": result["test_id"], "reused": result["reused"]}
+    if "error" in result:
+        event["error"] = result["error"]
+    else:
+        event.update(script=result["script"], validation=result["validation"])
+    if result["stored"] is not None:
+        event.update(script_id=result["stored"]["id"], generation_id=result["stored"]["generation_id"])
+    else:
+        event.update(script_cache=result.get("script_cache"), rewrite=result.get("rewrite"))
+    emit(event)
+    return result
+
+
+def _run_pipeline(
+    knowledge_base,
+    project_id: str,
+    request: TestSuitePipelineRequest,
+    events: queue.Queue,
+    cancelled: threading.Event
+) -> None:
+    """
+    Produce the events of /generate-test-suite/stream, ending with None.
+    
+    Test cases are streamed from the LLM; each one's script is submitted to
+    a bounded pool as soon as the case is complete, so scripts are written
+    while later cases are still being generated. Test cases and new scripts
+    are stored once everything has finished, scripts linked to their case.
+    """
+    def emit(event: dict) -> None:
+        events.put(json.dumps(event, default=str) + "\n")
+    
+    start_time = time.perf_counter()
+    test_case_agent = TestCaseAgent(knowledge_base, llm_handler)
+    stored_request = {"query": request.query, "top_k": request.top_k}
+    
+    try:
+        with knowledge_base.pin() as kb_version, ThreadPoolExecutor(
+            max_workers=request.concurrency or Config.PIPELINE_SCRIPT_CONCURRENCY,
+            thread_name_prefix="pipeline-script"
+        ) as executor:
+            kb_revision, generation = _find_generation(
+                project_id, "test_cases", stored_request, kb_version, request.regenerate
+            )
+            reused = generation is not None
+            if reused:
+                test_case_stream = iter(artifact_store.generation_test_cases(generation["id"]))
+            else:
+                test_case_stream = test_case_agent.stream_test_cases(query=request.query, top_k=request.top_k)
+            
+            test_cases = []
+            futures = []
+            for index, test_case in enumerate(test_case_stream):
+                if cancelled.is_set():
+                    break
+                test_cases.append(test_case)
+                emit({"event": "test_case", "index": index, "test_case": test_case})
+                # Worker threads need this context for the pinned knowledge-base version
+                futures.append(executor.submit(
+                    contextvars.copy_context().run, _pipeline_script,
+                    knowledge_base, project_id, request, kb_version, index, dict(test_case), emit
+                ))
+            
+            if cancelled.is_set():
+                # The client went away: drop queued scripts and store nothing
+                for future in futures:
+                    future.cancel()
+                return
+            
+            if not reused:
+                provenance = _provenance(
+                    test_case_agent.provenance, kb_version, kb_revision, start_time,
+                    {"parse_report": test_case_agent.parse_report}
+                )
+            scripts = [future.result() for future in futures]
+            
+            if not reused:
+                generation = artifact_store.save_test_cases(
+                    project_id, "test_cases", stored_request, test_cases, provenance
+                )
+            for test_case, result in zip(test_cases, scripts):
+                if result["stored"] is None and "error" not in result:
+                    result["stored"] = artifact_store.save_script(
+                        project_id, result["stored_request"], result["script"], result["validation"],
+                        result["provenance"], test_case_id=test_case.get("case_id")
+                    )
+        
+        scripts_reused = sum(1 for result in scripts if result["reused"])
+        knowledge_bases.record_usage(project_id, "test_cases_reused" if reused else "test_case_generations")
+        knowledge_bases.record_usage(project_id, "scripts_reused", scripts_reused)
+        knowledge_bases.record_usage(project_id, "script_generations", len(scripts) - scripts_reused)
+        
+        emit({
+            "event": "done",
+            "project_id": project_id,
+            "query": request.query,
+            "count": len(test_cases),
+            "failed": sum(1 for result in scripts if "error" in result),
+            "parse_report": generation["result"].get("parse_report", {}),
+            "generation_id": generation["id"],
+            "reused": reused,
+            "scripts": [
+                {
+                    "index": result["index"],
+                    "test_id": result["test_id"],
+                    "case_id": test_case.get("case_id"),
+                    "script_id": result["stored"]["id"] if result["stored"] else None,
+                    "generation_id": result["stored"]["generation_id"] if result["stored"] else None
+                }
+                for test_case, result in zip(test_cases, scripts)
+            ],
+            "seconds": round(time.perf_counter() - start_time, 3)
+        })
+    except Exception as e:
+        emit({"event": "error", "detail": str(e)})
+    finally:
+        events.put(None)
+
+
+def _pipeline_events(knowledge_base, project_id: str, request: TestSuitePipelineRequest) -> Iterator[str]:
+    """NDJSON lines of a pipeline run in its own thread; closing the iterator cancels the run"""
+    events = queue.Queue()
+    cancelled = threading.Event()
+    # The producer keeps the knowledge base pinned across the whole run, which
+    # a generator resumed in different threadpool threads cannot do itself
+    producer = threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(_run_pipeline, knowledge_base, project_id, request, events, cancelled),
+        name="pipeline",
+        daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            line = events.get()
+            if line is None:
+                break
+            yield line
+    finally:
+        cancelled.set()
+
+
+@app.post("/generate-test-suite/stream")
+async def generate_test_suite_stream(request: TestSuitePipelineRequest, project_id: str = DEFAULT_PROJECT):
+    """
+    Generate test cases and their Selenium scripts in one pipelined request.
+    Each test case's script is started as soon as the case has been parsed
+    from the streamed LLM response, at most concurrency
+    (PIPELINE_SCRIPT_CONCURRENCY) at a time, so the whole suite takes about
+    as long as the test cases plus the slowest script instead of the sum.
+    Streams newline-delimited JSON events as they happen: test_case, script
+    (in completion order, matched by index), then done with the stored ids,
+    or error. Test cases and scripts are stored and reused as by
+    /generate-test-cases and /generate-selenium-script.
+    """
+    try:
+        if request.concurrency is not None and request.concurrency < 1:
+            raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+        
+        knowledge_base = _knowledge_base(project_id)
+        _require_documents(knowledge_base)
+        
+        return StreamingResponse(
+            _pipeline_events(knowledge_base, project_id, request),
+            media_type="application/x-ndjson"
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/check-selectors")
+async def check_selectors(request: SelectorCheckRequest, project_id: str = DEFAULT_PROJECT):
+    """
+    Resolve the locators of Selenium scripts against a page, without a browser.
+    Unresolved locators come with suggestions; with repair, the LLM replaces
+    them (one small call per script that has any).
+    """
+    try:
+        if not request.html_content.strip():
+            raise HTTPException(status_code=400, detail="html_content is empty")
+        
+        knowledge_base = _knowledge_base(project_id) if request.repair else None
+        selenium_agent = SeleniumScriptAgent(knowledge_base, llm_handler)
+        
+        def check_all():
+            results = []
+            for script in request.scripts:
+                checked, report = selenium_agent.check_selectors(script, request.html_content, repair=request.repair)
+                result = {"selectors": report}
+                if checked != script:
+                    result["script"] = checked
+                results.append(result)
+            return results
+        
+        results = await run_in_threadpool(check_all)
         
         return {
             "status": "success",
-            "test_id": request.test_case.get("test_id", "unknown"),
-            "script": script,
-            "validation": validation
+            "project_id": project_id,
+            "results": results,
+            "valid": sum(1 for result in results if result["selectors"]["valid"]),
+            "count": len(results)
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/bundle-test-suite")
+async def bundle_test_suite(request: SuiteBundleRequest, project_id: str = DEFAULT_PROJECT):
+    """
+    Merge Selenium scripts into suite modules that share one browser per module.
+    Without scripts, the project's newest stored script of each test case is bundled.
+    """
+    try:
+        if request.shards < 1:
+            raise HTTPException(status_code=400, detail="shards must be at least 1")
+        
+        scripts = request.scripts
+        if scripts is None:
+            scripts = {}
+            for stored in artifact_store.latest_scripts(_validate_project_id(project_id)):
+                test_id = stored["test_id"] or f"script-{stored['id']}"
+                scripts[test_id if test_id not in scripts else f"{test_id}-{stored['id']}"] = stored["script"]
+        if not scripts:
+            raise HTTPException(status_code=400, detail="No scripts to bundle")
+        
+        modules, report = await run_in_threadpool(bundle_scripts, scripts, request.shards)
+        
+        return {
+            "status": "success",
+            "project_id": project_id,
+            "modules": modules,
+            "bundle": report
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/test-cases")
+async def list_test_cases(
+    project_id: str = DEFAULT_PROJECT,
+    feature: Optional[str] = None,
+    priority: Optional[str] = None,
+    test_type: Optional[str] = None,
+    source: Optional[str] = None,
+    kb_version: Optional[str] = None,
+    generation_id: Optional[int] = None,
+    limit: int = 50,
+    cursor: Optional[int] = None
+):
+    """
+    List a project's stored test cases, newest first.
+    Filters are exact matches; pass the returned next_cursor to get the next page.
+    """
+    try:
+        page = artifact_store.list_test_cases(
+            _validate_project_id(project_id),
+            limit=limit,
+            cursor=cursor,
+            feature=feature,
+            priority=priority,
+            test_type=test_type,
+            source=source,
+            kb_version=kb_version,
+            generation_id=generation_id
+        )
+        return {"status": "success", "project_id": project_id, **page}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/test-cases/facets")
+async def get_test_case_facets(project_id: str = DEFAULT_PROJECT):
+    """Distinct features, priorities, types, sources and knowledge-base versions of stored test cases"""
+    try:
+        return {
+            "status": "success",
+            "project_id": project_id,
+            "facets": artifact_store.test_case_facets(_validate_project_id(project_id))
         }
     
     except HTTPException:
@@ -289,44 +1391,148 @@ async def generate_selenium_script(request: ScriptGenerationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/generations")
+async def list_generations(
+    project_id: str = DEFAULT_PROJECT,
+    kind: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[int] = None
+):
+    """List a project's stored generations (test cases, test plans, scripts), newest first"""
+    try:
+        page = artifact_store.list_generations(_validate_project_id(project_id), kind=kind, limit=limit, cursor=cursor)
+        return {"status": "success", "project_id": project_id, **page}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/generations/{generation_id}")
+async def get_generation(generation_id: int):
+    """A stored generation with its prompt, retrieved context and provenance"""
+    generation = artifact_store.get_generation(generation_id)
+    if generation is None:
+        raise HTTPException(status_code=404, detail="Generation not found")
+    return {"status": "success", "generation": generation}
+
+
+@app.get("/scripts")
+async def list_scripts(
+    project_id: str = DEFAULT_PROJECT,
+    test_case_id: Optional[int] = None,
+    test_id: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[int] = None
+):
+    """List a project's stored Selenium scripts, newest first"""
+    try:
+        page = artifact_store.list_scripts(
+            _validate_project_id(project_id),
+            test_case_id=test_case_id,
+            test_id=test_id,
+            limit=limit,
+            cursor=cursor
+        )
+        return {"status": "success", "project_id": project_id, **page}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/scripts/{script_id}")
+async def get_script(script_id: int):
+    """A stored Selenium script"""
+    script = artifact_store.get_script(script_id)
+    if script is None:
+        raise HTTPException(status_code=404, detail="Script not found")
+    return {"status": "success", "script": script}
+
+
+@app.get("/profiles/{profile_id}/chrome-trace")
+async def get_profile_chrome_trace(profile_id: str):
+    """
+    Download a recent request profile as a Chrome trace file.
+    Open it in chrome://tracing or https://ui.perfetto.dev for a flame view.
+    """
+    profiler = profile_store.get(profile_id)
+    if not profiler:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    
+    return JSONResponse(
+        content=profiler.to_chrome_trace(),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.trace.json"'}
+    )
+
+
 @app.get("/test-suggestions")
-async def get_test_suggestions():
+async def get_test_suggestions(project_id: str = DEFAULT_PROJECT):
     """
-    Get suggested test scenarios based on uploaded documentation.
+    Get suggested test scenarios based on a project's uploaded documentation.
     """
     try:
+        test_case_agent = TestCaseAgent(_knowledge_base(project_id), llm_handler)
         suggestions = test_case_agent.suggest_test_scenarios()
         
         return {
             "status": "success",
+            "project_id": project_id,
             "suggestions": suggestions
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/knowledge-base/stats")
-async def get_knowledge_base_stats():
+async def get_knowledge_base_stats(project_id: str = DEFAULT_PROJECT):
     """
-    Get statistics about the knowledge base.
+    Get statistics about a project's knowledge base.
     """
     try:
-        stats = vector_db.get_collection_stats()
-        
-        # Get uploaded files
-        uploaded_files = []
-        if os.path.exists(Config.UPLOAD_DIR):
-            uploaded_files = [
-                f for f in os.listdir(Config.UPLOAD_DIR)
-                if Path(f).suffix.lower() in Config.ALLOWED_EXTENSIONS
-            ]
+        stats = _knowledge_base(project_id).get_collection_stats()
         
         return {
             "status": "success",
+            "project_id": project_id,
             "vector_db": stats,
-            "uploaded_files": uploaded_files,
-            "upload_directory": Config.UPLOAD_DIR
+            "usage": knowledge_bases.usage(project_id),
+            "uploaded_files": knowledge_bases.list_uploaded_files(project_id),
+            "upload_directory": knowledge_bases.upload_dir(project_id)
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/knowledge-bases")
+async def list_knowledge_bases():
+    """
+    List projects with their uploaded documents and usage statistics.
+    Knowledge bases are not opened, so listing does not evict active projects.
+    """
+    try:
+        projects = []
+        for project_id in knowledge_bases.list_projects():
+            usage = knowledge_bases.usage(project_id)
+            projects.append({
+                "project_id": project_id,
+                "uploaded_files": len(knowledge_bases.list_uploaded_files(project_id)),
+                "usage": usage
+            })
+        
+        return {
+            "status": "success",
+            "projects": projects,
+            "open_knowledge_bases": sum(1 for p in projects if p["usage"]["open"]),
+            "max_open": knowledge_bases.max_open
         }
     
     except Exception as e:
@@ -334,24 +1540,33 @@ async def get_knowledge_base_stats():
 
 
 @app.delete("/knowledge-base/reset")
-async def reset_knowledge_base():
+async def reset_knowledge_base(project_id: str = DEFAULT_PROJECT):
     """
-    Reset the knowledge base and delete all uploaded documents.
+    Reset a project's knowledge base and delete its uploaded documents.
+    Other projects are not affected.
     """
     try:
         # Delete vector database
-        vector_db.delete_collection()
+        _knowledge_base(project_id).delete_collection()
         
-        # Delete uploaded files
-        if os.path.exists(Config.UPLOAD_DIR):
-            shutil.rmtree(Config.UPLOAD_DIR)
-            os.makedirs(Config.UPLOAD_DIR)
+        # Stored test cases and scripts are kept, but no longer reused
+        artifact_store.bump_kb_revision(project_id)
+        
+        # Delete uploaded files (the default project's directory also holds
+        # the other projects' directories, which are left alone)
+        upload_dir = knowledge_bases.upload_dir(project_id)
+        for filename in os.listdir(upload_dir):
+            file_path = os.path.join(upload_dir, filename)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
         
         return StatusResponse(
             status="success",
-            message="Knowledge base and uploaded documents have been reset"
+            message=f"Knowledge base and uploaded documents of project '{project_id}' have been reset"
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,145 @@
+"""
+Prometheus metrics for the QA Agent pipeline.
+
+All metrics are module-level singletons so instrumented code only pays for a
+label lookup and an atomic update on the hot path.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+
+# Buckets tuned for sub-second pipeline stages
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets tuned for LLM round-trips
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0, 120.0)
+
+CHUNK_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+# Ingestion
+DOCUMENT_PARSE_SECONDS = Histogram(
+    "qa_agent_document_parse_seconds",
+    "Time spent extracting text from a document",
+    ["file_type"],
+    buckets=FAST_BUCKETS
+)
+
+DOCUMENT_CHUNKS = Histogram(
+    "qa_agent_document_chunks",
+    "Number of chunks produced per document",
+    ["file_type"],
+    buckets=CHUNK_COUNT_BUCKETS
+)
+
+EMBEDDING_BATCH_SECONDS = Histogram(
+    "qa_agent_embedding_batch_seconds",
+    "Latency of one embedding model encode call",
+    ["stage"],
+    buckets=FAST_BUCKETS
+)
+
+DUPLICATE_CHUNKS_TOTAL = Counter(
+    "qa_agent_duplicate_chunks_total",
+    "Near-duplicate chunks dropped before embedding"
+)
+
+# Retrieval
+VECTOR_QUERY_SECONDS = Histogram(
+    "qa_agent_vector_query_seconds",
+    "Latency of a Chroma collection query",
+    buckets=FAST_BUCKETS
+)
+
+# Generation
+LLM_REQUEST_SECONDS = Histogram(
+    "qa_agent_llm_request_seconds",
+    "Latency of a complete LLM request",
+    ["provider", "model"],
+    buckets=LLM_BUCKETS
+)
+
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "qa_agent_llm_time_to_first_token_seconds",
+    "Time until the first streamed token arrives",
+    ["provider", "model"],
+    buckets=LLM_BUCKETS
+)
+
+LLM_PHASE_SECONDS = Histogram(
+    "qa_agent_llm_phase_seconds",
+    "Model load, prompt evaluation and generation time reported by local providers",
+    ["provider", "phase"],
+    buckets=LLM_BUCKETS
+)
+
+LLM_TOKENS_TOTAL = Counter(
+    "qa_agent_llm_tokens_total",
+    "Tokens reported by the LLM provider",
+    ["provider", "model", "kind"]
+)
+
+LLM_ERRORS_TOTAL = Counter(
+    "qa_agent_llm_errors_total",
+    "LLM requests that raised an error",
+    ["provider", "model"]
+)
+
+LLM_HEDGED_REQUESTS_TOTAL = Counter(
+    "qa_agent_llm_hedged_requests_total",
+    "Hedge requests by provider and outcome (won, lost or failed)",
+    ["provider", "outcome"]
+)
+
+LLM_RETRIES_TOTAL = Counter(
+    "qa_agent_llm_retries_total",
+    "LLM request retries by provider and reason (rate_limited, server_error or connection)",
+    ["provider", "reason"]
+)
+
+LLM_STRUCTURED_OUTPUT_FALLBACKS_TOTAL = Counter(
+    "qa_agent_llm_structured_output_fallbacks_total",
+    "Requests retried with a weaker response format after the API rejected one (json_schema or json_object)",
+    ["provider", "mode"]
+)
+
+LLM_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "qa_agent_llm_rate_limit_wait_seconds",
+    "Time requests spent queued behind a provider's rate limiter",
+    ["provider"],
+    buckets=LLM_BUCKETS
+)
+
+LLM_CIRCUIT_OPEN = Gauge(
+    "qa_agent_llm_circuit_open",
+    "1 while a provider's circuit breaker is open",
+    ["provider"]
+)
+
+TEST_CASE_PARSE_TOTAL = Counter(
+    "qa_agent_test_case_parse_total",
+    "Test case responses by parse outcome (json, repaired, salvaged or fallback)",
+    ["outcome"]
+)
+
+TEST_CASES_INVALID_TOTAL = Counter(
+    "qa_agent_test_cases_invalid_total",
+    "Generated test cases dropped because they failed schema validation"
+)
+
+DUPLICATE_TEST_CASES_TOTAL = Counter(
+    "qa_agent_duplicate_test_cases_total",
+    "Test cases merged into a semantically equivalent test case"
+)
+
+# Caches and load
+CACHE_LOOKUPS_TOTAL = Counter(
+    "qa_agent_cache_lookups_total",
+    "Cache lookups by cache name and result (hit or miss)",
+    ["cache", "result"]
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "qa_agent_http_requests_in_flight",
+    "HTTP requests currently being served"
+)
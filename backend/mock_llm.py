@@ -0,0 +1,392 @@
+"""
+Local OpenAI-compatible mock LLM server for load and latency testing.
+
+Serves /v1/chat/completions (including streaming) with canned test-case JSON
+and Selenium scripts, configurable latency distributions, token throughput,
+error rates and an optional requests-per-minute quota with OpenAI-style
+x-ratelimit-* headers. Select it with LLM_PROVIDER=mock and run:
+
+    python -m backend.mock_llm
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+from collections import deque
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse
+
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from backend.config import Config
+
+
+CANNED_TEST_CASES = [
+    {
+        "test_id": "TC-001",
+        "feature": "Discount Code",
+        "test_scenario": "Apply valid discount code SAVE15",
+        "test_type": "positive",
+        "preconditions": "Cart contains at least one item",
+        "test_steps": [
+            "Add a product to the cart",
+            "Enter SAVE15 in the discount code field",
+            "Click Apply Discount"
+        ],
+        "expected_result": "A 15% discount is applied to the subtotal",
+        "grounded_in": "product_specs.md",
+        "priority": "high"
+    },
+    {
+        "test_id": "TC-002",
+        "feature": "Discount Code",
+        "test_scenario": "Apply invalid discount code",
+        "test_type": "negative",
+        "preconditions": "Cart contains at least one item",
+        "test_steps": [
+            "Enter INVALID in the discount code field",
+            "Click Apply Discount"
+        ],
+        "expected_result": "The message 'Invalid discount code.' is shown",
+        "grounded_in": "product_specs.md",
+        "priority": "medium"
+    },
+    {
+        "test_id": "TC-003",
+        "feature": "Shopping Cart",
+        "test_scenario": "Add a product to the cart",
+        "test_type": "positive",
+        "preconditions": "Checkout page is open",
+        "test_steps": [
+            "Click Add to Cart for Wireless Headphones"
+        ],
+        "expected_result": "The product appears in the cart and the subtotal is updated",
+        "grounded_in": "product_specs.md",
+        "priority": "high"
+    },
+    {
+        "test_id": "TC-004",
+        "feature": "Form Validation",
+        "test_scenario": "Submit the checkout form with an invalid email",
+        "test_type": "negative",
+        "preconditions": "Cart contains at least one item",
+        "test_steps": [
+            "Enter a name and address",
+            "Enter 'invalid-email' in the email field",
+            "Click Pay Now"
+        ],
+        "expected_result": "An inline email error is displayed in red",
+        "grounded_in": "ui_ux_guide.txt",
+        "priority": "high"
+    },
+    {
+        "test_id": "TC-005",
+        "feature": "Shipping",
+        "test_scenario": "Select express shipping",
+        "test_type": "positive",
+        "preconditions": "Cart contains at least one item",
+        "test_steps": [
+            "Select the Express shipping option"
+        ],
+        "expected_result": "A $10 shipping cost is added to the total",
+        "grounded_in": "product_specs.md",
+        "priority": "medium"
+    }
+]
+
+CANNED_SCRIPT_TEMPLATE = '''import unittest
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+
+class Test{class_suffix}(unittest.TestCase):
+    """{test_id}: apply a discount code on the checkout page"""
+
+    def setUp(self):
+        self.driver = webdriver.Chrome()
+        self.driver.get("file:///project_assets/checkout.html")
+        self.wait = WebDriverWait(self.driver, 10)
+
+    def test_apply_discount(self):
+        # Add a product so the discount can be applied
+        self.driver.find_element(By.ID, "add-product-1").click()
+
+        # Enter the discount code and apply it
+        code_input = self.wait.until(EC.presence_of_element_located((By.ID, "discount-code")))
+        code_input.send_keys("SAVE15")
+        self.driver.find_element(By.ID, "apply-discount-btn").click()
+
+        # Verify the confirmation message
+        message = self.wait.until(EC.visibility_of_element_located((By.ID, "discount-message")))
+        self.assertIn("applied", message.text.lower())
+
+    def tearDown(self):
+        self.driver.quit()
+
+
+if __name__ == "__main__":
+    unittest.main()
+'''
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: Optional[str] = ""
+
+
+class ChatCompletionRequest(BaseModel):
+    model: Optional[str] = None
+    messages: List[ChatMessage]
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    stream: Optional[bool] = False
+    stream_options: Optional[Dict[str, Any]] = None
+    response_format: Optional[Dict[str, Any]] = None
+
+
+app = FastAPI(
+    title="Mock LLM API",
+    description="OpenAI-compatible mock chat-completions server",
+    version="1.0.0"
+)
+
+_rng = random.Random(Config.MOCK_LLM_SEED or None)
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+_recent_requests: deque = deque()
+
+
+def sample_latency() -> float:
+    """Sample time-to-first-token in seconds from the configured distribution"""
+    mean = Config.MOCK_LLM_LATENCY_MS
+    spread = Config.MOCK_LLM_LATENCY_SPREAD_MS
+    distribution = Config.MOCK_LLM_LATENCY_DISTRIBUTION
+
+    if distribution == "uniform":
+        latency = _rng.uniform(mean - spread, mean + spread)
+    elif distribution == "normal":
+        latency = _rng.gauss(mean, spread)
+    elif distribution == "lognormal":
+        # MOCK_LLM_LATENCY_MS is the median; sigma controls the tail
+        latency = mean * _rng.lognormvariate(0, Config.MOCK_LLM_LATENCY_SIGMA)
+    else:
+        latency = mean
+
+    return max(latency, 0.0) / 1000.0
+
+
+def sample_error() -> Optional[int]:
+    """Return an HTTP error status to inject, or None"""
+    if Config.MOCK_LLM_ERROR_RATE <= 0 or _rng.random() >= Config.MOCK_LLM_ERROR_RATE:
+        return None
+    codes = [int(code) for code in Config.MOCK_LLM_ERROR_CODES.split(",") if code.strip()]
+    return _rng.choice(codes) if codes else 500
+
+
+def check_quota() -> Dict[str, str]:
+    """
+    Count a request against MOCK_LLM_RATE_LIMIT_RPM.
+
+    Returns:
+        x-ratelimit-* headers, plus retry-after when the request is over quota
+    """
+    limit = Config.MOCK_LLM_RATE_LIMIT_RPM
+    if limit <= 0:
+        return {}
+
+    now = time.monotonic()
+    while _recent_requests and now - _recent_requests[0] >= 60:
+        _recent_requests.popleft()
+
+    reset = 60 - (now - _recent_requests[0]) if _recent_requests else 0.0
+    headers = {
+        "x-ratelimit-limit-requests": str(limit),
+        "x-ratelimit-reset-requests": f"{reset:.3f}s"
+    }
+    if len(_recent_requests) >= limit:
+        headers["x-ratelimit-remaining-requests"] = "0"
+        headers["retry-after"] = str(max(int(reset + 0.999), 1))
+        return headers
+
+    _recent_requests.append(now)
+    headers["x-ratelimit-remaining-requests"] = str(limit - len(_recent_requests))
+    return headers
+
+
+def tokenize(text: str) -> List[str]:
+    """Approximate tokens as words with their trailing whitespace"""
+    return _TOKEN_RE.findall(text)
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def build_response(messages: List[ChatMessage], response_format: Dict[str, Any] = None) -> str:
+    """Pick a canned response matching the prompt"""
+    system_prompt = " ".join(m.content or "" for m in messages if m.role == "system")
+    user_prompt = " ".join(m.content or "" for m in messages if m.role == "user")
+
+    if "Selenium" in system_prompt:
+        match = re.search(r"Test ID:\s*([\w-]+)", user_prompt)
+        test_id = match.group(1) if match else "TC-001"
+        class_suffix = re.sub(r"\W", "", test_id.title()) or "Generated"
+        script = CANNED_SCRIPT_TEMPLATE.format(test_id=test_id, class_suffix=class_suffix)
+
+        # Batched prompts name one test method per test case
+        methods = re.findall(r"^TEST CASE \d+ \(method (\w+)\):", user_prompt, re.MULTILINE)
+        if methods:
+            start = script.index("    def test_apply_discount(self):")
+            end = script.index("    def tearDown(self):")
+            method = script[start:end]
+            script = script[:start] + "".join(
+                method.replace("test_apply_discount", name) for name in methods
+            ) + script[end:]
+        return script
+
+    if "test case" in system_prompt.lower():
+        # JSON modes return an object, like real providers
+        if (response_format or {}).get("type") in ("json_object", "json_schema"):
+            return json.dumps({"test_cases": CANNED_TEST_CASES}, indent=2)
+        return json.dumps(CANNED_TEST_CASES, indent=2)
+
+    return "This is a mock response from the local LLM server."
+
+
+def _error_response(status_code: int, headers: Dict[str, str] = None) -> JSONResponse:
+    if status_code == 429 and not headers:
+        headers = {"Retry-After": "1"}
+    return JSONResponse(
+        status_code=status_code,
+        headers=headers,
+        content={"error": {
+            "message": f"Mock LLM injected error ({status_code})",
+            "type": "mock_error",
+            "code": status_code
+        }}
+    )
+
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {"status": "healthy", "model": Config.MOCK_LLM_MODEL}
+
+
+@app.get("/v1/models")
+async def list_models():
+    """List the single mock model"""
+    return {
+        "object": "list",
+        "data": [{"id": Config.MOCK_LLM_MODEL, "object": "model", "owned_by": "mock"}]
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: ChatCompletionRequest, response: Response):
+    """OpenAI-compatible chat completions"""
+    quota_headers = check_quota()
+    if "retry-after" in quota_headers:
+        return _error_response(429, quota_headers)
+
+    error_status = sample_error()
+    if error_status:
+        return _error_response(error_status)
+
+    model = request.model or Config.MOCK_LLM_MODEL
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+
+    tokens = tokenize(build_response(request.messages, request.response_format))
+    finish_reason = "stop"
+    if request.max_tokens and len(tokens) > request.max_tokens:
+        tokens = tokens[:request.max_tokens]
+        finish_reason = "length"
+
+    prompt_tokens = sum(count_tokens(m.content or "") for m in request.messages)
+    token_delay = 1.0 / Config.MOCK_LLM_TOKENS_PER_SEC if Config.MOCK_LLM_TOKENS_PER_SEC > 0 else 0.0
+    latency = sample_latency()
+
+    if request.stream:
+        async def event_stream():
+            await asyncio.sleep(latency)
+
+            for index, token in enumerate(tokens):
+                if token_delay and index:
+                    await asyncio.sleep(token_delay)
+                delta = {"content": token}
+                if index == 0:
+                    delta["role"] = "assistant"
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+
+            final_chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]
+            }
+            yield f"data: {json.dumps(final_chunk)}\n\n"
+
+            if (request.stream_options or {}).get("include_usage"):
+                usage_chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": prompt_tokens + len(tokens)
+                    }
+                }
+                yield f"data: {json.dumps(usage_chunk)}\n\n"
+
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream", headers=quota_headers)
+
+    await asyncio.sleep(latency + token_delay * len(tokens))
+    response.headers.update(quota_headers)
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(tokens)},
+            "finish_reason": finish_reason
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens)
+        }
+    }
+
+
+# Run the mock server
+if __name__ == "__main__":
+    import uvicorn
+    base_url = urlparse(Config.MOCK_LLM_BASE_URL)
+    uvicorn.run(
+        "backend.mock_llm:app",
+        host=base_url.hostname or "localhost",
+        port=base_url.port or 8001
+    )
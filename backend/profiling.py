@@ -0,0 +1,178 @@
+"""
+Opt-in per-request profiling spans.
+
+Spans are only recorded while a Profiler is active in the current context, so
+instrumented code pays a single context variable lookup when profiling is off.
+"""
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+
+_active_profiler: ContextVar[Optional["Profiler"]] = ContextVar("active_profiler", default=None)
+
+# Nesting depth of the current span; a context variable rather than profiler
+# state, so work fanned out to threads (with a copied context) nests under the
+# span that submitted it without the threads racing on one counter
+_span_depth: ContextVar[int] = ContextVar("span_depth", default=0)
+
+
+class Span:
+    """A timed section of work with size attributes"""
+
+    __slots__ = ("name", "start", "duration", "depth", "thread_id", "attributes")
+
+    def __init__(self, name: str, start: float, depth: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.depth = depth
+        self.thread_id = threading.get_ident()
+        self.attributes = attributes
+
+    def set(self, **attributes: Any) -> None:
+        """Attach size or count attributes to the span"""
+        self.attributes.update(attributes)
+
+
+class _NullSpan:
+    """Stand-in returned when profiling is disabled"""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """Collect spans for one request"""
+
+    def __init__(self, name: str):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.thread_names: Dict[int, str] = {}
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        depth = _span_depth.get()
+        span = Span(name, time.perf_counter() - self.origin, depth, attributes)
+        self.spans.append(span)
+        self.thread_names.setdefault(span.thread_id, threading.current_thread().name)
+        token = _span_depth.set(depth + 1)
+        try:
+            yield span
+        finally:
+            _span_depth.reset(token)
+            span.duration = time.perf_counter() - self.origin - span.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize spans for an API response"""
+        total = max((s.start + s.duration for s in self.spans), default=0.0)
+        return {
+            "profile_id": self.profile_id,
+            "name": self.name,
+            "total_ms": round(total * 1000, 3),
+            "spans": [
+                {
+                    "name": s.name,
+                    "start_ms": round(s.start * 1000, 3),
+                    "duration_ms": round(s.duration * 1000, 3),
+                    "depth": s.depth,
+                    **({"attributes": s.attributes} if s.attributes else {})
+                }
+                for s in self.spans
+            ]
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        Export spans in Chrome trace event format (chrome://tracing, Perfetto).
+
+        Each thread gets its own track, so spans that ran concurrently do not
+        appear nested in one another.
+        """
+        pid = os.getpid()
+        return {
+            "displayTimeUnit": "ms",
+            "traceEvents": [
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": name}}
+                for thread_id, name in self.thread_names.items()
+            ] + [
+                {
+                    "name": s.name,
+                    "cat": self.name,
+                    "ph": "X",
+                    "ts": round(s.start * 1_000_000, 3),
+                    "dur": round(s.duration * 1_000_000, 3),
+                    "pid": pid,
+                    "tid": s.thread_id,
+                    "args": s.attributes
+                }
+                for s in self.spans
+            ]
+        }
+
+
+class ProfileStore:
+    """Keep the most recent profiles so they can be exported later"""
+
+    def __init__(self, max_profiles: int = 50):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Profiler]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profiler: Profiler) -> None:
+        with self._lock:
+            self._profiles[profiler.profile_id] = profiler
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profiler]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+@contextmanager
+def profile_request(name: str, enabled: bool = True):
+    """
+    Activate a profiler for the enclosed block.
+
+    Args:
+        name: Name of the profiled operation
+        enabled: If False, nothing is recorded and None is yielded
+    """
+    if not enabled:
+        yield None
+        return
+
+    profiler = Profiler(name)
+    token = _active_profiler.set(profiler)
+    depth_token = _span_depth.set(0)
+    try:
+        yield profiler
+    finally:
+        _span_depth.reset(depth_token)
+        _active_profiler.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Record a span on the active profiler, if any"""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield _NULL_SPAN
+        return
+
+    with profiler.span(name, **attributes) as active_span:
+        yield active_span
@@ -0,0 +1,106 @@
+"""
+Structured output schemas.
+
+Models for LLM responses that are parsed into data. Their JSON schemas are
+sent to providers that can constrain generation to them (response_format or
+Ollama's `format`), and the same models validate what comes back.
+"""
+
+from typing import Any, Dict, List, Literal
+
+from pydantic import BaseModel, ConfigDict, field_validator
+
+
+class TestCase(BaseModel):
+    """One generated test case"""
+
+    model_config = ConfigDict(extra="ignore")
+
+    test_id: str
+    feature: str
+    test_scenario: str
+    test_type: Literal["positive", "negative"] = "positive"
+    preconditions: str = ""
+    test_steps: List[str] = []
+    expected_result: str
+    grounded_in: str
+    priority: Literal["high", "medium", "low"] = "medium"
+
+    @field_validator("test_type", "priority", mode="before")
+    @classmethod
+    def _normalize_choice(cls, value: Any) -> Any:
+        return value.strip().lower() if isinstance(value, str) else value
+
+    @field_validator("test_steps", mode="before")
+    @classmethod
+    def _split_steps(cls, value: Any) -> Any:
+        # Some models return the steps as one numbered string
+        if isinstance(value, str):
+            return [line.strip() for line in value.splitlines() if line.strip()]
+        return value
+
+    @field_validator("preconditions", mode="before")
+    @classmethod
+    def _join_preconditions(cls, value: Any) -> Any:
+        if isinstance(value, list):
+            return "; ".join(str(item) for item in value)
+        return "" if value is None else value
+
+
+class TestCaseSuite(BaseModel):
+    """Top-level object of a test-case response (JSON modes require an object)"""
+
+    test_cases: List[TestCase]
+
+
+class Feature(BaseModel):
+    """A testable feature found in the documentation"""
+
+    name: str
+    description: str = ""
+
+
+class FeatureList(BaseModel):
+    """Top-level object of a feature discovery response"""
+
+    features: List[Feature]
+
+
+class LocatorFix(BaseModel):
+    """Replacement for a script locator that matches nothing on the page"""
+
+    by: str
+    value: str
+    new_by: Literal["ID", "NAME", "CSS_SELECTOR", "XPATH", "CLASS_NAME", "TAG_NAME", "LINK_TEXT", "PARTIAL_LINK_TEXT"]
+    new_value: str
+
+    @field_validator("by", "new_by", mode="before")
+    @classmethod
+    def _strip_by_prefix(cls, value: Any) -> Any:
+        # "By.ID" -> "ID"
+        return value.strip().upper().removeprefix("BY.") if isinstance(value, str) else value
+
+
+class LocatorFixList(BaseModel):
+    """Top-level object of a locator repair response"""
+
+    fixes: List[LocatorFix]
+
+
+def response_schema(model: type) -> Dict[str, Any]:
+    """
+    JSON schema of a model, as passed to LLMHandler.generate(json_schema=...).
+
+    Every property is marked required so constrained decoding emits all
+    fields; defaults only apply when validating unconstrained output.
+    """
+    schema = model.model_json_schema()
+    for definition in [schema, *schema.get("$defs", {}).values()]:
+        if "properties" in definition:
+            definition["required"] = list(definition["properties"])
+    return schema
+
+
+TEST_CASE_SUITE_SCHEMA = response_schema(TestCaseSuite)
+FEATURE_LIST_SCHEMA = response_schema(FeatureList)
+LOCATOR_FIX_LIST_SCHEMA = response_schema(LocatorFixList)
@@ -0,0 +1,350 @@
+"""
+Replacement of fixed sleeps in generated Selenium scripts.
+
+Generated scripts copy example_test_script.py: time.sleep() after
+driver.get() and between steps, and maximize_window() in setUpClass. The
+sleeps are most of a suite's runtime. rewrite_waits() parses a script and
+replaces each sleep with a WebDriverWait on what the next statement does:
+
+- finds an element that is then clicked or typed into: element_to_be_clickable
+- finds an element whose text or size is read: visibility_of_element_located
+- finds any other element: presence_of_element_located
+- switches to an alert: alert_is_present
+
+Sleeps before driver.get() or an existing wait, and sleeps right after
+driver.get() (which returns once the page has loaded), are removed. Sleeps
+with nothing to wait for, such as polling loops or before find_elements()
+(which may expect no elements), are kept. In headless mode maximize_window()
+calls are removed as well; the window size comes from the browser options.
+
+Edits are made on the source text, so comments and formatting are kept.
+"""
+
+import ast
+from typing import Any, Dict, List, Optional, Tuple
+
+
+WAIT_TIMEOUT_S = 10
+
+# How a located element is used -> condition to wait for
+_CLICKABLE_USES = {"click", "send_keys", "clear", "submit"}
+_VISIBLE_USES = {"text", "size", "rect", "location", "screenshot", "screenshot_as_png"}
+
+_WAIT_IMPORT = "from selenium.webdriver.support.ui import WebDriverWait"
+_EC_IMPORT = "from selenium.webdriver.support import expected_conditions as EC"
+
+# Sentinel for "no wait inferred, keep the sleep"
+_KEEP = object()
+
+
+def rewrite_waits(script: str, headless: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """
+    Replace fixed sleeps in a script with explicit waits.
+
+    Args:
+        script: Python source of a generated script
+        headless: Also remove maximize_window() calls
+
+    Returns:
+        Rewritten script and a report of the changes. A script that does not
+        compile is returned unchanged with the error in the report.
+    """
+    report = {
+        "changes": [],
+        "sleeps_replaced": 0,
+        "sleeps_removed": 0,
+        "sleeps_kept": 0,
+        "maximize_removed": 0,
+        "sleep_seconds_removed": 0.0
+    }
+    try:
+        tree = ast.parse(script)
+    except SyntaxError as e:
+        report["error"] = f"Syntax error at line {e.lineno}: {e.msg}"
+        return script, report
+
+    rewriter = _Rewriter(script, tree, headless, report)
+    rewritten = rewriter.apply()
+    if rewritten == script:
+        return script, report
+
+    try:
+        compile(rewritten, "<string>", "exec")
+    except SyntaxError as e:
+        return script, {**report, "changes": [], "error": f"Rewrite produced invalid code at line {e.lineno}: {e.msg}"}
+    return rewritten, report
+
+
+class _Rewriter:
+    """Plans text edits for one parsed script"""
+
+    def __init__(self, script: str, tree: ast.Module, headless: bool, report: Dict[str, Any]):
+        self.script = script
+        self.lines = script.splitlines(keepends=True)
+        self.line_starts = [0]
+        for line in self.lines:
+            self.line_starts.append(self.line_starts[-1] + len(line))
+        self.tree = tree
+        self.headless = headless
+        self.report = report
+        self.edits: List[Tuple[int, int, str]] = []  # (start offset, end offset, replacement)
+        self.time_modules, self.sleep_names = self._sleep_names()
+        self.ec_alias, self.imports_needed = self._wait_names()
+        self.waits_added = False
+
+    def apply(self) -> str:
+        for node in ast.walk(self.tree):
+            for field in ("body", "orelse", "finalbody"):
+                block = getattr(node, field, None)
+                if isinstance(block, list) and block and isinstance(block[0], ast.stmt):
+                    self._rewrite_block(block)
+
+        if self.waits_added and self.imports_needed:
+            offset = self._import_offset()
+            # An import on a last line without a newline needs one first
+            prefix = "" if offset == 0 or self.script[offset - 1] == "\n" else "\n"
+            self.edits.append((offset, offset, prefix + "".join(line + "\n" for line in self.imports_needed)))
+
+        text = self.script
+        for start, end, replacement in sorted(self.edits, key=lambda edit: edit[0], reverse=True):
+            text = text[:start] + replacement + text[end:]
+        return text
+
+    def _rewrite_block(self, block: List[ast.stmt]) -> None:
+        removed = []
+        for i, stmt in enumerate(block):
+            previous = block[i - 1] if i > 0 else None
+            following = block[i + 1] if i + 1 < len(block) else None
+            shares_line = (
+                (previous is not None and previous.end_lineno == stmt.lineno)
+                or (following is not None and following.lineno == stmt.end_lineno)
+            )
+
+            if self._is_sleep(stmt):
+                seconds = self._sleep_seconds(stmt)
+                if shares_line:
+                    wait, reason = _KEEP, "shares a line with another statement"
+                else:
+                    wait, reason = self._infer_wait(previous, block[i + 1:])
+
+                if wait is _KEEP:
+                    self.report["sleeps_kept"] += 1
+                    self._record(stmt, "kept", reason)
+                elif wait is None:
+                    self.report["sleeps_removed"] += 1
+                    self.report["sleep_seconds_removed"] += seconds
+                    removed.append(stmt)
+                    self._record(stmt, "removed", reason)
+                else:
+                    self.report["sleeps_replaced"] += 1
+                    self.report["sleep_seconds_removed"] += seconds
+                    self.waits_added = True
+                    self.edits.append((*self._span(stmt), wait))
+                    self._record(stmt, "replaced", reason, wait)
+            elif self.headless and not shares_line and self._is_maximize(stmt):
+                self.report["maximize_removed"] += 1
+                removed.append(stmt)
+                self._record(stmt, "removed", "window size is set by the headless browser options")
+
+        for stmt in removed:
+            if len(removed) == len(block) and stmt is removed[0]:
+                # A block cannot be empty
+                self.edits.append((*self._span(stmt), "pass"))
+            else:
+                self.edits.append(self._line_span(stmt))
+
+    def _infer_wait(self, previous: Optional[ast.stmt], rest: List[ast.stmt]) -> Tuple[Any, str]:
+        """Wait statement replacing a sleep (None to remove it, _KEEP to keep it)"""
+        after_get = previous is not None and self._navigation(previous) is not None
+        if not rest:
+            if after_get:
+                return None, "driver.get() returns after the page has loaded"
+            return _KEEP, "no following statement to wait for"
+
+        following = rest[0]
+        for node in sorted(
+            (n for n in ast.walk(following) if isinstance(n, (ast.Call, ast.Attribute))),
+            key=lambda n: (n.lineno, n.col_offset, n.end_lineno, n.end_col_offset)
+        ):
+            if isinstance(node, ast.Attribute) and node.attr == "alert" and self._attr(node.value) == "switch_to":
+                receiver = node.value.value
+                if self._has_call(receiver):
+                    continue
+                return self._wait(receiver, "alert_is_present()"), "next statement switches to an alert"
+
+            if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+                continue
+            method = node.func.attr
+            if method in ("until", "until_not"):
+                return None, "next statement already waits explicitly"
+            if self._navigation(node) is not None:
+                return None, "next statement loads a page"
+            if method == "find_elements":
+                return _KEEP, "find_elements() may expect no elements"
+            if method == "find_element":
+                locator = self._locator(node)
+                if locator is None or self._has_call(node.func.value):
+                    return _KEEP, "locator could not be determined"
+                condition = self._condition(node, following, rest[1:])
+                return (
+                    self._wait(node.func.value, f"{condition}({locator})"),
+                    f"next statement finds {locator}"
+                )
+
+        if after_get:
+            return None, "driver.get() returns after the page has loaded"
+        return _KEEP, "next statement does not locate anything"
+
+    def _condition(self, call: ast.Call, statement: ast.stmt, later: List[ast.stmt]) -> str:
+        """Expected condition matching how the located element is used"""
+        use = None
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Attribute) and node.value is call:
+                use = node.attr
+                break
+        else:
+            # element = driver.find_element(...), used by a later statement
+            targets = getattr(statement, "targets", None) or [getattr(statement, "target", None)]
+            if getattr(statement, "value", None) is call and len(targets) == 1 and isinstance(targets[0], ast.Name):
+                name = targets[0].id
+                uses = [
+                    node for stmt in later for node in ast.walk(stmt)
+                    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == name
+                ]
+                if uses:
+                    use = min(uses, key=lambda n: (n.lineno, n.col_offset)).attr
+
+        if use in _CLICKABLE_USES:
+            return "element_to_be_clickable"
+        if use in _VISIBLE_USES:
+            return "visibility_of_element_located"
+        return "presence_of_element_located"
+
+    def _locator(self, call: ast.Call) -> Optional[str]:
+        """Source of the (by, value) tuple of a find_element() call"""
+        keywords = {keyword.arg: keyword.value for keyword in call.keywords}
+        by = call.args[0] if call.args else keywords.get("by")
+        value = call.args[1] if len(call.args) > 1 else keywords.get("value")
+        if value is None or any(isinstance(arg, ast.Starred) for arg in call.args):
+            return None
+        by_source = self._source(by) if by is not None else '"id"'
+        return f"({by_source}, {self._source(value)})"
+
+    def _wait(self, receiver: ast.expr, condition: str) -> str:
+        return f"WebDriverWait({self._source(receiver)}, {WAIT_TIMEOUT_S}).until({self.ec_alias}.{condition})"
+
+    def _navigation(self, node: ast.AST) -> Optional[ast.Call]:
+        """The driver.get(url) call of a statement or expression, if it is one"""
+        if isinstance(node, ast.Expr):
+            node = node.value
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "get"
+            and len(node.args) == 1
+            and self._source(node.func.value).endswith("driver")
+        ):
+            return node
+        return None
+
+    def _is_sleep(self, stmt: ast.stmt) -> bool:
+        if not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)):
+            return False
+        func = stmt.value.func
+        if isinstance(func, ast.Attribute):
+            return func.attr == "sleep" and isinstance(func.value, ast.Name) and func.value.id in self.time_modules
+        return isinstance(func, ast.Name) and func.id in self.sleep_names
+
+    def _is_maximize(self, stmt: ast.stmt) -> bool:
+        return (
+            isinstance(stmt, ast.Expr)
+            and isinstance(stmt.value, ast.Call)
+            and self._attr(stmt.value.func) in ("maximize_window", "fullscreen_window")
+        )
+
+    def _sleep_seconds(self, stmt: ast.Expr) -> float:
+        args = stmt.value.args
+        if args and isinstance(args[0], ast.Constant) and isinstance(args[0].value, (int, float)):
+            return float(args[0].value)
+        return 0.0
+
+    def _sleep_names(self) -> Tuple[set, set]:
+        """Names bound to the time module and to time.sleep"""
+        modules, functions = set(), set()
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Import):
+                modules.update(alias.asname or alias.name for alias in node.names if alias.name == "time")
+            elif isinstance(node, ast.ImportFrom) and node.module == "time":
+                functions.update(alias.asname or alias.name for alias in node.names if alias.name == "sleep")
+        return modules, functions
+
+    def _wait_names(self) -> Tuple[str, List[str]]:
+        """Name of expected_conditions in the script and the imports a wait needs"""
+        bound = set()
+        ec_alias = None
+        for node in self.tree.body:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    bound.add(alias.asname or alias.name.split(".")[0])
+                    if alias.name == "selenium.webdriver.support.expected_conditions" and alias.asname:
+                        ec_alias = alias.asname
+            elif isinstance(node, ast.ImportFrom):
+                for alias in node.names:
+                    bound.add(alias.asname or alias.name)
+                    if node.module == "selenium.webdriver.support" and alias.name == "expected_conditions":
+                        ec_alias = alias.asname or alias.name
+
+        needed = [] if "WebDriverWait" in bound else [_WAIT_IMPORT]
+        if ec_alias is None:
+            ec_alias = "EC"
+            needed.append(_EC_IMPORT)
+        return ec_alias, needed
+
+    def _import_offset(self) -> int:
+        """Offset after the last top-level import (or the module docstring)"""
+        line = 0
+        for node in self.tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                line = node.end_lineno
+            elif (
+                line == 0 and node is self.tree.body[0]
+                and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)
+                and isinstance(node.value.value, str)
+            ):
+                line = node.end_lineno
+        return self.line_starts[line]
+
+    def _record(self, stmt: ast.stmt, action: str, reason: str, replacement: str = None) -> None:
+        change = {"line": stmt.lineno, "action": action, "statement": self._source(stmt), "reason": reason}
+        if replacement:
+            change["replacement"] = replacement
+        self.report["changes"].append(change)
+
+    def _offset(self, lineno: int, col: int) -> int:
+        # AST columns are UTF-8 byte offsets
+        line = self.lines[lineno - 1]
+        return self.line_starts[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    def _span(self, node: ast.AST) -> Tuple[int, int]:
+        return self._offset(node.lineno, node.col_offset), self._offset(node.end_lineno, node.end_col_offset)
+
+    def _line_span(self, stmt: ast.stmt) -> Tuple[int, int, str]:
+        """Edit deleting the whole lines of a statement (with its trailing comment)"""
+        start, end = self._span(stmt)
+        line_start = self.line_starts[stmt.lineno - 1]
+        line_end = self.line_starts[stmt.end_lineno]
+        rest = self.script[end:line_end].strip()
+        if self.script[line_start:start].strip() or (rest and not rest.startswith("#")):
+            return start, end, "pass"
+        return line_start, line_end, ""
+
+    def _source(self, node: ast.AST) -> str:
+        return ast.get_source_segment(self.script, node) or ast.unparse(node)
+
+    @staticmethod
+    def _attr(node: ast.AST) -> Optional[str]:
+        return node.attr if isinstance(node, ast.Attribute) else None
+
+    @staticmethod
+    def _has_call(node: ast.AST) -> bool:
+        return any(isinstance(n, ast.Call) for n in ast.walk(node))
@@ -0,0 +1,666 @@
+"""
+Parallel runner for generated Selenium scripts.
+
+Generated scripts are unittest modules that start their own Chrome in
+setUpClass (`webdriver.Chrome(service=Service(ChromeDriverManager().install()))`).
+Starting a browser per class, and webdriver-manager's network lookup on every
+run, cost more than most tests. The runner executes the scripts unchanged
+across worker processes that each hold one warm headless Chrome:
+
+- `webdriver.Chrome(...)` returns the worker's pooled driver; its quit()
+  hands the browser back instead of closing it
+- `ChromeDriverManager().install()` returns the local chromedriver, so
+  nothing is downloaded
+- before each test class (where the script would have started a fresh
+  browser) the browser switches to a fresh browser context on about:blank,
+  or has its windows, cookies and storage cleared if that is not supported
+
+Test classes are the unit of work and are scheduled largest first. Results
+are returned as a JSON-serializable report and can be written as JUnit XML.
+
+Usage:
+    python -m backend.script_runner generated_tests/ --workers 8 --junit results.xml --json results.json
+    python -m backend.script_runner --from-store default --junit results.xml
+"""
+
+import os
+import re
+import ast
+import sys
+import json
+import time
+import types
+import shutil
+import hashlib
+import argparse
+import tempfile
+import unittest
+import importlib.util
+import multiprocessing
+import multiprocessing.util
+import xml.etree.ElementTree as ET
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.config import Config
+
+
+# One test class of a script, with the names of its test methods
+TestUnit = namedtuple("TestUnit", ["path", "class_name", "tests"])
+
+STATUSES = ("passed", "failed", "error", "skipped")
+
+
+def resolve_chromedriver(path: str = None) -> str:
+    """
+    Locate the local chromedriver.
+
+    Raises:
+        FileNotFoundError: If no chromedriver is configured or on PATH
+    """
+    path = path or Config.RUNNER_CHROMEDRIVER or shutil.which("chromedriver")
+    if not path or not os.path.isfile(path):
+        raise FileNotFoundError(
+            "chromedriver not found. Install it locally and put it on PATH or set "
+            "RUNNER_CHROMEDRIVER; the runner does not download drivers."
+        )
+    return path
+
+
+def find_scripts(paths: List[str]) -> List[str]:
+    """Python files among `paths`, expanding directories recursively"""
+    scripts = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith((".", "__")))
+                scripts.extend(
+                    os.path.join(root, f) for f in sorted(files)
+                    if f.endswith(".py") and f != "__init__.py"
+                )
+        else:
+            scripts.append(path)
+    return scripts
+
+
+def discover_units(paths: List[str]) -> Tuple[List[TestUnit], List[Dict[str, Any]]]:
+    """
+    Find the unittest classes of the scripts without importing them.
+
+    Returns:
+        Tuple of (test units, error results for scripts that do not parse)
+    """
+    units = []
+    errors = []
+    for script in find_scripts(paths):
+        try:
+            with open(script, "r", encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=script)
+        except (OSError, SyntaxError, ValueError) as e:
+            errors.append(_record(script, None, "<module>", "error", 0.0, f"{type(e).__name__}: {e}"))
+            continue
+
+        # Test methods of each TestCase subclass, including inherited local ones
+        test_classes: Dict[str, List[str]] = {}
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+            bases = [base.attr if isinstance(base, ast.Attribute) else getattr(base, "id", None) for base in node.bases]
+            if not any(base == "TestCase" or base in test_classes for base in bases):
+                continue
+            tests = [
+                item.name for item in node.body
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith("test")
+            ]
+            for base in bases:
+                tests.extend(t for t in test_classes.get(base, []) if t not in tests)
+            test_classes[node.name] = tests
+
+        units.extend(TestUnit(script, name, tests) for name, tests in test_classes.items() if tests)
+    return units, errors
+
+
+def run_scripts(
+    paths: List[str],
+    workers: int = None,
+    chromedriver: str = None,
+    screenshot_dir: str = None
+) -> Dict[str, Any]:
+    """
+    Run generated scripts in parallel.
+
+    Args:
+        paths: Script files or directories
+        workers: Worker processes (defaults to RUNNER_WORKERS)
+        chromedriver: Local chromedriver path (see resolve_chromedriver)
+        screenshot_dir: Directory for screenshots of failed tests
+
+    Returns:
+        Report with a summary and one result per test
+    """
+    units, results = discover_units(paths)
+    chromedriver = resolve_chromedriver(chromedriver)
+    workers = max(1, min(workers or Config.RUNNER_WORKERS, len(units) or 1))
+    if screenshot_dir:
+        os.makedirs(screenshot_dir, exist_ok=True)
+
+    options = {
+        "chromedriver": chromedriver,
+        "chrome_binary": Config.RUNNER_CHROME_BINARY,
+        "window_size": Config.RUNNER_WINDOW_SIZE,
+        "page_load_timeout": Config.RUNNER_PAGE_LOAD_TIMEOUT_S,
+        "max_uses": Config.RUNNER_DRIVER_MAX_USES,
+        "screenshot_dir": screenshot_dir
+    }
+
+    # Largest classes first so no worker is left with a long one at the end
+    units.sort(key=lambda unit: -len(unit.tests))
+
+    start_time = time.perf_counter()
+    if units:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(options,)
+        ) as executor:
+            futures = {executor.submit(_run_unit, unit): unit for unit in units}
+            for done, future in enumerate(as_completed(futures), 1):
+                unit = futures[future]
+                try:
+                    unit_results = future.result()
+                except Exception as e:
+                    # The worker died (e.g. the browser crashed the process)
+                    unit_results = [
+                        _record(unit.path, unit.class_name, test, "error", 0.0, f"Worker failed: {str(e)}")
+                        for test in unit.tests
+                    ]
+                results.extend(unit_results)
+                failed = sum(1 for r in unit_results if r["status"] in ("failed", "error"))
+                print(f"[{done}/{len(units)}] {_label(unit.path)}.{unit.class_name}: "
+                      f"{len(unit_results) - failed} ok, {failed} failed")
+
+    return build_report(results, time.perf_counter() - start_time, workers)
+
+
+def build_report(results: List[Dict[str, Any]], wall_seconds: float, workers: int) -> Dict[str, Any]:
+    """Summary and sorted results"""
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in STATUSES}
+    return {
+        "summary": {
+            "tests": len(results),
+            **counts,
+            "workers": workers,
+            "wall_seconds": round(wall_seconds, 3),
+            "test_seconds": round(sum(r["seconds"] for r in results), 3)
+        },
+        "results": sorted(results, key=lambda r: (r["file"], r["classname"], r["name"]))
+    }
+
+
+def write_junit(report: Dict[str, Any], path: str) -> None:
+    """Write a report as JUnit XML (one testsuite per test class)"""
+    summary = report["summary"]
+    root = ET.Element(
+        "testsuites",
+        name="qa-agent",
+        tests=str(summary["tests"]),
+        failures=str(summary["failed"]),
+        errors=str(summary["error"]),
+        skipped=str(summary["skipped"]),
+        time=f"{summary['wall_seconds']:.3f}"
+    )
+
+    by_class = defaultdict(list)
+    for result in report["results"]:
+        by_class[result["classname"]].append(result)
+
+    for classname, results in by_class.items():
+        suite = ET.SubElement(
+            root,
+            "testsuite",
+            name=classname,
+            file=results[0]["file"],
+            tests=str(len(results)),
+            failures=str(sum(1 for r in results if r["status"] == "failed")),
+            errors=str(sum(1 for r in results if r["status"] == "error")),
+            skipped=str(sum(1 for r in results if r["status"] == "skipped")),
+            time=f"{sum(r['seconds'] for r in results):.3f}"
+        )
+        for result in results:
+            case = ET.SubElement(
+                suite,
+                "testcase",
+                classname=classname,
+                name=result["name"],
+                file=result["file"],
+                time=f"{result['seconds']:.3f}"
+            )
+            if result["status"] in ("failed", "error"):
+                element = ET.SubElement(
+                    case,
+                    "failure" if result["status"] == "failed" else "error",
+                    message=(result["message"] or "").splitlines()[0][:500] if result["message"] else "",
+                    type=result.get("error_type") or ""
+                )
+                element.text = result.get("details") or result["message"]
+            elif result["status"] == "skipped":
+                ET.SubElement(case, "skipped", message=result["message"] or "")
+            if result.get("stdout"):
+                ET.SubElement(case, "system-out").text = result["stdout"]
+            if result.get("screenshot"):
+                ET.SubElement(case, "system-out").text = f"[[ATTACHMENT|{result['screenshot']}]]"
+
+    ET.indent(root)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def export_stored_scripts(project_id: str, directory: str) -> List[str]:
+    """
+    Write the latest stored script of each test case of a project to a directory.
+
+    Returns:
+        Paths of the written scripts
+    """
+    from backend.artifact_store import ArtifactStore
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for script in ArtifactStore().latest_scripts(project_id):
+        name = re.sub(r"\W+", "_", script["test_id"] or "script").strip("_").lower()
+        path = os.path.join(directory, f"test_{name}_{script['id']}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(script["script"])
+        paths.append(path)
+    return paths
+
+
+def _label(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _record(
+    path: str,
+    class_name: Optional[str],
+    name: str,
+    status: str,
+    seconds: float,
+    message: str = None,
+    **extra: Any
+) -> Dict[str, Any]:
+    """One test result"""
+    return {
+        "file": path,
+        "classname": f"{_label(path)}.{class_name}" if class_name else _label(path),
+        "name": name,
+        "status": status,
+        "seconds": round(seconds, 3),
+        "message": message,
+        **extra
+    }
+
+
+# Worker process side
+
+_worker: Optional["WorkerBrowser"] = None
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    global _worker
+    _worker = WorkerBrowser(**options)
+    _worker.install_patches()
+
+    # Quit the browser when the pool shuts the worker down (atexit does not
+    # run in multiprocessing children)
+    multiprocessing.util.Finalize(None, _worker.discard, exitpriority=10)
+
+
+def _run_unit(unit: TestUnit) -> List[Dict[str, Any]]:
+    return _worker.run_unit(unit)
+
+
+class _PooledDriver:
+    """The worker's driver as handed to a script: quit() keeps the browser running"""
+
+    def __init__(self, driver: Any):
+        object.__setattr__(self, "_driver", driver)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._driver, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._driver, name, value)
+
+    def quit(self) -> None:
+        pass
+
+    def close(self) -> None:
+        # Closing the last window would end the session
+        if len(self._driver.window_handles) > 1:
+            self._driver.close()
+        else:
+            self._driver.get("about:blank")
+
+
+class WorkerBrowser:
+    """The warm headless Chrome of one worker process"""
+
+    def __init__(
+        self,
+        chromedriver: str,
+        chrome_binary: str = "",
+        window_size: str = "1920,1080",
+        page_load_timeout: float = 30,
+        max_uses: int = 100,
+        screenshot_dir: str = None
+    ):
+        self.chromedriver = chromedriver
+        self.chrome_binary = chrome_binary
+        self.window_size = window_size
+        self.page_load_timeout = page_load_timeout
+        self.max_uses = max_uses
+        self.screenshot_dir = screenshot_dir
+        self.driver = None
+        self.uses = 0
+        self._chrome_class = None
+        self._context_id = None
+        self._contexts_supported = True
+
+    def install_patches(self) -> None:
+        """Route the scripts' driver creation to this worker's browser"""
+        # Selenium Manager must not try to download anything either
+        os.environ.setdefault("SE_OFFLINE", "true")
+
+        from selenium import webdriver
+
+        self._chrome_class = webdriver.Chrome
+        webdriver.Chrome = lambda *args, **kwargs: _PooledDriver(self.acquire())
+
+        chromedriver = self.chromedriver
+        try:
+            from webdriver_manager.chrome import ChromeDriverManager
+            ChromeDriverManager.install = lambda manager: chromedriver
+        except ImportError:
+            # Scripts import webdriver-manager even though it is not needed here
+            class ChromeDriverManager:
+                def __init__(self, *args, **kwargs):
+                    pass
+
+                def install(self) -> str:
+                    return chromedriver
+
+            package = types.ModuleType("webdriver_manager")
+            chrome = types.ModuleType("webdriver_manager.chrome")
+            chrome.ChromeDriverManager = ChromeDriverManager
+            package.chrome = chrome
+            sys.modules["webdriver_manager"] = package
+            sys.modules["webdriver_manager.chrome"] = chrome
+
+    def acquire(self) -> Any:
+        """The running browser, started on first use"""
+        if self.driver is None:
+            self.driver = self._start()
+        return self.driver
+
+    def _start(self) -> Any:
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+
+        options = Options()
+        for argument in (
+            "--headless=new",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-gpu",
+            "--disable-extensions",
+            "--no-first-run",
+            f"--window-size={self.window_size}"
+        ):
+            options.add_argument(argument)
+        if self.chrome_binary:
+            options.binary_location = self.chrome_binary
+
+        driver = self._chrome_class(service=Service(executable_path=self.chromedriver), options=options)
+        driver.set_page_load_timeout(self.page_load_timeout)
+        self.uses = 0
+        self._context_id = None
+        return driver
+
+    def reset(self) -> None:
+        """Give the next test class a clean browser (or a new one if it is unusable)"""
+        if self.driver is None:
+            return
+        self.uses += 1
+        if self.uses >= self.max_uses:
+            self.discard()
+            return
+
+        try:
+            if self._contexts_supported:
+                try:
+                    self._switch_to_fresh_context()
+                    return
+                except Exception as e:
+                    self._contexts_supported = False
+                    print(f"Browser contexts unavailable, clearing state instead: {str(e)}")
+            self._clear_state()
+        except Exception:
+            self.discard()
+
+    def _switch_to_fresh_context(self) -> None:
+        """Open about:blank in a new browser context and close everything else"""
+        driver = self.driver
+        context_id = driver.execute_cdp_cmd("Target.createBrowserContext", {})["browserContextId"]
+        target_id = driver.execute_cdp_cmd(
+            "Target.createTarget", {"url": "about:blank", "browserContextId": context_id}
+        )["targetId"]
+
+        for handle in driver.window_handles:
+            if handle != target_id:
+                driver.switch_to.window(handle)
+                driver.close()
+        driver.switch_to.window(target_id)
+
+        if self._context_id:
+            driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": self._context_id})
+        self._context_id = context_id
+
+    def _clear_state(self) -> None:
+        driver = self.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception:
+            pass
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def discard(self) -> None:
+        """Quit the browser; the next test class starts a new one"""
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+
+    def run_unit(self, unit: TestUnit) -> List[Dict[str, Any]]:
+        """Run one test class"""
+        try:
+            test_class = getattr(self._load(unit.path), unit.class_name)
+        except Exception as e:
+            return [
+                _record(unit.path, unit.class_name, test, "error", 0.0, f"Could not load script: {type(e).__name__}: {e}")
+                for test in unit.tests
+            ]
+
+        self.reset()
+        result = _RecordingResult(unit, self)
+        unittest.defaultTestLoader.loadTestsFromTestCase(test_class).run(result)
+        return result.records
+
+    def _load(self, path: str) -> types.ModuleType:
+        """Import a script once per worker (under a unique module name)"""
+        name = "qa_script_" + hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+        module = sys.modules.get(name)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[name] = module
+            try:
+                spec.loader.exec_module(module)
+            except Exception:
+                del sys.modules[name]
+                raise
+        return module
+
+    def screenshot(self, test_id: str) -> Optional[str]:
+        if not self.screenshot_dir or self.driver is None:
+            return None
+        path = os.path.join(self.screenshot_dir, re.sub(r"[^\w.-]+", "_", test_id) + ".png")
+        try:
+            self.driver.save_screenshot(path)
+            return path
+        except Exception:
+            return None
+
+
+class _RecordingResult(unittest.TestResult):
+    """Collect per-test results (with output and timings) as plain dicts"""
+
+    def __init__(self, unit: TestUnit, browser: WorkerBrowser):
+        super().__init__()
+        self.buffer = True
+        self.unit = unit
+        self.browser = browser
+        self.records: List[Dict[str, Any]] = []
+        self._start_time = None
+        self._outcome = None
+
+    def startTest(self, test: unittest.TestCase) -> None:
+        super().startTest(test)
+        self._start_time = time.perf_counter()
+        self._outcome = None
+
+    def stopTest(self, test: unittest.TestCase) -> None:
+        status, message, details, error_type = self._outcome or ("passed", None, None, None)
+        seconds = time.perf_counter() - self._start_time if self._start_time else 0.0
+        stdout = self._stdout_buffer.getvalue() if self._stdout_buffer else ""
+        stderr = self._stderr_buffer.getvalue() if self._stderr_buffer else ""
+        for buffer in (self._stdout_buffer, self._stderr_buffer):
+            # Kept in the record, not echoed to the worker's console
+            if buffer is not None:
+                buffer.seek(0)
+                buffer.truncate()
+
+        name = getattr(test, "_testMethodName", str(test))
+        screenshot = None
+        if status in ("failed", "error"):
+            screenshot = self.browser.screenshot(f"{_label(self.unit.path)}.{self.unit.class_name}.{name}")
+
+        self.records.append(_record(
+            self.unit.path,
+            self.unit.class_name,
+            name,
+            status,
+            seconds,
+            message,
+            details=details,
+            error_type=error_type,
+            stdout=(stdout + stderr) or None,
+            screenshot=screenshot,
+            worker=os.getpid()
+        ))
+        super().stopTest(test)
+
+    def _set_outcome(self, status: str, test: Any = None, err: Any = None, message: str = None) -> None:
+        if err is not None:
+            exc_type, exc_value, _ = err
+            message = f"{exc_type.__name__}: {exc_value}"
+            details = self._exc_info_to_string(err, test)
+            self._outcome = (status, message, details, exc_type.__name__)
+        else:
+            self._outcome = (status, message, None, None)
+
+    def addError(self, test: Any, err: Any) -> None:
+        super().addError(test, err)
+        if isinstance(test, unittest.TestCase):
+            self._set_outcome("error", test, err)
+        else:
+            # setUpClass/tearDownClass failure: reported once for the class
+            _, exc_value, _ = err
+            self.records.append(_record(
+                self.unit.path, self.unit.class_name, str(test).split(" ")[0], "error", 0.0,
+                f"{type(exc_value).__name__}: {exc_value}",
+                details=self._exc_info_to_string(err, test),
+                error_type=type(exc_value).__name__,
+                worker=os.getpid()
+            ))
+
+    def addFailure(self, test: unittest.TestCase, err: Any) -> None:
+        super().addFailure(test, err)
+        self._set_outcome("failed", test, err)
+
+    def addSkip(self, test: unittest.TestCase, reason: str) -> None:
+        super().addSkip(test, reason)
+        self._set_outcome("skipped", message=reason)
+
+    def addExpectedFailure(self, test: unittest.TestCase, err: Any) -> None:
+        super().addExpectedFailure(test, err)
+        self._set_outcome("passed", message="expected failure")
+
+    def addUnexpectedSuccess(self, test: unittest.TestCase) -> None:
+        super().addUnexpectedSuccess(test)
+        self._set_outcome("failed", message="unexpected success")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run generated Selenium scripts in parallel headless Chrome")
+    parser.add_argument("paths", nargs="*", help="Script files or directories")
+    parser.add_argument("--from-store", metavar="PROJECT", help="Run the latest stored script of each test case of a project")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: RUNNER_WORKERS)")
+    parser.add_argument("--chromedriver", default=None, help="Local chromedriver (default: RUNNER_CHROMEDRIVER or PATH)")
+    parser.add_argument("--junit", metavar="FILE", help="Write JUnit XML results")
+    parser.add_argument("--json", metavar="FILE", help="Write JSON results")
+    parser.add_argument("--screenshots", metavar="DIR", help="Save screenshots of failed tests")
+    args = parser.parse_args()
+
+    paths = list(args.paths)
+    export_dir = None
+    if args.from_store:
+        export_dir = tempfile.mkdtemp(prefix="qa-scripts-")
+        exported = export_stored_scripts(args.from_store, export_dir)
+        print(f"Exported {len(exported)} stored script(s) of project '{args.from_store}'")
+        paths.append(export_dir)
+    if not paths:
+        parser.error("no scripts given (pass paths or --from-store)")
+
+    try:
+        report = run_scripts(paths, args.workers, args.chromedriver, args.screenshots)
+    finally:
+        if export_dir:
+            shutil.rmtree(export_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.junit:
+        write_junit(report, args.junit)
+
+    summary = report["summary"]
+    print(
+        f"{summary['tests']} tests: {summary['passed']} passed, {summary['failed']} failed, "
+        f"{summary['error']} errors, {summary['skipped']} skipped in {summary['wall_seconds']:.1f}s "
+        f"({summary['workers']} workers, {summary['test_seconds']:.1f}s of test time)"
+    )
+    return 0 if summary["failed"] == 0 and summary["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
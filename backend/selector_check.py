@@ -0,0 +1,434 @@
+"""
+Static locator validation of generated scripts against the target page.
+
+validate_script_syntax() only compiles a script, so a script that locates a
+made-up id passes and then fails in CI after its wait times out.
+check_selectors() takes every locator with a literal value from a script's
+AST (find_element() arguments and (By.X, value) tuples) and resolves it
+against the parsed HTML:
+
+- By.ID / NAME / CLASS_NAME / TAG_NAME / LINK_TEXT via dictionaries of the page
+- By.CSS_SELECTOR via cssselect's XPath translation (compiled once per selector)
+- By.XPATH with lxml
+
+Locators that match nothing come back with the closest ids, names and
+classes of the page. Those whose ids, names or classes the page's own
+scripts create (an `.id =` / `.className =` assignment, setAttribute(),
+classList.add() or an HTML fragment string) are reported as dynamic rather
+than unresolved, since they only exist at runtime (cart rows, messages).
+A token the scripts merely mention, such as a variable or property name,
+does not count.
+
+A PageIndex is built once per page and can check any number of scripts.
+"""
+
+import re
+import ast
+import json
+import bisect
+import difflib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from lxml import etree, html as lxml_html
+from cssselect import HTMLTranslator, SelectorError
+
+
+# Selenium's By constants and their string values
+BY_VALUES = {
+    "ID": "id",
+    "NAME": "name",
+    "CLASS_NAME": "class name",
+    "TAG_NAME": "tag name",
+    "CSS_SELECTOR": "css selector",
+    "XPATH": "xpath",
+    "LINK_TEXT": "link text",
+    "PARTIAL_LINK_TEXT": "partial link text"
+}
+_BY_NAMES = {value: name for name, value in BY_VALUES.items()}
+
+_FIND_METHODS = {"find_element", "find_elements"}
+
+# Lines that can hold a locator (anything else is not walked)
+_LOCATOR_LINE_RE = re.compile(
+    r"\bBy\b|find_elements?\b|[\"'](?:id|name|class name|tag name|css selector|xpath|link text|partial link text)[\"']"
+)
+
+# State-dependent pseudo-classes a static page cannot answer
+_STATEFUL_CSS_RE = re.compile(r":(hover|focus|focus-within|focus-visible|active|visited|target)\b")
+_QUOTED_RE = re.compile(r"'[^']*'|\"[^\"]*\"")
+_CSS_ID_RE = re.compile(r"#([\w-]+)")
+_CSS_CLASS_RE = re.compile(r"\.(-?[A-Za-z_][\w-]*)")
+_ATTRIBUTE_RE = re.compile(r"""@?\b(id|name|class)\s*[~|^$*]?=\s*["']([^"']+)["']""")
+_CONTAINS_RE = re.compile(r"""contains\(\s*@(id|name|class)\s*,\s*["']([^"']+)["']""")
+
+# Page-script contexts that create an id, name or class at runtime
+_JS_PROPERTY_RE = re.compile(r"""\.(id|className)\s*=\s*(["'`])([^"'`]*)\2""")
+_JS_SET_ATTRIBUTE_RE = re.compile(
+    r"""setAttribute\(\s*["'](id|name|class)["']\s*,\s*(["'`])([^"'`]*)\2"""
+)
+_JS_CLASS_LIST_RE = re.compile(r"""classList\.(?:add|toggle|replace)\(([^)]*)\)""")
+_JS_STRING_RE = re.compile(r"""(["'`])([^"'`]*)\1""")
+_HTML_FRAGMENT_RE = re.compile(r"""(?<![\w.$[-])(id|name|class)\s*=\s*(\\?["'])([^"'\\]*)\2""")
+
+MAX_SUGGESTIONS = 3
+
+
+class UncheckableSelector(ValueError):
+    """A valid selector whose matches depend on browser state"""
+
+
+class PageIndex:
+    """Parsed page with lookup tables for locator resolution"""
+
+    def __init__(self, html: str):
+        self.root = lxml_html.document_fromstring(html)
+        self.ids: Counter = Counter()
+        self.names: Counter = Counter()
+        self.classes: Counter = Counter()
+        self.tags: Counter = Counter()
+        self.link_texts: List[str] = []
+
+        for element in self.root.iter():
+            if not isinstance(element.tag, str):
+                continue  # comments and processing instructions
+            self.tags[element.tag] += 1
+            if element.get("id"):
+                self.ids[element.get("id")] += 1
+            if element.get("name"):
+                self.names[element.get("name")] += 1
+            self.classes.update(element.get("class", "").split())
+            if element.tag == "a":
+                self.link_texts.append(" ".join(element.text_content().split()))
+
+        self.script_tokens = _script_tokens("\n".join(self.root.xpath("//script/text()")))
+        self._translator = HTMLTranslator()
+        self._compiled: Dict[Tuple[str, str], Any] = {}
+
+    def count(self, by: str, value: str) -> int:
+        """
+        Number of elements a locator matches.
+
+        Raises:
+            UncheckableSelector: If the matches depend on browser state
+            ValueError: If the selector is invalid
+        """
+        if by == "id":
+            return self.ids.get(value, 0)
+        if by == "name":
+            return self.names.get(value, 0)
+        if by == "class name":
+            if len(value.split()) != 1:
+                raise ValueError("compound class names are not allowed; use a CSS selector")
+            return self.classes.get(value, 0)
+        if by == "tag name":
+            return self.tags.get(value.lower(), 0)
+        if by == "link text":
+            return sum(1 for text in self.link_texts if text == value.strip())
+        if by == "partial link text":
+            return sum(1 for text in self.link_texts if value in text)
+        if by in ("css selector", "xpath"):
+            result = self._compile(by, value)(self.root)
+            if not isinstance(result, list):
+                raise ValueError("XPath does not select elements")
+            return sum(1 for node in result if isinstance(node, etree._Element))
+        raise ValueError(f"unknown locator strategy '{by}'")
+
+    def _compile(self, by: str, value: str) -> Any:
+        key = (by, value)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            try:
+                if by == "css selector":
+                    if _STATEFUL_CSS_RE.search(value):
+                        raise UncheckableSelector("depends on browser state")
+                    compiled = etree.XPath(self._translator.css_to_xpath(value))
+                else:
+                    compiled = etree.XPath(value)
+            except (SelectorError, etree.XPathError) as e:
+                raise ValueError(f"invalid selector: {str(e) or type(e).__name__}")
+            self._compiled[key] = compiled
+        return compiled
+
+    def candidates(self, kind: str) -> List[str]:
+        return list({"id": self.ids, "name": self.names, "class": self.classes}[kind])
+
+    def in_scripts(self, kind: str, token: str) -> bool:
+        """Whether the page's own JavaScript creates an id, name or class"""
+        return token in self.script_tokens[kind]
+
+
+def _script_tokens(script_text: str) -> Dict[str, set]:
+    """Ids, names and classes that page scripts assign or write into HTML strings"""
+    tokens = {"id": set(), "name": set(), "class": set()}
+
+    def add(kind: str, value: str) -> None:
+        for token in value.split() if kind == "class" else [value.strip()]:
+            if token and "${" not in token:
+                tokens[kind].add(token)
+
+    for prop, _, value in _JS_PROPERTY_RE.findall(script_text):
+        add("id" if prop == "id" else "class", value)
+    for kind, _, value in _JS_SET_ATTRIBUTE_RE.findall(script_text):
+        add(kind, value)
+    for arguments in _JS_CLASS_LIST_RE.findall(script_text):
+        for _, value in _JS_STRING_RE.findall(arguments):
+            add("class", value)
+    for kind, _, value in _HTML_FRAGMENT_RE.findall(script_text):
+        add(kind, value)
+    return tokens
+
+
+class Locator:
+    """A literal locator in a script, with the source positions to edit it"""
+
+    def __init__(self, by: str, value: str, by_node: ast.AST, value_node: ast.Constant):
+        self.by = by
+        self.value = value
+        self.by_node = by_node
+        self.value_node = value_node
+
+    @property
+    def line(self) -> int:
+        return self.value_node.lineno
+
+
+def extract_locators(tree: ast.AST, script: str) -> Tuple[List[Locator], int]:
+    """
+    Literal locators of a parsed script.
+
+    Returns:
+        Tuple of (locators in source order, number of locators skipped
+        because their value is computed at runtime)
+    """
+    locators = []
+    skipped = 0
+    seen = set()
+
+    for node in _candidate_nodes(tree, script):
+        pair = None
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in _FIND_METHODS:
+            keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+            by = node.args[0] if node.args else keywords.get("by")
+            value = node.args[1] if len(node.args) > 1 else keywords.get("value")
+            if by is not None and value is not None:
+                pair = (by, value)
+        elif isinstance(node, ast.Tuple) and len(node.elts) == 2 and _by_value(node.elts[0]) is not None:
+            pair = tuple(node.elts)
+
+        if pair is None or id(pair[1]) in seen:
+            continue
+        seen.add(id(pair[1]))
+        by = _by_value(pair[0])
+        if by is None:
+            continue
+        if isinstance(pair[1], ast.Constant) and isinstance(pair[1].value, str):
+            locators.append(Locator(by, pair[1].value, pair[0], pair[1]))
+        else:
+            skipped += 1
+
+    locators.sort(key=lambda locator: (locator.value_node.lineno, locator.value_node.col_offset))
+    return locators, skipped
+
+
+def _candidate_nodes(tree: ast.AST, script: str) -> List[ast.AST]:
+    """Nodes of a tree, skipping those that span no line mentioning a locator"""
+    lines = [
+        number for number, line in enumerate(script.splitlines(), 1)
+        if _LOCATOR_LINE_RE.search(line)
+    ]
+    nodes = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        start = getattr(node, "lineno", None)
+        if start is not None:
+            index = bisect.bisect_left(lines, start)
+            if index == len(lines) or lines[index] > node.end_lineno:
+                continue
+        nodes.append(node)
+        stack.extend(ast.iter_child_nodes(node))
+    return nodes
+
+
+def _by_value(node: ast.AST) -> Optional[str]:
+    """Strategy string of By.X or a literal strategy string"""
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "By":
+        return BY_VALUES.get(node.attr)
+    if isinstance(node, ast.Constant) and node.value in _BY_NAMES:
+        return node.value
+    return None
+
+
+def check_selectors(script: str, page: PageIndex) -> Dict[str, Any]:
+    """
+    Resolve the literal locators of a script against a page.
+
+    Args:
+        script: Python source of a generated script
+        page: Index of the target page
+
+    Returns:
+        Report with "valid" (no unresolved or invalid locators), the counts,
+        and the unresolved, dynamic, invalid and unchecked locators with
+        their lines
+    """
+    report = {
+        "valid": True,
+        "checked": 0,
+        "resolved": 0,
+        "skipped": 0,
+        "unresolved": [],
+        "dynamic": [],
+        "invalid": [],
+        "unchecked": []
+    }
+    try:
+        tree = ast.parse(script)
+    except SyntaxError as e:
+        report.update(valid=False, error=f"Syntax error at line {e.lineno}: {e.msg}")
+        return report
+
+    locators, report["skipped"] = extract_locators(tree, script)
+
+    # One entry per distinct locator, with every line it appears on
+    grouped: Dict[Tuple[str, str], List[int]] = {}
+    for locator in locators:
+        grouped.setdefault((locator.by, locator.value), []).append(locator.line)
+    report["checked"] = len(grouped)
+
+    for (by, value), lines in grouped.items():
+        entry = {"by": _BY_NAMES[by], "value": value, "lines": lines}
+        try:
+            matches = page.count(by, value)
+        except UncheckableSelector as e:
+            report["unchecked"].append({**entry, "reason": str(e)})
+            continue
+        except ValueError as e:
+            report["invalid"].append({**entry, "error": str(e)})
+            continue
+        if matches:
+            report["resolved"] += 1
+            continue
+
+        tokens = _tokens(by, value)
+        missing = [(kind, token) for kind, token in tokens if token not in page.candidates(kind)]
+        if missing and all(page.in_scripts(kind, token) for kind, token in missing):
+            report["dynamic"].append({**entry, "reason": "not in the static page; created by its scripts"})
+            continue
+
+        entry["reason"] = _reason(by, missing)
+        entry["suggestions"] = _suggestions(page, by, value, missing)
+        report["unresolved"].append(entry)
+
+    report["valid"] = not report["unresolved"] and not report["invalid"]
+    return report
+
+
+def _tokens(by: str, value: str) -> List[Tuple[str, str]]:
+    """The ids, names and classes a locator refers to"""
+    if by in ("id", "name"):
+        return [(by, value)]
+    if by == "class name":
+        return [("class", value.strip())]
+    if by == "css selector":
+        unquoted = _QUOTED_RE.sub("", value)
+        tokens = [("id", token) for token in _CSS_ID_RE.findall(unquoted)]
+        tokens += [("class", token) for token in _CSS_CLASS_RE.findall(unquoted)]
+        tokens += _ATTRIBUTE_RE.findall(value)
+        return tokens
+    if by == "xpath":
+        return _ATTRIBUTE_RE.findall(value) + _CONTAINS_RE.findall(value)
+    return []
+
+
+def _reason(by: str, missing: List[Tuple[str, str]]) -> str:
+    if missing:
+        return "no element with " + ", ".join(f"{kind} '{token}'" for kind, token in missing)
+    if by in ("tag name", "link text", "partial link text"):
+        return f"no element matches this {by}"
+    return "matches no element, although the ids and classes it uses exist"
+
+
+def _suggestions(page: PageIndex, by: str, value: str, missing: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    """Locators on the page close to an unresolved one, checked to resolve"""
+    if by in ("link text", "partial link text"):
+        return [
+            {"by": "LINK_TEXT", "value": text}
+            for text in difflib.get_close_matches(value, page.link_texts, n=MAX_SUGGESTIONS, cutoff=0.6)
+        ]
+
+    suggestions = []
+    for kind, token in missing:
+        for match in difflib.get_close_matches(token, page.candidates(kind), n=MAX_SUGGESTIONS, cutoff=0.6):
+            if by in ("id", "name", "class name"):
+                suggestion = match
+            else:
+                suggestion = re.sub(rf"(?<![\w-]){re.escape(token)}(?![\w-])", match, value)
+            try:
+                if page.count(by, suggestion):
+                    suggestions.append({"by": _BY_NAMES[by], "value": suggestion})
+            except ValueError:
+                continue
+
+        # The token exists under the other attribute (By.NAME "email" for id="email")
+        if by == "name" and token in page.ids:
+            suggestions.append({"by": "ID", "value": token})
+        elif by == "id" and token in page.names:
+            suggestions.append({"by": "NAME", "value": token})
+
+    unique = []
+    for suggestion in suggestions:
+        if suggestion not in unique:
+            unique.append(suggestion)
+    return unique[:MAX_SUGGESTIONS]
+
+
+def apply_locator_fixes(script: str, fixes: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Replace locators in a script.
+
+    Args:
+        script: Python source of a script
+        fixes: {"by", "value", "new_by", "new_value"} dicts, with By
+            constant names (ID, CSS_SELECTOR, ...) as strategies
+
+    Returns:
+        Edited script and the fixes that were applied
+    """
+    tree = ast.parse(script)
+    locators, _ = extract_locators(tree, script)
+    lines = script.splitlines(keepends=True)
+    line_starts = [0]
+    for line in lines:
+        line_starts.append(line_starts[-1] + len(line))
+
+    def offset(lineno: int, col: int) -> int:
+        # AST columns are UTF-8 byte offsets
+        return line_starts[lineno - 1] + len(lines[lineno - 1].encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    by_fix = {(BY_VALUES.get(fix["by"], fix["by"]), fix["value"]): fix for fix in fixes}
+    edits = []
+    applied = []
+    for locator in locators:
+        fix = by_fix.get((locator.by, locator.value))
+        if fix is None or fix["new_by"] not in BY_VALUES:
+            continue
+        edits.append((
+            offset(locator.value_node.lineno, locator.value_node.col_offset),
+            offset(locator.value_node.end_lineno, locator.value_node.end_col_offset),
+            json.dumps(fix["new_value"])
+        ))
+        if BY_VALUES[fix["new_by"]] != locator.by:
+            new_by = f"By.{fix['new_by']}" if isinstance(locator.by_node, ast.Attribute) else json.dumps(BY_VALUES[fix["new_by"]])
+            edits.append((
+                offset(locator.by_node.lineno, locator.by_node.col_offset),
+                offset(locator.by_node.end_lineno, locator.by_node.end_col_offset),
+                new_by
+            ))
+        if fix not in applied:
+            applied.append(fix)
+
+    for start, end, replacement in sorted(edits, reverse=True):
+        script = script[:start] + replacement + script[end:]
+    return script, applied
@@ -2,45 +2,205 @@
 Selenium Script Generation Agent - Generates executable Selenium Python scripts from test cases.
 """
 
-from typing import Dict, Any
-from backend.llm_handler import LLMHandler
+import re
+import ast
+import json
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+from backend.config import Config
+from backend.llm_handler import LLMHandler, served_by
 from backend.vector_db import VectorDatabase
+from backend.profiling import span
+from backend.script_rewriter import rewrite_waits
+from backend.selector_check import BY_VALUES, PageIndex, apply_locator_fixes, check_selectors
+from backend.json_repair import parse_json
+from backend.schemas import LOCATOR_FIX_LIST_SCHEMA, LocatorFixList
+
+
+# Page ids, names and classes listed in a locator repair prompt (each)
+REPAIR_OUTLINE_LIMIT = 300
+
+# Test case fields that appear in the script generation prompt
+PROMPT_FIELDS = (
+    "test_id", "feature", "test_scenario", "test_type", "preconditions", "test_steps", "expected_result"
+)
+
+# System prompt for Selenium generation
+SCRIPT_SYSTEM_PROMPT = """You are an expert Selenium test automation engineer with deep knowledge of Python and web testing.
+
+Your task is to generate a complete, executable Selenium Python script based on the provided test case and HTML structure.
+
+CRITICAL REQUIREMENTS:
+1. Use actual element IDs, names, and CSS selectors from the HTML
+2. Include proper imports (selenium, webdriver_manager, unittest, etc.)
+3. Use explicit waits with WebDriverWait
+4. Include proper assertions
+5. Add error handling and teardown
+6. Use unittest framework
+7. Add comments explaining each step
+8. Make the script runnable as-is
+9. Use Chrome WebDriver with automatic driver management
+10. Include setup and teardown methods
+
+Code Quality Standards:
+- Clean, readable, PEP 8 compliant code
+- Proper exception handling
+- Meaningful variable names
+- Comprehensive assertions
+- Screenshots on failure (optional but recommended)
+
+Output Format:
+Return ONLY the complete Python script. No explanations before or after.
+The script should be ready to save as a .py file and execute."""
+
+SCRIPT_TEMPERATURE = 0.3  # Lower temperature for more consistent code
+SCRIPT_MAX_TOKENS = 3000
+
+# System prompt for several test cases of one page in a single module
+BATCH_SYSTEM_PROMPT = """You are an expert Selenium test automation engineer with deep knowledge of Python and web testing.
+
+Your task is to generate ONE complete, executable Selenium Python test module for several test cases of the same page, based on the provided test cases and HTML structure.
+
+CRITICAL REQUIREMENTS:
+1. Use actual element IDs, names, and CSS selectors from the HTML
+2. Include proper imports (selenium, webdriver_manager, unittest, etc.)
+3. Use explicit waits with WebDriverWait
+4. Include proper assertions
+5. Add error handling and teardown
+6. Use unittest framework with one TestCase class
+7. Write exactly one test method per test case, named exactly as given for that case
+8. Keep test methods independent: every test method must run on its own, so shared steps go in setUp or helper methods, never in another test method
+9. Add comments explaining each step
+10. Use Chrome WebDriver with automatic driver management, created in setUp and quit in tearDown
+
+Code Quality Standards:
+- Clean, readable, PEP 8 compliant code
+- Proper exception handling
+- Meaningful variable names
+- Comprehensive assertions
+
+Output Format:
+Return ONLY the complete Python module. No explanations before or after.
+The module should be ready to save as a .py file and execute."""
+
+# Output tokens of a batched generation: per test case, up to this cap
+BATCH_TOKENS_PER_CASE = 1500
+BATCH_MAX_TOKENS = 8000
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _statement_lines(node: ast.AST, lines: List[str]) -> Tuple[int, int]:
+    """First and last line of a statement with its decorators, comments and the blank lines above"""
+    first = min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+    while first > 1 and (not lines[first - 2].strip() or lines[first - 2].strip().startswith("#")):
+        first -= 1
+    return first, node.end_lineno
 
 
 class SeleniumScriptAgent:
     """Agent for generating Selenium test scripts"""
     
-    def __init__(self, vector_db: VectorDatabase, llm_handler: LLMHandler):
+    def __init__(self, vector_db: VectorDatabase, llm_handler: LLMHandler, script_cache: Any = None):
         """
         Initialize Selenium script agent.
         
         Args:
             vector_db: Vector database instance
             llm_handler: LLM handler instance
+            script_cache: Content-addressed script cache (ArtifactStore.script_cache);
+                scripts are always generated if omitted
         """
         self.vector_db = vector_db
         self.llm = llm_handler
+        self.script_cache = script_cache if Config.SELENIUM_SCRIPT_CACHE else None
+        
+        # Prompts and retrieved chunks of the last generation
+        self.provenance: Dict[str, Any] = {}
+        
+        # Whether the last script came from the cache
+        self.cache_report: Dict[str, Any] = {}
+        
+        # Sleeps replaced by explicit waits in the last generated script
+        self.rewrite_report: Dict[str, Any] = {}
+        
+        # LLM calls and batches of the last generate_scripts()
+        self.batch_report: Dict[str, Any] = {}
+        
+        # Index of the last checked page, reused while the HTML is the same
+        self._page: Optional[Tuple[str, PageIndex]] = None
     
     def generate_selenium_script(
         self,
         test_case: Dict[str, Any],
-        html_content: str = None
+        html_content: str = None,
+        use_cache: bool = True
     ) -> str:
         """
         Generate Selenium Python script from test case.
         
+        A script cached for the same test case, page, documentation context
+        and model settings is returned without calling the LLM.
+        Fixed sleeps in a generated script are replaced with explicit waits
+        (see rewrite_report).
+        
         Args:
             test_case: Test case dictionary
             html_content: HTML content of the target page
+            use_cache: Look up the script cache (a generated script is cached either way)
             
         Returns:
             Python Selenium script as string
         """
         # Retrieve HTML structure from vector DB if not provided
-        if not html_content:
-            html_results = self.vector_db.search("HTML structure checkout", top_k=3)
-            html_content = "\n".join([chunk["content"] for chunk in html_results])
+        html_content = html_content or self._search_html()
+        request = self._script_request(test_case, html_content)
+        
+        self.provenance = {
+            "prompt": f"{SCRIPT_SYSTEM_PROMPT}\n\n{request['prompt']}",
+            "context": self._context_provenance(request["context_chunks"])
+        }
+        self.cache_report = {"enabled": self.script_cache is not None, "hit": False, "key": request["key"]}
+        self.rewrite_report = {}
+        
+        if self.script_cache is not None and use_cache:
+            with span("selenium.script_cache") as cache_span:
+                cached = self.script_cache.get(request["key"])
+                cache_span.set(hit=cached is not None)
+            if cached is not None:
+                self.cache_report["hit"] = True
+                return cached
+        
+        try:
+            script = self.llm.generate(
+                prompt=request["prompt"],
+                system_prompt=SCRIPT_SYSTEM_PROMPT,
+                temperature=SCRIPT_TEMPERATURE,
+                max_tokens=SCRIPT_MAX_TOKENS
+            )
+            script, self.rewrite_report = self._finish_script(script)
+        except Exception as e:
+            raise Exception(f"Error generating Selenium script: {str(e)}")
+        
+        self._cache_script(request, script, self.cache_report)
+        return script
+    
+    def _search_html(self) -> str:
+        """HTML structure from the vector DB, when no page is given"""
+        html_results = self.vector_db.search("HTML structure checkout", top_k=3)
+        return "\n".join([chunk["content"] for chunk in html_results])
+    
+    def _script_request(self, test_case: Dict[str, Any], html_content: str) -> Dict[str, Any]:
+        """
+        Documentation context, prompt and cache key of one test case's script.
         
+        Returns:
+            Dictionary with prompt, context_chunks, key (of a script generated
+            on its own), batch_key (of one split out of a batch),
+            test_case_sha256 and page_sha256
+        """
         # Get relevant documentation
         test_scenario = test_case.get("test_scenario", "")
         feature = test_case.get("feature", "")
@@ -48,51 +208,127 @@ class SeleniumScriptAgent:
         
         context_chunks = self.vector_db.search(query, top_k=5)
         
-        # System prompt for Selenium generation
-        system_prompt = """You are an expert Selenium test automation engineer with deep knowledge of Python and web testing.
-
-Your task is to generate a complete, executable Selenium Python script based on the provided test case and HTML structure.
-
-CRITICAL REQUIREMENTS:
-1. Use actual element IDs, names, and CSS selectors from the HTML
-2. Include proper imports (selenium, webdriver_manager, unittest, etc.)
-3. Use explicit waits with WebDriverWait
-4. Include proper assertions
-5. Add error handling and teardown
-6. Use unittest framework
-7. Add comments explaining each step
-8. Make the script runnable as-is
-9. Use Chrome WebDriver with automatic driver management
-10. Include setup and teardown methods
-
-Code Quality Standards:
-- Clean, readable, PEP 8 compliant code
-- Proper exception handling
-- Meaningful variable names
-- Comprehensive assertions
-- Screenshots on failure (optional but recommended)
-
-Output Format:
-Return ONLY the complete Python script. No explanations before or after.
-The script should be ready to save as a .py file and execute."""
-        
         # Create detailed prompt
-        prompt = self._create_script_generation_prompt(test_case, html_content, context_chunks)
+        with span("selenium.build_prompt", html_chars=len(html_content), chunks=len(context_chunks)) as prompt_span:
+            prompt = self._create_script_generation_prompt(test_case, html_content, context_chunks)
+            prompt_span.set(chars=len(prompt))
+        
+        page_sha256 = _sha256(html_content)
+        return {
+            "prompt": prompt,
+            "context_chunks": context_chunks,
+            "key": self._request_key(prompt, page_sha256),
+            "batch_key": self._request_key(prompt, page_sha256, batch=True),
+            "test_case_sha256": _sha256(
+                json.dumps({field: test_case.get(field) for field in PROMPT_FIELDS}, sort_keys=True)
+            ),
+            "page_sha256": page_sha256
+        }
+    
+    def _context_provenance(self, context_chunks: list) -> List[Dict[str, Any]]:
+        return [
+            {
+                "source": (chunk.get("metadata") or {}).get("source"),
+                "chunk_index": (chunk.get("metadata") or {}).get("chunk_index"),
+                "distance": chunk.get("distance")
+            }
+            for chunk in context_chunks
+        ]
+    
+    def _finish_script(self, script: str) -> Tuple[str, Dict[str, Any]]:
+        """Clean a generated script and replace its fixed sleeps with explicit waits"""
+        # Clean up the script
+        with span("selenium.clean_script", chars=len(script)):
+            script = self._clean_script(script)
         
+        # Replace fixed sleeps with explicit waits
+        rewrite_report = {}
+        if Config.SELENIUM_REWRITE_WAITS:
+            with span("selenium.rewrite_waits") as rewrite_span:
+                script, rewrite_report = rewrite_waits(script, headless=Config.SELENIUM_HEADLESS)
+                rewrite_span.set(
+                    replaced=rewrite_report["sleeps_replaced"],
+                    removed=rewrite_report["sleeps_removed"]
+                )
+        return script, rewrite_report
+    
+    def _request_key(self, prompt: str, page_sha256: str, batch: bool = False, served: tuple = None) -> str:
+        """Cache key of a test case's script, generated on its own or split out of a batch"""
+        if batch:
+            return self.script_cache_key(
+                BATCH_SYSTEM_PROMPT, prompt, page_sha256, SCRIPT_TEMPERATURE, BATCH_TOKENS_PER_CASE,
+                batch=True, served=served
+            )
+        return self.script_cache_key(
+            SCRIPT_SYSTEM_PROMPT, prompt, page_sha256, SCRIPT_TEMPERATURE, SCRIPT_MAX_TOKENS, served=served
+        )
+    
+    def _cache_script(
+        self,
+        request: Dict[str, Any],
+        script: str,
+        cache_report: Dict[str, Any],
+        batch: bool = False
+    ) -> None:
+        """
+        Cache a script just generated, under the provider and model that wrote it.
+        
+        Lookups use the primary's key, so a script a fallback provider wrote
+        is only served while that provider is the primary.
+        """
+        if self.script_cache is None:
+            return
+        provider, model = served_by() or (self.llm.provider, self.llm.model)
+        key = self._request_key(request["prompt"], request["page_sha256"], batch=batch, served=(provider, model))
+        cache_report["key"] = key
         try:
-            script = self.llm.generate(
-                prompt=prompt,
-                system_prompt=system_prompt,
-                temperature=0.3,  # Lower temperature for more consistent code
-                max_tokens=3000
+            cache_report["invalidated"] = self.script_cache.put(
+                key, request["test_case_sha256"], request["page_sha256"], script, model, provider
             )
-            
-            # Clean up the script
-            script = self._clean_script(script)
-            
-            return script
         except Exception as e:
-            raise Exception(f"Error generating Selenium script: {str(e)}")
+            print(f"Warning: could not cache Selenium script: {str(e)}")
+    
+    def script_cache_key(
+        self,
+        system_prompt: str,
+        prompt: str,
+        page_sha256: str,
+        temperature: float,
+        max_tokens: int,
+        batch: bool = False,
+        served: tuple = None
+    ) -> str:
+        """
+        Cache key of a script generation.
+        
+        The prompt carries the test case fields, the (truncated) HTML and the
+        documentation context; the full page hash makes any page change a miss
+        even beyond the truncated part. Model settings are included so a
+        different model or sampling never serves another model's scripts, and
+        the rewrite settings because they change the stored script.
+        
+        A script split out of a batch (batch=True, with the batch system prompt
+        and the single-case prompt of its test case) gets a key of its own, so
+        a single-case lookup never returns output its prompt did not produce.
+        
+        Provider and model are the primary's for lookups; a script is stored
+        under served, the (provider, model) that actually wrote it.
+        """
+        provider, model = served or (self.llm.provider, self.llm.model)
+        payload = {
+            "system_prompt": _sha256(system_prompt),
+            "prompt": _sha256(prompt),
+            "page": page_sha256,
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "rewrite_waits": Config.SELENIUM_REWRITE_WAITS,
+            "headless": Config.SELENIUM_HEADLESS
+        }
+        if batch:
+            payload["batch"] = True
+        return _sha256(json.dumps(payload, sort_keys=True))
     
     def _create_script_generation_prompt(
         self,
@@ -108,30 +344,10 @@ The script should be ready to save as a .py file and execute."""
             for chunk in context_chunks
         ])
         
-        # Extract test case details
-        test_id = test_case.get("test_id", "TC-001")
-        feature = test_case.get("feature", "Unknown")
-        scenario = test_case.get("test_scenario", "")
-        test_steps = test_case.get("test_steps", [])
-        expected_result = test_case.get("expected_result", "")
-        preconditions = test_case.get("preconditions", "")
-        
         prompt = f"""Generate a complete Selenium Python script for this test case:
 
 TEST CASE DETAILS:
-- Test ID: {test_id}
-- Feature: {feature}
-- Scenario: {scenario}
-- Type: {test_case.get('test_type', 'positive')}
-
-PRECONDITIONS:
-{preconditions}
-
-TEST STEPS:
-{self._format_steps(test_steps)}
-
-EXPECTED RESULT:
-{expected_result}
+{self._format_test_case(test_case)}
 
 ---
 
@@ -161,6 +377,76 @@ Make it production-ready and executable."""
         
         return prompt
     
+    def _create_batch_prompt(
+        self,
+        cases: List[Tuple[str, Dict[str, Any]]],
+        html_content: str,
+        context_chunks: list
+    ) -> str:
+        """Create the prompt for several test cases, each with its test method name"""
+        context_text = "\n".join([
+            f"Source: {chunk.get('metadata', {}).get('source', 'unknown')}\n{chunk.get('content', '')}"
+            for chunk in context_chunks
+        ])
+        
+        test_cases = "\n\n".join(
+            f"TEST CASE {number} (method {method}):\n{self._format_test_case(test_case)}"
+            for number, (method, test_case) in enumerate(cases, 1)
+        )
+        
+        return f"""Generate one Selenium Python test module for these {len(cases)} test cases of the same page:
+
+{test_cases}
+
+---
+
+HTML STRUCTURE (Use these exact selectors):
+```html
+{html_content[:5000]}
+```
+
+---
+
+DOCUMENTATION CONTEXT:
+{context_text[:3000]}
+
+---
+
+Generate one complete Selenium Python module that:
+1. Sets up Chrome WebDriver using webdriver_manager in setUp
+2. Opens the HTML file (assume it's at ./project_assets/checkout.html)
+3. Has one test method per test case, named as given ({", ".join(method for method, _ in cases)}), executing all of that case's steps
+4. Performs assertions to verify each expected result
+5. Includes proper error handling
+6. Closes the browser in teardown
+
+Use unittest.TestCase as the base class.
+Include detailed comments for each step."""
+    
+    def _format_test_case(self, test_case: Dict[str, Any]) -> str:
+        """Test case details as listed in script generation prompts"""
+        # Extract test case details
+        test_id = test_case.get("test_id", "TC-001")
+        feature = test_case.get("feature", "Unknown")
+        scenario = test_case.get("test_scenario", "")
+        test_steps = test_case.get("test_steps", [])
+        expected_result = test_case.get("expected_result", "")
+        preconditions = test_case.get("preconditions", "")
+        
+        return f"""- Test ID: {test_id}
+- Feature: {feature}
+- Scenario: {scenario}
+- Type: {test_case.get('test_type', 'positive')}
+
+PRECONDITIONS:
+{preconditions}
+
+TEST STEPS:
+{self._format_steps(test_steps)}
+
+EXPECTED RESULT:
+{expected_result}"""
+    
     def _format_steps(self, steps: list) -> str:
         """Format test steps as numbered list"""
         if isinstance(steps, list):
@@ -204,25 +490,342 @@ Make it production-ready and executable."""
         """
         Generate multiple Selenium scripts for a test suite.
         
+        Test cases are generated SELENIUM_BATCH_SIZE at a time (see generate_scripts).
+        
         Args:
             test_cases: List of test cases
             html_content: HTML content
-            
+        
         Returns:
             Dictionary mapping test_id to script
         """
         scripts = {}
         
+        for result in self.generate_scripts(test_cases, html_content):
+            test_id = result["test_case"].get("test_id", f"TC-{len(scripts)+1}")
+            if result["error"]:
+                scripts[test_id] = f"# Error generating script: {result['error']}"
+            else:
+                scripts[test_id] = result["script"]
+        
+        return scripts
+    
+    def generate_scripts(
+        self,
+        test_cases: List[Dict[str, Any]],
+        html_content: str = None,
+        use_cache: bool = True,
+        batch_size: int = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate scripts for several test cases of one page, a batch per LLM call.
+        
+        Cached scripts are reused. The other test cases are grouped by feature
+        and sent batch_size at a time, with the page and documentation context
+        once per batch; the LLM writes one test method per case and the module
+        is split back into one script per case. A case whose method is missing
+        or broken, or a batch that fails altogether, is generated on its own.
+        Scripts are cached per test case: generated on their own as
+        generate_selenium_script would, split out of a batch under a batch key
+        that only generate_scripts looks up.
+        
+        Args:
+            test_cases: Test cases
+            html_content: HTML content of the target page
+            use_cache: Look up the script cache
+            batch_size: Test cases per LLM call (defaults to SELENIUM_BATCH_SIZE)
+        
+        Returns:
+            One result per test case, in order: test_case, script, error,
+            provenance, script_cache, rewrite and batch (the test ids generated
+            together, None for cached or single generations)
+        """
+        batch_size = max(1, batch_size or Config.SELENIUM_BATCH_SIZE)
+        html_content = html_content or self._search_html()
+        
+        results = []
+        pending = []
         for test_case in test_cases:
-            test_id = test_case.get("test_id", f"TC-{len(scripts)+1}")
+            request = self._script_request(test_case, html_content)
+            result = {
+                "test_case": test_case,
+                "script": None,
+                "error": None,
+                "provenance": {
+                    "prompt": f"{SCRIPT_SYSTEM_PROMPT}\n\n{request['prompt']}",
+                    "context": self._context_provenance(request["context_chunks"])
+                },
+                "script_cache": {"enabled": self.script_cache is not None, "hit": False, "key": request["key"]},
+                "rewrite": {},
+                "batch": None
+            }
+            results.append(result)
+            
+            if self.script_cache is not None and use_cache:
+                for key in (request["key"], request["batch_key"]):
+                    cached = self.script_cache.get(key)
+                    if cached is not None:
+                        result["script"] = cached
+                        result["script_cache"].update(hit=True, key=key)
+                        break
+                if cached is not None:
+                    continue
+            pending.append((result, request))
+        
+        # Cases of the same feature next to each other, in order of appearance
+        features = {}
+        for result, _ in pending:
+            features.setdefault(result["test_case"].get("feature", ""), len(features))
+        pending.sort(key=lambda item: features[item[0]["test_case"].get("feature", "")])
+        
+        self.batch_report = {"cases": len(test_cases), "cached": len(test_cases) - len(pending), "llm_calls": 0, "batches": []}
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            if len(batch) > 1:
+                batch = self._generate_batch(batch, html_content)
+            for result, request in batch:
+                self._generate_single(result, request)
+        
+        return results
+    
+    def _generate_single(self, result: Dict[str, Any], request: Dict[str, Any]) -> None:
+        """Generate one test case's script into its generate_scripts() result"""
+        self.batch_report["llm_calls"] += 1
+        try:
+            script = self.llm.generate(
+                prompt=request["prompt"],
+                system_prompt=SCRIPT_SYSTEM_PROMPT,
+                temperature=SCRIPT_TEMPERATURE,
+                max_tokens=SCRIPT_MAX_TOKENS
+            )
+            result["script"], result["rewrite"] = self._finish_script(script)
+        except Exception as e:
+            result["error"] = f"Error generating Selenium script: {str(e)}"
+            return
+        self._cache_script(request, result["script"], result["script_cache"])
+    
+    def _generate_batch(
+        self,
+        batch: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+        html_content: str
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Generate a batch of test cases in one LLM call.
+        
+        Returns:
+            The (result, request) pairs that still need a generation of their own
+        """
+        methods = []
+        for result, _ in batch:
+            slug = re.sub(r"\W+", "_", str(result["test_case"].get("test_id", ""))).strip("_").lower()
+            method = f"test_{slug or 'case'}"
+            while method in methods:
+                method += "_"
+            methods.append(method)
+        
+        # The documentation context of all cases, each chunk once, closest first
+        context_chunks = {}
+        for _, request in batch:
+            for chunk in request["context_chunks"]:
+                context_chunks.setdefault(chunk.get("content", ""), chunk)
+        context_chunks = sorted(context_chunks.values(), key=lambda chunk: chunk.get("distance") or 0)
+        
+        with span("selenium.build_batch_prompt", cases=len(batch), chunks=len(context_chunks)) as prompt_span:
+            prompt = self._create_batch_prompt(
+                [(method, result["test_case"]) for method, (result, _) in zip(methods, batch)],
+                html_content,
+                context_chunks
+            )
+            prompt_span.set(chars=len(prompt))
+        
+        test_ids = [result["test_case"].get("test_id") for result, _ in batch]
+        report = {"test_ids": test_ids, "split": 0, "error": None}
+        self.batch_report["batches"].append(report)
+        self.batch_report["llm_calls"] += 1
+        try:
+            with span("selenium.generate_batch", cases=len(batch)):
+                module = self.llm.generate(
+                    prompt=prompt,
+                    system_prompt=BATCH_SYSTEM_PROMPT,
+                    temperature=SCRIPT_TEMPERATURE,
+                    max_tokens=min(BATCH_TOKENS_PER_CASE * len(batch), BATCH_MAX_TOKENS)
+                )
+            scripts = self._split_batch_script(self._clean_script(module), methods)
+        except Exception as e:
+            report["error"] = str(e)
+            return batch
+        
+        provenance = {
+            "prompt": f"{BATCH_SYSTEM_PROMPT}\n\n{prompt}",
+            "context": self._context_provenance(context_chunks)
+        }
+        remaining = []
+        for method, (result, request) in zip(methods, batch):
+            if method not in scripts:
+                remaining.append((result, request))
+                continue
             try:
-                script = self.generate_selenium_script(test_case, html_content)
-                scripts[test_id] = script
-            except Exception as e:
-                scripts[test_id] = f"# Error generating script: {str(e)}"
+                result["script"], result["rewrite"] = self._finish_script(scripts[method])
+            except Exception:
+                remaining.append((result, request))
+                continue
+            result["provenance"] = provenance
+            result["batch"] = {"test_ids": test_ids, "method": method}
+            self._cache_script(request, result["script"], result["script_cache"], batch=True)
+            report["split"] += 1
+        return remaining
+    
+    def _split_batch_script(self, module: str, methods: List[str]) -> Dict[str, str]:
+        """
+        Split a batched module into one script per test method.
+        
+        Each script keeps everything but the other cases' test methods (and
+        classes left with only those), so shared setUp, helpers and imports
+        stay with every case.
+        
+        Returns:
+            Script by test method name, for the methods found in the module
+        """
+        tree = ast.parse(module)
+        lines = module.splitlines(keepends=True)
+        
+        # Line ranges of each case's method, and of classes holding only other cases
+        found = {}
+        classes = []
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+            names = [item.name for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            cases = [name for name in names if name in methods]
+            if cases:
+                classes.append((node, set(cases), all(name in methods for name in names if name.startswith("test"))))
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name in methods:
+                    found.setdefault(item.name, (node, item))
         
+        scripts = {}
+        for method in found:
+            drop = []
+            for node, cases, only_cases in classes:
+                if method not in cases and only_cases:
+                    drop.append(_statement_lines(node, lines))
+                else:
+                    drop.extend(_statement_lines(item, lines) for other, (owner, item) in found.items()
+                                if owner is node and other != method)
+            kept = [line for number, line in enumerate(lines, 1) if not any(first <= number <= last for first, last in drop)]
+            script = "".join(kept)
+            try:
+                ast.parse(script)
+            except SyntaxError:
+                continue
+            scripts[method] = script
         return scripts
     
+    def check_selectors(
+        self,
+        script: str,
+        html_content: str,
+        repair: bool = False
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Resolve a script's locators against the page without a browser.
+        
+        Args:
+            script: Python script to check
+            html_content: HTML of the target page
+            repair: Ask the LLM to replace unresolved locators
+            
+        Returns:
+            The script (repaired if requested) and the selector report
+        """
+        if self._page is None or self._page[0] != html_content:
+            self._page = (html_content, PageIndex(html_content))
+        page = self._page[1]
+        report = check_selectors(script, page)
+        if repair and report["unresolved"]:
+            try:
+                script, report = self.repair_selectors(script, report, page)
+            except Exception as e:
+                report["repair_error"] = str(e)
+        return script, report
+    
+    def repair_selectors(
+        self,
+        script: str,
+        report: Dict[str, Any],
+        page: PageIndex
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Replace unresolved locators with ones the LLM picks from the page.
+        
+        Only the unresolved locators (with their script lines and suggestions)
+        and the page's ids, names and classes are sent, and only replacements
+        that resolve on the page are applied, so the rest of the script is
+        left untouched.
+        
+        Args:
+            script: Python script
+            report: check_selectors() report of the script
+            page: Index of the target page
+            
+        Returns:
+            The repaired script and its new selector report, with the applied
+            fixes under "repaired"
+        """
+        lines = script.splitlines()
+        unresolved = []
+        for entry in report["unresolved"]:
+            line = entry["lines"][0]
+            text = f"- By.{entry['by']} {json.dumps(entry['value'])} ({entry['reason']}), line {line}: {lines[line - 1].strip()}"
+            if entry["suggestions"]:
+                text += "\n  Close matches: " + ", ".join(
+                    f"By.{suggestion['by']} {json.dumps(suggestion['value'])}" for suggestion in entry["suggestions"]
+                )
+            unresolved.append(text)
+        
+        outline = "\n".join(
+            f"{label}: " + ", ".join(page.candidates(kind)[:REPAIR_OUTLINE_LIMIT])
+            for label, kind in (("IDs", "id"), ("Names", "name"), ("Classes", "class"))
+        )
+        
+        system_prompt = """You fix Selenium locators that match no element on the target page.
+
+For each locator listed, pick the page element the test step means, using the page's ids, names and classes. Return ONLY a valid JSON object of the form {"fixes": [{"by": "ID", "value": "old value", "new_by": "ID", "new_value": "new value"}]}. Use By constant names (ID, NAME, CSS_SELECTOR, XPATH, CLASS_NAME, TAG_NAME, LINK_TEXT, PARTIAL_LINK_TEXT) and leave out locators that have no matching element."""
+        
+        prompt = f"""UNRESOLVED LOCATORS:
+{chr(10).join(unresolved)}
+
+PAGE:
+{outline}"""
+        
+        with span("selenium.repair_selectors", locators=len(unresolved)):
+            response = self.llm.generate(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                temperature=0.0,
+                max_tokens=800,
+                json_schema=LOCATOR_FIX_LIST_SCHEMA
+            )
+        data, _ = parse_json(response)
+        fixes = LocatorFixList.model_validate(data).model_dump()["fixes"]
+        
+        # Apply only fixes of reported locators that resolve on the page
+        reported = {(entry["by"], entry["value"]) for entry in report["unresolved"]}
+        valid = []
+        for fix in fixes:
+            if (fix["by"], fix["value"]) not in reported:
+                continue
+            try:
+                if page.count(BY_VALUES[fix["new_by"]], fix["new_value"]):
+                    valid.append(fix)
+            except ValueError:
+                continue
+        
+        script, applied = apply_locator_fixes(script, valid)
+        repaired_report = check_selectors(script, page)
+        repaired_report["repaired"] = applied
+        return script, repaired_report
+    
     def validate_script_syntax(self, script: str) -> Dict[str, Any]:
         """
         Validate Python syntax of generated script.
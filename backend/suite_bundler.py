@@ -0,0 +1,692 @@
+"""
+Bundling of generated Selenium scripts into shared-browser suite modules.
+
+generate_test_suite() returns one standalone script per test case, and each
+one starts and quits its own Chrome. bundle_scripts() merges the scripts
+into one module, or into shards balanced by test count:
+
+- each shard starts one browser (shared_driver()) and quits it in
+  tearDownModule. The scripts' webdriver.Chrome(...) calls return that
+  browser. Their driver Service/Options setup and quit()/close() calls
+  are removed.
+- each test class resets the browser at the start of setUp: extra windows
+  closed, cookies and storage cleared, about:blank.
+- imports are merged. Identical helpers are kept once. Test classes,
+  helpers and constants whose names clash across scripts get the test id
+  as a suffix. Duplicate test methods within a class are numbered, since
+  Python would silently keep only the last one.
+
+Edits are made on the source text, so comments are kept.
+"""
+
+import re
+import ast
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from backend.config import Config
+
+
+# Names defined by the bundle itself
+_RESERVED = {
+    "unittest", "shared_driver", "reset_browser", "setUpModule", "tearDownModule",
+    "_driver", "_BROWSER_ARGUMENTS", "_webdriver", "_ChromeOptions"
+}
+
+_BUNDLE_IMPORTS = [
+    "import unittest",
+    "from selenium import webdriver as _webdriver",
+    "from selenium.webdriver.chrome.options import Options as _ChromeOptions"
+]
+
+_BROWSER_CLASSES = {"Chrome", "Firefox", "Edge", "Safari", "ChromiumEdge"}
+
+# Calls whose results only configure a script's own browser
+_DRIVER_SETUP_RE = re.compile(r"Service|Options|DriverManager")
+
+_SHARED_BROWSER = '''
+_driver = None
+_BROWSER_ARGUMENTS = {arguments!r}
+
+
+def shared_driver():
+    """The shard's browser, started on first use"""
+    global _driver
+    if _driver is None:
+        options = _ChromeOptions()
+        for argument in _BROWSER_ARGUMENTS:
+            options.add_argument(argument)
+        _driver = _webdriver.Chrome(options=options)
+    return _driver
+
+
+def reset_browser():
+    """Close extra windows, clear cookies and storage and open a blank page"""
+    if _driver is None:
+        return
+    handles = _driver.window_handles
+    for handle in handles[1:]:
+        _driver.switch_to.window(handle)
+        _driver.close()
+    _driver.switch_to.window(handles[0])
+    try:
+        _driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    except Exception:
+        pass
+    _driver.delete_all_cookies()
+    _driver.get("about:blank")
+
+
+def tearDownModule():
+    global _driver
+    if _driver is not None:
+        _driver.quit()
+        _driver = None
+'''
+
+
+def bundle_scripts(
+    scripts: Dict[str, str],
+    shards: int = 1,
+    headless: bool = None
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Merge generated scripts into suite modules sharing one browser per module.
+
+    Args:
+        scripts: Script source by test id (as returned by generate_test_suite)
+        shards: Number of modules to split the tests across
+        headless: Start the shared browser headless (defaults to SELENIUM_HEADLESS)
+
+    Returns:
+        Module source by file name, and a report of the bundled, skipped and
+        renamed scripts
+    """
+    headless = Config.SELENIUM_HEADLESS if headless is None else headless
+    report = {
+        "scripts": len(scripts),
+        "bundled": 0,
+        "tests": 0,
+        "drivers_shared": 0,
+        "skipped": [],
+        "renamed": [],
+        "warnings": [],
+        "shards": []
+    }
+
+    parts = []
+    used_names: Set[str] = set(_RESERVED)
+    helpers: Dict[str, Optional[str]] = {}  # helper name -> source, None if not shareable
+    for test_id, script in scripts.items():
+        try:
+            part = _ScriptPart(test_id, script, used_names, helpers, report)
+        except SyntaxError as e:
+            report["skipped"].append({"test_id": test_id, "error": f"Syntax error at line {e.lineno}: {e.msg}"})
+            continue
+        except ValueError as e:
+            report["skipped"].append({"test_id": test_id, "error": str(e)})
+            continue
+        if not part.classes:
+            report["skipped"].append({"test_id": test_id, "error": "no unittest.TestCase classes"})
+            continue
+        parts.append(part)
+
+    report["bundled"] = len(parts)
+    report["tests"] = sum(part.test_count for part in parts)
+    if not parts:
+        return {}, report
+
+    # Largest scripts first onto the least loaded shard, then original order
+    shard_parts: List[List[Tuple[int, _ScriptPart]]] = [[] for _ in range(min(shards, len(parts)))]
+    loads = [0] * len(shard_parts)
+    for index, part in sorted(enumerate(parts), key=lambda item: -item[1].test_count):
+        target = loads.index(min(loads))
+        shard_parts[target].append((index, part))
+        loads[target] += part.test_count
+
+    arguments = ["--no-sandbox", "--disable-dev-shm-usage", f"--window-size={Config.RUNNER_WINDOW_SIZE}"]
+    if headless:
+        arguments.insert(0, "--headless=new")
+
+    modules = {}
+    for number, members in enumerate(shard_parts, 1):
+        members = [part for _, part in sorted(members, key=lambda item: item[0])]
+        name = "test_suite.py" if len(shard_parts) == 1 else f"test_suite_shard_{number}.py"
+        modules[name] = _render(members, number, len(shard_parts), arguments)
+        report["shards"].append({
+            "module": name,
+            "test_ids": [part.test_id for part in members],
+            "tests": sum(part.test_count for part in members)
+        })
+    return modules, report
+
+
+def _render(parts: List["_ScriptPart"], number: int, total: int, arguments: List[str]) -> str:
+    """Source of one suite module"""
+    used = {
+        node.id for part in parts for block in [*part.classes, *(source for _, source in part.helpers)]
+        for node in ast.walk(ast.parse(block)) if isinstance(node, ast.Name)
+    }
+    imports = []
+    for line in [*(line for part in parts for line in part.imports), *_BUNDLE_IMPORTS]:
+        line = _without_unused_setup(line, used)
+        if line and line not in imports:
+            imports.append(line)
+    imports.sort(key=lambda line: not line.startswith("from __future__"))
+
+    label = f" (shard {number} of {total})" if total > 1 else ""
+    sections = [
+        f'"""\nGenerated test suite{label}: {", ".join(part.test_id for part in parts)}.\n\n'
+        "The tests share one browser, started by shared_driver() on first use,\n"
+        'reset before every test and quit in tearDownModule.\n"""\n',
+        "\n".join(imports) + "\n",
+        _SHARED_BROWSER.format(arguments=arguments)
+    ]
+
+    emitted_helpers = set()
+    for part in parts:
+        blocks = []
+        for key, source in part.helpers:
+            if key not in emitted_helpers:
+                emitted_helpers.add(key)
+                blocks.append(source)
+        blocks.extend(part.classes)
+        sections.append(f"# {part.test_id}\n" + "\n\n\n".join(blocks) + "\n")
+
+    sections.append('if __name__ == "__main__":\n    unittest.main()\n')
+    return "\n\n".join(sections)
+
+
+def _without_unused_setup(line: str, used: Set[str]) -> Optional[str]:
+    """Drop imported Service/Options/driver-manager names the bundle no longer uses"""
+    node = ast.parse(line).body[0]
+    if not isinstance(node, ast.ImportFrom):
+        return line
+    names = [
+        alias for alias in node.names
+        if (alias.asname or alias.name) in used
+        or (alias.asname or alias.name) in _RESERVED
+        or not _DRIVER_SETUP_RE.search(alias.name)
+    ]
+    if not names:
+        return None
+    node.names = names
+    return ast.unparse(node)
+
+
+class _ScriptPart:
+    """The imports, helpers and rewritten test classes of one script"""
+
+    def __init__(
+        self,
+        test_id: str,
+        script: str,
+        used_names: Set[str],
+        helpers: Dict[str, Optional[str]],
+        report: Dict[str, Any]
+    ):
+        self.test_id = test_id
+        self.suffix = re.sub(r"\W+", "_", test_id).strip("_") or "script"
+        self.report = report
+        self.imports: List[str] = []
+        self.helpers: List[Tuple[Tuple[str, str], str]] = []  # ((name, source), source)
+        self.classes: List[str] = []
+        self.test_count = 0
+
+        tree = ast.parse(script)
+        source = _Source(script)
+        edits = _Edits(source)
+        renames: Dict[str, str] = {}
+        test_classes = {}
+        helper_nodes = []
+        local_tests: Dict[str, List[str]] = {}
+
+        for index, node in enumerate(tree.body):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                self.imports.append(ast.unparse(node))
+            elif index == 0 and _is_docstring(node):
+                continue
+            elif _is_main_guard(node):
+                continue
+            elif isinstance(node, ast.FunctionDef) and node.name in ("setUpModule", "tearDownModule"):
+                report["warnings"].append(f"{test_id}: module fixture {node.name}() was not bundled")
+            elif isinstance(node, ast.ClassDef) and any(
+                base == "TestCase" or base in local_tests for base in _base_names(node)
+            ):
+                # Duplicate names count, they are numbered below
+                tests = [item.name for item in node.body if isinstance(item, ast.FunctionDef) and item.name.startswith("test")]
+                for base in _base_names(node):
+                    tests.extend(name for name in local_tests.get(base, ()) if name not in tests)
+                local_tests[node.name] = tests
+                test_classes[node.name] = node
+                self.test_count += len(tests)
+            else:
+                helper_nodes.append(node)
+
+        # Names: test classes are always unique, identical helpers are shared
+        for name in test_classes:
+            renames[name] = self._unique(name, used_names, "class")
+        shared, owned = [], []
+        for node in helper_nodes:
+            text = source.segment(node)
+            for name in _bound_names(node):
+                if name in helpers and helpers[name] == text:
+                    shared.append((name, node))
+                elif name in used_names or name in helpers:
+                    renames[name] = self._unique(name, used_names, "helper")
+                else:
+                    used_names.add(name)
+                    owned.append((name, node))
+        # A helper using a renamed name is not the same as its namesake elsewhere
+        changed = True
+        while changed:
+            changed = False
+            for name, node in list(shared):
+                if _uses(node, renames):
+                    shared.remove((name, node))
+                    renames[name] = self._unique(name, used_names, "helper")
+                    changed = True
+        for name, node in owned:
+            helpers[name] = None if _uses(node, renames) else source.segment(node)
+        renames = {old: new for old, new in renames.items() if old != new}
+
+        # Rewrite driver lifecycle and rename references
+        for node in test_classes.values():
+            self._share_driver(node, edits)
+            self._inject_reset(node, edits, local_tests)
+            self._number_duplicate_tests(node, edits)
+        for node in helper_nodes:
+            self._share_driver(node, edits)
+        if renames:
+            _Renamer(renames, edits).visit(tree)
+            for node in tree.body:
+                if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in renames:
+                    edits.rename_definition(node, renames[node.name])
+
+        # Cut the rewritten classes and helpers out of the edited script
+        rewritten = edits.apply()
+        try:
+            rewritten_tree = ast.parse(rewritten)
+        except SyntaxError as e:
+            raise ValueError(f"Rewritten script does not parse at line {e.lineno}: {e.msg}")
+        rewritten_source = _Source(rewritten)
+        # Edits stay inside top-level statements, so the statements still line up
+        for original, node in zip(tree.body, rewritten_tree.body):
+            if any(original is test_class for test_class in test_classes.values()):
+                self.classes.append(rewritten_source.block(node))
+            elif any(original is helper for helper in helper_nodes):
+                block = rewritten_source.block(node)
+                names = _bound_names(original)
+                # Unrenamed helpers are shared with identical ones of other scripts
+                key = (names[0], block) if names and names[0] not in renames else (self.suffix, block)
+                self.helpers.append((key, block))
+
+    def _unique(self, name: str, used_names: Set[str], kind: str) -> str:
+        new = name
+        if new in used_names:
+            new = f"{name}_{self.suffix}"
+            counter = 2
+            while new in used_names:
+                new = f"{name}_{self.suffix}_{counter}"
+                counter += 1
+            self.report["renamed"].append({"test_id": self.test_id, "kind": kind, "from": name, "to": new})
+        used_names.add(new)
+        return new
+
+    def _share_driver(self, node: ast.AST, edits: "_Edits") -> None:
+        """Return the shared browser instead of starting one, and never quit it"""
+        replaced = []
+        for call in ast.walk(node):
+            if isinstance(call, ast.Call) and _is_browser_start(call):
+                edits.replace(call, "shared_driver()")
+                replaced.append(call)
+        self.report["drivers_shared"] += len(replaced)
+
+        for function in ast.walk(node):
+            if isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if replaced:
+                    _prune_driver_setup(function.body, replaced, edits)
+                for block in _blocks(function):
+                    for stmt in block:
+                        if _is_driver_shutdown(stmt):
+                            edits.delete(stmt, block)
+
+    def _inject_reset(self, node: ast.ClassDef, edits: "_Edits", local_tests: Dict[str, List[str]]) -> None:
+        """Reset the shared browser at the start of setUp"""
+        for item in node.body:
+            if isinstance(item, ast.FunctionDef) and item.name == "setUp":
+                if _is_docstring(item.body[0]) and len(item.body) == 1:
+                    edits.insert(item.body[0], ["reset_browser()"], after=True)
+                else:
+                    edits.insert(item.body[1 if _is_docstring(item.body[0]) else 0], ["reset_browser()"])
+                return
+
+        if any(base in local_tests for base in _base_names(node)):
+            return  # the local base class resets
+        setup = ["def setUp(self):", "    reset_browser()"]
+        if not _is_docstring(node.body[0]):
+            edits.insert(node.body[0], setup + [""])
+        elif len(node.body) == 1:
+            edits.insert(node.body[0], [""] + setup, after=True)
+        else:
+            edits.insert(node.body[1], ([] if edits.blank_before(node.body[1]) else [""]) + setup + [""])
+
+    def _number_duplicate_tests(self, node: ast.ClassDef, edits: "_Edits") -> None:
+        seen: Dict[str, int] = {}
+        names = {item.name for item in node.body if isinstance(item, ast.FunctionDef)}
+        for item in node.body:
+            if not isinstance(item, ast.FunctionDef) or not item.name.startswith("test"):
+                continue
+            seen[item.name] = seen.get(item.name, 0) + 1
+            if seen[item.name] > 1:
+                new = f"{item.name}_{seen[item.name]}"
+                while new in names:
+                    new += "_"
+                names.add(new)
+                edits.rename_definition(item, new)
+                self.report["renamed"].append({"test_id": self.test_id, "kind": "method", "from": item.name, "to": new})
+
+
+def _is_docstring(node: ast.AST) -> bool:
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+
+def _is_main_guard(node: ast.AST) -> bool:
+    return (
+        isinstance(node, ast.If)
+        and isinstance(node.test, ast.Compare)
+        and isinstance(node.test.left, ast.Name)
+        and node.test.left.id == "__name__"
+    )
+
+
+def _uses(node: ast.AST, names: Dict[str, str]) -> bool:
+    return any(isinstance(child, ast.Name) and child.id in names for child in ast.walk(node))
+
+
+def _first_line(node: ast.AST) -> int:
+    """First line of a statement, including its decorators"""
+    return min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+
+
+def _base_names(node: ast.ClassDef) -> List[str]:
+    return [base.attr if isinstance(base, ast.Attribute) else getattr(base, "id", "") for base in node.bases]
+
+
+def _bound_names(node: ast.AST) -> List[str]:
+    """Module-level names a statement defines"""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    targets = getattr(node, "targets", None) or [getattr(node, "target", None)]
+    return [
+        name.id for target in targets if target is not None
+        for name in ast.walk(target) if isinstance(name, ast.Name)
+    ]
+
+
+def _blocks(function: ast.AST) -> List[List[ast.stmt]]:
+    """Statement lists inside a function, excluding nested functions and classes"""
+    blocks = []
+    stack = [function]
+    while stack:
+        node = stack.pop()
+        for field in ("body", "orelse", "finalbody", "handlers"):
+            block = getattr(node, field, None)
+            if not isinstance(block, list) or not block:
+                continue
+            if isinstance(block[0], ast.stmt):
+                blocks.append(block)
+            stack.extend(
+                child for child in block
+                if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+            )
+    return blocks
+
+
+def _is_browser_start(call: ast.Call) -> bool:
+    """webdriver.Chrome(...) and the like"""
+    func = call.func
+    if isinstance(func, ast.Attribute):
+        return func.attr in _BROWSER_CLASSES and isinstance(func.value, ast.Name) and func.value.id == "webdriver"
+    return isinstance(func, ast.Name) and func.id in _BROWSER_CLASSES
+
+
+def _is_driver_shutdown(stmt: ast.stmt) -> bool:
+    """driver.quit() / driver.close() statements"""
+    if not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)):
+        return False
+    func = stmt.value.func
+    if not (isinstance(func, ast.Attribute) and func.attr in ("quit", "close")):
+        return False
+    receiver = func.value
+    name = receiver.attr if isinstance(receiver, ast.Attribute) else getattr(receiver, "id", "")
+    return name.lower().endswith("driver")
+
+
+def _prune_driver_setup(body: List[ast.stmt], replaced: List[ast.Call], edits: "_Edits") -> None:
+    """
+    Remove Service/Options/driver-manager setup that only fed a replaced browser.
+
+    A setup variable is removed with the statements that configure it
+    (options.add_argument(...), options.binary_location = ...) when nothing
+    else, outside the replaced calls, uses it.
+    """
+    removed = set()
+    changed = True
+    while changed:
+        changed = False
+        for stmt in body:
+            if id(stmt) in removed or not (
+                isinstance(stmt, ast.Assign)
+                and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Name)
+                and isinstance(stmt.value, ast.Call)
+                and _DRIVER_SETUP_RE.search(ast.unparse(stmt.value.func))
+            ):
+                continue
+            name = stmt.targets[0].id
+            uses = [
+                other for other in body
+                if other is not stmt and id(other) not in removed and _references(other, name, replaced)
+            ]
+            if all(_configures(other, name) for other in uses):
+                for other in [stmt, *uses]:
+                    removed.add(id(other))
+                    edits.delete(other, body)
+                changed = True
+
+
+def _references(node: ast.AST, name: str, excluded: List[ast.Call]) -> bool:
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if any(current is call for call in excluded):
+            continue
+        if isinstance(current, ast.Name) and current.id == name:
+            return True
+        stack.extend(ast.iter_child_nodes(current))
+    return False
+
+
+def _configures(stmt: ast.stmt, name: str) -> bool:
+    """options.add_argument(...) or options.attribute = ... on `name`"""
+    if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call):
+        func = stmt.value.func
+        return isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == name
+    if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+        target = stmt.targets[0]
+        return isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == name
+    return False
+
+
+class _Renamer(ast.NodeVisitor):
+    """Rename references to module-level names, except where a scope shadows them"""
+
+    def __init__(self, renames: Dict[str, str], edits: "_Edits"):
+        self.renames = renames
+        self.edits = edits
+        self.shadowed: Set[str] = set()
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if node.id in self.renames and node.id not in self.shadowed:
+            self.edits.replace(node, self.renames[node.id])
+
+    def visit_FunctionDef(self, node: ast.AST) -> None:
+        # Decorators and defaults belong to the enclosing scope
+        for outer in [*getattr(node, "decorator_list", []), *node.args.defaults, *filter(None, node.args.kw_defaults)]:
+            self.visit(outer)
+        self._visit_scope(node.body if isinstance(node.body, list) else [node.body], _local_names(node))
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_Lambda = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        for outer in [*node.decorator_list, *node.bases, *node.keywords]:
+            self.visit(outer)
+        attributes = {name for stmt in node.body for name in _bound_names(stmt)}
+        for stmt in node.body:
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.visit(stmt)  # methods do not see class attributes
+            else:
+                self._visit_scope([stmt], attributes)
+
+    def _visit_scope(self, body: List[ast.AST], local_names: Set[str]) -> None:
+        outer = self.shadowed
+        self.shadowed = outer | local_names
+        for node in body:
+            self.visit(node)
+        self.shadowed = outer
+
+
+def _local_names(function: ast.AST) -> Set[str]:
+    """Parameters and assigned names of a function, less its global declarations"""
+    arguments = function.args
+    names = {
+        argument.arg for argument in [
+            *arguments.posonlyargs, *arguments.args, *arguments.kwonlyargs,
+            *filter(None, [arguments.vararg, arguments.kwarg])
+        ]
+    }
+    declared_global = set()
+    stack = list(function.body) if isinstance(function.body, list) else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Global):
+            declared_global.update(node.names)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            continue
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        if not isinstance(node, ast.Lambda):
+            stack.extend(ast.iter_child_nodes(node))
+    return names - declared_global
+
+
+class _Source:
+    """A script's text with offsets for AST positions"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines = text.splitlines(keepends=True)
+        self.line_starts = [0]
+        for line in self.lines:
+            self.line_starts.append(self.line_starts[-1] + len(line))
+
+    def offset(self, lineno: int, col: int) -> int:
+        # AST columns are UTF-8 byte offsets
+        line = self.lines[lineno - 1]
+        return self.line_starts[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    def span(self, node: ast.AST) -> Tuple[int, int]:
+        return self.offset(node.lineno, node.col_offset), self.offset(node.end_lineno, node.end_col_offset)
+
+    def segment(self, node: ast.AST) -> str:
+        start, end = self.span(node)
+        return self.text[start:end]
+
+    def block(self, node: ast.AST) -> str:
+        """Whole lines of a top-level statement, with decorators and the comments above it"""
+        first = _first_line(node)
+        while first > 1 and self.lines[first - 2].strip().startswith("#"):
+            first -= 1
+        return "".join(self.lines[first - 1:node.end_lineno]).rstrip()
+
+
+class _Edits:
+    """Text edits planned against the original positions of a script"""
+
+    def __init__(self, source: _Source):
+        self.source = source
+        self.edits: List[Tuple[int, int, str]] = []
+        self.deleted: Dict[int, List[ast.stmt]] = {}  # id(block) -> deleted statements
+
+    def replace(self, node: ast.AST, text: str) -> None:
+        self.edits.append((*self.source.span(node), text))
+
+    def rename_definition(self, node: ast.AST, name: str) -> None:
+        keyword = "class" if isinstance(node, ast.ClassDef) else "def"
+        line_start = self.source.line_starts[node.lineno - 1]
+        line = self.source.lines[node.lineno - 1]
+        match = re.search(rf"\b{keyword}\s+({re.escape(node.name)})\b", line)
+        if match:
+            self.edits.append((line_start + match.start(1), line_start + match.end(1), name))
+
+    def delete(self, stmt: ast.stmt, block: List[ast.stmt]) -> None:
+        deleted = self.deleted.setdefault(id(block), [])
+        if any(stmt is other for other in deleted):
+            return
+        deleted.append(stmt)
+        start, end = self.source.span(stmt)
+        line_start = self.source.line_starts[stmt.lineno - 1]
+        line_end = self.source.line_starts[stmt.end_lineno]
+        rest = self.source.text[end:line_end].strip()
+        if len(deleted) == len(block):
+            # A block cannot be empty: the last deleted statement becomes pass
+            self.edits.append((start, end, "pass"))
+        elif self.source.text[line_start:start].strip() or (rest and not rest.startswith("#")):
+            self.edits.append((start, end, "pass"))
+        else:
+            self.edits.append((line_start, line_end, ""))
+
+    def insert(self, stmt: ast.stmt, lines: List[str], after: bool = False) -> None:
+        """Insert lines before or after a statement, at its indentation"""
+        indent = " " * stmt.col_offset
+        start = self.source.offset(stmt.lineno, stmt.col_offset)
+        if not after and self.source.text[self.source.line_starts[stmt.lineno - 1]:start].strip():
+            # def setUp(self): pass
+            self.edits.append((start, start, "; ".join(lines) + "; "))
+            return
+        if after:
+            offset = self.source.line_starts[stmt.end_lineno]
+        else:
+            # Above the comments that introduce the statement
+            first = _first_line(stmt)
+            while first > 1 and self.source.lines[first - 2].startswith(indent + "#"):
+                first -= 1
+            offset = self.source.line_starts[first - 1]
+        self.edits.append((offset, offset, "".join(f"{indent}{line}".rstrip() + "\n" for line in lines)))
+
+    def blank_before(self, stmt: ast.stmt) -> bool:
+        line = _first_line(stmt)
+        return line > 1 and not self.source.lines[line - 2].strip()
+
+    def apply(self) -> str:
+        text = self.source.text
+        if not text.endswith("\n"):
+            text += "\n"
+        # An edit inside a replaced range is dropped, the outer edit wins
+        ranges = [(start, end) for start, end, _ in self.edits if start != end]
+        edits = [
+            (start, end, replacement) for start, end, replacement in self.edits
+            if not any(
+                outer_start <= start and end <= outer_end and (outer_start, outer_end) != (start, end)
+                and (start != end or outer_start < start < outer_end)
+                for outer_start, outer_end in ranges
+            )
+        ]
+        # Back to front; at the same offset the replacement goes before the insertion
+        for start, end, replacement in sorted(set(edits), key=lambda edit: (edit[0], edit[1]), reverse=True):
+            text = text[:start] + replacement + text[end:]
+        return text
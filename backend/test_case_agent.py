@@ -2,10 +2,57 @@
 Test Case Generation Agent - Generates comprehensive test cases from documentation.
 """
 
-import json
-from typing import List, Dict, Any
+import re
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Dict, Any, Optional
+from pydantic import ValidationError
+from backend.config import Config
 from backend.llm_handler import LLMHandler
 from backend.vector_db import VectorDatabase
+from backend.json_repair import ArrayStream, parse_json, salvage_array
+from backend.dedup import TestCaseDeduplicator
+from backend.schemas import FEATURE_LIST_SCHEMA, TEST_CASE_SUITE_SCHEMA, FeatureList, TestCase
+from backend import metrics
+from backend.profiling import span
+
+
+_HEADING_RE = re.compile(r"^(#{2,3})\s+(.+)$", re.MULTILINE)
+_GENERIC_HEADING_RE = re.compile(
+    r"\s*(version|last updated|overview|introduction|table of contents|summary)\b", re.IGNORECASE
+)
+
+# System prompt for test case generation
+TEST_CASE_SYSTEM_PROMPT = """You are an expert QA engineer specializing in test case design.
+
+Your task is to generate comprehensive, well-structured test cases based STRICTLY on the provided documentation.
+
+CRITICAL RULES:
+1. ALL test cases MUST be grounded in the provided documentation
+2. Reference the source document for each test case
+3. Do NOT invent features, behaviors, or requirements not in the documentation
+4. If information is missing, state it explicitly
+5. Generate both positive and negative test cases where applicable
+
+Output Format:
+Return ONLY a valid JSON object of the form {"test_cases": [...]}. Each test case must have this exact structure:
+{
+  "test_id": "TC-XXX",
+  "feature": "Feature name",
+  "test_scenario": "Clear description of what is being tested",
+  "test_type": "positive" or "negative",
+  "preconditions": "Prerequisites before test execution",
+  "test_steps": ["Step 1", "Step 2", "Step 3"],
+  "expected_result": "What should happen",
+  "grounded_in": "source_document.ext",
+  "priority": "high", "medium", or "low"
+}
+
+Generate multiple comprehensive test cases covering different aspects of the feature."""
+
+TEST_CASE_TEMPERATURE = 0.7
+TEST_CASE_MAX_TOKENS = 3000
 
 
 class TestCaseAgent:
@@ -21,6 +68,12 @@ class TestCaseAgent:
         """
         self.vector_db = vector_db
         self.llm = llm_handler
+        
+        # What the last parse kept, repaired and dropped
+        self.parse_report: Dict[str, Any] = {}
+        
+        # System prompt and retrieved chunks of the last generation
+        self.provenance: Dict[str, Any] = {}
     
     def generate_test_cases(
         self,
@@ -35,96 +88,259 @@ class TestCaseAgent:
             top_k: Number of context chunks to retrieve
             
         Returns:
-            List of test cases
+            List of test cases (see parse_report for anything dropped)
         """
-        # Retrieve relevant context
-        context_chunks = self.vector_db.search(query, top_k=top_k)
-        
-        if not context_chunks:
-            raise Exception("No relevant documentation found. Please ensure documents are uploaded.")
-        
-        # System prompt for test case generation
-        system_prompt = """You are an expert QA engineer specializing in test case design.
-
-Your task is to generate comprehensive, well-structured test cases based STRICTLY on the provided documentation.
-
-CRITICAL RULES:
-1. ALL test cases MUST be grounded in the provided documentation
-2. Reference the source document for each test case
-3. Do NOT invent features, behaviors, or requirements not in the documentation
-4. If information is missing, state it explicitly
-5. Generate both positive and negative test cases where applicable
-
-Output Format:
-Return ONLY a valid JSON array of test cases. Each test case must have this exact structure:
-{
-  "test_id": "TC-XXX",
-  "feature": "Feature name",
-  "test_scenario": "Clear description of what is being tested",
-  "test_type": "positive" or "negative",
-  "preconditions": "Prerequisites before test execution",
-  "test_steps": ["Step 1", "Step 2", "Step 3"],
-  "expected_result": "What should happen",
-  "grounded_in": "source_document.ext",
-  "priority": "high", "medium", or "low"
-}
-
-Generate multiple comprehensive test cases covering different aspects of the feature."""
+        context_chunks = self._retrieve_context(query, top_k)
         
         # Generate test cases
         try:
             response = self.llm.generate_with_context(
                 query=query,
                 context_chunks=context_chunks,
-                system_prompt=system_prompt,
-                temperature=0.7,
-                max_tokens=3000
+                system_prompt=TEST_CASE_SYSTEM_PROMPT,
+                temperature=TEST_CASE_TEMPERATURE,
+                max_tokens=TEST_CASE_MAX_TOKENS,
+                json_schema=TEST_CASE_SUITE_SCHEMA
             )
             
             # Parse JSON response
-            test_cases = self._parse_test_cases(response)
+            with span("test_cases.parse", response_chars=len(response)) as parse_span:
+                test_cases = self._parse_test_cases(response)
+                parse_span.set(test_cases=len(test_cases), dropped=len(self.parse_report["dropped"]))
+            
+            # Ask only for what was cut off instead of regenerating everything
+            if self.parse_report["truncated"] and Config.TEST_CASE_CONTINUATION:
+                test_cases = self._continue_test_cases(query, context_chunks, TEST_CASE_SYSTEM_PROMPT, test_cases)
             
             return test_cases
         except Exception as e:
             raise Exception(f"Error generating test cases: {str(e)}")
     
-    def _parse_test_cases(self, response: str) -> List[Dict[str, Any]]:
-        """Parse test cases from LLM response"""
-        # Try to extract JSON from response
+    def stream_test_cases(
+        self,
+        query: str,
+        top_k: int = 5
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generate test cases like generate_test_cases(), yielding each one as
+        soon as the model has finished writing it.
+        
+        The response is streamed and its test-case array decoded element by
+        element (ArrayStream), so a caller can start working on the first
+        case while the rest are still being generated. parse_report is
+        complete once the iterator is exhausted.
+        
+        Args:
+            query: User's test case request
+            top_k: Number of context chunks to retrieve
+            
+        Yields:
+            Validated test cases in response order
+        """
+        context_chunks = self._retrieve_context(query, top_k)
+        
+        report = {"outcome": "json", "kept": 0, "dropped": [], "repairs": [], "truncated": False}
+        self.parse_report = report
+        test_cases = []
+        
         try:
-            # Find JSON array in response
-            start_idx = response.find('[')
-            end_idx = response.rfind(']') + 1
+            stream = ArrayStream(key="test_cases")
+            response = []
+            with span("test_cases.stream") as stream_span:
+                for delta in self.llm.generate_with_context_stream(
+                    query=query,
+                    context_chunks=context_chunks,
+                    system_prompt=TEST_CASE_SYSTEM_PROMPT,
+                    temperature=TEST_CASE_TEMPERATURE,
+                    max_tokens=TEST_CASE_MAX_TOKENS,
+                    json_schema=TEST_CASE_SUITE_SCHEMA
+                ):
+                    response.append(delta)
+                    for index, tc in stream.feed(delta):
+                        test_case = self._keep_valid(index, tc, report)
+                        if test_case is not None:
+                            test_cases.append(test_case)
+                            yield test_case
+                
+                salvage = stream.close()
+                stream_span.set(
+                    response_chars=sum(len(delta) for delta in response),
+                    test_cases=len(test_cases)
+                )
             
-            if start_idx == -1 or end_idx == 0:
-                raise ValueError("No JSON array found in response")
+            if not salvage.found:
+                # Not the expected {"test_cases": [...]}: parse the whole response instead
+                yield from self._parse_test_cases("".join(response))
+                return
             
-            json_str = response[start_idx:end_idx]
-            test_cases = json.loads(json_str)
+            report.update(repairs=salvage.repairs, truncated=salvage.truncated)
+            report["dropped"].extend(
+                {**dropped, "test_id": self._find_test_id(dropped["excerpt"])}
+                for dropped in salvage.dropped
+            )
+            if salvage.truncated or salvage.dropped:
+                report["outcome"] = "salvaged"
+            elif salvage.repairs:
+                report["outcome"] = "repaired"
+            report["kept"] = len(test_cases)
+            metrics.TEST_CASE_PARSE_TOTAL.labels(report["outcome"]).inc()
             
-            # Validate test cases
-            validated_cases = []
-            for tc in test_cases:
-                if self._validate_test_case(tc):
-                    validated_cases.append(tc)
+            # Ask only for what was cut off instead of regenerating everything
+            if salvage.truncated and Config.TEST_CASE_CONTINUATION:
+                yield from self._continue_test_cases(
+                    query, context_chunks, TEST_CASE_SYSTEM_PROMPT, test_cases
+                )[len(test_cases):]
+        except Exception as e:
+            raise Exception(f"Error generating test cases: {str(e)}")
+    
+    def _retrieve_context(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        """Retrieve the chunks a test-case generation is grounded in and record its provenance"""
+        context_chunks = self.vector_db.search(query, top_k=top_k)
+        
+        if not context_chunks:
+            raise Exception("No relevant documentation found. Please ensure documents are uploaded.")
+        
+        self.provenance = {
+            "prompt": TEST_CASE_SYSTEM_PROMPT,
+            "context": [self._chunk_reference(chunk) for chunk in context_chunks]
+        }
+        return context_chunks
+    
+    def _parse_test_cases(self, response: str) -> List[Dict[str, Any]]:
+        """
+        Parse test cases from LLM response.
+        
+        Syntax errors are repaired where possible. If the JSON is still
+        broken (e.g. cut off by max_tokens), the test-case array is decoded
+        item by item and every complete, valid test case is kept. What was
+        dropped and why is recorded in self.parse_report.
+        """
+        report = {"outcome": "json", "kept": 0, "dropped": [], "repairs": [], "truncated": False}
+        self.parse_report = report
+        
+        try:
+            data, report["repairs"] = parse_json(response)
+            if report["repairs"]:
+                report["outcome"] = "repaired"
             
-            return validated_cases
-        except json.JSONDecodeError as e:
-            # If JSON parsing fails, try to create structured output from text
-            return self._fallback_parse(response)
-    
-    def _validate_test_case(self, test_case: Dict[str, Any]) -> bool:
-        """Validate test case structure"""
-        required_fields = [
-            "test_id", "feature", "test_scenario",
-            "expected_result", "grounded_in"
-        ]
+            # {"test_cases": [...]} from structured output, a bare array otherwise
+            if isinstance(data, dict):
+                test_cases = data.get("test_cases", [data])
+            else:
+                test_cases = data if isinstance(data, list) else []
+            indexes = list(range(len(test_cases)))
+        except ValueError:
+            salvage = salvage_array(response, key="test_cases")
+            if not salvage.found:
+                # If JSON parsing fails, try to create structured output from text
+                report["outcome"] = "fallback"
+                metrics.TEST_CASE_PARSE_TOTAL.labels("fallback").inc()
+                return self._fallback_parse(response)
+            
+            report.update(outcome="salvaged", repairs=salvage.repairs, truncated=salvage.truncated)
+            report["dropped"] = [
+                {**dropped, "test_id": self._find_test_id(dropped["excerpt"])}
+                for dropped in salvage.dropped
+            ]
+            test_cases = salvage.items
+            indexes = salvage.indexes
+        
+        # Validate test cases
+        validated_cases = []
+        for index, tc in zip(indexes, test_cases):
+            test_case = self._keep_valid(index, tc, report)
+            if test_case is not None:
+                validated_cases.append(test_case)
+        
+        report["kept"] = len(validated_cases)
+        metrics.TEST_CASE_PARSE_TOTAL.labels(report["outcome"]).inc()
+        return validated_cases
+    
+    def _keep_valid(self, index: int, tc: Any, report: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The validated test case, or None after recording why it was dropped in `report`"""
+        try:
+            return self._validate_test_case(tc)
+        except ValidationError as e:
+            metrics.TEST_CASES_INVALID_TOTAL.inc()
+            report["dropped"].append({
+                "index": index,
+                "test_id": tc.get("test_id") if isinstance(tc, dict) else None,
+                "reason": "invalid test case: " + "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc']) or 'value'}: {error['msg']}"
+                    for error in e.errors()[:3]
+                )
+            })
+            return None
+    
+    def _validate_test_case(self, test_case: Any) -> Dict[str, Any]:
+        """
+        Validate a test case against the TestCase model.
         
-        for field in required_fields:
-            if field not in test_case:
-                return False
+        Returns:
+            The normalized test case
+            
+        Raises:
+            ValidationError: If required fields are missing or invalid
+        """
+        return TestCase.model_validate(test_case).model_dump()
+    
+    def _find_test_id(self, fragment: str) -> Optional[str]:
+        match = re.search(r'"test_id"\s*:\s*"([^"]+)"', fragment)
+        return match.group(1) if match else None
+    
+    def _continue_test_cases(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        system_prompt: str,
+        test_cases: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Request the test cases a truncated response did not finish and append them"""
+        first_report = self.parse_report
+        next_number = self._next_test_number(test_cases)
+        received = "\n".join(f"- {tc['test_id']}: {tc['test_scenario']}" for tc in test_cases) or "- (none)"
+        
+        continuation_query = f"""{query}
+
+Your previous answer was cut off. These test cases were already received:
+{received}
+
+Continue with the remaining test cases only. Do not repeat the ones above. Number them from TC-{next_number:03d}."""
+        
+        with span("test_cases.continue", received=len(test_cases)):
+            response = self.llm.generate_with_context(
+                query=continuation_query,
+                context_chunks=context_chunks,
+                system_prompt=system_prompt,
+                temperature=TEST_CASE_TEMPERATURE,
+                max_tokens=TEST_CASE_MAX_TOKENS,
+                json_schema=TEST_CASE_SUITE_SCHEMA
+            )
+            continued = self._parse_test_cases(response)
+        
+        seen_ids = {tc["test_id"] for tc in test_cases}
+        seen_scenarios = {tc["test_scenario"].strip().lower() for tc in test_cases}
+        added = []
+        for tc in continued:
+            if tc["test_scenario"].strip().lower() in seen_scenarios:
+                continue
+            if tc["test_id"] in seen_ids:
+                tc["test_id"] = f"TC-{self._next_test_number(test_cases + added):03d}"
+            seen_ids.add(tc["test_id"])
+            seen_scenarios.add(tc["test_scenario"].strip().lower())
+            added.append(tc)
         
-        return True
+        first_report["continuation"] = {**self.parse_report, "added": len(added)}
+        self.parse_report = first_report
+        return test_cases + added
+    
+    def _next_test_number(self, test_cases: List[Dict[str, Any]]) -> int:
+        numbers = [
+            int(match.group(1))
+            for match in (re.search(r"(\d+)$", tc.get("test_id", "")) for tc in test_cases)
+            if match
+        ]
+        return max(numbers, default=0) + 1
     
     def _fallback_parse(self, response: str) -> List[Dict[str, Any]]:
         """Fallback parser for non-JSON responses"""
@@ -144,23 +360,96 @@ Generate multiple comprehensive test cases covering different aspects of the fea
     
     def generate_test_plan(
         self,
-        features: List[str] = None
+        features: List[str] = None,
+        max_features: int = None
     ) -> Dict[str, Any]:
         """
         Generate a comprehensive test plan.
         
+        Features are discovered from the knowledge base unless given. Each
+        feature gets its own generation over its own top-k context, run
+        concurrently (TEST_PLAN_CONCURRENCY), so wall-clock time follows the
+        slowest feature. The results are merged, deduplicated (exact scenarios,
+        then semantically with TestCaseDeduplicator) and renumbered.
+        
         Args:
             features: List of features to test (optional)
+            max_features: Maximum number of features to discover
             
         Returns:
             Complete test plan
         """
+        max_features = max_features or Config.TEST_PLAN_MAX_FEATURES
         if features:
-            query = f"Generate a comprehensive test plan for these features: {', '.join(features)}"
+            features = [{"name": name, "description": ""} for name in features]
         else:
-            query = "Generate a comprehensive test plan covering all features in the application"
+            with span("test_plan.discover_features") as discover_span:
+                features = self.discover_features(max_features)
+                discover_span.set(features=len(features))
         
-        test_cases = self.generate_test_cases(query, top_k=10)
+        if not features:
+            raise Exception("No features found in the documentation. Please ensure documents are uploaded.")
+        
+        start_time = time.perf_counter()
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        with span("test_plan.fan_out", features=len(features)):
+            workers = min(Config.TEST_PLAN_CONCURRENCY, len(features))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="test-plan") as executor:
+                # Each task runs in a copy of this context so knowledge-base
+                # pins, deadlines and profiling carry over to the worker
+                futures = {
+                    executor.submit(contextvars.copy_context().run, self._generate_feature_cases, feature): feature
+                    for feature in features
+                }
+                for future in as_completed(futures):
+                    feature = futures[future]
+                    try:
+                        results[feature["name"]] = future.result()
+                    except Exception as e:
+                        results[feature["name"]] = {"test_cases": [], "seconds": None, "context": [], "error": str(e)}
+        
+        wall_seconds = time.perf_counter() - start_time
+        
+        if all("error" in result for result in results.values()):
+            errors = "; ".join(f"{name}: {result['error']}" for name, result in results.items())
+            raise Exception(f"Error generating test plan: {errors}")
+        
+        # Merge in feature order, dropping repeats across features
+        test_cases = []
+        seen = set()
+        duplicates_removed = 0
+        for feature in features:
+            for tc in results[feature["name"]]["test_cases"]:
+                key = self._scenario_key(tc)
+                if key in seen:
+                    duplicates_removed += 1
+                    continue
+                seen.add(key)
+                test_cases.append(tc)
+        
+        # Merge reworded repeats; a failure here keeps the exact-deduplicated plan
+        dedup_report = None
+        if Config.TEST_CASE_DEDUP_ENABLED and test_cases:
+            try:
+                deduplicator = TestCaseDeduplicator(self.vector_db.embedding_model)
+                test_cases, dedup_report = deduplicator.deduplicate(test_cases)
+                duplicates_removed += dedup_report["duplicates_removed"]
+            except Exception as e:
+                print(f"Warning: semantic test case dedup failed: {str(e)}")
+                dedup_report = {"error": str(e)}
+        
+        for number, tc in enumerate(test_cases, 1):
+            tc["test_id"] = f"TC-{number:03d}"
+        
+        self.provenance = {
+            "prompt": None,
+            "context": [
+                {"feature": feature["name"], **reference}
+                for feature in features
+                for reference in results[feature["name"]]["context"]
+            ]
+        }
         
         # Organize test plan
         test_plan = {
@@ -174,11 +463,135 @@ Generate multiple comprehensive test cases covering different aspects of the fea
                 "high_priority": len([tc for tc in test_cases if tc.get("priority") == "high"]),
                 "medium_priority": len([tc for tc in test_cases if tc.get("priority") == "medium"]),
                 "low_priority": len([tc for tc in test_cases if tc.get("priority") == "low"])
+            },
+            "features": [
+                {
+                    "name": feature["name"],
+                    "description": feature["description"],
+                    "test_cases": len(results[feature["name"]]["test_cases"]),
+                    "seconds": results[feature["name"]]["seconds"],
+                    **({"error": results[feature["name"]]["error"]} if "error" in results[feature["name"]] else {})
+                }
+                for feature in features
+            ],
+            "duplicates_removed": duplicates_removed,
+            "dedup": dedup_report,
+            "generation": {
+                "concurrency": workers,
+                "wall_seconds": round(wall_seconds, 3),
+                "sum_seconds": round(sum(r["seconds"] or 0 for r in results.values()), 3)
             }
         }
         
         return test_plan
     
+    def _generate_feature_cases(self, feature: Dict[str, str]) -> Dict[str, Any]:
+        """Generate the test cases of one feature with a separate agent (parse reports are per agent)"""
+        query = f"Generate positive and negative test cases for the {feature['name']} feature"
+        if feature.get("description"):
+            query += f" ({feature['description']})"
+        
+        agent = TestCaseAgent(self.vector_db, self.llm)
+        start_time = time.perf_counter()
+        with span("test_plan.feature", feature=feature["name"]) as feature_span:
+            test_cases = agent.generate_test_cases(query, top_k=Config.TEST_PLAN_TOP_K)
+            feature_span.set(test_cases=len(test_cases))
+        
+        return {
+            "test_cases": test_cases,
+            "seconds": round(time.perf_counter() - start_time, 3),
+            "parse_report": agent.parse_report,
+            "context": agent.provenance.get("context", [])
+        }
+    
+    def _chunk_reference(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Where a retrieved chunk came from (recorded as generation provenance)"""
+        metadata = chunk.get("metadata") or {}
+        return {
+            "source": metadata.get("source"),
+            "chunk_index": metadata.get("chunk_index"),
+            "distance": chunk.get("distance")
+        }
+    
+    def _scenario_key(self, test_case: Dict[str, Any]) -> str:
+        """Normalized scenario text used to spot the same test case generated twice"""
+        return " ".join(re.findall(r"\w+", test_case.get("test_scenario", "").lower()))
+    
+    def discover_features(self, max_features: int = None) -> List[Dict[str, str]]:
+        """
+        Find the testable features described in the knowledge base.
+        
+        The document outline (Markdown headings, or the opening lines of
+        documents without headings) is sent to the LLM, which groups it into
+        features. If that fails, second-level headings are used directly.
+        
+        Args:
+            max_features: Maximum number of features to return
+            
+        Returns:
+            List of {"name", "description"} dicts
+        """
+        max_features = max_features or Config.TEST_PLAN_MAX_FEATURES
+        outline = self._document_outline()
+        if not outline:
+            return []
+        
+        outline_text = "\n\n".join(
+            f"Source: {source}\n" + "\n".join(lines) for source, lines in outline.items()
+        )
+        
+        system_prompt = f"""You are an expert QA engineer planning test coverage.
+
+From the documentation outline below, list the distinct user-facing features that should be tested. Merge headings that describe the same feature, and skip document metadata (versions, dates, overviews).
+
+Return ONLY a valid JSON object of the form {{"features": [{{"name": "Feature name", "description": "One sentence on what to test"}}]}} with at most {max_features} features, most important first."""
+        
+        try:
+            response = self.llm.generate(
+                prompt=outline_text,
+                system_prompt=system_prompt,
+                temperature=0.2,
+                max_tokens=800,
+                json_schema=FEATURE_LIST_SCHEMA
+            )
+            data, _ = parse_json(response)
+            features = FeatureList.model_validate(data).model_dump()["features"]
+        except Exception as e:
+            print(f"Feature discovery fell back to headings: {str(e)}")
+            features = [
+                {"name": line[3:].strip(), "description": ""}
+                for lines in outline.values() for line in lines
+                if line.startswith("## ") and not _GENERIC_HEADING_RE.match(line[3:])
+            ]
+        
+        unique = {}
+        for feature in features:
+            name = feature["name"].strip()
+            if name and name.lower() not in unique:
+                unique[name.lower()] = {"name": name, "description": feature.get("description", "")}
+        return list(unique.values())[:max_features]
+    
+    def _document_outline(self) -> Dict[str, List[str]]:
+        """Headings per source, or the first line of sources that have none"""
+        outline: Dict[str, List[str]] = {}
+        first_lines: Dict[str, str] = {}
+        
+        for doc in self.vector_db.get_all_documents():
+            source = doc.get("metadata", {}).get("source", "unknown")
+            content = doc.get("content", "")
+            headings = outline.setdefault(source, [])
+            for match in _HEADING_RE.finditer(content):
+                heading = f"{match.group(1)} {match.group(2).strip()}"
+                if heading not in headings:
+                    headings.append(heading)
+            if source not in first_lines and content.strip():
+                first_lines[source] = content.strip().splitlines()[0][:200]
+        
+        for source, headings in outline.items():
+            if not headings and source in first_lines:
+                headings.append(first_lines[source])
+        return {source: lines for source, lines in outline.items() if lines}
+    
     def suggest_test_scenarios(self) -> List[str]:
         """
         Suggest test scenarios based on uploaded documentation.
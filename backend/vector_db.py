@@ -3,137 +3,794 @@ Vector database management using ChromaDB for semantic search and retrieval.
 """
 
 import os
+import json
+import time
+import uuid
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import List, Dict, Any, Optional
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 from backend.config import Config
 from backend.document_processor import DocumentProcessor
+from backend.dedup import ChunkDeduplicator
+from backend import metrics
+from backend.profiling import span
+
+
+# Collection versions pinned by the current request, keyed by base collection name
+_pinned_versions: ContextVar[Dict[str, str]] = ContextVar("pinned_versions", default={})
+
+# Commits remembered in the pointer file, to know when each version was replaced
+POINTER_HISTORY = 20
+
+# Per-source breakdowns of a dedup report, so a source's contribution can be taken out
+DEDUP_SOURCE_KEYS = ("seen_by_source", "removed_by_source", "chars_removed_by_source")
+
+
+def load_embedding_model(model_name: str = None):
+    """
+    Load the sentence-transformers embedding model.
+    
+    sentence_transformers (and torch) are imported here rather than at module
+    level so processes that only proxy to the embedding service stay small.
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name or Config.EMBEDDING_MODEL)
 
 
 class VectorDatabase:
     """Manage vector database operations for document storage and retrieval"""
     
-    def __init__(self, persist_directory: str = None):
+    def __init__(
+        self,
+        persist_directory: str = None,
+        embedding_model: Any = None,
+        collection_name: str = "qa_documents",
+        client: Any = None
+    ):
         """
         Initialize vector database.
         
         Args:
             persist_directory: Directory to persist the database
+            embedding_model: Preloaded embedding model (loaded from config if omitted)
+            collection_name: Base collection name of this knowledge base
+            client: ChromaDB client shared with other knowledge bases (opened lazily if omitted)
         """
         self.persist_directory = persist_directory or Config.CHROMA_DB_PATH
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=self.persist_directory,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
+        # ChromaDB client is opened on first use (see `client`)
+        self._client = client
         
         # Initialize embedding model
-        self.embedding_model = SentenceTransformer(Config.EMBEDDING_MODEL)
+        self.embedding_model = embedding_model or load_embedding_model()
         
-        # Collection name
-        self.collection_name = "qa_documents"
-        self.collection = None
+        # Base collection name; data lives in versioned collections
+        # (qa_documents_v1, qa_documents_v2, ...) and a pointer file names the active one
+        self.collection_name = collection_name
+        self._collections: Dict[str, Any] = {}
+        self._active_name: Optional[str] = None
+        self._pointer_mtime: Optional[int] = None
+        self._pins: Dict[str, int] = defaultdict(int)
+        self._building: set = set()  # shadows this process is still writing
+        self._dedup_reports: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """
+        ChromaDB client, opened lazily.
+        
+        A preloaded app (gunicorn preload_app) loads the model in the master and
+        forks; opening the client on first use gives each worker its own SQLite
+        handle instead of one inherited across fork().
+        """
+        if self._client is None:
+            self._client = chromadb.PersistentClient(
+                path=self.persist_directory,
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    allow_reset=True
+                )
+            )
+        return self._client
+    
+    @property
+    def collection(self):
+        """Collection serving reads for the current request (None if none exists)"""
+        return self._read_collection()
     
     def create_collection(self, reset: bool = False) -> None:
         """
         Create or get collection.
         
         Args:
-            reset: If True, delete existing collection and create new one
+            reset: If True, swap in a new empty collection version
         """
-        if reset:
-            try:
-                self.client.delete_collection(self.collection_name)
-            except:
-                pass
+        if reset or self.active_collection_name() is None:
+            self.commit_rebuild(self.begin_rebuild())
+    
+    def active_collection_name(self) -> Optional[str]:
+        """
+        Name of the active collection version.
         
+        The pointer file is re-read only when its mtime changes, so every
+        process sees a swap made by another one.
+        """
+        pointer_path = self._pointer_path()
         try:
-            self.collection = self.client.get_collection(self.collection_name)
-        except:
-            self.collection = self.client.create_collection(
-                name=self.collection_name,
-                metadata={"description": "QA Agent document collection"}
+            mtime = os.stat(pointer_path).st_mtime_ns
+        except FileNotFoundError:
+            return self._migrate_legacy_collection()
+        
+        if mtime != self._pointer_mtime:
+            with open(pointer_path, "r", encoding="utf-8") as f:
+                self._active_name = json.load(f)["collection"]
+            self._pointer_mtime = mtime
+        
+        return self._active_name
+    
+    def begin_rebuild(self) -> str:
+        """
+        Create an empty shadow collection for a rebuild.
+        
+        Reads keep using the active version until commit_rebuild() is called.
+        
+        Returns:
+            Name of the shadow collection
+        """
+        # Also reaps versions whose grace period ran out since the last commit
+        self.garbage_collect()
+        
+        with self._lock:
+            version = max((v for v, _ in self._list_versions()), default=0) + 1
+            name = f"{self.collection_name}_v{version}"
+            self._collections[name] = self.client.create_collection(
+                name=name,
+                metadata={"description": "QA Agent document collection", "version": version, "created_at": time.time()}
             )
+            self._building.add(name)
+        return name
+    
+    def commit_rebuild(self, shadow_name: str) -> None:
+        """Atomically make a shadow collection the active version"""
+        self._write_pointer(shadow_name)
+        with self._lock:
+            self._building.discard(shadow_name)
+        self.garbage_collect()
+    
+    def abort_rebuild(self, shadow_name: str) -> None:
+        """Discard a shadow collection that was not committed"""
+        with self._lock:
+            self._building.discard(shadow_name)
+            self._drop_collection(shadow_name)
+    
+    def garbage_collect(self, retain: int = None) -> List[str]:
+        """
+        Delete old collection versions and abandoned rebuilds.
+        
+        The active version and the `retain` versions before it are kept, as
+        are versions pinned by this process's in-flight requests and versions
+        replaced less than KB_VERSION_GRACE_S ago, which covers requests of
+        other worker processes. Versions newer than the active one are rebuilds
+        in progress, unless this process is not building them and they are
+        older than KB_STALE_SHADOW_S (a crashed build).
+        
+        Returns:
+            Names of the deleted collections
+        """
+        retain = Config.KB_RETAINED_VERSIONS if retain is None else retain
+        active = self.active_collection_name()
+        versions = self._list_versions()
+        active_version = next((v for v, name in versions if name == active), None)
+        if active_version is None:
+            return []
+        
+        now = time.time()
+        replaced_at, oldest_commit = self._replacement_times()
+        older = [name for v, name in versions if v < active_version]
+        keep = set(older[-retain:]) if retain else set()
+        candidates = [
+            name for name in older
+            if name not in keep and now - replaced_at.get(name, oldest_commit) >= Config.KB_VERSION_GRACE_S
+        ]
+        with self._lock:
+            building = set(self._building)
+        candidates += [
+            name for v, name in versions
+            if v > active_version and name not in building
+            and now - self._created_at(name) >= Config.KB_STALE_SHADOW_S
+        ]
+        
+        deleted = []
+        for name in candidates:
+            # Checked and dropped under the lock so pin() cannot take it in between
+            with self._lock:
+                if self._pins.get(name, 0) > 0:
+                    continue
+                self._drop_collection(name)
+            deleted.append(name)
+        
+        return deleted
+    
+    @contextmanager
+    def pin(self):
+        """
+        Pin the active collection version for the enclosed block.
+        
+        Every read made inside the block uses the version that was active when
+        it started, even if a rebuild is committed meanwhile.
+        """
+        pinned = _pinned_versions.get()
+        if self.collection_name in pinned:
+            yield pinned[self.collection_name]
+            return
+        
+        # Resolved and counted in one step, so garbage_collect() cannot drop it in between
+        with self._lock:
+            name = self.active_collection_name()
+            self._pins[name] += 1
+        token = _pinned_versions.set({**pinned, self.collection_name: name})
+        try:
+            yield name
+        finally:
+            _pinned_versions.reset(token)
+            with self._lock:
+                self._pins[name] -= 1
+    
+    def _read_collection(self, collection_name: str = None):
+        """Resolve an explicit, pinned or active collection handle"""
+        name = (
+            collection_name
+            or _pinned_versions.get().get(self.collection_name)
+            or self.active_collection_name()
+        )
+        if not name:
+            return None
+        
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self.client.get_collection(name)
+            self._collections[name] = collection
+        return collection
+    
+    def _pointer_path(self) -> str:
+        return os.path.join(self.persist_directory, f"{self.collection_name}.active.json")
+    
+    def _read_pointer(self) -> Dict[str, Any]:
+        try:
+            with open(self._pointer_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+    
+    def _write_pointer(self, collection_name: str) -> None:
+        pointer_path = self._pointer_path()
+        committed_at = time.time()
+        
+        previous = self._read_pointer()
+        history = previous.get("history") or (
+            [{"collection": previous["collection"], "committed_at": previous.get("committed_at", 0)}]
+            if previous.get("collection") else []
+        )
+        history = (history + [{"collection": collection_name, "committed_at": committed_at}])[-POINTER_HISTORY:]
+        
+        tmp_path = f"{pointer_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"collection": collection_name, "committed_at": committed_at, "history": history}, f)
+        os.replace(tmp_path, pointer_path)
+        
+        self._active_name = collection_name
+        self._pointer_mtime = os.stat(pointer_path).st_mtime_ns
+    
+    def _migrate_legacy_collection(self) -> Optional[str]:
+        """Adopt an unversioned collection from before versioning, if present"""
+        try:
+            self.client.get_collection(self.collection_name)
+        except Exception:
+            return None
+        self._write_pointer(self.collection_name)
+        return self.collection_name
+    
+    def _replacement_times(self) -> tuple:
+        """
+        When recently replaced versions stopped being active, from the pointer history.
+        
+        Returns:
+            Tuple of (time by collection name, the oldest commit time on
+            record, which bounds when any older version was replaced)
+        """
+        history = self._read_pointer().get("history") or []
+        replaced_at = {
+            entry["collection"]: following["committed_at"]
+            for entry, following in zip(history, history[1:])
+        }
+        return replaced_at, history[0]["committed_at"] if history else 0
+    
+    def _created_at(self, name: str) -> float:
+        """Creation time of a collection version (0 if unknown)"""
+        try:
+            metadata = self.client.get_collection(name).metadata or {}
+        except Exception:
+            return 0
+        return metadata.get("created_at", 0)
+    
+    def _list_versions(self) -> List[tuple]:
+        """Sorted (version, name) pairs of this knowledge base's collections"""
+        prefix = f"{self.collection_name}_v"
+        versions = []
+        for collection in self.client.list_collections():
+            if collection.name == self.collection_name:
+                versions.append((0, collection.name))
+            elif collection.name.startswith(prefix) and collection.name[len(prefix):].isdigit():
+                versions.append((int(collection.name[len(prefix):]), collection.name))
+        return sorted(versions)
+    
+    def _drop_collection(self, name: str) -> None:
+        self._collections.pop(name, None)
+        self._dedup_reports.pop(name, None)
+        try:
+            self.client.delete_collection(name)
+        except Exception:
+            pass
     
     def add_documents(
         self,
         documents: List[Dict[str, Any]],
         chunk_size: int = None,
-        chunk_overlap: int = None
+        chunk_overlap: int = None,
+        collection_name: str = None
     ) -> int:
         """
         Add documents to the vector database.
         
+        Near-duplicate chunks (repeated headers, footers, copied sections) are
+        dropped before embedding according to CHUNK_DEDUP_MODE; see
+        get_dedup_report() for what was removed.
+        
+        A document whose source is already in the collection replaces its
+        chunks (see replace_document) instead of being added a second time.
+        
         Args:
             documents: List of documents with 'content' and 'metadata' keys
             chunk_size: Size of text chunks
             chunk_overlap: Overlap between chunks
+            collection_name: Target collection (e.g. a rebuild shadow); defaults to the active one
             
         Returns:
             Number of chunks added
         """
-        if not self.collection:
+        if not collection_name and not self.active_collection_name():
             self.create_collection()
         
+        collection = self._read_collection(collection_name)
+        
+        # Chunk IDs are unique per call, so re-adding a stored source (a build
+        # without reset) would index it twice
+        stored = self._stored_sources(collection, [doc.get("source", "unknown") for doc in documents])
+        new_documents = [doc for doc in documents if doc.get("source", "unknown") not in stored]
+        
+        num_chunks = 0
+        if new_documents:
+            num_chunks += len(self._index_documents(collection, new_documents, chunk_size, chunk_overlap))
+        for doc in documents:
+            if doc.get("source", "unknown") in stored:
+                replaced = self.replace_document(doc, chunk_size, chunk_overlap, collection_name=collection.name)
+                num_chunks += replaced["chunks_added"]
+        return num_chunks
+    
+    def _stored_sources(self, collection: Any, sources: List[str]) -> set:
+        """The given sources that already have chunks in a collection"""
+        if not sources or collection.count() == 0:
+            return set()
+        stored = collection.get(where={"source": {"$in": sorted(set(sources))}}, include=["metadatas"])
+        return {(metadata or {}).get("source") for metadata in stored["metadatas"] or []}
+    
+    def replace_document(
+        self,
+        document: Dict[str, Any],
+        chunk_size: int = None,
+        chunk_overlap: int = None,
+        collection_name: str = None
+    ) -> Dict[str, Any]:
+        """
+        Replace the chunks of one source document.
+        
+        The new chunks are added before the old ones are deleted, and a
+        failure while embedding restores the previous version. Chunks whose
+        text did not change reuse their stored embeddings.
+        
+        Args:
+            document: Processed document ('source' identifies the chunks to replace)
+            chunk_size: Size of text chunks
+            chunk_overlap: Overlap between chunks
+            collection_name: Target collection; defaults to the active one
+            
+        Returns:
+            Dictionary with the numbers of chunks added, removed, embedded and reused
+        """
+        if not collection_name and not self.active_collection_name():
+            self.create_collection()
+        
+        collection = self._read_collection(collection_name)
+        source = document.get("source", "unknown")
+        
+        old = collection.get(where={"source": source}, include=["documents", "embeddings"])
+        reuse_embeddings = {}
+        if old.get("embeddings") is not None:
+            reuse_embeddings = {
+                text: list(embedding)
+                for text, embedding in zip(old["documents"], old["embeddings"])
+            }
+        
+        own_ids, originals = self._detach_source(collection, source)
+        
+        stats = {"embedded": 0}
+        try:
+            new_ids = self._index_documents(
+                collection,
+                [document],
+                chunk_size,
+                chunk_overlap,
+                exclude_source=source,
+                reuse_embeddings=reuse_embeddings,
+                stats=stats
+            )
+        except Exception:
+            # Roll back the partly written new version and the provenance changes
+            if stats.get("ingest_id"):
+                collection.delete(where={"ingest_id": stats["ingest_id"]})
+            if originals:
+                collection.update(ids=list(originals), metadatas=list(originals.values()))
+            raise
+        
+        if own_ids:
+            collection.delete(ids=own_ids)
+        
+        return {
+            "source": source,
+            "chunks_added": len(new_ids),
+            "chunks_removed": len(own_ids),
+            "chunks_embedded": stats["embedded"],
+            "chunks_reused": len(new_ids) - stats["embedded"]
+        }
+    
+    def delete_document(self, source: str, collection_name: str = None) -> int:
+        """
+        Delete the chunks of one source document.
+        
+        Chunks that other sources duplicated (see CHUNK_DEDUP_MODE=merge) are
+        handed over to one of those sources instead of being deleted.
+        
+        Args:
+            source: Source file name
+            collection_name: Target collection; defaults to the active one
+            
+        Returns:
+            Number of chunks deleted
+        """
+        collection = self._read_collection(collection_name)
+        if collection is None:
+            return 0
+        
+        own_ids, _ = self._detach_source(collection, source)
+        if own_ids:
+            collection.delete(ids=own_ids)
+        self._forget_dedup_source(collection.name, source)
+        return len(own_ids)
+    
+    def list_documents(self, collection_name: str = None) -> Dict[str, int]:
+        """Chunk count per source document"""
+        collection = self._read_collection(collection_name)
+        if collection is None:
+            return {}
+        
+        counts: Dict[str, int] = defaultdict(int)
+        for metadata in collection.get(include=["metadatas"])["metadatas"] or []:
+            counts[(metadata or {}).get("source", "unknown")] += 1
+        return dict(counts)
+    
+    def _detach_source(self, collection: Any, source: str) -> tuple:
+        """
+        Remove a source from shared-chunk provenance ahead of deleting its chunks.
+        
+        Chunks of `source` that other sources also contained are handed over
+        to one of them, and `source` is dropped from other chunks'
+        duplicate_sources.
+        
+        Returns:
+            Tuple of (IDs of the chunks only `source` owns, original metadata
+            of the updated chunks by ID for rollback)
+        """
+        own = collection.get(where={"source": source}, include=["metadatas"])
+        shared = collection.get(where={"duplicate_count": {"$gt": 0}}, include=["metadatas"])
+        
+        own_ids = []
+        originals = {}
+        updated = {}
+        
+        for chunk_id, metadata in zip(own["ids"], own["metadatas"]):
+            sharing = [s for s in (metadata.get("duplicate_sources") or "").split(",") if s and s != source]
+            if not sharing:
+                own_ids.append(chunk_id)
+                continue
+            
+            # Another source also contained this chunk; it keeps it
+            originals[chunk_id] = metadata
+            updated[chunk_id] = {
+                **metadata,
+                "source": sharing[0],
+                "file_path": os.path.join(os.path.dirname(metadata.get("file_path", "")), sharing[0]),
+                "duplicate_sources": ",".join(sharing[1:]),
+                "duplicate_count": len(sharing) - 1
+            }
+        
+        for chunk_id, metadata in zip(shared["ids"], shared["metadatas"]):
+            sharing = [s for s in (metadata.get("duplicate_sources") or "").split(",") if s]
+            if chunk_id in updated or source not in sharing:
+                continue
+            sharing.remove(source)
+            originals[chunk_id] = metadata
+            updated[chunk_id] = {
+                **metadata,
+                "duplicate_sources": ",".join(sharing),
+                "duplicate_count": len(sharing)
+            }
+        
+        if updated:
+            collection.update(ids=list(updated), metadatas=list(updated.values()))
+        
+        return own_ids, originals
+    
+    def _index_documents(
+        self,
+        collection: Any,
+        documents: List[Dict[str, Any]],
+        chunk_size: int = None,
+        chunk_overlap: int = None,
+        exclude_source: str = None,
+        reuse_embeddings: Dict[str, List[float]] = None,
+        stats: Dict[str, Any] = None
+    ) -> List[str]:
+        """
+        Chunk, deduplicate, embed and store documents.
+        
+        Args:
+            collection: Target collection
+            documents: Processed documents
+            chunk_size: Size of text chunks
+            chunk_overlap: Overlap between chunks
+            exclude_source: Source whose stored chunks are not used for deduplication
+                (the one being replaced)
+            reuse_embeddings: Stored embeddings by chunk text
+            stats: Receives the ingest ID and the number of chunks embedded
+            
+        Returns:
+            IDs of the chunks added
+        """
         chunk_size = chunk_size or Config.CHUNK_SIZE
         chunk_overlap = chunk_overlap or Config.CHUNK_OVERLAP
+        stats = stats if stats is not None else {}
+        stats.setdefault("embedded", 0)
+        
+        # Chunk IDs are unique per call, so a replacement never collides with
+        # the chunks it replaces
+        ingest_id = uuid.uuid4().hex[:8]
+        stats["ingest_id"] = ingest_id
+        
+        deduplicator = ChunkDeduplicator()
+        if deduplicator.enabled and collection.count() > 0:
+            # Appending: new chunks are also compared with the stored ones
+            existing = collection.get(include=["documents", "metadatas"])
+            deduplicator.seed(
+                existing["ids"],
+                existing["documents"],
+                existing["metadatas"],
+                exclude_source=exclude_source
+            )
         
         all_chunks = []
         all_metadatas = []
         all_ids = []
+        added_ids = []
         
         chunk_counter = 0
         
+        def add_chunk(chunk: str, chunk_metadata: Dict[str, Any], chunk_id: str) -> bool:
+            chunk_metadata["ingest_id"] = ingest_id
+            if deduplicator.enabled and deduplicator.check(chunk_id, chunk, chunk_metadata):
+                return False
+            all_chunks.append(chunk)
+            all_metadatas.append(chunk_metadata)
+            all_ids.append(chunk_id)
+            return True
+        
+        def flush() -> None:
+            stats["embedded"] += self._add_batch(collection, all_chunks, all_metadatas, all_ids, reuse_embeddings)
+            added_ids.extend(all_ids)
+            del all_chunks[:], all_metadatas[:], all_ids[:]
+        
         for doc in documents:
             content = doc["content"]
             metadata = doc.get("metadata", {})
             source = doc.get("source", "unknown")
+            file_type = metadata.get("file_type", "unknown")
+            
+            if doc.get("chunks") is not None:
+                # Pre-chunked (streamed) documents carry their own chunk metadata
+                doc_chunks = 0
+                for i, chunk in enumerate(doc["chunks"]):
+                    doc_chunks += 1
+                    chunk_metadata = {
+                        **metadata,
+                        "chunk_index": i,
+                        "json_path": chunk["json_path"]
+                    }
+                    if add_chunk(chunk["content"], chunk_metadata, f"{source}_chunk_{i}_{chunk_counter}_{ingest_id}"):
+                        chunk_counter += 1
+                    
+                    if len(all_chunks) >= Config.EMBEDDING_BATCH_SIZE:
+                        flush()
+                
+                metrics.DOCUMENT_CHUNKS.labels(file_type).observe(doc_chunks)
+                continue
             
             # Chunk the document
             chunks = DocumentProcessor.chunk_text(content, chunk_size, chunk_overlap)
+            metrics.DOCUMENT_CHUNKS.labels(file_type).observe(len(chunks))
             
             for i, chunk in enumerate(chunks):
                 if chunk.strip():  # Only add non-empty chunks
-                    chunk_id = f"{source}_chunk_{i}_{chunk_counter}"
-                    
-                    all_chunks.append(chunk)
-                    all_metadatas.append({
+                    chunk_id = f"{source}_chunk_{i}_{chunk_counter}_{ingest_id}"
+                    chunk_metadata = {
                         **metadata,
                         "chunk_index": i,
                         "total_chunks": len(chunks)
-                    })
-                    all_ids.append(chunk_id)
-                    
-                    chunk_counter += 1
-        
-        if all_chunks:
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(
-                all_chunks,
-                convert_to_numpy=True,
-                show_progress_bar=True
-            ).tolist()
+                    }
+                    if add_chunk(chunk, chunk_metadata, chunk_id):
+                        chunk_counter += 1
             
-            # Add to collection
-            self.collection.add(
-                embeddings=embeddings,
-                documents=all_chunks,
-                metadatas=all_metadatas,
-                ids=all_ids
-            )
+            if len(all_chunks) >= Config.EMBEDDING_BATCH_SIZE:
+                flush()
+        
+        flush()
+        
+        if deduplicator.enabled:
+            # Record on the kept chunks which other sources shared them
+            merged = deduplicator.merged_metadatas()
+            if merged:
+                collection.update(ids=list(merged), metadatas=list(merged.values()))
+            
+            report = deduplicator.report()
+            metrics.DUPLICATE_CHUNKS_TOTAL.inc(report["duplicates_removed"])
+            self._record_dedup_report(collection.name, report, replaced_source=exclude_source)
         
-        return len(all_chunks)
+        return added_ids
+    
+    def _record_dedup_report(
+        self,
+        collection_name: str,
+        report: Dict[str, Any],
+        replaced_source: str = None
+    ) -> None:
+        """
+        Accumulate the dedup report of a collection version across add_documents calls.
+        
+        Args:
+            collection_name: Collection version the report belongs to
+            report: Report of the latest call
+            replaced_source: Source whose earlier contribution the latest call replaces
+        """
+        with self._lock:
+            previous = self._dedup_reports.get(collection_name)
+            if previous and replaced_source:
+                previous = self._without_source(previous, replaced_source)
+            if previous:
+                for key in ("chunks_seen", "duplicates_removed", "chars_removed"):
+                    report[key] += previous[key]
+                for key in DEDUP_SOURCE_KEYS:
+                    for source, count in previous.get(key, {}).items():
+                        report[key][source] = report[key].get(source, 0) + count
+                self._update_dedup_totals(report)
+            self._dedup_reports[collection_name] = report
+    
+    def _forget_dedup_source(self, collection_name: str, source: str) -> None:
+        """Remove a deleted source's contribution from the dedup report of a collection version"""
+        with self._lock:
+            report = self._dedup_reports.get(collection_name)
+            if report:
+                self._dedup_reports[collection_name] = self._without_source(report, source)
+    
+    def _without_source(self, report: Dict[str, Any], source: str) -> Dict[str, Any]:
+        """Copy of a dedup report with the chunks `source` contributed taken out"""
+        report = {
+            **report,
+            **{key: dict(report.get(key, {})) for key in DEDUP_SOURCE_KEYS},
+            "shared_chunks": [
+                {**shared, "duplicate_sources": [s for s in shared["duplicate_sources"] if s != source]}
+                for shared in report.get("shared_chunks", [])
+                if shared["source"] != source
+            ]
+        }
+        report["shared_chunks"] = [shared for shared in report["shared_chunks"] if shared["duplicate_sources"]]
+        
+        report["chunks_seen"] -= report["seen_by_source"].pop(source, 0)
+        report["duplicates_removed"] -= report["removed_by_source"].pop(source, 0)
+        report["chars_removed"] -= report["chars_removed_by_source"].pop(source, 0)
+        self._update_dedup_totals(report)
+        return report
+    
+    @staticmethod
+    def _update_dedup_totals(report: Dict[str, Any]) -> None:
+        report["chunks_kept"] = report["chunks_seen"] - report["duplicates_removed"]
+        report["removed_ratio"] = (
+            round(report["duplicates_removed"] / report["chunks_seen"], 4) if report["chunks_seen"] else 0.0
+        )
+    
+    def get_dedup_report(self, collection_name: str = None) -> Optional[Dict[str, Any]]:
+        """Near-duplicate removal report of a collection version built by this process"""
+        collection = self._read_collection(collection_name)
+        if not collection:
+            return None
+        return self._dedup_reports.get(collection.name)
+    
+    def _add_batch(
+        self,
+        collection: Any,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+        reuse_embeddings: Dict[str, List[float]] = None
+    ) -> int:
+        """
+        Embed a batch of chunks and add them to the collection.
+        
+        Returns:
+            Number of chunks that had to be embedded (not reused)
+        """
+        if not chunks:
+            return 0
+        
+        reuse_embeddings = reuse_embeddings or {}
+        to_embed = [chunk for chunk in chunks if chunk not in reuse_embeddings]
+        if reuse_embeddings:
+            metrics.CACHE_LOOKUPS_TOTAL.labels("embedding_reuse", "hit").inc(len(chunks) - len(to_embed))
+            metrics.CACHE_LOOKUPS_TOTAL.labels("embedding_reuse", "miss").inc(len(to_embed))
+        
+        # Generate embeddings
+        embedded = {}
+        if to_embed:
+            with metrics.EMBEDDING_BATCH_SECONDS.labels("ingest").time():
+                vectors = self.embedding_model.encode(
+                    to_embed,
+                    convert_to_numpy=True,
+                    show_progress_bar=True
+                ).tolist()
+            embedded = dict(zip(to_embed, vectors))
+        
+        embeddings = [
+            embedded[chunk] if chunk in embedded else reuse_embeddings[chunk]
+            for chunk in chunks
+        ]
+        
+        # Add to collection
+        collection.add(
+            embeddings=embeddings,
+            documents=chunks,
+            metadatas=metadatas,
+            ids=ids
+        )
+        return len(to_embed)
     
     def search(
         self,
         query: str,
         top_k: int = None,
-        filter_metadata: Dict[str, Any] = None
+        filter_metadata: Dict[str, Any] = None,
+        collection_name: str = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant documents.
@@ -142,47 +799,59 @@ class VectorDatabase:
             query: Search query
             top_k: Number of results to return
             filter_metadata: Metadata filters
+            collection_name: Collection version to read (defaults to pinned/active)
             
         Returns:
             List of relevant documents with metadata
         """
-        if not self.collection:
+        collection = self._read_collection(collection_name)
+        if collection is None:
             self.create_collection()
+            collection = self._read_collection()
         
         top_k = top_k or Config.TOP_K_RESULTS
         
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode(
-            query,
-            convert_to_numpy=True
-        ).tolist()
-        
-        # Search
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=filter_metadata
-        )
-        
-        # Format results
-        formatted_results = []
-        
-        if results and results['documents'] and len(results['documents'][0]) > 0:
-            for i in range(len(results['documents'][0])):
-                formatted_results.append({
-                    "content": results['documents'][0][i],
-                    "metadata": results['metadatas'][0][i],
-                    "distance": results['distances'][0][i] if 'distances' in results else None
-                })
+        with span("vector_db.search", top_k=top_k, query_chars=len(query)) as search_span:
+            # Generate query embedding
+            with span("vector_db.embed_query"), metrics.EMBEDDING_BATCH_SECONDS.labels("query").time():
+                query_embedding = self.embedding_model.encode(
+                    query,
+                    convert_to_numpy=True
+                ).tolist()
+            
+            # Search
+            with span("vector_db.query"), metrics.VECTOR_QUERY_SECONDS.time():
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=top_k,
+                    where=filter_metadata
+                )
+            
+            # Format results
+            formatted_results = []
+            
+            if results and results['documents'] and len(results['documents'][0]) > 0:
+                for i in range(len(results['documents'][0])):
+                    formatted_results.append({
+                        "content": results['documents'][0][i],
+                        "metadata": results['metadatas'][0][i],
+                        "distance": results['distances'][0][i] if 'distances' in results else None
+                    })
+            
+            search_span.set(
+                chunks=len(formatted_results),
+                chars=sum(len(r["content"]) for r in formatted_results)
+            )
         
         return formatted_results
     
-    def get_all_documents(self) -> List[Dict[str, Any]]:
+    def get_all_documents(self, collection_name: str = None) -> List[Dict[str, Any]]:
         """Get all documents from the collection"""
-        if not self.collection:
+        collection = self._read_collection(collection_name)
+        if not collection:
             return []
         
-        results = self.collection.get()
+        results = collection.get()
         
         formatted_results = []
         if results and results['documents']:
@@ -196,25 +865,40 @@ class VectorDatabase:
         return formatted_results
     
     def delete_collection(self) -> None:
-        """Delete the collection"""
+        """Delete every version of the collection"""
+        for _, name in self._list_versions():
+            self._drop_collection(name)
+        
         try:
-            self.client.delete_collection(self.collection_name)
-            self.collection = None
-        except:
+            os.remove(self._pointer_path())
+        except FileNotFoundError:
             pass
+        self._active_name = None
+        self._pointer_mtime = None
     
-    def get_collection_stats(self) -> Dict[str, Any]:
+    def get_collection_stats(self, collection_name: str = None) -> Dict[str, Any]:
         """Get statistics about the collection"""
-        if not self.collection:
+        collection = self._read_collection(collection_name)
+        if not collection:
             return {
                 "exists": False,
                 "count": 0
             }
         
-        count = self.collection.count()
+        count = collection.count()
         
-        return {
+        stats = {
             "exists": True,
             "count": count,
-            "name": self.collection_name
+            "name": self.collection_name,
+            "version": collection.name
         }
+        
+        dedup_report = self._dedup_reports.get(collection.name)
+        if dedup_report:
+            stats["deduplication"] = {
+                key: dedup_report[key]
+                for key in ("chunks_seen", "duplicates_removed", "chars_removed", "removed_ratio")
+            }
+        
+        return stats
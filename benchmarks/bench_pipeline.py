@@ -0,0 +1,255 @@
+"""
+End-to-end benchmark for the ingest -> retrieve -> generate pipeline.
+
+Runs fully offline: the embedding model is replaced by a deterministic fake
+and the LLM provider by the bundled mock server (backend/mock_llm.py), while
+the real chunker, ChromaDB and FastAPI app are exercised.
+
+Usage:
+    python -m benchmarks.bench_pipeline --output bench_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import itertools
+import resource
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+ASSETS_DIR = REPO_ROOT / "project_assets"
+
+SEARCH_QUERIES = [
+    "discount code validation",
+    "shipping cost express standard",
+    "email format error message",
+    "add product to cart",
+    "payment method paypal credit card",
+    "HTML structure checkout",
+]
+
+TEST_CASE_QUERIES = [
+    "Generate test cases for the discount code feature",
+    "Generate test cases for form validation",
+    "Generate test cases for shopping cart functionality",
+]
+
+SCRIPT_TEST_CASE = {
+    "test_id": "TC-001",
+    "feature": "Discount Code",
+    "test_scenario": "Apply valid discount code SAVE15",
+    "test_steps": ["Enter SAVE15", "Click Apply"],
+    "expected_result": "15% discount applied"
+}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize_latencies(samples_s: List[float]) -> Dict[str, float]:
+    """Summarize latency samples (seconds) in milliseconds"""
+    samples_ms = [s * 1000 for s in samples_s]
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "max_ms": round(max(samples_ms), 3),
+    }
+
+
+def time_calls(func: Callable[[], Any], iterations: int, warmup: int = 1) -> List[float]:
+    """Time repeated calls of func, discarding warmup runs"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def prepare_corpus(upload_dir: str, copies: int) -> int:
+    """Copy the project assets into the upload directory `copies` times"""
+    os.makedirs(upload_dir, exist_ok=True)
+    count = 0
+    for copy_index in range(copies):
+        for asset in sorted(ASSETS_DIR.iterdir()):
+            if asset.is_file():
+                target = Path(upload_dir) / f"{asset.stem}_{copy_index}{asset.suffix}"
+                shutil.copyfile(asset, target)
+                count += 1
+    return count
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from benchmarks.fakes import free_port
+
+    workdir = tempfile.mkdtemp(prefix="qa-agent-bench-")
+    port = free_port()
+
+    # Config reads the environment at import time, so set it up first
+    os.environ["LLM_PROVIDER"] = "mock"
+    os.environ["MOCK_LLM_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["MOCK_LLM_LATENCY_DISTRIBUTION"] = "fixed"
+    os.environ["MOCK_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["MOCK_LLM_TOKENS_PER_SEC"] = "0"
+    os.environ["MOCK_LLM_ERROR_RATE"] = "0"
+    os.environ["CHROMA_DB_PATH"] = os.path.join(workdir, "chroma_db")
+    os.environ["ARTIFACT_DB_PATH"] = os.path.join(workdir, "qa_artifacts.db")
+    # Stored scripts would otherwise answer every call after the first
+    os.environ["SELENIUM_SCRIPT_CACHE"] = "false"
+    os.chdir(workdir)
+    sys.path.insert(0, str(REPO_ROOT))
+
+    from benchmarks.fakes import FakeEmbeddingModel, MockLLMServer
+
+    with MockLLMServer(port=port):
+        import backend.vector_db
+        backend.vector_db.load_embedding_model = FakeEmbeddingModel
+
+        from fastapi.testclient import TestClient
+        from backend import main
+        from backend.config import Config
+
+        client = TestClient(main.app)
+
+        # Ingest
+        num_files = prepare_corpus(Config.UPLOAD_DIR, args.copies)
+        start = time.perf_counter()
+        response = client.post("/build-knowledge-base", params={"reset": True})
+        ingest_s = time.perf_counter() - start
+        response.raise_for_status()
+        details = response.json()["details"]
+
+        ingest = {
+            "files": details["files_processed"],
+            "chunks": details["chunks_created"],
+            "seconds": round(ingest_s, 4),
+            "files_per_s": round(details["files_processed"] / ingest_s, 2),
+            "chunks_per_s": round(details["chunks_created"] / ingest_s, 2),
+        }
+
+        # Retrieval
+        search_queries = itertools.cycle(SEARCH_QUERIES)
+        knowledge_base = main.knowledge_bases.get()
+        search_samples = time_calls(
+            lambda: knowledge_base.search(next(search_queries), top_k=5),
+            iterations=args.search_iterations
+        )
+
+        # End-to-end generation; the queries repeat, so regenerate is set to
+        # keep stored generations from answering them
+        test_case_queries = itertools.cycle(TEST_CASE_QUERIES)
+
+        def generate_test_cases(regenerate: bool = True):
+            query = next(test_case_queries)
+            client.post(
+                "/generate-test-cases",
+                json={"query": query, "top_k": 5, "regenerate": regenerate}
+            ).raise_for_status()
+
+        def generate_script(regenerate: bool = True):
+            client.post(
+                "/generate-selenium-script",
+                json={"test_case": SCRIPT_TEST_CASE, "regenerate": regenerate}
+            ).raise_for_status()
+
+        test_case_samples = time_calls(generate_test_cases, iterations=args.generation_iterations)
+        script_samples = time_calls(generate_script, iterations=args.generation_iterations)
+
+        # Repeated requests answered from the artifact store
+        reused_test_case_samples = time_calls(
+            lambda: generate_test_cases(regenerate=False),
+            iterations=args.generation_iterations
+        )
+        reused_script_samples = time_calls(
+            lambda: generate_script(regenerate=False),
+            iterations=args.generation_iterations
+        )
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "copies": args.copies,
+                "corpus_files": num_files,
+                "search_iterations": args.search_iterations,
+                "generation_iterations": args.generation_iterations,
+                "llm_latency_ms": args.llm_latency_ms,
+            },
+        },
+        "results": {
+            "ingest": ingest,
+            "search": summarize_latencies(search_samples),
+            "generate_test_cases": summarize_latencies(test_case_samples),
+            "generate_selenium_script": summarize_latencies(script_samples),
+            "reuse_test_cases": summarize_latencies(reused_test_case_samples),
+            "reuse_selenium_script": summarize_latencies(reused_script_samples),
+            "peak_rss_mb": peak_rss_mb(),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline QA Agent pipeline benchmark")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--copies", type=int, default=20, help="Copies of project_assets to ingest")
+    parser.add_argument("--search-iterations", type=int, default=200)
+    parser.add_argument("--generation-iterations", type=int, default=30)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated LLM response latency")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output)
+    results = run(args)
+
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    print(json.dumps(results["results"], indent=2, sort_keys=True))
+    print(f"Results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
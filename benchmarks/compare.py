@@ -0,0 +1,78 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json --threshold 0.10
+
+Exits with status 1 if any metric regressed by more than the threshold.
+"""
+
+import sys
+import json
+import argparse
+from typing import Any, Dict, Iterator, Tuple
+
+
+# Metrics where a larger value is better; everything else is lower-is-better
+HIGHER_IS_BETTER_SUFFIXES = ("_per_s",)
+
+# Bookkeeping values that are not performance metrics
+IGNORED_KEYS = {"count", "files", "chunks"}
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """Yield (dotted_key, value) for every numeric leaf"""
+    for key, value in sorted(results.items()):
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, name)
+        elif isinstance(value, (int, float)) and key not in IGNORED_KEYS:
+            yield name, float(value)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    base_metrics = dict(flatten(baseline["results"]))
+    current_metrics = dict(flatten(current["results"]))
+    regressions = 0
+
+    print(f"{'metric':45} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(set(base_metrics) | set(current_metrics)):
+        old = base_metrics.get(name)
+        new = current_metrics.get(name)
+        if old is None or new is None:
+            print(f"{name:45} {str(old):>12} {str(new):>12} {'n/a':>9}")
+            continue
+
+        change = (new - old) / old if old else 0.0
+        if name.endswith(HIGHER_IS_BETTER_SUFFIXES):
+            regressed = change < -threshold
+        else:
+            regressed = change > threshold
+
+        marker = "  REGRESSION" if regressed else ""
+        regressions += regressed
+        print(f"{name:45} {old:12.3f} {new:12.3f} {change:+9.1%}{marker}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare QA Agent benchmark results")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative change")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"\n{regressions} metric(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Deterministic offline stand-ins for the embedding model and the LLM provider.
+"""
+
+import time
+import socket
+import hashlib
+import threading
+from typing import List, Union
+
+import numpy as np
+
+
+class FakeEmbeddingModel:
+    """
+    Deterministic stand-in for SentenceTransformer.
+    
+    Tokens are feature-hashed into a fixed-size vector so similar texts get
+    similar embeddings, without downloading or running a model.
+    """
+    
+    def __init__(self, model_name: str = None, dimension: int = 384):
+        self.model_name = model_name
+        self.dimension = dimension
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+    
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dimension] += sign
+        
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        
+        return vectors[0] if single else vectors
+
+
+class MockLLMServer:
+    """Run backend.mock_llm on a background thread"""
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 8001):
+        import uvicorn
+        from backend.mock_llm import app
+        
+        self.base_url = f"http://{host}:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+    
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
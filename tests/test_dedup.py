@@ -0,0 +1,175 @@
+"""
+Tests for near-duplicate detection of chunks and test cases.
+"""
+
+import numpy as np
+
+from backend.dedup import FINGERPRINT_BITS, ChunkDeduplicator, SimHashIndex, simhash
+# Aliased so pytest does not try to collect it as a test class
+from backend.dedup import TestCaseDeduplicator as CaseDeduplicator
+
+
+HEADER = "ACME Corp confidential. Product specification for the checkout page, revision 4, approved by QA."
+
+
+def _flip(fingerprint: int, bits) -> int:
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_simhash_is_stable_and_ignores_case_and_punctuation():
+    assert simhash(HEADER) == simhash(HEADER.upper().replace(",", ""))
+    assert simhash(HEADER) != simhash("Discount codes are validated on the server.")
+    assert 0 <= simhash(HEADER) < 1 << FINGERPRINT_BITS
+
+
+def test_index_finds_fingerprint_at_max_distance():
+    index = SimHashIndex(max_distance=3)
+    stored = simhash(HEADER)
+    index.add(stored, "kept")
+
+    # One flipped bit in each of three bands: only the fourth band matches exactly
+    assert index.find(_flip(stored, [0, 16, 32])) == "kept"
+    # All flips in one band: the other three match
+    assert index.find(_flip(stored, [1, 2, 3])) == "kept"
+
+
+def test_index_misses_fingerprint_past_max_distance():
+    index = SimHashIndex(max_distance=3)
+    stored = simhash(HEADER)
+    index.add(stored, "kept")
+
+    assert index.find(_flip(stored, [0, 16, 32, 48])) is None
+    # Shares three bands exactly but is still too far
+    assert index.find(_flip(stored, [0, 1, 2, 3])) is None
+
+
+def test_threshold_sets_max_distance():
+    assert ChunkDeduplicator(mode="skip", threshold=0.95).index.max_distance == 3
+    assert ChunkDeduplicator(mode="skip", threshold=1.0).index.max_distance == 0
+
+
+def test_skip_mode_drops_duplicates_without_provenance():
+    deduplicator = ChunkDeduplicator(mode="skip", threshold=0.95)
+
+    assert deduplicator.check("a_0", HEADER, {"source": "a.md"}) is None
+    assert deduplicator.check("b_0", HEADER, {"source": "b.md"}) == "a_0"
+    assert deduplicator.merged_metadatas() == {}
+
+    report = deduplicator.report()
+    assert report["chunks_seen"] == 2
+    assert report["duplicates_removed"] == 1
+    assert report["removed_by_source"] == {"b.md": 1}
+    assert report["chars_removed"] == len(HEADER)
+
+
+def test_merge_mode_records_sources_on_kept_chunk():
+    deduplicator = ChunkDeduplicator(mode="merge", threshold=0.95)
+    deduplicator.seed(["a_0"], [HEADER], [{"source": "a.md", "duplicate_sources": "c.md", "duplicate_count": 1}])
+
+    assert deduplicator.check("b_0", HEADER, {"source": "b.md"}) == "a_0"
+    assert deduplicator.check("b_1", HEADER, {"source": "b.md"}) == "a_0"
+
+    merged = deduplicator.merged_metadatas()
+    assert merged == {
+        "a_0": {"source": "a.md", "duplicate_sources": "b.md,c.md", "duplicate_count": 2}
+    }
+    assert deduplicator.report()["shared_chunks"] == [
+        {"chunk_id": "a_0", "source": "a.md", "duplicate_sources": ["b.md"]}
+    ]
+
+
+def test_seed_skips_the_source_being_replaced():
+    deduplicator = ChunkDeduplicator(mode="merge", threshold=0.95)
+    deduplicator.seed(["a_0"], [HEADER], [{"source": "a.md"}], exclude_source="a.md")
+
+    assert deduplicator.check("a_new_0", HEADER, {"source": "a.md"}) is None
+
+
+def test_repeats_within_a_source_are_not_shared_provenance():
+    deduplicator = ChunkDeduplicator(mode="merge", threshold=0.95)
+    deduplicator.check("a_0", HEADER, {"source": "a.md"})
+    deduplicator.check("a_1", HEADER, {"source": "a.md"})
+
+    assert deduplicator.merged_metadatas() == {}
+    assert deduplicator.report()["removed_by_source"] == {"a.md": 1}
+
+
+class _TopicModel:
+    """Embeds a text as its topic's axis, tilted slightly by its wording"""
+
+    def __init__(self, topics):
+        self.topics = topics
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        vectors = []
+        for text in texts:
+            vector = np.zeros(len(self.topics) + 1, dtype=np.float32)
+            vector[next(i for i, topic in enumerate(self.topics) if topic in text)] = 1.0
+            vector[-1] = 0.1 * (len(text) % 3)
+            vectors.append(vector)
+        return np.array(vectors)
+
+
+def _case(test_id, scenario, test_type="positive", **fields):
+    return {"test_id": test_id, "test_scenario": scenario, "test_type": test_type, "test_steps": ["step"], **fields}
+
+
+def test_test_case_clusters_keep_first_case_with_provenance():
+    cases = [
+        _case("TC-001", "Apply discount code", feature="Discount", grounded_in="product_specs.md"),
+        _case("TC-002", "Checkout with empty cart"),
+        _case("TC-003", "Apply a valid discount code", feature="Cart", grounded_in="ui_ux_guide.txt"),
+        _case("TC-004", "Apply the discount code twice"),
+    ]
+    deduplicator = CaseDeduplicator(_TopicModel(["discount", "empty cart"]), threshold=0.9)
+
+    kept, report = deduplicator.deduplicate(cases)
+
+    assert [tc["test_id"] for tc in kept] == ["TC-001", "TC-002"]
+    merged = kept[0]["merged_from"]
+    assert [m["test_id"] for m in merged] == ["TC-003", "TC-004"]
+    assert merged[0]["feature"] == "Cart"
+    assert merged[0]["grounded_in"] == "ui_ux_guide.txt"
+    assert merged[0]["test_scenario"] == "Apply a valid discount code"
+    assert all(0.9 <= m["similarity"] <= 1.0 for m in merged)
+    assert "merged_from" not in kept[1]
+    assert "merged_from" not in cases[0]
+    assert report["duplicates_removed"] == 2
+    assert report["clusters"] == [
+        {"test_id": "TC-001", "test_scenario": "Apply discount code", "duplicates": ["TC-003", "TC-004"]}
+    ]
+
+
+def test_test_cases_of_different_types_are_not_merged():
+    cases = [_case("TC-001", "Apply discount code"), _case("TC-002", "Apply discount code", test_type="negative")]
+    deduplicator = CaseDeduplicator(_TopicModel(["discount"]), threshold=0.9)
+
+    kept, report = deduplicator.deduplicate(cases)
+
+    assert [tc["test_id"] for tc in kept] == ["TC-001", "TC-002"]
+    assert report["duplicates_removed"] == 0
+
+
+def test_earlier_provenance_survives_a_second_pass():
+    cases = [_case("TC-001", "Apply discount code"), _case("TC-002", "Apply discount code again")]
+    deduplicator = CaseDeduplicator(_TopicModel(["discount"]), threshold=0.9)
+
+    kept, _ = deduplicator.deduplicate(cases)
+    kept, _ = deduplicator.deduplicate(kept + [_case("TC-003", "Apply discount code once more")])
+
+    assert [m["test_id"] for m in kept[0]["merged_from"]] == ["TC-002", "TC-003"]
+
+
+def test_identical_cases_are_embedded_once():
+    model = _TopicModel(["discount"])
+    cases = [_case(f"TC-{i:03d}", "Apply discount code") for i in range(5)]
+
+    kept, report = CaseDeduplicator(model, threshold=0.9).deduplicate(cases)
+
+    assert [tc["test_id"] for tc in kept] == ["TC-000"]
+    assert [m["similarity"] for m in kept[0]["merged_from"]] == [1.0] * 4
+    assert model.batches == [["Apply discount code. step"]]
@@ -0,0 +1,139 @@
+"""
+Tests for tolerant JSON parsing and array salvage of LLM output.
+"""
+
+import pytest
+
+from backend.json_repair import ArrayStream, parse_json, salvage_array
+
+
+def test_parse_json_reads_fenced_document_inside_prose():
+    text = 'Here are the test cases:\n```json\n{"test_cases": [{"test_id": "TC-001"}]}\n```\nLet me know!'
+
+    value, repairs = parse_json(text)
+
+    assert value == {"test_cases": [{"test_id": "TC-001"}]}
+    assert repairs == []
+
+
+def test_parse_json_removes_trailing_commas():
+    value, repairs = parse_json('{"test_cases": [{"test_id": "TC-001", "test_steps": ["a", "b",],},],}')
+
+    assert value == {"test_cases": [{"test_id": "TC-001", "test_steps": ["a", "b"]}]}
+    assert repairs == ["removed trailing comma"] * 4
+
+
+def test_parse_json_fixes_missing_commas_and_python_literals():
+    value, repairs = parse_json('[\n  {"a": 1}\n  {"b": True, "c": None}\n]')
+
+    assert value == [{"a": 1}, {"b": True, "c": None}]
+    assert repairs == ["inserted missing comma", "replaced True", "replaced None"]
+
+
+def test_parse_json_leaves_string_contents_alone():
+    value, repairs = parse_json('{"step": "Click OK, then None,]"}')
+
+    assert value == {"step": "Click OK, then None,]"}
+    assert repairs == []
+
+
+def test_parse_json_raises_without_document():
+    with pytest.raises(ValueError):
+        parse_json("Sorry, I cannot help with that.")
+
+
+def test_salvage_array_keeps_complete_items_of_truncated_array():
+    text = '{"test_cases": [{"test_id": "TC-001"}, {"test_id": "TC-002"}, {"test_id": "TC-0'
+
+    result = salvage_array(text, key="test_cases")
+
+    assert result.found and result.truncated
+    assert result.items == [{"test_id": "TC-001"}, {"test_id": "TC-002"}]
+    assert result.indexes == [0, 1]
+    assert result.dropped == [{"index": 2, "reason": "truncated", "excerpt": '{"test_id": "TC-0'}]
+
+
+def test_salvage_array_truncated_between_items():
+    result = salvage_array('[{"a": 1}, ', key="test_cases")
+
+    assert result.truncated
+    assert result.items == [{"a": 1}]
+    assert result.dropped == []
+
+
+def test_salvage_array_reads_fenced_array_and_drops_invalid_items():
+    text = '```json\n[{"a": 1}, {"b": oops}, {"c": 3,}]\n```'
+
+    result = salvage_array(text)
+
+    assert not result.truncated
+    assert result.items == [{"a": 1}, {"c": 3}]
+    assert result.indexes == [0, 2]
+    assert result.repairs == ["removed trailing comma"]
+    assert [(item["index"], item["excerpt"]) for item in result.dropped] == [(1, '{"b": oops}')]
+    assert result.dropped[0]["reason"].startswith("invalid JSON")
+
+
+def test_salvage_array_prefers_keyed_array_over_earlier_lists():
+    result = salvage_array('{"notes": ["x"], "test_cases": [{"a": 1}]}', key="test_cases")
+
+    assert result.items == [{"a": 1}]
+
+
+def test_salvage_array_without_array():
+    result = salvage_array("No test cases could be generated.")
+
+    assert not result.found
+    assert result.items == [] and result.dropped == []
+
+
+def test_array_stream_returns_items_as_deltas_complete_them():
+    text = '{"test_cases": [{"test_id": "TC-001", "test_steps": ["a", "b"]}, {"test_id": "TC-002"}]}'
+    stream = ArrayStream(key="test_cases")
+
+    completed = [stream.feed(text[i:i + 7]) for i in range(0, len(text), 7)]
+    result = stream.close()
+
+    assert [item for delta in completed for item in delta] == [
+        (0, {"test_id": "TC-001", "test_steps": ["a", "b"]}),
+        (1, {"test_id": "TC-002"})
+    ]
+    # Each item is handed back by the delta that closes it, not at the end
+    closing = text.index("]}") + 2
+    assert completed[(closing - 1) // 7] == [(0, {"test_id": "TC-001", "test_steps": ["a", "b"]})]
+    assert result.found and not result.truncated
+    assert result.items == [{"test_id": "TC-001", "test_steps": ["a", "b"]}, {"test_id": "TC-002"}]
+
+
+def test_array_stream_waits_for_the_key_before_nested_lists():
+    stream = ArrayStream(key="test_cases")
+
+    assert stream.feed('{"notes": ["not", "an", "item"], ') == []
+    assert stream.feed('"test_cases": [{"a": 1}') == [(0, {"a": 1})]
+
+
+def test_array_stream_handles_strings_split_across_deltas():
+    stream = ArrayStream(key="test_cases")
+
+    assert stream.feed('{"test_cases": [{"step": "type \\"x') == []
+    assert stream.feed('\\" and press ]"}]}') == [(0, {"step": 'type "x" and press ]'})]
+
+
+def test_array_stream_close_marks_cut_off_array_as_truncated():
+    stream = ArrayStream(key="test_cases")
+    stream.feed('{"test_cases": [{"a": 1}, {"b": 2,}, {"c": ')
+
+    result = stream.close()
+
+    assert result.truncated
+    assert result.items == [{"a": 1}, {"b": 2}]
+    assert result.repairs == ["removed trailing comma"]
+    assert result.dropped == [{"index": 2, "reason": "truncated", "excerpt": '{"c": '}]
+
+
+def test_array_stream_ignores_text_after_the_array():
+    stream = ArrayStream(key="test_cases")
+    stream.feed('{"test_cases": [{"a": 1}]')
+
+    assert stream.feed(', "extra": [{"b": 2}]}') == []
+    assert not stream.close().truncated
@@ -0,0 +1,134 @@
+"""
+Tests for replacing fixed sleeps in generated scripts with explicit waits.
+"""
+
+import textwrap
+
+from backend.script_rewriter import rewrite_waits
+
+
+HEADER = textwrap.dedent('''\
+    import time
+    import unittest
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    ''')
+
+WAIT_IMPORTS = (
+    "from selenium.webdriver.support.ui import WebDriverWait\n"
+    "from selenium.webdriver.support import expected_conditions as EC\n"
+)
+
+
+def _script(body: str) -> str:
+    return HEADER + "\n\ndef test_checkout(driver):\n" + textwrap.indent(textwrap.dedent(body), "    ")
+
+
+def _actions(report):
+    return sorted((change["line"], change["action"]) for change in report["changes"])
+
+
+def test_sleep_before_an_interaction_waits_for_clickable():
+    script, report = rewrite_waits(_script('''\
+        driver.find_element(By.ID, "add-product-1").click()
+        time.sleep(2)
+        driver.find_element(By.ID, "discount-code").send_keys("SAVE15")
+        '''))
+
+    assert 'WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, "discount-code")))' in script
+    assert "time.sleep" not in script
+    assert script.startswith(HEADER + WAIT_IMPORTS)
+    assert report["sleeps_replaced"] == 1
+    assert report["sleep_seconds_removed"] == 2.0
+
+
+def test_wait_condition_follows_how_the_element_is_used():
+    script, report = rewrite_waits(_script('''\
+        time.sleep(1)
+        total = driver.find_element(By.ID, "total-price").text
+        time.sleep(1)
+        form = driver.find_element(By.ID, "checkout-form")
+        '''))
+
+    assert 'EC.visibility_of_element_located((By.ID, "total-price"))' in script
+    assert 'EC.presence_of_element_located((By.ID, "checkout-form"))' in script
+    assert report["sleeps_replaced"] == 2
+
+
+def test_sleep_before_an_alert_waits_for_it():
+    script, _ = rewrite_waits(_script('''\
+        driver.find_element(By.ID, "pay-now-btn").click()
+        time.sleep(1)
+        driver.switch_to.alert.accept()
+        '''))
+
+    assert "WebDriverWait(driver, 10).until(EC.alert_is_present())" in script
+
+
+def test_sleeps_around_page_loads_are_removed():
+    script, report = rewrite_waits(_script('''\
+        time.sleep(1)
+        driver.get("http://localhost/checkout.html")
+        time.sleep(3)
+        driver.execute_script("window.scrollTo(0, 0)")
+        '''))
+
+    assert "time.sleep" not in script
+    assert "WebDriverWait" not in script
+    assert _actions(report) == [(8, "removed"), (10, "removed")]
+    assert report["sleep_seconds_removed"] == 4.0
+
+
+def test_sleeps_with_nothing_to_wait_for_are_kept():
+    source = _script('''\
+        while not driver.find_elements(By.CLASS_NAME, "cart-item"):
+            time.sleep(0.5)
+        time.sleep(1)
+        items = driver.find_elements(By.CLASS_NAME, "cart-item")
+        ''')
+
+    script, report = rewrite_waits(source)
+
+    assert script == source
+    assert report["sleeps_kept"] == 2
+    assert sorted((change["line"], change["reason"]) for change in report["changes"]) == [
+        (9, "no following statement to wait for"),
+        (10, "find_elements() may expect no elements")
+    ]
+
+
+def test_imported_sleep_name_is_rewritten():
+    script, report = rewrite_waits(textwrap.dedent('''\
+        from time import sleep
+        from selenium.webdriver.common.by import By
+
+
+        def remove_item(driver):
+            sleep(1)
+            driver.find_element(By.CSS_SELECTOR, ".cart-item .remove-btn").click()
+        '''))
+
+    assert 'EC.element_to_be_clickable((By.CSS_SELECTOR, ".cart-item .remove-btn"))' in script
+    assert report["sleeps_replaced"] == 1
+
+
+def test_maximize_window_is_removed_only_when_headless():
+    source = _script('''\
+        driver.maximize_window()
+        driver.get("http://localhost/checkout.html")
+        ''')
+
+    headless_script, headless_report = rewrite_waits(source)
+    headed_script, headed_report = rewrite_waits(source, headless=False)
+
+    assert "maximize_window" not in headless_script
+    assert headless_report["maximize_removed"] == 1
+    assert headed_script == source
+    assert headed_report["maximize_removed"] == 0
+
+
+def test_script_that_does_not_compile_is_returned_unchanged():
+    script, report = rewrite_waits("def test_checkout(driver:\n    time.sleep(1)\n")
+
+    assert script == "def test_checkout(driver:\n    time.sleep(1)\n"
+    assert report["error"].startswith("Syntax error at line 1")
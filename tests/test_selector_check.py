@@ -0,0 +1,150 @@
+"""
+Tests for the static locator check of generated scripts.
+"""
+
+import textwrap
+
+import pytest
+
+from backend.selector_check import PageIndex, apply_locator_fixes, check_selectors
+
+
+PAGE = """
+<html>
+<body>
+  <form id="checkout-form">
+    <input id="customer-email" name="email" class="form-input">
+    <input id="discount-code" name="discount" class="form-input discount-input">
+    <button id="pay-now-btn" class="btn primary">Pay Now</button>
+    <a href="/help">Need help?</a>
+  </form>
+  <div id="cart-items-container"></div>
+  <span id="total-price">$0.00</span>
+  <script>
+    const total = 0;
+    let cart = [];
+    function render(item) {
+      const row = document.createElement("div");
+      row.className = "cart-item";
+      row.classList.add("highlight", 'fresh');
+      row.innerHTML = `<span class="cart-item-name">${item.name}</span>
+        <button class="remove-btn" data-id="${item.id}">Remove</button>`;
+      document.getElementById("cart-items-container").appendChild(row);
+      const msg = document.createElement("p");
+      msg.id = "empty-cart-msg";
+      msg.setAttribute("name", "status");
+      document.querySelector('[name="discount"]').value = "";
+      document.getElementById("submit").disabled = cart.length === 0;
+    }
+  </script>
+</body>
+</html>
+"""
+
+
+@pytest.fixture(scope="module")
+def page():
+    return PageIndex(PAGE)
+
+
+def _script(*lines: str) -> str:
+    body = "\n".join(f"        {line}" for line in lines)
+    return textwrap.dedent('''\
+        from selenium.webdriver.common.by import By
+
+
+        def test_checkout(driver):
+        ''') + body + "\n"
+
+
+def _values(report, key):
+    return [entry["value"] for entry in report[key]]
+
+
+def test_locators_present_in_the_page_resolve(page):
+    report = check_selectors(_script(
+        'driver.find_element(By.ID, "customer-email").send_keys("a@b.c")',
+        'driver.find_element(By.NAME, "discount")',
+        'driver.find_element(By.CSS_SELECTOR, "#checkout-form button.btn.primary").click()',
+        'driver.find_element(By.XPATH, "//input[@name=\'email\']")',
+        'driver.find_element(By.LINK_TEXT, "Need help?")',
+    ), page)
+
+    assert report["valid"]
+    assert report["checked"] == report["resolved"] == 5
+    assert report["unresolved"] == report["dynamic"] == []
+
+
+def test_ids_and_classes_created_by_page_scripts_are_dynamic(page):
+    report = check_selectors(_script(
+        'driver.find_element(By.CLASS_NAME, "cart-item")',
+        'driver.find_element(By.CSS_SELECTOR, ".cart-item .remove-btn")',
+        'driver.find_element(By.CSS_SELECTOR, ".cart-item-name.highlight")',
+        'driver.find_element(By.ID, "empty-cart-msg")',
+        'driver.find_element(By.NAME, "status")',
+    ), page)
+
+    assert report["valid"]
+    assert _values(report, "dynamic") == [
+        "cart-item", ".cart-item .remove-btn", ".cart-item-name.highlight", "empty-cart-msg", "status"
+    ]
+    assert report["unresolved"] == []
+
+
+@pytest.mark.parametrize("locator", [
+    'By.ID, "total"',
+    'By.ID, "submit"',
+    'By.ID, "cart"',
+    'By.NAME, "value"',
+    'By.CSS_SELECTOR, "#discount"',
+])
+def test_tokens_page_scripts_only_mention_are_unresolved(page, locator):
+    report = check_selectors(_script(f"driver.find_element({locator})"), page)
+
+    assert not report["valid"]
+    assert report["dynamic"] == []
+    assert len(report["unresolved"]) == 1
+
+
+def test_selector_mixing_dynamic_and_made_up_tokens_is_unresolved(page):
+    report = check_selectors(_script('driver.find_element(By.CSS_SELECTOR, ".cart-item .delete-btn")'), page)
+
+    assert _values(report, "unresolved") == [".cart-item .delete-btn"]
+    assert report["unresolved"][0]["reason"] == "no element with class 'cart-item', class 'delete-btn'"
+
+
+def test_unresolved_locators_suggest_close_page_locators(page):
+    report = check_selectors(_script(
+        'driver.find_element(By.ID, "pay-now-button").click()',
+        'driver.find_element(By.ID, "email")',
+        'driver.find_element(By.ID, "pay-now-button")',
+    ), page)
+
+    by_value = {entry["value"]: entry for entry in report["unresolved"]}
+    assert by_value["pay-now-button"]["lines"] == [5, 7]
+    assert {"by": "ID", "value": "pay-now-btn"} in by_value["pay-now-button"]["suggestions"]
+    assert {"by": "NAME", "value": "email"} in by_value["email"]["suggestions"]
+
+
+def test_invalid_and_state_dependent_selectors_are_reported_separately(page):
+    report = check_selectors(_script(
+        'driver.find_element(By.CSS_SELECTOR, "button[")',
+        'driver.find_element(By.CSS_SELECTOR, "#pay-now-btn:hover")',
+        'driver.find_element(By.CLASS_NAME, "btn primary")',
+    ), page)
+
+    assert not report["valid"]
+    assert _values(report, "invalid") == ["button[", "btn primary"]
+    assert _values(report, "unchecked") == ["#pay-now-btn:hover"]
+
+
+def test_locator_fixes_edit_only_the_locator_value(page):
+    script = _script('driver.find_element(By.ID, "pay-now-button").click()  # pay')
+
+    fixed, applied = apply_locator_fixes(script, [
+        {"by": "ID", "value": "pay-now-button", "new_by": "ID", "new_value": "pay-now-btn"}
+    ])
+
+    assert len(applied) == 1
+    assert 'driver.find_element(By.ID, "pay-now-btn").click()  # pay' in fixed
+    assert check_selectors(fixed, page)["valid"]
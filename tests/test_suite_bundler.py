@@ -0,0 +1,139 @@
+"""
+Tests for bundling generated scripts into shared-browser suite modules.
+"""
+
+import ast
+import textwrap
+
+from backend.suite_bundler import bundle_scripts
+
+
+SCRIPT = textwrap.dedent('''\
+    import time
+    import unittest
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+
+    BASE_URL = "http://localhost/{page}"
+
+
+    def open_page(driver):
+        driver.get(BASE_URL)
+
+
+    class TestCheckout(unittest.TestCase):
+        @classmethod
+        def setUpClass(cls):
+            options = Options()
+            options.add_argument("--headless")
+            cls.driver = webdriver.Chrome(options=options)
+
+        @classmethod
+        def tearDownClass(cls):
+            cls.driver.quit()
+
+        def test_flow(self):
+            open_page(self.driver)
+            self.assertIn("{page}", self.driver.current_url)
+
+        def test_flow(self):
+            self.assertTrue(self.driver.title)
+
+
+    if __name__ == "__main__":
+        unittest.main()
+    ''')
+
+
+def _definitions(module: str):
+    """Top-level functions, assignments and classes (with their methods) of a module"""
+    tree = ast.parse(module)
+    names = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            names[node.name] = [item.name for item in node.body if isinstance(item, ast.FunctionDef)]
+        elif isinstance(node, ast.FunctionDef):
+            names[node.name] = None
+        elif isinstance(node, ast.Assign):
+            names.update({target.id: None for target in node.targets if isinstance(target, ast.Name)})
+    return names
+
+
+def _renames(report):
+    return [(entry["test_id"], entry["kind"], entry["from"], entry["to"]) for entry in report["renamed"]]
+
+
+def test_clashing_names_get_the_test_id_as_suffix():
+    modules, report = bundle_scripts({
+        "TC-001": SCRIPT.replace("{page}", "cart.html"),
+        "TC-002": SCRIPT.replace("{page}", "payment.html")
+    }, headless=True)
+
+    module = modules["test_suite.py"]
+    names = _definitions(module)
+    assert names["TestCheckout"] == ["setUp", "setUpClass", "tearDownClass", "test_flow", "test_flow_2"]
+    assert names["TestCheckout_TC_002"] == names["TestCheckout"]
+    assert "BASE_URL" in names and "BASE_URL_TC_002" in names
+    assert "open_page" in names and "open_page_TC_002" in names
+    assert _renames(report) == [
+        ("TC-001", "method", "test_flow", "test_flow_2"),
+        ("TC-002", "class", "TestCheckout", "TestCheckout_TC_002"),
+        ("TC-002", "helper", "BASE_URL", "BASE_URL_TC_002"),
+        ("TC-002", "helper", "open_page", "open_page_TC_002"),
+        ("TC-002", "method", "test_flow", "test_flow_2"),
+    ]
+    # References follow the renamed definitions
+    assert "def open_page_TC_002(driver):\n    driver.get(BASE_URL_TC_002)" in module
+    assert "open_page_TC_002(self.driver)" in module
+    assert report["tests"] == 4
+
+
+def test_identical_helpers_are_kept_once():
+    modules, report = bundle_scripts({
+        "TC-001": SCRIPT.replace("{page}", "cart.html"),
+        "TC-002": SCRIPT.replace("{page}", "cart.html").replace("TestCheckout", "TestCart")
+    })
+
+    module = modules["test_suite.py"]
+    assert module.count("def open_page(") == 1
+    assert module.count("BASE_URL = ") == 1
+    assert [entry["kind"] for entry in report["renamed"]] == ["method", "method"]
+
+
+def test_scripts_share_one_browser():
+    modules, report = bundle_scripts({"TC-001": SCRIPT.replace("{page}", "cart.html")}, headless=True)
+
+    module = modules["test_suite.py"]
+    compile(module, "test_suite.py", "exec")
+    assert "cls.driver = shared_driver()" in module
+    assert "webdriver.Chrome(" not in module.split("# TC-001")[1]
+    assert "Options()" not in module.split("# TC-001")[1]
+    assert "cls.driver.quit()" not in module
+    assert "--headless=new" in module
+    assert "def setUp(self):\n        reset_browser()" in module
+    assert module.count('if __name__ == "__main__":') == 1
+    assert report["drivers_shared"] == 1
+
+
+def test_shards_are_balanced_by_test_count_and_bad_scripts_skipped():
+    single = SCRIPT.replace("{page}", "cart.html").replace(
+        "    def test_flow(self):\n        self.assertTrue(self.driver.title)\n\n", ""
+    )
+    modules, report = bundle_scripts({
+        "TC-001": SCRIPT.replace("{page}", "a.html"),
+        "TC-002": single.replace("TestCheckout", "TestB"),
+        "TC-003": single.replace("TestCheckout", "TestC"),
+        "TC-004": "driver = (",
+        "TC-005": "print('no tests')\n",
+    }, shards=2)
+
+    assert sorted(modules) == ["test_suite_shard_1.py", "test_suite_shard_2.py"]
+    assert [(shard["test_ids"], shard["tests"]) for shard in report["shards"]] == [
+        (["TC-001"], 2),
+        (["TC-002", "TC-003"], 2),
+    ]
+    assert [entry["test_id"] for entry in report["skipped"]] == ["TC-004", "TC-005"]
+    assert report["skipped"][1]["error"] == "no unittest.TestCase classes"
+    for module in modules.values():
+        compile(module, "shard", "exec")